@@ -32,9 +32,25 @@ from blueprints.dashboards import dashboards_bp
 from blueprints.portfolio import portfolio_bp
 from blueprints.chatbot import chatbot_bp
 from blueprints.exports import exports_bp
+from blueprints.jobs import jobs_bp
 
 # Import sécurité
 from utils.security import init_security
+from database.db import init_db_pool
+from database.grade_engine import init_grade_engine
+from database.stats_snapshot import init_stats_snapshot
+from database.search_index import init_search_index
+from database.chat_unread import init_chat_unread
+from database.query_indexes import init_query_indexes
+from utils.cache_service import init_cache
+from utils.jobs import init_jobs
+from utils.pagination import init_pagination, PAGINATION_HEADERS
+from utils.realtime import init_realtime
+from utils.presence import init_presence
+from utils.notifications_service import init_notifications
+from utils.audit_log import init_audit_log
+from utils.query_profiler import init_query_profiler
+from utils.metrics import init_metrics
 
 def create_app():
     """Factory function pour créer l'application Flask"""
@@ -45,23 +61,133 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
-    app.config['DATABASE'] = os.path.join(os.path.dirname(__file__), 'database', 'esa.db')
+    # Embarquer le rôle dans le token: role_required n'interroge plus la base,
+    # mais une désactivation ne prend effet qu'à l'expiration du token
+    app.config['JWT_ROLE_CLAIMS'] = os.getenv('JWT_ROLE_CLAIMS', 'false').lower() == 'true'
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', '60'))
+    # Base SQLite (DATABASE_PATH: base synthétique de scripts/generate_school_data.py, par exemple)
+    app.config['DATABASE'] = os.getenv('DATABASE_PATH') or os.path.join(os.path.dirname(__file__), 'database', 'esa.db')
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
     
+    # Pool de connexions SQLite
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '8'))  # lecteurs
+    app.config['DB_WRITER_POOL_SIZE'] = int(os.getenv('DB_WRITER_POOL_SIZE', '1'))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    app.config['DB_STATEMENT_CACHE_SIZE'] = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+    app.config['DB_LOCK_RETRIES'] = int(os.getenv('DB_LOCK_RETRIES', '3'))
+    app.config['SQLITE_PRAGMAS'] = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-16000')),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    }
+    
+    # Profilage SQL par requête (en-tête Server-Timing, GET /api/admin/perf); N+1: répétitions d'une même instruction
+    app.config['SQL_PROFILING'] = os.getenv('SQL_PROFILING', 'true').lower() == 'true'
+    app.config['SQL_PROFILING_N_PLUS_ONE'] = int(os.getenv('SQL_PROFILING_N_PLUS_ONE', '5'))
+    
+    # Métriques Prometheus (GET /api/metrics); METRICS_TOKEN: jeton Bearer exigé du collecteur (sans jeton: debug/test seulement)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+    
+    # Cache applicatif (memory par défaut, redis si disponible)
+    app.config['CACHE_TYPE'] = os.getenv('CACHE_TYPE', 'memory')
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_DEFAULT_TIMEOUT'] = int(os.getenv('CACHE_DEFAULT_TIMEOUT', '300'))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+
+    # Limitation de débit: 'sqlite' partage les seaux entre workers (fichier RATELIMIT_DATABASE)
+    app.config['RATELIMIT_STORAGE'] = os.getenv('RATELIMIT_STORAGE', 'sqlite')
+    app.config['RATELIMIT_DATABASE'] = os.getenv('RATELIMIT_DATABASE', '')  # défaut: ratelimit.db à côté de DATABASE
+    app.config['RATELIMIT_MAX_KEYS'] = int(os.getenv('RATELIMIT_MAX_KEYS', '10000'))
+    app.config['RATELIMIT_STORAGE_URI'] = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')  # flask-limiter
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'  # false: tests de charge
+    app.config['ANOMALY_MAX_KEYS'] = int(os.getenv('ANOMALY_MAX_KEYS', '50000'))  # fenêtres de détection en mémoire
+    
+    # Travaux en arrière-plan (PDF): processus de rendu, attente des vues synchrones
+    # Un processus de rendu par cœur (les lots de bulletins se répartissent sur tous); 0 = pas de répartiteur
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', str(os.cpu_count() or 2)))
+    app.config['JOB_SYNC_WAIT'] = float(os.getenv('JOB_SYNC_WAIT', '15'))  # secondes
+    app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+    app.config['JOB_BAIL'] = int(os.getenv('JOB_BAIL', '300'))
+    
+    # Pagination des listes (taille de page par défaut et maximale)
+    app.config['PAGE_SIZE'] = int(os.getenv('PAGE_SIZE', '50'))
+    app.config['PAGE_SIZE_MAX'] = int(os.getenv('PAGE_SIZE_MAX', '200'))
+    
+    # Diffusion temps réel (SSE): file par abonné, maintien de connexion, rattrapage maximal
+    app.config['REALTIME_QUEUE_SIZE'] = int(os.getenv('REALTIME_QUEUE_SIZE', '256'))
+    app.config['REALTIME_KEEPALIVE'] = float(os.getenv('REALTIME_KEEPALIVE', '15'))  # secondes
+    app.config['CHAT_REPLAY_LIMIT'] = int(os.getenv('CHAT_REPLAY_LIMIT', '500'))
+    
+    # Présence en mémoire: expiration sans battement, écriture en base par lots (0 = immédiate)
+    app.config['PRESENCE_TTL'] = float(os.getenv('PRESENCE_TTL', '90'))  # secondes
+    app.config['PRESENCE_FLUSH_INTERVAL'] = float(os.getenv('PRESENCE_FLUSH_INTERVAL', '10'))
+    
+    # Notifications externes: canaux activés, workers d'envoi, lots et nouvelles tentatives
+    canaux = os.getenv('NOTIFICATION_CHANNELS')
+    app.config['NOTIFICATION_CHANNELS'] = tuple(c for c in canaux.split(',') if c) if canaux is not None else None  # None = canaux configurés
+    app.config['NOTIFICATION_WORKERS'] = os.getenv('NOTIFICATION_WORKERS', 'true').lower() == 'true'
+    app.config['NOTIFICATION_BATCH_SIZE'] = int(os.getenv('NOTIFICATION_BATCH_SIZE', '50'))
+    app.config['NOTIFICATION_POLL_INTERVAL'] = float(os.getenv('NOTIFICATION_POLL_INTERVAL', '5'))
+    app.config['NOTIFICATION_MAX_TENTATIVES'] = int(os.getenv('NOTIFICATION_MAX_TENTATIVES', '5'))
+    app.config['NOTIFICATION_BACKOFF'] = float(os.getenv('NOTIFICATION_BACKOFF', '30'))  # secondes, doublé à chaque échec
+    app.config['NOTIFICATION_DIGEST_WINDOW'] = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', '300'))  # secondes de regroupement des emails/SMS, 0 = désactivé
+    
+    # Journal d'audit: file bornée écrite par lots; file pleine: block, drop ou spill (fichier AUDIT_SPILL_PATH)
+    app.config['AUDIT_ASYNC'] = os.getenv('AUDIT_ASYNC', 'true').lower() == 'true'
+    app.config['AUDIT_QUEUE_SIZE'] = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    app.config['AUDIT_BATCH_SIZE'] = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+    app.config['AUDIT_FLUSH_INTERVAL'] = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1'))  # secondes
+    app.config['AUDIT_OVERFLOW'] = os.getenv('AUDIT_OVERFLOW', 'spill')
+    app.config['AUDIT_SPILL_PATH'] = os.getenv('AUDIT_SPILL_PATH', '')  # défaut: audit_spill.<pid>.jsonl à côté de DATABASE
+    
+    # Cache des documents générés (0 = désactivé)
+    app.config['DOCUMENT_CACHE_DIR'] = os.getenv('DOCUMENT_CACHE_DIR', '')  # défaut: uploads/documents
+    app.config['DOCUMENT_CACHE_MAX_BYTES'] = int(os.getenv('DOCUMENT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+    app.config['DOCUMENT_CACHE_SWEEP_INTERVAL'] = float(os.getenv('DOCUMENT_CACHE_SWEEP_INTERVAL', '3600'))  # secondes, fichiers orphelins
+    
     # Créer les dossiers nécessaires
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'photos'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'qr_codes'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'pdf'), exist_ok=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'jobs'), exist_ok=True)
     
     # Initialiser les extensions
-    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True,
+         expose_headers=['Location', *PAGINATION_HEADERS])
     jwt = JWTManager(app)
     bcrypt = Bcrypt(app)
     
+    # Initialiser le pool de connexions
+    init_db_pool(app)
+    init_query_profiler(app)
+    init_metrics(app)
+    init_audit_log(app)
+    init_grade_engine(app)
+    init_stats_snapshot(app)
+    init_pagination(app)
+    init_query_indexes(app)
+    init_search_index(app)
+    init_chat_unread(app)
+    
+    # Démarrer la file de travaux en arrière-plan
+    init_jobs(app)
+    init_notifications(app)
+    
+    # Initialiser le cache
+    init_cache(app)
+    init_realtime(app)
+    init_presence(app)
+    
     # Initialiser la sécurité
     limiter = init_security(app)
+    if 'metrics' in app.view_functions:
+        # Collecte périodique: hors des limites par défaut (50 par heure)
+        limiter.exempt(app.view_functions['metrics'])
     
     # Enregistrer les blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -86,6 +212,7 @@ def create_app():
     app.register_blueprint(portfolio_bp, url_prefix='/api/portfolio')
     app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
     app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     
     # Route de santé
     @app.route('/api/health')
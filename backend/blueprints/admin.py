@@ -3,11 +3,19 @@ Blueprint pour les fonctionnalités d'administration
 """
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
-from database.db import get_db
-from utils.auth import role_required, get_current_user, log_action
+from database.db import get_db, get_pool
+from database.stats_snapshot import read_stats_snapshot, rebuild_stats_snapshot
+from database.job_queue import get_job
+from utils.auth import role_required, get_current_user, log_action, invalidate_user_cache
+from utils.cache_service import cached, invalidate_cache
 from utils.validators import validate_required, validate_email_format, validate_phone, validate_date, validate_montant
 from utils.qr_code import generate_student_qr
 from utils.pdf_generator import generate_receipt, generate_bulletin
+from utils.jobs import enqueue_job, job_status_response
+from utils.pagination import paginate
+from utils.notifications_service import notification_stats
+from utils.audit_log import get_audit_writer
+from utils.query_profiler import get_query_profiler
 from datetime import datetime
 import os
 
@@ -23,17 +31,14 @@ def list_users():
     role_filter = request.args.get('role')
     db = get_db()
     
+    query = "SELECT id, username, email, role, nom, prenom, telephone, is_active, created_at FROM users"
+    params = []
+    
     if role_filter:
-        users = db.execute(
-            "SELECT id, username, email, role, nom, prenom, telephone, is_active, created_at FROM users WHERE role = ?",
-            (role_filter,)
-        ).fetchall()
-    else:
-        users = db.execute(
-            "SELECT id, username, email, role, nom, prenom, telephone, is_active, created_at FROM users"
-        ).fetchall()
+        query += " WHERE role = ?"
+        params.append(role_filter)
     
-    return jsonify([dict(user) for user in users]), 200
+    return paginate(db, query, params, [('id', 'ASC')])
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
 @jwt_required()
@@ -206,6 +211,7 @@ def update_user(user_id):
         
         db.execute(f"UPDATE users SET {', '.join(updates)} WHERE id = ?", values)
         db.commit()
+        invalidate_user_cache(user_id)
         
         log_action(get_current_user()['id'], 'modification_utilisateur', 'users', user_id, 
                   dict(old_user), data)
@@ -227,6 +233,7 @@ def toggle_user_status(user_id):
     db.execute("UPDATE users SET is_active = ?, updated_at = ? WHERE id = ?",
                (new_status, datetime.now(), user_id))
     db.commit()
+    invalidate_user_cache(user_id)
     
     action = 'activation_utilisateur' if new_status else 'desactivation_utilisateur'
     log_action(get_current_user()['id'], action, 'users', user_id)
@@ -274,6 +281,7 @@ def create_annee():
 
 @admin_bp.route('/filieres', methods=['GET'])
 @jwt_required()
+@cached(tags=['referentiel'])
 def list_filieres():
     """Liste les filières"""
     db = get_db()
@@ -301,6 +309,7 @@ def create_filiere():
         data.get('is_active', True)
     ))
     db.commit()
+    invalidate_cache('referentiel')
     
     log_action(get_current_user()['id'], 'creation_filiere', 'filieres', cursor.lastrowid)
     return jsonify({'message': 'Filière créée avec succès'}), 201
@@ -309,6 +318,7 @@ def create_filiere():
 
 @admin_bp.route('/niveaux', methods=['GET'])
 @jwt_required()
+@cached(tags=['referentiel'])
 def list_niveaux():
     """Liste les niveaux"""
     db = get_db()
@@ -336,6 +346,7 @@ def create_niveau():
         data.get('is_active', True)
     ))
     db.commit()
+    invalidate_cache('referentiel')
     
     log_action(get_current_user()['id'], 'creation_niveau', 'niveaux', cursor.lastrowid)
     return jsonify({'message': 'Niveau créé avec succès'}), 201
@@ -344,6 +355,7 @@ def create_niveau():
 
 @admin_bp.route('/classes', methods=['GET'])
 @jwt_required()
+@cached(tags=['referentiel'])
 def list_classes():
     """Liste les classes"""
     annee_id = request.args.get('annee_id')
@@ -391,14 +403,35 @@ def create_classe():
         data.get('is_active', True)
     ))
     db.commit()
+    invalidate_cache('referentiel')
     
     log_action(get_current_user()['id'], 'creation_classe', 'classes', cursor.lastrowid)
     return jsonify({'message': 'Classe créée avec succès'}), 201
 
+@admin_bp.route('/classes/<int:classe_id>/bulletins', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def generate_bulletins_classe(classe_id):
+    """Génère les bulletins de toute une classe (archive ZIP, en arrière-plan)"""
+    data = request.get_json(silent=True) or {}
+    db = get_db()
+    
+    if not db.execute("SELECT id FROM classes WHERE id = ?", (classe_id,)).fetchone():
+        return jsonify({'error': 'Classe non trouvée'}), 404
+    
+    current_user = get_current_user()
+    parametres = {'classe_id': classe_id, 'periode': data.get('periode', 'annuel')}
+    job_id = enqueue_job('bulletins_classe', current_user['id'], parametres)
+    
+    log_action(current_user['id'], 'generation_bulletins_classe', 'classes', classe_id, None, parametres)
+    # Avancement (progression/total) et téléchargement via /api/jobs/<id>
+    return job_status_response(get_job(db, job_id))
+
 # ========== GESTION DES MATIÈRES ==========
 
 @admin_bp.route('/matieres', methods=['GET'])
 @jwt_required()
+@cached(tags=['referentiel'])
 def list_matieres():
     """Liste les matières"""
     db = get_db()
@@ -427,6 +460,7 @@ def create_matiere():
         data.get('is_active', True)
     ))
     db.commit()
+    invalidate_cache('referentiel')
     
     log_action(get_current_user()['id'], 'creation_matiere', 'matieres', cursor.lastrowid)
     return jsonify({'message': 'Matière créée avec succès'}), 201
@@ -435,6 +469,7 @@ def create_matiere():
 
 @admin_bp.route('/types-frais', methods=['GET'])
 @jwt_required()
+@cached(tags=['referentiel'])
 def list_types_frais():
     """Liste les types de frais"""
     db = get_db()
@@ -467,6 +502,7 @@ def create_type_frais():
         data.get('is_active', True)
     ))
     db.commit()
+    invalidate_cache('referentiel')
     
     log_action(get_current_user()['id'], 'creation_type_frais', 'types_frais', cursor.lastrowid)
     return jsonify({'message': 'Type de frais créé avec succès'}), 201
@@ -492,6 +528,7 @@ def assign_frais_classe():
         data['annee_academique_id']
     ))
     db.commit()
+    invalidate_cache('paiements', f"classe:{data['classe_id']}")
     
     log_action(get_current_user()['id'], 'assignation_frais_classe', 'frais_classes', cursor.lastrowid)
     return jsonify({'message': 'Frais assigné à la classe avec succès'}), 201
@@ -502,46 +539,82 @@ def assign_frais_classe():
 @jwt_required()
 @role_required('admin')
 def get_dashboard_stats():
-    """Obtient les statistiques du tableau de bord"""
-    db = get_db()
-    
-    # Nombre total d'étudiants
-    total_etudiants = db.execute("SELECT COUNT(*) as count FROM etudiants WHERE is_active = 1").fetchone()['count']
-    
-    # Nombre total d'enseignants
-    total_enseignants = db.execute("SELECT COUNT(*) as count FROM enseignants WHERE is_active = 1").fetchone()['count']
-    
-    # Nombre total de classes
-    total_classes = db.execute("SELECT COUNT(*) as count FROM classes WHERE is_active = 1").fetchone()['count']
+    """Obtient les statistiques du tableau de bord (instantané maintenu par triggers)"""
+    stats = read_stats_snapshot(get_db(), nombre_mois=1, details=False)
+    mois_courant = stats['mois'][0]
     
-    # Taux de réussite (moyenne >= 10)
-    reussite = db.execute("""
-        SELECT COUNT(*) as count FROM moyennes 
-        WHERE moyenne >= 10 AND periode = 'annuel'
-    """).fetchone()['count']
-    
-    total_moyennes = db.execute("SELECT COUNT(*) as count FROM moyennes WHERE periode = 'annuel'").fetchone()['count']
-    taux_reussite = (reussite / total_moyennes * 100) if total_moyennes > 0 else 0
-    
-    # Total des paiements du mois
-    total_paiements = db.execute("""
-        SELECT COALESCE(SUM(montant), 0) as total FROM paiements 
-        WHERE statut = 'valide' AND strftime('%Y-%m', date_paiement) = strftime('%Y-%m', 'now')
-    """).fetchone()['total']
+    return jsonify({
+        'total_etudiants': stats['total_etudiants'],
+        'total_enseignants': stats['total_enseignants'],
+        'total_classes': stats['total_classes'],
+        'taux_reussite': stats['taux_reussite'],
+        'total_paiements_mois': stats['series']['revenus'][mois_courant],
+        'total_absences_mois': int(stats['series']['absences'][mois_courant]),
+        'snapshot_at': stats['updated_at']
+    }), 200
+
+@admin_bp.route('/dashboard/stats/rebuild', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def rebuild_dashboard_stats():
+    """Recalcule entièrement l'instantané des statistiques"""
+    rebuild_stats_snapshot(get_db())
     
-    # Absences du mois
-    total_absences = db.execute("""
-        SELECT COUNT(*) as count FROM absences 
-        WHERE strftime('%Y-%m', date_absence) = strftime('%Y-%m', 'now')
-    """).fetchone()['count']
+    log_action(get_current_user()['id'], 'reconstruction_statistiques', 'stats_compteurs', None)
+    return jsonify({'message': 'Statistiques recalculées avec succès'}), 200
+
+# ========== SUPERVISION TECHNIQUE ==========
+
+@admin_bp.route('/system/db-pool', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_db_pool_stats():
+    """Obtient les statistiques des pools de connexions SQLite (écriture et lecture)"""
+    pool = get_pool()
+    if pool is None:
+        return jsonify({'error': 'Pool de connexions non initialisé'}), 404
     
+    read_pool = get_pool(read_only=True)
     return jsonify({
-        'total_etudiants': total_etudiants,
-        'total_enseignants': total_enseignants,
-        'total_classes': total_classes,
-        'taux_reussite': round(taux_reussite, 2),
-        'total_paiements_mois': total_paiements,
-        'total_absences_mois': total_absences
+        'writer': pool.stats(),
+        'reader': read_pool.stats() if read_pool else None
     }), 200
 
+@admin_bp.route('/system/notifications', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_notification_stats():
+    """Obtient l'état de la boîte d'envoi des notifications et le débit de chaque canal"""
+    return jsonify(notification_stats(get_db())), 200
 
+@admin_bp.route('/system/audit', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_audit_stats():
+    """Obtient l'état de la file du journal d'audit (écrits, abandonnés, débordés)"""
+    writer = get_audit_writer()
+    if writer is None:
+        return jsonify({'error': "Journal d'audit en écriture synchrone"}), 404
+    return jsonify(writer.stats()), 200
+
+@admin_bp.route('/perf', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_perf_stats():
+    """Obtient les profils SQL agrégés par route (instructions, temps en base, N+1)"""
+    profiler = get_query_profiler()
+    if profiler is None:
+        return jsonify({'error': 'Profilage SQL désactivé'}), 404
+    limite = request.args.get('limite', 5, type=int)
+    return jsonify(profiler.stats(limite=max(limite, 0))), 200
+
+@admin_bp.route('/perf', methods=['DELETE'])
+@jwt_required()
+@role_required('admin')
+def reset_perf_stats():
+    """Remet à zéro les profils SQL agrégés"""
+    profiler = get_query_profiler()
+    if profiler is None:
+        return jsonify({'error': 'Profilage SQL désactivé'}), 404
+    profiler.reset()
+    return jsonify({'message': 'Profils SQL réinitialisés'}), 200
@@ -4,6 +4,7 @@ Blueprint pour l'Intelligence Artificielle et Analytics
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.db import get_db
+from database.stats_snapshot import read_stats_snapshot
 from utils.auth import role_required, get_current_user
 from datetime import datetime, timedelta
 import json
@@ -123,80 +124,26 @@ def predict_student_success():
 @jwt_required()
 @role_required('admin')
 def get_analytics_dashboard():
-    """Tableau de bord analytics avancé"""
-    db = get_db()
-    
-    # Statistiques générales
-    total_etudiants = db.execute("SELECT COUNT(*) as count FROM etudiants WHERE is_active = 1").fetchone()['count']
-    total_enseignants = db.execute("SELECT COUNT(*) as count FROM enseignants WHERE is_active = 1").fetchone()['count']
-    
-    # Taux de réussite
-    reussite = db.execute("""
-        SELECT COUNT(*) as count FROM moyennes 
-        WHERE moyenne >= 10 AND periode = 'annuel'
-    """).fetchone()['count']
-    total_moyennes = db.execute("SELECT COUNT(*) as count FROM moyennes WHERE periode = 'annuel'").fetchone()['count']
-    taux_reussite = (reussite / total_moyennes * 100) if total_moyennes > 0 else 0
-    
-    # Évolution des inscriptions
-    inscriptions_mois = []
-    for i in range(6):
-        date_debut = (datetime.now() - timedelta(days=30*(i+1))).strftime('%Y-%m-%d')
-        date_fin = (datetime.now() - timedelta(days=30*i)).strftime('%Y-%m-%d')
-        count = db.execute("""
-            SELECT COUNT(*) as count FROM etudiants
-            WHERE date_inscription BETWEEN ? AND ?
-        """, (date_debut, date_fin)).fetchone()['count']
-        inscriptions_mois.append({
-            'mois': date_fin[:7],
-            'nombre': count
-        })
-    
-    # Répartition par filière
-    repartition_filieres = db.execute("""
-        SELECT f.libelle, COUNT(e.id) as nombre
-        FROM filieres f
-        LEFT JOIN classes c ON f.id = c.filiere_id
-        LEFT JOIN etudiants e ON c.id = e.classe_id AND e.is_active = 1
-        GROUP BY f.id, f.libelle
-    """).fetchall()
-    
-    # Top 10 étudiants
-    top_etudiants = db.execute("""
-        SELECT e.id, u.nom, u.prenom, AVG(m.moyenne) as moyenne_generale
-        FROM etudiants e
-        JOIN users u ON e.user_id = u.id
-        JOIN moyennes m ON e.id = m.etudiant_id
-        WHERE m.periode = 'annuel' AND e.is_active = 1
-        GROUP BY e.id, u.nom, u.prenom
-        ORDER BY moyenne_generale DESC
-        LIMIT 10
-    """).fetchall()
-    
-    # Revenus par mois
-    revenus_mois = []
-    for i in range(6):
-        date_debut = (datetime.now() - timedelta(days=30*(i+1))).strftime('%Y-%m-%d')
-        date_fin = (datetime.now() - timedelta(days=30*i)).strftime('%Y-%m-%d')
-        total = db.execute("""
-            SELECT COALESCE(SUM(montant), 0) as total FROM paiements
-            WHERE statut = 'valide' AND date_paiement BETWEEN ? AND ?
-        """, (date_debut, date_fin)).fetchone()['total']
-        revenus_mois.append({
-            'mois': date_fin[:7],
-            'montant': total
-        })
+    """Tableau de bord analytics avancé (instantané maintenu par triggers)"""
+    stats = read_stats_snapshot(get_db())
     
     return jsonify({
         'statistiques_generales': {
-            'total_etudiants': total_etudiants,
-            'total_enseignants': total_enseignants,
-            'taux_reussite': round(taux_reussite, 2)
+            'total_etudiants': stats['total_etudiants'],
+            'total_enseignants': stats['total_enseignants'],
+            'taux_reussite': stats['taux_reussite']
         },
-        'evolution_inscriptions': inscriptions_mois,
-        'repartition_filieres': [dict(r) for r in repartition_filieres],
-        'top_etudiants': [dict(t) for t in top_etudiants],
-        'revenus_mois': revenus_mois
+        'evolution_inscriptions': [
+            {'mois': mois, 'nombre': int(stats['series']['inscriptions'][mois])}
+            for mois in stats['mois']
+        ],
+        'repartition_filieres': stats['repartition_filieres'],
+        'top_etudiants': stats['top_etudiants'],
+        'revenus_mois': [
+            {'mois': mois, 'montant': stats['series']['revenus'][mois]}
+            for mois in stats['mois']
+        ],
+        'snapshot_at': stats['updated_at']
     }), 200
 
 @ai_analytics_bp.route('/prediction/inscriptions', methods=['GET'])
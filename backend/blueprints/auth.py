@@ -3,8 +3,11 @@ Blueprint d'authentification
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from database.db import get_db
-from utils.auth import hash_password, verify_password, log_connection, generate_reset_token
+from database.db import get_db, get_db_connection
+from utils.auth import (
+    hash_password, verify_password, log_connection, generate_reset_token,
+    load_user, invalidate_user_cache, build_role_claims
+)
 from utils.validators import validate_email_format, validate_required
 from utils.security import (
     check_rate_limit, detect_suspicious_activity, log_security_event,
@@ -41,11 +44,12 @@ def login():
         return jsonify({'error': 'Trop de tentatives. Veuillez réessayer plus tard.'}), 429
     
     try:
-        db = get_db()
-        user = db.execute(
-            "SELECT * FROM users WHERE username = ? OR email = ?",
-            (username, username)
-        ).fetchone()
+        # Lecture sans détenir la connexion d'écriture pendant la vérification bcrypt
+        with get_db_connection(read_only=True) as db:
+            user = db.execute(
+                "SELECT * FROM users WHERE username = ? OR email = ?",
+                (username, username)
+            ).fetchone()
     except Exception as e:
         # Erreur de base de données - retourner erreur générique
         import logging
@@ -56,7 +60,7 @@ def login():
     user_agent = request.headers.get('User-Agent', '')
     
     if not user or not verify_password(password, user['password_hash']):
-        log_connection(None, username, ip_address, user_agent, 'echec', 'Identifiants invalides')
+        log_connection(user['id'] if user else None, username, ip_address, user_agent, 'echec', 'Identifiants invalides')
         log_security_event('failed_login', None, {'username': username, 'ip': ip_address}, 'warning')
         return jsonify({'error': 'Identifiants invalides'}), 401
     
@@ -77,11 +81,13 @@ def login():
     
     # Mettre à jour la dernière connexion
     try:
+        db = get_db()
         db.execute(
             "UPDATE users SET last_login = ? WHERE id = ?",
             (datetime.now(), user['id'])
         )
         db.commit()
+        invalidate_user_cache(user['id'])
     except Exception as e:
         # Ne pas bloquer si la mise à jour échoue
         import logging
@@ -95,7 +101,7 @@ def login():
     log_connection(user['id'], username, ip_address, user_agent, 'succes', None)
     
     # Créer les tokens JWT
-    access_token = create_access_token(identity=user['id'])
+    access_token = create_access_token(identity=user['id'], additional_claims=build_role_claims(user))
     refresh_token = create_refresh_token(identity=user['id'])
     
     return jsonify({
@@ -259,7 +265,10 @@ def register():
 def refresh():
     """Rafraîchit le token d'accès"""
     current_user_id = get_jwt_identity()
-    new_token = create_access_token(identity=current_user_id)
+    user = load_user(current_user_id)
+    if not user or not user['is_active']:
+        return jsonify({'error': 'Utilisateur non trouvé ou désactivé'}), 401
+    new_token = create_access_token(identity=current_user_id, additional_claims=build_role_claims(user))
     return jsonify({'access_token': new_token}), 200
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -304,6 +313,7 @@ def change_password():
         (new_password_hash, datetime.now(), current_user_id)
     )
     db.commit()
+    invalidate_user_cache(current_user_id)
     
     from utils.auth import log_action
     log_action(current_user_id, 'changement_mot_de_passe', 'users', current_user_id)
@@ -374,6 +384,7 @@ def reset_password():
         (new_password_hash, datetime.now(), user['id'])
     )
     db.commit()
+    invalidate_user_cache(user['id'])
     
     return jsonify({'message': 'Mot de passe réinitialisé avec succès'}), 200
 
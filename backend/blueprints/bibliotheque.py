@@ -6,6 +6,8 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required
+from utils.pagination import paginate
+from database.search_index import match_expression, bm25
 from datetime import datetime, timedelta
 
 bibliotheque_bp = Blueprint('bibliotheque', __name__)
@@ -14,34 +16,39 @@ bibliotheque_bp = Blueprint('bibliotheque', __name__)
 @jwt_required()
 def list_ouvrages():
     """Liste les ouvrages de la bibliothèque"""
-    recherche = request.args.get('q')
+    match = match_expression(request.args.get('q'))
     categorie = request.args.get('categorie')
     db = get_db()
     
-    query = """
+    # Avec une recherche: index plein texte, résultats classés par pertinence
+    pertinence, jointure = '', ''
+    if match:
+        pertinence = f", {bm25('recherche_ouvrages')} as pertinence"
+        jointure = "JOIN recherche_ouvrages ON recherche_ouvrages.rowid = o.id"
+    
+    query = f"""
         SELECT o.*, 
                (SELECT COUNT(*) FROM exemplaires e WHERE e.ouvrage_id = o.id AND e.etat != 'perdu') as total_exemplaires,
                (SELECT COUNT(*) FROM exemplaires e 
                 JOIN emprunts em ON e.id = em.exemplaire_id 
                 WHERE e.ouvrage_id = o.id AND em.statut = 'en_cours') as exemplaires_empruntes
+               {pertinence}
         FROM ouvrages o
+        {jointure}
         WHERE o.is_active = 1
     """
     params = []
     
-    if recherche:
-        query += " AND (o.titre LIKE ? OR o.auteur LIKE ? OR o.isbn LIKE ?)"
-        search_term = f"%{recherche}%"
-        params.extend([search_term, search_term, search_term])
+    if match:
+        query += " AND recherche_ouvrages MATCH ?"
+        params.append(match)
     
     if categorie:
         query += " AND o.categorie = ?"
         params.append(categorie)
     
-    query += " ORDER BY o.titre"
-    
-    ouvrages = db.execute(query, params).fetchall()
-    return jsonify([dict(o) for o in ouvrages]), 200
+    order_by = [('pertinence', 'ASC'), ('id', 'ASC')] if match else [('titre', 'ASC'), ('id', 'ASC')]
+    return paginate(db, query, params, order_by)
 
 @bibliotheque_bp.route('/ouvrages', methods=['POST'])
 @jwt_required()
@@ -131,10 +138,7 @@ def list_emprunts():
         query += " AND e.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY e.date_emprunt DESC"
-    
-    emprunts = db.execute(query, params).fetchall()
-    return jsonify([dict(e) for e in emprunts]), 200
+    return paginate(db, query, params, [('date_emprunt', 'DESC'), ('id', 'DESC')])
 
 @bibliotheque_bp.route('/emprunts', methods=['POST'])
 @jwt_required()
@@ -182,7 +186,8 @@ def create_emprunt():
     """, (
         data['exemplaire_id'],
         data['emprunteur_id'],
-        data.get('date_emprunt', datetime.now().date()),
+        # Clé de tri de la liste paginée: jamais NULL (une date null ou vide vaut aujourd'hui)
+        data.get('date_emprunt') or datetime.now().date(),
         data['date_retour_prevue'],
         'en_cours'
     ))
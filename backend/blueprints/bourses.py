@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required, validate_montant
+from utils.pagination import paginate
 from datetime import datetime
 
 bourses_bp = Blueprint('bourses', __name__)
@@ -80,10 +81,7 @@ def list_bourses():
         query += " AND b.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY b.date_attribution DESC"
-    
-    bourses = db.execute(query, params).fetchall()
-    return jsonify([dict(b) for b in bourses]), 200
+    return paginate(db, query, params, [('date_attribution', 'DESC'), ('id', 'DESC')])
 
 @bourses_bp.route('/attributions', methods=['POST'])
 @jwt_required()
@@ -156,15 +154,12 @@ def attribuer_bourse():
 def list_paiements_bourse(bourse_id):
     """Liste les paiements d'une bourse"""
     db = get_db()
-    paiements = db.execute("""
+    return paginate(db, """
         SELECT pb.*, u.nom as valide_par_nom, u.prenom as valide_par_prenom
         FROM paiements_bourses pb
         LEFT JOIN users u ON pb.valide_par = u.id
         WHERE pb.bourse_id = ?
-        ORDER BY pb.date_paiement DESC
-    """, (bourse_id,)).fetchall()
-    
-    return jsonify([dict(p) for p in paiements]), 200
+    """, (bourse_id,), [('date_paiement', 'DESC'), ('id', 'DESC')])
 
 @bourses_bp.route('/attributions/<int:bourse_id>/paiements', methods=['POST'])
 @jwt_required()
@@ -187,7 +182,8 @@ def enregistrer_paiement_bourse(bourse_id):
         bourse_id,
         data['montant'],
         data['mois_paye'],
-        data.get('date_paiement', datetime.now().date()),
+        # Clé de tri de la liste paginée: jamais NULL (une date null ou vide vaut aujourd'hui)
+        data.get('date_paiement') or datetime.now().date(),
         data.get('mode_paiement'),
         data.get('reference_paiement'),
         current_user['id'],
@@ -213,14 +209,11 @@ def get_etudiant_bourses(etudiant_id):
         if not etudiant or etudiant['user_id'] != current_user['id']:
             return jsonify({'error': 'Accès refusé'}), 403
     
-    bourses = db.execute("""
+    return paginate(db, """
         SELECT b.*, tb.libelle as type_bourse_libelle, tb.code as type_bourse_code
         FROM bourses b
         JOIN types_bourses tb ON b.type_bourse_id = tb.id
         WHERE b.etudiant_id = ?
-        ORDER BY b.date_attribution DESC
-    """, (etudiant_id,)).fetchall()
-    
-    return jsonify([dict(b) for b in bourses]), 200
+    """, (etudiant_id,), [('date_attribution', 'DESC'), ('id', 'DESC')])
 
 
@@ -1,37 +1,61 @@
 """
 Blueprint pour le chat en temps réel
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
-from database.db import get_db
+from database.db import get_db, close_db
 from utils.auth import get_current_user
+from utils.presence import get_presence_service, presence_channel
+from utils.realtime import get_hub, sse_stream
 from utils.validators import validate_required
 from datetime import datetime
 import json
 
 chat_realtime_bp = Blueprint('chat_realtime', __name__)
 
+# Utilisateurs par requête de présence
+MAX_PRESENCE_USERS = 200
+
+MESSAGE_SELECT = """
+    SELECT m.*, u.nom as expediteur_nom, u.prenom as expediteur_prenom, u.role as expediteur_role
+    FROM messages_chat m
+    JOIN users u ON m.expediteur_id = u.id
+"""
+
 @chat_realtime_bp.route('/conversations', methods=['GET'])
 @jwt_required()
 def list_conversations():
-    """Liste les conversations de l'utilisateur"""
+    """Liste les conversations de l'utilisateur avec leur nombre de messages non lus"""
     current_user = get_current_user()
     db = get_db()
     
     conversations = db.execute("""
-        SELECT c.*, 
-               (SELECT COUNT(*) FROM messages_chat m 
-                WHERE m.conversation_id = c.id AND m.created_at > 
-                (SELECT date_derniere_lecture FROM participants_conversations 
-                 WHERE conversation_id = c.id AND user_id = ?)) as messages_non_lus
-        FROM conversations c
-        JOIN participants_conversations p ON c.id = p.conversation_id
+        SELECT c.*, COALESCE(n.nombre, 0) as messages_non_lus
+        FROM participants_conversations p
+        JOIN conversations c ON c.id = p.conversation_id
+        LEFT JOIN chat_non_lus n ON n.user_id = p.user_id AND n.conversation_id = p.conversation_id
         WHERE p.user_id = ? AND c.is_active = 1
         ORDER BY c.created_at DESC
-    """, (current_user['id'], current_user['id'])).fetchall()
+    """, (current_user['id'],)).fetchall()
     
     return jsonify([dict(c) for c in conversations]), 200
 
+@chat_realtime_bp.route('/unread', methods=['GET'])
+@jwt_required()
+def unread_total():
+    """Total des messages non lus de l'utilisateur (badge de l'application)"""
+    current_user = get_current_user()
+    db = get_db()
+    
+    total = db.execute("""
+        SELECT COALESCE(SUM(n.nombre), 0) as total, COUNT(*) as conversations
+        FROM chat_non_lus n
+        JOIN conversations c ON c.id = n.conversation_id
+        WHERE n.user_id = ? AND n.nombre > 0 AND c.is_active = 1
+    """, (current_user['id'],)).fetchone()
+    
+    return jsonify(dict(total)), 200
+
 @chat_realtime_bp.route('/conversations', methods=['POST'])
 @jwt_required()
 def create_conversation():
@@ -72,28 +96,39 @@ def create_conversation():
     
     return jsonify({'message': 'Conversation créée', 'conversation_id': conversation_id}), 201
 
+def _is_participant(db, conversation_id, user_id):
+    """Vérifie que l'utilisateur participe à la conversation"""
+    return db.execute("""
+        SELECT id FROM participants_conversations
+        WHERE conversation_id = ? AND user_id = ?
+    """, (conversation_id, user_id)).fetchone() is not None
+
+def _canal(conversation_id):
+    return f'conversation:{conversation_id}'
+
+def _message_event(message):
+    return {'id': message['id'], 'event': 'message', 'data': dict(message)}
+
 @chat_realtime_bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
 @jwt_required()
 def get_messages(conversation_id):
-    """Obtient les messages d'une conversation"""
+    """Historique des messages d'une conversation (page précédant before_id)
+
+    Les nouveaux messages arrivent par le flux /stream: cette route ne sert
+    qu'au chargement initial et au défilement vers le passé, et n'écrit
+    pas (la lecture est signalée par POST /read).
+    """
     limit = request.args.get('limit', 50, type=int)
     before_id = request.args.get('before_id', type=int)
     current_user = get_current_user()
     db = get_db()
     
     # Vérifier que l'utilisateur participe à la conversation
-    participant = db.execute("""
-        SELECT id FROM participants_conversations
-        WHERE conversation_id = ? AND user_id = ?
-    """, (conversation_id, current_user['id'])).fetchone()
-    
-    if not participant:
+    if not _is_participant(db, conversation_id, current_user['id']):
         return jsonify({'error': 'Accès refusé'}), 403
     
-    query = """
-        SELECT m.*, u.nom as expediteur_nom, u.prenom as expediteur_prenom, u.role as expediteur_role
-        FROM messages_chat m
-        JOIN users u ON m.expediteur_id = u.id
+    query = f"""
+        {MESSAGE_SELECT}
         WHERE m.conversation_id = ? AND m.is_supprime = 0
     """
     params = [conversation_id]
@@ -102,20 +137,82 @@ def get_messages(conversation_id):
         query += " AND m.id < ?"
         params.append(before_id)
     
-    query += " ORDER BY m.created_at DESC LIMIT ?"
+    query += " ORDER BY m.id DESC LIMIT ?"
     params.append(limit)
     
     messages = db.execute(query, params).fetchall()
     
-    # Mettre à jour la date de dernière lecture
-    db.execute("""
+    return jsonify([dict(m) for m in reversed(messages)]), 200
+
+@chat_realtime_bp.route('/conversations/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def mark_conversation_read(conversation_id):
+    """Marque la conversation comme lue par l'utilisateur (remet son compteur de non lus à zéro)"""
+    current_user = get_current_user()
+    db = get_db()
+    
+    cursor = db.execute("""
         UPDATE participants_conversations
         SET date_derniere_lecture = ?
         WHERE conversation_id = ? AND user_id = ?
     """, (datetime.now(), conversation_id, current_user['id']))
+    if cursor.rowcount == 0:
+        return jsonify({'error': 'Accès refusé'}), 403
     db.commit()
     
-    return jsonify([dict(m) for m in reversed(messages)]), 200
+    return jsonify({'message': 'Conversation marquée comme lue'}), 200
+
+@chat_realtime_bp.route('/conversations/<int:conversation_id>/stream', methods=['GET'])
+@jwt_required()
+def stream_messages(conversation_id):
+    """Flux Server-Sent Events des nouveaux messages d'une conversation
+
+    Reprise: les messages postérieurs à l'en-tête Last-Event-ID (envoyé
+    automatiquement par EventSource à la reconnexion) ou au paramètre
+    last_id sont d'abord rejoués depuis la base. Au-delà de
+    CHAT_REPLAY_LIMIT messages à rattraper, le flux se termine après le
+    rattrapage et le client reprend aussitôt au dernier id reçu.
+    """
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_id') or 0) or None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID invalide'}), 400
+    
+    current_user = get_current_user()
+    db = get_db()
+    
+    if not _is_participant(db, conversation_id, current_user['id']):
+        return jsonify({'error': 'Accès refusé'}), 403
+    
+    # S'abonner avant le rattrapage: un message publié entre les deux n'est pas perdu
+    hub = get_hub()
+    subscription = hub.subscribe(_canal(conversation_id), current_user['id'])
+    
+    rattrapage = []
+    if last_id:
+        replay_limit = current_app.config.get('CHAT_REPLAY_LIMIT', 500)
+        rattrapage = [_message_event(m) for m in db.execute(f"""
+            {MESSAGE_SELECT}
+            WHERE m.conversation_id = ? AND m.id > ? AND m.is_supprime = 0
+            ORDER BY m.id LIMIT ?
+        """, (conversation_id, last_id, replay_limit)).fetchall()]
+        if len(rattrapage) == replay_limit:
+            hub.unsubscribe(subscription)
+            subscription = None
+    
+    # Le flux ne garde aucune connexion à la base
+    close_db()
+    
+    response = Response(
+        sse_stream(subscription, hub, rattrapage,
+                   keepalive=current_app.config.get('REALTIME_KEEPALIVE', 15), last_id=last_id),
+        mimetype='text/event-stream'
+    )
+    if subscription is not None:
+        response.call_on_close(lambda: hub.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @chat_realtime_bp.route('/conversations/<int:conversation_id>/messages', methods=['POST'])
 @jwt_required()
@@ -130,12 +227,7 @@ def send_message(conversation_id):
     db = get_db()
     
     # Vérifier que l'utilisateur participe à la conversation
-    participant = db.execute("""
-        SELECT id FROM participants_conversations
-        WHERE conversation_id = ? AND user_id = ?
-    """, (conversation_id, current_user['id'])).fetchone()
-    
-    if not participant:
+    if not _is_participant(db, conversation_id, current_user['id']):
         return jsonify({'error': 'Accès refusé'}), 403
     
     # Créer le message
@@ -155,52 +247,69 @@ def send_message(conversation_id):
     
     message_id = cursor.lastrowid
     
-    # Mettre à jour la présence
-    db.execute("""
-        INSERT OR REPLACE INTO presence_users (user_id, is_online, derniere_activite)
-        VALUES (?, 1, ?)
-    """, (current_user['id'], datetime.now()))
-    db.commit()
+    # Diffuser aux participants connectés au flux de la conversation
+    message = db.execute(f"{MESSAGE_SELECT} WHERE m.id = ?", (message_id,)).fetchone()
+    get_hub().publish(_canal(conversation_id), _message_event(message))
     
-    # En production, envoyer via WebSocket aux autres participants
-    # notify_participants_via_websocket(conversation_id, message_id)
+    # Envoyer un message vaut battement de présence (en mémoire, sans écriture)
+    get_presence_service().heartbeat(current_user['id'])
     
     return jsonify({'message': 'Message envoyé', 'message_id': message_id}), 201
 
+def _user_ids_param():
+    """Identifiants du paramètre user_ids (répété ou séparé par des virgules); None si invalide"""
+    try:
+        user_ids = [int(u) for valeur in request.args.getlist('user_ids') for u in valeur.split(',') if u]
+    except ValueError:
+        return None
+    return list(dict.fromkeys(user_ids))[:MAX_PRESENCE_USERS]
+
 @chat_realtime_bp.route('/presence', methods=['GET'])
 @jwt_required()
 def get_presence():
-    """Obtient le statut de présence des utilisateurs"""
-    user_ids = request.args.getlist('user_ids')
+    """Obtient le statut de présence des utilisateurs (depuis le registre en mémoire)"""
+    user_ids = _user_ids_param()
     if not user_ids:
         return jsonify({'error': 'user_ids requis'}), 400
     
-    db = get_db()
-    
-    placeholders = ','.join(['?'] * len(user_ids))
-    presence = db.execute(f"""
-        SELECT user_id, is_online, derniere_activite
-        FROM presence_users
-        WHERE user_id IN ({placeholders})
-    """, user_ids).fetchall()
-    
-    return jsonify([dict(p) for p in presence]), 200
+    return jsonify(get_presence_service().get_many(user_ids)), 200
 
 @chat_realtime_bp.route('/presence', methods=['POST'])
 @jwt_required()
 def update_presence():
-    """Met à jour le statut de présence"""
-    data = request.get_json()
+    """Met à jour le statut de présence (battement de cœur, écrit en base par lots)"""
+    data = request.get_json() or {}
     current_user = get_current_user()
-    db = get_db()
     
-    is_online = data.get('is_online', True)
-    
-    db.execute("""
-        INSERT OR REPLACE INTO presence_users (user_id, is_online, derniere_activite, device_info)
-        VALUES (?, ?, ?, ?)
-    """, (current_user['id'], is_online, datetime.now(), json.dumps(data.get('device_info', {}))))
-    db.commit()
+    device_info = json.dumps(data['device_info']) if 'device_info' in data else None
+    get_presence_service().heartbeat(current_user['id'], bool(data.get('is_online', True)), device_info)
     
     return jsonify({'message': 'Présence mise à jour'}), 200
 
+@chat_realtime_bp.route('/presence/stream', methods=['GET'])
+@jwt_required()
+def stream_presence():
+    """Flux Server-Sent Events des changements de présence des utilisateurs demandés
+
+    Le flux commence par l'état courant de chacun, puis un événement
+    'presence' est émis à chaque connexion, déconnexion ou expiration.
+    """
+    user_ids = _user_ids_param()
+    if not user_ids:
+        return jsonify({'error': 'user_ids requis'}), 400
+    
+    current_user = get_current_user()
+    hub = get_hub()
+    subscription = hub.subscribe([presence_channel(u) for u in user_ids], current_user['id'])
+    etat_initial = [{'event': 'presence', 'data': p} for p in get_presence_service().get_many(user_ids)]
+    close_db()
+    
+    response = Response(
+        sse_stream(subscription, hub, etat_initial,
+                   keepalive=current_app.config.get('REALTIME_KEEPALIVE', 15)),
+        mimetype='text/event-stream'
+    )
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -5,6 +5,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import get_current_user, role_required
+from database.search_index import match_expression, bm25
 from datetime import datetime
 import json
 import re
@@ -74,22 +75,28 @@ def chat():
 def list_base_connaissances():
     """Liste la base de connaissances"""
     categorie = request.args.get('categorie')
-    recherche = request.args.get('q')
+    match = match_expression(request.args.get('q'))
     db = get_db()
     
-    query = "SELECT * FROM base_connaissances WHERE is_active = 1"
-    params = []
+    if match:
+        query = """
+            SELECT k.* FROM recherche_connaissances
+            JOIN base_connaissances k ON k.id = recherche_connaissances.rowid
+            WHERE recherche_connaissances MATCH ? AND k.is_active = 1
+        """
+        params = [match]
+    else:
+        query = "SELECT * FROM base_connaissances k WHERE k.is_active = 1"
+        params = []
     
     if categorie:
-        query += " AND categorie = ?"
+        query += " AND k.categorie = ?"
         params.append(categorie)
     
-    if recherche:
-        query += " AND (question LIKE ? OR reponse LIKE ?)"
-        search_term = f"%{recherche}%"
-        params.extend([search_term, search_term])
-    
-    query += " ORDER BY nombre_utilisations DESC"
+    if match:
+        query += f" ORDER BY {bm25('recherche_connaissances')}"
+    else:
+        query += " ORDER BY k.nombre_utilisations DESC"
     
     connaissances = db.execute(query, params).fetchall()
     return jsonify([dict(k) for k in connaissances]), 200
@@ -143,14 +150,17 @@ def analyser_intention(message):
 def generer_reponse(message, intention, user, db):
     """Génère une réponse selon l'intention"""
     
-    # Chercher dans la base de connaissances
-    connaissances = db.execute("""
-        SELECT * FROM base_connaissances
-        WHERE is_active = 1
-        AND (question LIKE ? OR reponse LIKE ?)
-        ORDER BY score_utilite DESC, nombre_utilisations DESC
-        LIMIT 1
-    """, (f"%{message}%", f"%{message}%")).fetchone()
+    # Chercher dans la base de connaissances (au moins un mot significatif du message)
+    match = match_expression(message, ignorer_mots_vides=True, tous_les_mots=False)
+    connaissances = None
+    if match:
+        connaissances = db.execute(f"""
+            SELECT k.* FROM recherche_connaissances
+            JOIN base_connaissances k ON k.id = recherche_connaissances.rowid
+            WHERE recherche_connaissances MATCH ? AND k.is_active = 1
+            ORDER BY {bm25('recherche_connaissances')}, k.score_utilite DESC, k.nombre_utilisations DESC
+            LIMIT 1
+        """, (match,)).fetchone()
     
     if connaissances:
         # Mettre à jour le nombre d'utilisations
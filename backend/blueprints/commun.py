@@ -5,6 +5,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import get_current_user
+from utils.cache_service import cached
+from utils.pagination import paginate
+from database.search_index import match_expression, bm25, available_indexes
 from datetime import datetime
 
 commun_bp = Blueprint('commun', __name__)
@@ -41,10 +44,8 @@ def list_annonces():
         if etudiant and etudiant['classe_id']:
             query += " AND (a.type_annonce = 'generale' OR a.type_annonce = 'classe')"
     
-    query += " ORDER BY a.is_urgent DESC, a.date_publication DESC LIMIT 50"
-    
-    annonces = db.execute(query, params).fetchall()
-    return jsonify([dict(annonce) for annonce in annonces]), 200
+    return paginate(db, query, params,
+                    [('is_urgent', 'DESC'), ('date_publication', 'DESC'), ('id', 'DESC')])
 
 @commun_bp.route('/annonces/<int:annonce_id>', methods=['GET'])
 @jwt_required()
@@ -93,10 +94,7 @@ def list_messages():
         query += " AND m.is_lu = ?"
         params.append(1 if is_lu == 'true' else 0)
     
-    query += " ORDER BY m.created_at DESC LIMIT 50"
-    
-    messages = db.execute(query, params).fetchall()
-    return jsonify([dict(message) for message in messages]), 200
+    return paginate(db, query, params, [('created_at', 'DESC'), ('id', 'DESC')])
 
 @commun_bp.route('/messages', methods=['POST'])
 @jwt_required()
@@ -157,28 +155,114 @@ def search_users():
     role = request.args.get('role')
     db = get_db()
     
-    if not query_param or len(query_param) < 2:
+    match = match_expression(query_param)
+    if not match or len(query_param) < 2:
         return jsonify([]), 200
     
     sql_query = """
-        SELECT id, username, nom, prenom, email, role
-        FROM users
-        WHERE (nom LIKE ? OR prenom LIKE ? OR username LIKE ? OR email LIKE ?)
-        AND is_active = 1
+        SELECT u.id, u.username, u.nom, u.prenom, u.email, u.role
+        FROM recherche_users
+        JOIN users u ON u.id = recherche_users.rowid
+        WHERE recherche_users MATCH ?
+        AND u.is_active = 1
     """
-    params = [f"%{query_param}%", f"%{query_param}%", f"%{query_param}%", f"%{query_param}%"]
+    params = [match]
     
     if role:
-        sql_query += " AND role = ?"
+        sql_query += " AND u.role = ?"
         params.append(role)
     
-    sql_query += " LIMIT 20"
+    sql_query += f" ORDER BY {bm25('recherche_users')} LIMIT 20"
     
     users = db.execute(sql_query, params).fetchall()
     return jsonify([dict(user) for user in users]), 200
 
+# Sources de la recherche unifiée: requête et index plein texte
+RECHERCHES = {
+    'ouvrages': ("""
+        SELECT o.id, o.titre, o.auteur, o.isbn, o.categorie,
+               snippet(recherche_ouvrages, -1, '[', ']', '…', 12) as extrait,
+               {rang} as pertinence
+        FROM recherche_ouvrages
+        JOIN ouvrages o ON o.id = recherche_ouvrages.rowid
+        WHERE recherche_ouvrages MATCH ? AND o.is_active = 1
+    """, 'recherche_ouvrages'),
+    'utilisateurs': ("""
+        SELECT u.id, u.username, u.nom, u.prenom, u.role,
+               {rang} as pertinence
+        FROM recherche_users
+        JOIN users u ON u.id = recherche_users.rowid
+        WHERE recherche_users MATCH ? AND u.is_active = 1
+    """, 'recherche_users'),
+    'cours': ("""
+        SELECT c.id, c.code, c.titre, c.classe_id, c.is_public,
+               snippet(recherche_cours, -1, '[', ']', '…', 12) as extrait,
+               {rang} as pertinence
+        FROM recherche_cours
+        JOIN cours_online c ON c.id = recherche_cours.rowid
+        WHERE recherche_cours MATCH ? AND c.is_active = 1
+    """, 'recherche_cours'),
+    'connaissances': ("""
+        SELECT k.id, k.question, k.categorie,
+               snippet(recherche_connaissances, 1, '[', ']', '…', 16) as extrait,
+               {rang} as pertinence
+        FROM recherche_connaissances
+        JOIN base_connaissances k ON k.id = recherche_connaissances.rowid
+        WHERE recherche_connaissances MATCH ? AND k.is_active = 1
+    """, 'recherche_connaissances'),
+}
+
+@commun_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Recherche plein texte unifiée (ouvrages, utilisateurs, cours, base de connaissances)
+
+    Paramètres: q (mots, préfixes acceptés), types (liste séparée par des
+    virgules, toutes les sources par défaut), limit (par source, 50 au plus).
+    """
+    match = match_expression(request.args.get('q'))
+    if not match:
+        return jsonify({'error': 'Paramètre q requis'}), 400
+    
+    types = request.args.get('types')
+    types = [t.strip() for t in types.split(',')] if types else list(RECHERCHES)
+    inconnus = [t for t in types if t not in RECHERCHES]
+    if inconnus:
+        return jsonify({'error': f"Types de recherche inconnus: {', '.join(inconnus)}"}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'limit doit être un entier'}), 400
+    
+    db = get_db()
+    current_user = get_current_user()
+    disponibles = available_indexes(db)
+    resultats = {}
+    for type_recherche in types:
+        sql, table = RECHERCHES[type_recherche]
+        if table not in disponibles:
+            # Module absent de cette base
+            continue
+        sql = sql.format(rang=bm25(table))
+        params = [match]
+        
+        if type_recherche == 'cours' and current_user['role'] == 'etudiant':
+            # Mêmes règles de visibilité que la liste des cours
+            etudiant = db.execute("SELECT classe_id FROM etudiants WHERE user_id = ?", 
+                                 (current_user['id'],)).fetchone()
+            sql += " AND (c.is_public = 1 OR c.classe_id = ?)"
+            params.append(etudiant['classe_id'] if etudiant else None)
+        
+        sql += " ORDER BY pertinence LIMIT ?"
+        params.append(limit)
+        resultats[type_recherche] = [dict(row) for row in db.execute(sql, params).fetchall()]
+    
+    return jsonify({'q': request.args.get('q'), 'resultats': resultats}), 200
+
 @commun_bp.route('/parametres', methods=['GET'])
 @jwt_required()
+@cached(tags=['parametres'])
 def get_parametres():
     """Obtient les paramètres globaux"""
     db = get_db()
@@ -5,8 +5,10 @@ from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
+from utils.cache_service import cached, invalidate_cache
 from utils.validators import validate_required, validate_montant
-from utils.pdf_generator import generate_receipt
+from utils.jobs import document_response
+from utils.pagination import paginate
 from datetime import datetime, timedelta
 import os
 
@@ -50,10 +52,7 @@ def list_paiements():
         query += " AND p.date_paiement <= ?"
         params.append(date_fin)
     
-    query += " ORDER BY p.date_paiement DESC"
-    
-    paiements = db.execute(query, params).fetchall()
-    return jsonify([dict(p) for p in paiements]), 200
+    return paginate(db, query, params, [('date_paiement', 'DESC'), ('id', 'DESC')])
 
 @comptabilite_bp.route('/paiements', methods=['POST'])
 @jwt_required()
@@ -82,11 +81,13 @@ def create_paiement():
         data['montant'],
         data['mode_paiement'],
         data.get('reference_paiement'),
-        data.get('date_paiement', datetime.now().date().isoformat()),
+        # Clé de tri de la liste paginée: jamais NULL (une date null ou vide vaut aujourd'hui)
+        data.get('date_paiement') or datetime.now().date().isoformat(),
         'en_attente',
         data.get('notes')
     ))
     db.commit()
+    invalidate_cache('paiements', f"etudiant:{data['etudiant_id']}")
     
     paiement_id = cursor.lastrowid
     
@@ -124,6 +125,7 @@ def validate_paiement(paiement_id):
         paiement_id
     ))
     db.commit()
+    invalidate_cache('paiements', f"etudiant:{paiement['etudiant_id']}")
     
     # Mettre à jour les tranches
     update_tranches(db, paiement['etudiant_id'], paiement['type_frais_id'], paiement['montant'])
@@ -148,6 +150,10 @@ def reject_paiement(paiement_id):
     """, ('rejete', raison, paiement_id))
     db.commit()
     
+    paiement = db.execute("SELECT etudiant_id FROM paiements WHERE id = ?", (paiement_id,)).fetchone()
+    if paiement:
+        invalidate_cache('paiements', f"etudiant:{paiement['etudiant_id']}")
+    
     log_action(get_current_user()['id'], 'rejet_paiement', 'paiements', paiement_id)
     
     return jsonify({'message': 'Paiement rejeté'}), 200
@@ -157,45 +163,21 @@ def reject_paiement(paiement_id):
 @role_required('comptabilite', 'admin', 'etudiant', 'parent')
 def generate_payment_receipt(paiement_id):
     """Génère un reçu de paiement en PDF"""
-    db = get_db()
-    paiement = db.execute("""
-        SELECT p.*, e.numero_etudiant, u.nom as etudiant_nom, u.prenom as etudiant_prenom,
-               tf.libelle as type_frais
-        FROM paiements p
-        JOIN etudiants e ON p.etudiant_id = e.id
-        JOIN users u ON e.user_id = u.id
-        JOIN types_frais tf ON p.type_frais_id = tf.id
-        WHERE p.id = ?
-    """, (paiement_id,)).fetchone()
+    from blueprints.jobs import authorize_job
     
-    if not paiement:
-        return jsonify({'error': 'Paiement non trouvé'}), 404
+    current_user = get_current_user()
+    parametres, error = authorize_job(get_db(), current_user, 'recu', {'paiement_id': paiement_id})
+    if error:
+        return error
     
-    # Générer le PDF
-    output_path = os.path.join(
-        request.application.config['UPLOAD_FOLDER'],
-        'pdf',
-        f'receipt_{paiement_id}.pdf'
-    )
-    
-    paiement_data = {
-        'reference': paiement['reference_paiement'] or f"PAY{paiement_id:06d}",
-        'date_paiement': paiement['date_paiement'],
-        'etudiant_nom': paiement['etudiant_nom'],
-        'etudiant_prenom': paiement['etudiant_prenom'],
-        'type_frais': paiement['type_frais'],
-        'montant': paiement['montant'],
-        'mode_paiement': paiement['mode_paiement']
-    }
-    
-    generate_receipt(paiement_data, output_path)
-    
-    return send_file(output_path, mimetype='application/pdf', as_attachment=True,
-                    download_name=f'receipt_{paiement_id}.pdf')
+    # Servi depuis le cache s'il est à jour, sinon rendu en arrière-plan
+    attendre = 0 if request.args.get('async') == '1' else None
+    return document_response('recu', current_user['id'], parametres, attendre=attendre)
 
 @comptabilite_bp.route('/etudiants/<int:etudiant_id>/situation-financiere', methods=['GET'])
 @jwt_required()
 @role_required('comptabilite', 'admin', 'etudiant', 'parent')
+@cached(tags=['paiements', 'etudiant:{etudiant_id}'], per_user=True)
 def get_financial_situation(etudiant_id):
     """Obtient la situation financière d'un étudiant"""
     db = get_db()
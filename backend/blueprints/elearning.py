@@ -3,9 +3,11 @@ Blueprint pour l'E-Learning intégré
 """
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
-from database.db import get_db
+from database.db import get_db, writes_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required
+from utils.pagination import paginate
+from database.search_index import match_expression, bm25
 from datetime import datetime
 import os
 
@@ -18,13 +20,22 @@ def list_cours():
     matiere_id = request.args.get('matiere_id')
     classe_id = request.args.get('classe_id')
     is_public = request.args.get('is_public')
+    match = match_expression(request.args.get('q'))
     db = get_db()
     current_user = get_current_user()
     
-    query = """
+    # Avec une recherche: index plein texte, résultats classés par pertinence
+    pertinence, jointure = '', ''
+    if match:
+        pertinence = f", {bm25('recherche_cours')} as pertinence"
+        jointure = "JOIN recherche_cours ON recherche_cours.rowid = c.id"
+    
+    query = f"""
         SELECT c.*, m.libelle as matiere_libelle, cl.libelle as classe_libelle,
                u.nom as enseignant_nom, u.prenom as enseignant_prenom
+               {pertinence}
         FROM cours_online c
+        {jointure}
         LEFT JOIN matieres m ON c.matiere_id = m.id
         LEFT JOIN classes cl ON c.classe_id = cl.id
         JOIN users u ON c.enseignant_id = u.id
@@ -32,6 +43,10 @@ def list_cours():
     """
     params = []
     
+    if match:
+        query += " AND recherche_cours MATCH ?"
+        params.append(match)
+    
     if matiere_id:
         query += " AND c.matiere_id = ?"
         params.append(matiere_id)
@@ -52,10 +67,8 @@ def list_cours():
         else:
             query += " AND c.is_public = 1"
     
-    query += " ORDER BY c.date_creation DESC"
-    
-    cours = db.execute(query, params).fetchall()
-    return jsonify([dict(c) for c in cours]), 200
+    order_by = [('pertinence', 'ASC'), ('id', 'ASC')] if match else [('date_creation', 'DESC'), ('id', 'DESC')]
+    return paginate(db, query, params, order_by)
 
 @elearning_bp.route('/cours', methods=['POST'])
 @jwt_required()
@@ -269,6 +282,7 @@ def tenter_quiz(quiz_id):
 
 @elearning_bp.route('/cours/<int:cours_id>/progression', methods=['GET'])
 @jwt_required()
+@writes_db
 def get_progression(cours_id):
     """Obtient la progression d'un étudiant dans un cours"""
     current_user = get_current_user()
@@ -4,12 +4,22 @@ Blueprint pour les fonctionnalités enseignants
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.db import get_db
+from database.grade_engine import record_validated_notes
 from utils.auth import role_required, get_current_user, log_action
-from utils.validators import validate_required, validate_note
-from datetime import datetime
+from utils.cache_service import invalidate_cache
+from utils.validators import validate_required, validate_note as check_note_value
+from utils.pagination import paginate
+from datetime import date, datetime
+import csv
+import io
 
 enseignant_bp = Blueprint('enseignant', __name__)
 
+# Import de notes en lot
+MAX_IMPORT_NOTES = 2000
+IMPORT_DEFAULT_FIELDS = ('classe_id', 'matiere_id', 'type_note', 'coefficient', 'date_note')
+TYPES_NOTE = ('devoir', 'controle', 'examen')
+
 @enseignant_bp.route('/classes', methods=['GET'])
 @jwt_required()
 @role_required('enseignant')
@@ -64,7 +74,7 @@ def create_note():
     if not valid:
         return jsonify({'error': error}), 400
     
-    note_valid, note_error = validate_note(data['note'])
+    note_valid, note_error = check_note_value(data['note'])
     if not note_valid:
         return jsonify({'error': note_error}), 400
     
@@ -92,7 +102,8 @@ def create_note():
         data['type_note'],
         data['note'],
         data.get('coefficient', 1.0),
-        data.get('date_note', datetime.now().date().isoformat()),
+        # Clé de tri de la liste paginée: jamais NULL (une date null ou vide vaut aujourd'hui)
+        data.get('date_note') or datetime.now().date().isoformat(),
         current_user['id'],
         False  # Par défaut non validée
     ))
@@ -103,6 +114,109 @@ def create_note():
     
     return jsonify({'message': 'Note créée avec succès', 'note_id': note_id}), 201
 
+@enseignant_bp.route('/notes/import', methods=['POST'])
+@jwt_required()
+@role_required('enseignant')
+def import_notes():
+    """Importe un lot de notes (JSON ou fichier CSV/XLSX) en une seule transaction
+
+    Corps JSON: liste de notes, ou {"notes": [...], "valider": bool} avec des
+    valeurs par défaut (classe_id, matiere_id, type_note, coefficient,
+    date_note) applicables à toutes les lignes. Fichier: champ 'fichier'
+    (en-têtes etudiant_id ou numero_etudiant, note, ...) et valeurs par
+    défaut en champs de formulaire. Le lot est rejeté entièrement si une
+    ligne est invalide.
+    """
+    current_user = get_current_user()
+    
+    if 'fichier' in request.files:
+        try:
+            rows = parse_notes_file(request.files['fichier'])
+        except ImportError:
+            return jsonify({'error': 'Import XLSX indisponible (openpyxl non installé)'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        options = request.form.to_dict()
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            rows, options = data, {}
+        elif isinstance(data, dict) and isinstance(data.get('notes'), list):
+            rows, options = data['notes'], data
+        else:
+            return jsonify({'error': 'Liste de notes ou fichier attendu'}), 400
+    
+    if not rows:
+        return jsonify({'error': 'Aucune note à importer'}), 400
+    if len(rows) > MAX_IMPORT_NOTES:
+        return jsonify({'error': f'Import limité à {MAX_IMPORT_NOTES} notes'}), 400
+    
+    valider = str(options.get('valider', 'false')).lower() in ('1', 'true', 'oui')
+    defaults = {field: options[field] for field in IMPORT_DEFAULT_FIELDS if options.get(field) not in (None, '')}
+    
+    db = get_db()
+    
+    # Précharger en une requête les affectations de l'enseignant et les inscrits de ses classes
+    enseignements = {
+        (row['classe_id'], row['matiere_id'])
+        for row in db.execute("""
+            SELECT classe_id, matiere_id FROM classe_matieres WHERE enseignant_id = ?
+        """, (current_user['id'],))
+    }
+    inscrits = {}
+    numeros = {}
+    for row in db.execute("""
+        SELECT e.id, e.numero_etudiant, e.classe_id FROM etudiants e
+        WHERE e.is_active = 1 AND e.classe_id IN (
+            SELECT classe_id FROM classe_matieres WHERE enseignant_id = ?
+        )
+    """, (current_user['id'],)):
+        inscrits[row['id']] = row['classe_id']
+        numeros[str(row['numero_etudiant'])] = row['id']
+    
+    notes, errors = [], []
+    today = datetime.now().date().isoformat()
+    for ligne, raw in enumerate(rows, start=1):
+        note, error = _prepare_import_row(raw, defaults, enseignements, inscrits, numeros, today)
+        if error:
+            errors.append({'ligne': ligne, 'error': error})
+        else:
+            notes.append(note)
+    
+    if errors:
+        return jsonify({'error': 'Import rejeté', 'erreurs': errors[:100], 'nombre_erreurs': len(errors)}), 400
+    
+    now = datetime.now()
+    db.executemany("""
+        INSERT INTO notes (etudiant_id, matiere_id, classe_id, type_note, note, coefficient,
+                          date_note, enseignant_id, is_valide, valide_par, date_validation)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (n['etudiant_id'], n['matiere_id'], n['classe_id'], n['type_note'], n['note'], n['coefficient'],
+         n['date_note'], current_user['id'], valider,
+         current_user['id'] if valider else None, now if valider else None)
+        for n in notes
+    ])
+    
+    classes = set()
+    if valider:
+        # Moyennes puis classement recalculé une seule fois par classe
+        classes = record_validated_notes(db, notes)
+    db.commit()
+    
+    if classes:
+        invalidate_cache('moyennes', *{f"etudiant:{n['etudiant_id']}" for n in notes},
+                         *(f"classe:{classe_id}" for classe_id in classes))
+    
+    log_action(current_user['id'], 'import_notes', 'notes', None, None,
+               {'nombre': len(notes), 'valide': valider})
+    
+    return jsonify({
+        'message': f'{len(notes)} notes importées avec succès',
+        'nombre': len(notes),
+        'validees': valider
+    }), 201
+
 @enseignant_bp.route('/notes/<int:note_id>', methods=['PUT'])
 @jwt_required()
 @role_required('enseignant')
@@ -127,7 +241,7 @@ def update_note(note_id):
     
     # Valider la nouvelle note si fournie
     if 'note' in data:
-        note_valid, note_error = validate_note(data['note'])
+        note_valid, note_error = check_note_value(data['note'])
         if not note_valid:
             return jsonify({'error': note_error}), 400
     
@@ -183,14 +297,18 @@ def validate_note(note_id):
     if note['enseignant_id'] != current_user['id']:
         return jsonify({'error': 'Vous ne pouvez valider que vos propres notes'}), 403
     
-    db.execute("""
+    cursor = db.execute("""
         UPDATE notes SET is_valide = 1, valide_par = ?, date_validation = ?
-        WHERE id = ?
+        WHERE id = ? AND is_valide = 0
     """, (current_user['id'], datetime.now(), note_id))
-    db.commit()
+    if cursor.rowcount == 0:
+        return jsonify({'error': 'Note déjà validée'}), 400
     
-    # Recalculer les moyennes
-    calculate_moyennes(db, note['etudiant_id'], note['classe_id'], note['matiere_id'])
+    # Mettre à jour la moyenne et le classement dans la même transaction
+    record_validated_notes(db, [note])
+    db.commit()
+    # Le classement de toute la classe a pu changer
+    invalidate_cache('moyennes', f"etudiant:{note['etudiant_id']}", f"classe:{note['classe_id']}")
     
     log_action(current_user['id'], 'validation_note', 'notes', note_id)
     
@@ -256,88 +374,104 @@ def get_student_notes(etudiant_id):
         query += " AND n.classe_id = ?"
         params.append(classe_id)
     
-    query += " ORDER BY n.date_note DESC"
-    
-    notes = db.execute(query, params).fetchall()
-    return jsonify([dict(note) for note in notes]), 200
+    return paginate(db, query, params, [('date_note', 'DESC'), ('id', 'DESC')])
 
-def calculate_moyennes(db, etudiant_id, classe_id, matiere_id):
-    """Calcule les moyennes pour un étudiant dans une matière"""
-    # Récupérer toutes les notes validées
-    notes = db.execute("""
-        SELECT note, coefficient FROM notes
-        WHERE etudiant_id = ? AND matiere_id = ? AND classe_id = ? AND is_valide = 1
-    """, (etudiant_id, matiere_id, classe_id)).fetchall()
-    
-    if not notes:
-        return
-    
-    # Calculer la moyenne pondérée
-    total_points = sum(note['note'] * note['coefficient'] for note in notes)
-    total_coeff = sum(note['coefficient'] for note in notes)
-    
-    if total_coeff > 0:
-        moyenne = total_points / total_coeff
-        
-        # Obtenir l'année académique
-        classe = db.execute("SELECT annee_academique_id FROM classes WHERE id = ?", (classe_id,)).fetchone()
-        
-        # Insérer ou mettre à jour la moyenne
-        existing = db.execute("""
-            SELECT id FROM moyennes
-            WHERE etudiant_id = ? AND matiere_id = ? AND classe_id = ? AND periode = 'annuel'
-        """, (etudiant_id, matiere_id, classe_id)).fetchone()
-        
-        if existing:
-            db.execute("""
-                UPDATE moyennes SET moyenne = ?
-                WHERE id = ?
-            """, (moyenne, existing['id']))
+def _to_number(value, cast=float):
+    """Convertit une valeur saisie (accepte la virgule décimale)"""
+    if isinstance(value, str):
+        value = value.strip().replace(',', '.')
+    return cast(float(value)) if cast is int else cast(value)
+
+def _to_date(value):
+    """Date ISO d'une valeur saisie: AAAA-MM-JJ ou JJ/MM/AAAA (une cellule XLSX de date est lue en datetime)"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    value = str(value).strip()
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        return datetime.strptime(value, '%d/%m/%Y').date().isoformat()
+
+def _prepare_import_row(raw, defaults, enseignements, inscrits, numeros, today):
+    """Valide une ligne d'import; retourne (note, None) ou (None, erreur)"""
+    if not isinstance(raw, dict):
+        return None, 'Ligne invalide'
+    row = dict(defaults)
+    row.update({k: v for k, v in raw.items() if v not in (None, '')})
+    
+    try:
+        if row.get('etudiant_id') is not None:
+            etudiant_id = _to_number(row['etudiant_id'], int)
+        elif row.get('numero_etudiant') is not None:
+            etudiant_id = numeros.get(str(row['numero_etudiant']).strip())
+            if etudiant_id is None:
+                return None, f"Étudiant inconnu: {row['numero_etudiant']}"
         else:
-            db.execute("""
-                INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
-                VALUES (?, ?, ?, ?, 'annuel', ?)
-            """, (etudiant_id, matiere_id, classe_id, moyenne, classe['annee_academique_id']))
+            return None, 'Champs manquants: etudiant_id ou numero_etudiant'
         
-        db.commit()
-        
-        # Recalculer le classement
-        calculate_classement(db, etudiant_id, classe_id)
+        missing = [field for field in ('classe_id', 'matiere_id', 'type_note', 'note') if row.get(field) is None]
+        if missing:
+            return None, f"Champs manquants: {', '.join(missing)}"
+        classe_id = _to_number(row['classe_id'], int)
+        matiere_id = _to_number(row['matiere_id'], int)
+        coefficient = _to_number(row.get('coefficient', 1.0))
+    except (ValueError, TypeError):
+        return None, 'Identifiant ou coefficient invalide'
+    
+    try:
+        note = _to_number(row['note'])
+    except (ValueError, TypeError):
+        return None, 'La note doit être un nombre'
+    note_valid, note_error = check_note_value(note)
+    if not note_valid:
+        return None, note_error
+    if row['type_note'] not in TYPES_NOTE:
+        return None, f"Type de note invalide: {row['type_note']}"
+    if coefficient <= 0:
+        return None, 'Le coefficient doit être positif'
+    try:
+        date_note = _to_date(row.get('date_note', today))
+    except ValueError:
+        return None, f"Date invalide: {row['date_note']} (AAAA-MM-JJ ou JJ/MM/AAAA)"
+    if (classe_id, matiere_id) not in enseignements:
+        return None, 'Vous n\'enseignez pas cette matière dans cette classe'
+    if inscrits.get(etudiant_id) != classe_id:
+        return None, f"L'étudiant {etudiant_id} n'est pas inscrit dans cette classe"
+    
+    return {
+        'etudiant_id': etudiant_id,
+        'matiere_id': matiere_id,
+        'classe_id': classe_id,
+        'type_note': row['type_note'],
+        'note': note,
+        'coefficient': coefficient,
+        'date_note': date_note,
+    }, None
 
-def calculate_classement(db, etudiant_id, classe_id):
-    """Calcule le classement d'un étudiant"""
-    # Obtenir toutes les moyennes de la classe
-    moyennes = db.execute("""
-        SELECT e.id as etudiant_id, AVG(m.moyenne) as moyenne_generale
-        FROM etudiants e
-        JOIN moyennes m ON e.id = m.etudiant_id
-        WHERE e.classe_id = ? AND m.periode = 'annuel'
-        GROUP BY e.id
-        ORDER BY moyenne_generale DESC
-    """, (classe_id,)).fetchall()
-    
-    # Obtenir l'année académique
-    classe = db.execute("SELECT annee_academique_id FROM classes WHERE id = ?", (classe_id,)).fetchone()
-    
-    # Mettre à jour les classements
-    for rang, etudiant_moyenne in enumerate(moyennes, start=1):
-        existing = db.execute("""
-            SELECT id FROM classements
-            WHERE etudiant_id = ? AND classe_id = ? AND periode = 'annuel'
-        """, (etudiant_moyenne['etudiant_id'], classe_id)).fetchone()
-        
-        if existing:
-            db.execute("""
-                UPDATE classements SET rang = ?, moyenne_generale = ?
-                WHERE id = ?
-            """, (rang, etudiant_moyenne['moyenne_generale'], existing['id']))
-        else:
-            db.execute("""
-                INSERT INTO classements (etudiant_id, classe_id, rang, moyenne_generale, periode, annee_academique_id)
-                VALUES (?, ?, ?, ?, 'annuel', ?)
-            """, (etudiant_moyenne['etudiant_id'], classe_id, rang, 
-                  etudiant_moyenne['moyenne_generale'], classe['annee_academique_id']))
+def parse_notes_file(fichier):
+    """Lit un fichier de notes CSV ou XLSX (première ligne = en-têtes)"""
+    filename = (fichier.filename or '').lower()
     
-    db.commit()
-
-
+    if filename.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        
+        wb = load_workbook(io.BytesIO(fichier.read()), read_only=True, data_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+        return [dict(zip(headers, values)) for values in rows if any(v is not None for v in values)]
+    
+    if filename.endswith('.csv') or not filename:
+        try:
+            content = fichier.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('Le fichier CSV doit être encodé en UTF-8')
+        try:
+            dialect = csv.Sniffer().sniff(content[:2048], delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(io.StringIO(content), dialect=dialect)
+        return [{(k or '').strip(): v for k, v in row.items()} for row in reader]
+    
+    raise ValueError('Format de fichier non supporté (CSV ou XLSX)')
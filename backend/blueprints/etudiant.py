@@ -5,7 +5,8 @@ from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import get_current_user
-from utils.pdf_generator import generate_bulletin
+from utils.jobs import document_response
+from utils.pagination import paginate
 from datetime import datetime
 import os
 
@@ -70,10 +71,7 @@ def get_my_notes():
         query += " AND n.type_note = ?"
         params.append(type_note)
     
-    query += " ORDER BY n.date_note DESC"
-    
-    notes = db.execute(query, params).fetchall()
-    return jsonify([dict(note) for note in notes]), 200
+    return paginate(db, query, params, [('date_note', 'DESC'), ('id', 'DESC')])
 
 @etudiant_bp.route('/moyennes', methods=['GET'])
 @jwt_required()
@@ -172,40 +170,10 @@ def get_bulletin():
             'has_unpaid': True
         }), 403
     
-    # Obtenir les moyennes
-    moyennes = db.execute("""
-        SELECT m.*, mat.libelle as matiere, mat.coefficient
-        FROM moyennes m
-        JOIN matieres mat ON m.matiere_id = mat.id
-        WHERE m.etudiant_id = ? AND m.periode = ?
-    """, (etudiant['id'], periode)).fetchall()
-    
-    # Générer le PDF
-    output_path = os.path.join(
-        request.application.config['UPLOAD_FOLDER'],
-        'pdf',
-        f'bulletin_{etudiant["id"]}_{periode}.pdf'
-    )
-    
-    etudiant_data = {
-        'nom': etudiant['nom'],
-        'prenom': etudiant['prenom'],
-        'classe': etudiant['classe_libelle'],
-        'periode': periode,
-        'moyenne_generale': sum(m['moyenne'] for m in moyennes) / len(moyennes) if moyennes else 0
-    }
-    
-    notes_data = [{
-        'matiere': m['matiere'],
-        'note': m['moyenne'],
-        'coefficient': m['coefficient'],
-        'moyenne': m['moyenne']
-    } for m in moyennes]
-    
-    generate_bulletin(etudiant_data, notes_data, output_path)
-    
-    return send_file(output_path, mimetype='application/pdf', as_attachment=True,
-                    download_name=f'bulletin_{etudiant["numero_etudiant"]}.pdf')
+    # Servi depuis le cache s'il est à jour, sinon rendu en arrière-plan
+    attendre = 0 if request.args.get('async') == '1' else None
+    parametres = {'etudiant_id': etudiant['id'], 'periode': periode}
+    return document_response('bulletin', current_user['id'], parametres, attendre=attendre)
 
 @etudiant_bp.route('/absences', methods=['GET'])
 @jwt_required()
@@ -219,16 +187,13 @@ def get_my_absences():
     if not etudiant:
         return jsonify({'error': 'Accès refusé'}), 403
     
-    absences = db.execute("""
+    return paginate(db, """
         SELECT a.*, m.libelle as matiere_libelle, c.libelle as classe_libelle
         FROM absences a
         LEFT JOIN matieres m ON a.matiere_id = m.id
         JOIN classes c ON a.classe_id = c.id
         WHERE a.etudiant_id = ?
-        ORDER BY a.date_absence DESC
-    """, (etudiant['id'],)).fetchall()
-    
-    return jsonify([dict(absence) for absence in absences]), 200
+    """, (etudiant['id'],), [('date_absence', 'DESC'), ('id', 'DESC')])
 
 @etudiant_bp.route('/emploi-temps', methods=['GET'])
 @jwt_required()
@@ -290,13 +255,10 @@ def get_decisions():
     if not etudiant:
         return jsonify({'error': 'Accès refusé'}), 403
     
-    decisions = db.execute("""
+    return paginate(db, """
         SELECT * FROM decisions_academiques
         WHERE etudiant_id = ?
-        ORDER BY created_at DESC
-    """, (etudiant['id'],)).fetchall()
-    
-    return jsonify([dict(d) for d in decisions]), 200
+    """, (etudiant['id'],), [('created_at', 'DESC'), ('id', 'DESC')])
 
 @etudiant_bp.route('/notifications', methods=['GET'])
 @jwt_required()
@@ -313,10 +275,7 @@ def get_notifications():
         query += " AND is_lu = ?"
         params.append(1 if is_lu == 'true' else 0)
     
-    query += " ORDER BY created_at DESC LIMIT 50"
-    
-    notifications = db.execute(query, params).fetchall()
-    return jsonify([dict(n) for n in notifications]), 200
+    return paginate(db, query, params, [('created_at', 'DESC'), ('id', 'DESC')])
 
 @etudiant_bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
 @jwt_required()
@@ -1,16 +1,17 @@
 """
 Blueprint pour l'Export Avancé
 """
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from flask_jwt_extended import jwt_required
-from database.db import get_db
+from database.db import get_db, get_db_connection, close_db
 from utils.auth import role_required, get_current_user
 from utils.validators import validate_required
-from utils.pdf_generator import generate_receipt, generate_bulletin
-from reportlab.lib import colors
-from datetime import datetime
+from utils.jobs import document_response
+from utils.export_stream import iter_rows, csv_chunks, json_chunks, write_xlsx, streaming_response
+from utils.pagination import paginate
 import os
 import json
+import tempfile
 
 exports_bp = Blueprint('exports', __name__)
 
@@ -57,157 +58,88 @@ def export_data():
         return export_excel(donnees_type, data, current_user)
     elif type_export == 'csv':
         return export_csv(donnees_type, data, current_user)
-    elif type_export == 'json':
+    elif type_export in ('json', 'ndjson'):
         return export_json(donnees_type, data, current_user)
     else:
         return jsonify({'error': 'Type d\'export non supporté'}), 400
 
 def export_pdf(donnees_type, data, user):
-    """Exporte en PDF"""
-    db = get_db()
+    """Exporte en PDF (rendu en arrière-plan)"""
+    if donnees_type == 'rapport_financier':
+        return export_rapport_financier_pdf(data, user)
     
-    if donnees_type == 'bulletin':
-        etudiant_id = data.get('etudiant_id')
-        periode = data.get('periode', 'annuel')
-        
-        # Utiliser la fonction existante
-        from blueprints.etudiant import get_bulletin
-        # Appel direct de la génération
-        etudiant = db.execute("""
-            SELECT e.*, u.nom, u.prenom, c.libelle as classe_libelle
-            FROM etudiants e
-            JOIN users u ON e.user_id = u.id
-            LEFT JOIN classes c ON e.classe_id = c.id
-            WHERE e.id = ?
-        """, (etudiant_id,)).fetchone()
-        
-        if not etudiant:
-            return jsonify({'error': 'Étudiant non trouvé'}), 404
-        
-        moyennes = db.execute("""
-            SELECT m.*, mat.libelle as matiere, mat.coefficient
-            FROM moyennes m
-            JOIN matieres mat ON m.matiere_id = mat.id
-            WHERE m.etudiant_id = ? AND m.periode = ?
-        """, (etudiant_id, periode)).fetchall()
-        
-        output_path = os.path.join(
-            request.application.config['UPLOAD_FOLDER'],
-            'pdf',
-            f'bulletin_{etudiant_id}_{periode}.pdf'
-        )
-        
-        etudiant_data = {
-            'nom': etudiant['nom'],
-            'prenom': etudiant['prenom'],
-            'classe': etudiant['classe_libelle'],
-            'periode': periode,
-            'moyenne_generale': sum(m['moyenne'] for m in moyennes) / len(moyennes) if moyennes else 0
-        }
-        
-        notes_data = [{
-            'matiere': m['matiere'],
-            'note': m['moyenne'],
-            'coefficient': m['coefficient'],
-            'moyenne': m['moyenne']
-        } for m in moyennes]
-        
-        generate_bulletin(etudiant_data, notes_data, output_path)
-        
-        # Enregistrer l'export
-        enregistrer_export(user['id'], 'pdf', 'bulletin', output_path, len(moyennes))
-        
-        return send_file(output_path, mimetype='application/pdf', as_attachment=True,
-                        download_name=f'bulletin_{etudiant["numero_etudiant"]}.pdf')
+    if donnees_type not in ('bulletin', 'liste_etudiants'):
+        return jsonify({'error': 'Type de données non supporté pour PDF'}), 400
     
-    elif donnees_type == 'liste_etudiants':
-        return export_liste_etudiants_pdf(data, user)
+    from blueprints.jobs import authorize_job
+    parametres, error = authorize_job(get_db(), user, donnees_type, data)
+    if error:
+        return error
     
-    elif donnees_type == 'rapport_financier':
-        return export_rapport_financier_pdf(data, user)
-    
-    return jsonify({'error': 'Type de données non supporté pour PDF'}), 400
+    # Servi depuis le cache s'il est à jour, sinon rendu en arrière-plan (202 si pas prêt à temps)
+    attendre = 0 if data.get('async') else None
+    return document_response(donnees_type, user['id'], parametres, attendre=attendre)
 
-def export_excel(donnees_type, data, user):
-    """Exporte en Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment
-    
-    db = get_db()
-    wb = Workbook()
-    ws = wb.active
+# Jeux de données exportables: requête, colonnes (libellé, clé ou fonction) et rôles autorisés
+EXPORT_DATASETS = {
+    'liste_etudiants': {
+        'titre': 'Étudiants',
+        'roles': ('admin', 'comptabilite', 'enseignant'),
+        'colonnes': [
+            ('Numéro', 'numero_etudiant'),
+            ('Nom', 'nom'),
+            ('Prénom', 'prenom'),
+            ('Email', 'email'),
+            ('Téléphone', 'telephone'),
+            ('Classe', 'classe_libelle'),
+            ('Date inscription', 'date_inscription'),
+        ],
+    },
+    'paiements': {
+        'titre': 'Paiements',
+        'roles': ('admin', 'comptabilite'),
+        'colonnes': [
+            ('Date', 'date_paiement'),
+            ('Étudiant', lambda p: f"{p['etudiant_nom']} {p['etudiant_prenom']}"),
+            ('Type frais', 'type_frais'),
+            ('Montant', 'montant'),
+            ('Mode paiement', 'mode_paiement'),
+            ('Référence', 'reference_paiement'),
+        ],
+    },
+    'notes': {
+        'titre': 'Notes',
+        'roles': ('admin', 'enseignant'),
+        'colonnes': [
+            ('Numéro étudiant', 'numero_etudiant'),
+            ('Matière', 'matiere_libelle'),
+            ('Type', 'type_note'),
+            ('Note', 'note'),
+            ('Coefficient', 'coefficient'),
+            ('Date', 'date_note'),
+        ],
+    },
+}
+
+def build_export_query(donnees_type, data):
+    """Construit la requête d'un jeu de données exportable (filtres optionnels)"""
+    params = []
     
     if donnees_type == 'liste_etudiants':
-        ws.title = "Étudiants"
-        
-        # En-têtes
-        headers = ['Numéro', 'Nom', 'Prénom', 'Email', 'Téléphone', 'Classe', 'Date inscription']
-        ws.append(headers)
-        
-        # Style en-têtes
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Données
-        etudiants = db.execute("""
+        query = """
             SELECT e.numero_etudiant, u.nom, u.prenom, u.email, u.telephone,
                    c.libelle as classe_libelle, e.date_inscription
             FROM etudiants e
             JOIN users u ON e.user_id = u.id
             LEFT JOIN classes c ON e.classe_id = c.id
             WHERE e.is_active = 1
-        """).fetchall()
-        
-        for etudiant in etudiants:
-            ws.append([
-                etudiant['numero_etudiant'],
-                etudiant['nom'],
-                etudiant['prenom'],
-                etudiant['email'],
-                etudiant['telephone'],
-                etudiant['classe_libelle'],
-                etudiant['date_inscription']
-            ])
-        
-        # Ajuster largeurs
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        filename = os.path.join(
-            request.application.config['UPLOAD_FOLDER'],
-            'exports',
-            f'etudiants_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        )
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        wb.save(filename)
-        
-        enregistrer_export(user['id'], 'excel', 'liste_etudiants', filename, len(etudiants))
-        
-        return send_file(filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        as_attachment=True, download_name='etudiants.xlsx')
-    
-    return jsonify({'error': 'Type de données non supporté pour Excel'}), 400
-
-def export_csv(donnees_type, data, user):
-    """Exporte en CSV"""
-    import csv
-    
-    db = get_db()
+        """
+        if data.get('classe_id'):
+            query += " AND e.classe_id = ?"
+            params.append(data['classe_id'])
+        query += " ORDER BY e.numero_etudiant"
     
-    if donnees_type == 'paiements':
-        date_debut = data.get('date_debut')
-        date_fin = data.get('date_fin')
-        
+    elif donnees_type == 'paiements':
         query = """
             SELECT p.*, e.numero_etudiant, u.nom as etudiant_nom, u.prenom as etudiant_prenom,
                    tf.libelle as type_frais
@@ -217,135 +149,118 @@ def export_csv(donnees_type, data, user):
             JOIN types_frais tf ON p.type_frais_id = tf.id
             WHERE p.statut = 'valide'
         """
-        params = []
-        
-        if date_debut:
+        if data.get('date_debut'):
             query += " AND p.date_paiement >= ?"
-            params.append(date_debut)
-        
-        if date_fin:
+            params.append(data['date_debut'])
+        if data.get('date_fin'):
             query += " AND p.date_paiement <= ?"
-            params.append(date_fin)
-        
-        paiements = db.execute(query, params).fetchall()
-        
-        filename = os.path.join(
-            request.application.config['UPLOAD_FOLDER'],
-            'exports',
-            f'paiements_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Date', 'Étudiant', 'Type frais', 'Montant', 'Mode paiement', 'Référence'])
-            
-            for p in paiements:
-                writer.writerow([
-                    p['date_paiement'],
-                    f"{p['etudiant_nom']} {p['etudiant_prenom']}",
-                    p['type_frais'],
-                    p['montant'],
-                    p['mode_paiement'],
-                    p['reference_paiement']
-                ])
-        
-        enregistrer_export(user['id'], 'csv', 'paiements', filename, len(paiements))
-        
-        return send_file(filename, mimetype='text/csv', as_attachment=True,
-                        download_name='paiements.csv')
+            params.append(data['date_fin'])
+        query += " ORDER BY p.date_paiement, p.id"
     
-    return jsonify({'error': 'Type de données non supporté pour CSV'}), 400
-
-def export_json(donnees_type, data, user):
-    """Exporte en JSON"""
-    db = get_db()
-    
-    if donnees_type == 'notes':
-        etudiant_id = data.get('etudiant_id')
-        
-        notes = db.execute("""
-            SELECT n.*, m.libelle as matiere_libelle
+    elif donnees_type == 'notes':
+        query = """
+            SELECT n.*, m.libelle as matiere_libelle, e.numero_etudiant
             FROM notes n
             JOIN matieres m ON n.matiere_id = m.id
-            WHERE n.etudiant_id = ? AND n.is_valide = 1
-        """, (etudiant_id,)).fetchall()
-        
-        filename = os.path.join(
-            request.application.config['UPLOAD_FOLDER'],
-            'exports',
-            f'notes_{etudiant_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        )
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump([dict(n) for n in notes], f, indent=2, ensure_ascii=False, default=str)
-        
-        enregistrer_export(user['id'], 'json', 'notes', filename, len(notes))
-        
-        return send_file(filename, mimetype='application/json', as_attachment=True,
-                        download_name='notes.json')
+            JOIN etudiants e ON n.etudiant_id = e.id
+            WHERE n.is_valide = 1
+        """
+        for field in ('etudiant_id', 'classe_id', 'matiere_id'):
+            if data.get(field):
+                query += f" AND n.{field} = ?"
+                params.append(data[field])
+        query += " ORDER BY n.id"
     
-    return jsonify({'error': 'Type de données non supporté pour JSON'}), 400
-
-def export_liste_etudiants_pdf(data, user):
-    """Exporte la liste des étudiants en PDF"""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-    from reportlab.lib.styles import getSampleStyleSheet
+    else:
+        return None, None
     
-    db = get_db()
-    etudiants = db.execute("""
-        SELECT e.numero_etudiant, u.nom, u.prenom, u.email, c.libelle as classe_libelle
-        FROM etudiants e
-        JOIN users u ON e.user_id = u.id
-        LEFT JOIN classes c ON e.classe_id = c.id
-        WHERE e.is_active = 1
-        LIMIT 100
-    """).fetchall()
+    return query, params
+
+def _check_export_access(donnees_type, data, user):
+    """Vérifie le droit d'exporter un jeu de données; retourne une réponse d'erreur ou None"""
+    dataset = EXPORT_DATASETS.get(donnees_type)
+    if dataset is None:
+        return jsonify({'error': 'Type de données non supporté'}), 400
+    # Les notes d'un seul étudiant restent exportables comme auparavant
+    if donnees_type == 'notes' and data.get('etudiant_id'):
+        return None
+    if user['role'] not in dataset['roles']:
+        return jsonify({'error': 'Accès refusé'}), 403
+    return None
+
+def export_excel(donnees_type, data, user):
+    """Exporte en Excel (classeur write-only, lignes lues par paquets)
+
+    Le classeur est écrit dans un fichier temporaire supprimé une fois la
+    réponse envoyée.
+    """
+    error = _check_export_access(donnees_type, data, user)
+    if error:
+        return error
     
-    filename = os.path.join(
-        request.application.config['UPLOAD_FOLDER'],
-        'pdf',
-        f'liste_etudiants_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    )
+    dataset = EXPORT_DATASETS[donnees_type]
+    query, params = build_export_query(donnees_type, data)
+    directory = os.path.join(current_app.config['UPLOAD_FOLDER'], 'exports')
+    os.makedirs(directory, exist_ok=True)
+    fd, filename = tempfile.mkstemp(prefix=f'{donnees_type}_', suffix='.xlsx', dir=directory)
+    os.close(fd)
     
-    doc = SimpleDocTemplate(filename, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
+    # Connexions de la requête rendues avant l'écriture du classeur (POST: la
+    # connexion d'écriture y serait détenue tout le temps d'un export complet);
+    # les lignes sont lues sur une connexion de lecture
+    close_db()
+    try:
+        nombre = write_xlsx(filename, dataset['titre'], iter_rows(query, params), dataset['colonnes'])
+    except ImportError:
+        os.remove(filename)
+        return jsonify({'error': 'Export Excel indisponible (openpyxl non installé)'}), 400
+    except Exception:
+        os.remove(filename)
+        raise
     
-    story.append(Paragraph("Liste des Étudiants", styles['Heading1']))
-    story.append(Paragraph(f"Date: {datetime.now().strftime('%d/%m/%Y')}", styles['Normal']))
+    enregistrer_export(user['id'], 'excel', donnees_type, None, nombre, os.path.getsize(filename))
     
-    data_table = [['Numéro', 'Nom', 'Prénom', 'Email', 'Classe']]
-    for e in etudiants:
-        data_table.append([
-            e['numero_etudiant'],
-            e['nom'],
-            e['prenom'],
-            e['email'],
-            e['classe_libelle'] or 'N/A'
-        ])
+    response = send_file(filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                         as_attachment=True, download_name=f'{donnees_type}.xlsx')
+    # Sans passage direct, le serveur ferme la réponse elle-même (et donc appelle call_on_close)
+    response.direct_passthrough = False
+    response.call_on_close(lambda: os.remove(filename))
+    return response
+
+def export_csv(donnees_type, data, user):
+    """Exporte en CSV (flux)"""
+    error = _check_export_access(donnees_type, data, user)
+    if error:
+        return error
     
-    table = Table(data_table)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    query, params = build_export_query(donnees_type, data)
+    stats = {}
+    chunks = csv_chunks(iter_rows(query, params), EXPORT_DATASETS[donnees_type]['colonnes'], stats=stats)
     
-    story.append(table)
-    doc.build(story)
+    return streaming_response(
+        chunks, 'text/csv', f'{donnees_type}.csv',
+        on_complete=lambda: enregistrer_export(user['id'], 'csv', donnees_type, None,
+                                               stats.get('lignes', 0), stats.get('octets', 0))
+    )
+
+def export_json(donnees_type, data, user):
+    """Exporte en JSON (tableau) ou NDJSON (un objet par ligne), en flux"""
+    error = _check_export_access(donnees_type, data, user)
+    if error:
+        return error
     
-    enregistrer_export(user['id'], 'pdf', 'liste_etudiants', filename, len(etudiants))
+    ndjson = data.get('type_export') == 'ndjson'
+    query, params = build_export_query(donnees_type, data)
+    stats = {}
+    chunks = json_chunks(iter_rows(query, params), stats=stats, ndjson=ndjson)
     
-    return send_file(filename, mimetype='application/pdf', as_attachment=True,
-                    download_name='liste_etudiants.pdf')
+    return streaming_response(
+        chunks,
+        'application/x-ndjson' if ndjson else 'application/json',
+        f"{donnees_type}.{'ndjson' if ndjson else 'json'}",
+        on_complete=lambda: enregistrer_export(user['id'], 'ndjson' if ndjson else 'json', donnees_type,
+                                               None, stats.get('lignes', 0), stats.get('octets', 0))
+    )
 
 def export_rapport_financier_pdf(data, user):
     """Exporte un rapport financier en PDF"""
@@ -353,24 +268,25 @@ def export_rapport_financier_pdf(data, user):
     # ... (code similaire)
     return jsonify({'message': 'Rapport financier généré'}), 200
 
-def enregistrer_export(user_id, type_export, donnees_type, fichier_path, nombre_lignes):
-    """Enregistre l'historique d'un export"""
-    db = get_db()
-    taille = os.path.getsize(fichier_path) if os.path.exists(fichier_path) else 0
+def enregistrer_export(user_id, type_export, donnees_type, fichier_path, nombre_lignes, taille=None):
+    """Enregistre l'historique d'un export (fichier_path None si le fichier n'est pas conservé)"""
+    if taille is None:
+        taille = os.path.getsize(fichier_path) if fichier_path and os.path.exists(fichier_path) else 0
     
-    db.execute("""
+    with get_db_connection() as db:
+        db.execute("""
         INSERT INTO historique_exports (user_id, type_export, fichier_path, parametres,
                                        nombre_lignes, taille_fichier)
         VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        user_id,
-        type_export,
-        fichier_path,
-        json.dumps({'donnees_type': donnees_type}),
-        nombre_lignes,
-        taille
-    ))
-    db.commit()
+        """, (
+            user_id,
+            type_export,
+            fichier_path,
+            json.dumps({'donnees_type': donnees_type}),
+            nombre_lignes,
+            taille
+        ))
+        db.commit()
 
 @exports_bp.route('/historique', methods=['GET'])
 @jwt_required()
@@ -379,12 +295,8 @@ def get_historique_exports():
     current_user = get_current_user()
     db = get_db()
     
-    exports = db.execute("""
+    return paginate(db, """
         SELECT * FROM historique_exports
         WHERE user_id = ?
-        ORDER BY date_export DESC
-        LIMIT 50
-    """, (current_user['id'],)).fetchall()
-    
-    return jsonify([dict(e) for e in exports]), 200
+    """, (current_user['id'],), [('date_export', 'DESC'), ('id', 'DESC')])
 
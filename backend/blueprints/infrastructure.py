@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required, validate_date
+from utils.pagination import paginate
 from datetime import datetime, date, time
 
 infrastructure_bp = Blueprint('infrastructure', __name__)
@@ -125,10 +126,8 @@ def list_reservations():
         query += " AND r.reserve_par = ?"
         params.append(current_user['id'])
     
-    query += " ORDER BY r.date_reservation, r.heure_debut"
-    
-    reservations = db.execute(query, params).fetchall()
-    return jsonify([dict(r) for r in reservations]), 200
+    return paginate(db, query, params,
+                    [('date_reservation', 'ASC'), ('heure_debut', 'ASC'), ('id', 'ASC')])
 
 @infrastructure_bp.route('/reservations', methods=['POST'])
 @jwt_required()
@@ -265,10 +264,7 @@ def list_maintenances():
         query += " AND statut = ?"
         params.append(statut)
     
-    query += " ORDER BY date_intervention DESC"
-    
-    maintenances = db.execute(query, params).fetchall()
-    return jsonify([dict(m) for m in maintenances]), 200
+    return paginate(db, query, params, [('date_intervention', 'DESC'), ('id', 'DESC')])
 
 @infrastructure_bp.route('/maintenances', methods=['POST'])
 @jwt_required()
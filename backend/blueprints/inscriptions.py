@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required, validate_email_format, validate_date
+from utils.pagination import paginate
 from datetime import datetime
 
 inscriptions_bp = Blueprint('inscriptions', __name__)
@@ -33,10 +34,7 @@ def list_candidatures():
         query += " AND c.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY c.date_candidature DESC"
-    
-    candidatures = db.execute(query, params).fetchall()
-    return jsonify([dict(c) for c in candidatures]), 200
+    return paginate(db, query, params, [('date_candidature', 'DESC'), ('id', 'DESC')])
 
 @inscriptions_bp.route('/candidatures', methods=['POST'])
 def create_candidature():
@@ -0,0 +1,165 @@
+"""
+Blueprint pour les travaux en arrière-plan (bulletins, reçus, listes PDF, lots)
+"""
+import os
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from database.db import get_db
+from database.job_queue import get_job, job_to_dict
+from utils.auth import get_current_user
+from utils.jobs import (JOB_HANDLERS, enqueue_job, abort_job, job_status_response,
+                        send_job_file)
+from utils.pagination import paginate
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Rôles autorisés par type de travail (étudiants et parents: leurs propres documents)
+JOB_ROLES = {
+    'bulletin': ('admin', 'enseignant', 'comptabilite', 'etudiant', 'parent'),
+    'recu': ('admin', 'comptabilite', 'etudiant', 'parent'),
+    'liste_etudiants': ('admin', 'comptabilite', 'enseignant'),
+    'bulletins_classe': ('admin',),
+}
+
+# Identifiants acceptés dans les paramètres d'un travail
+JOB_ID_FIELDS = ('etudiant_id', 'paiement_id', 'classe_id')
+
+def _parse_ids(parametres):
+    """Identifiants des paramètres convertis en entiers; retourne (ids, None) ou (None, message)"""
+    ids = {}
+    for field in JOB_ID_FIELDS:
+        value = parametres.get(field)
+        if value is None or value == '':
+            continue
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            return None, f'{field} doit être un entier'
+        try:
+            ids[field] = int(value)
+        except (TypeError, ValueError):
+            return None, f'{field} doit être un entier'
+    return ids, None
+
+def authorize_job(db, user, job_type, parametres):
+    """Vérifie qu'un utilisateur peut demander un travail
+
+    Retourne (paramètres normalisés, None) ou (None, réponse d'erreur).
+    """
+    from blueprints.etudiant import check_unpaid_fees
+    from blueprints.parent import is_parent_of_student
+
+    if job_type not in JOB_HANDLERS:
+        return None, (jsonify({'error': 'Type de travail non supporté'}), 400)
+    if user['role'] not in JOB_ROLES[job_type]:
+        return None, (jsonify({'error': 'Accès refusé'}), 403)
+    if not isinstance(parametres, dict):
+        return None, (jsonify({'error': 'parametres doit être un objet'}), 400)
+    ids, error = _parse_ids(parametres)
+    if error:
+        return None, (jsonify({'error': error}), 400)
+
+    if job_type == 'bulletin':
+        etudiant_id = ids.get('etudiant_id')
+        if user['role'] == 'etudiant':
+            etudiant = db.execute("SELECT id FROM etudiants WHERE user_id = ?", (user['id'],)).fetchone()
+            if not etudiant:
+                return None, (jsonify({'error': 'Étudiant non trouvé'}), 404)
+            if check_unpaid_fees(db, etudiant['id']):
+                return None, (jsonify({'error': 'Accès restreint: frais impayés', 'has_unpaid': True}), 403)
+            etudiant_id = etudiant['id']
+        elif not etudiant_id:
+            return None, (jsonify({'error': 'etudiant_id requis'}), 400)
+        elif user['role'] == 'parent' and not is_parent_of_student(db, user['id'], etudiant_id):
+            return None, (jsonify({'error': 'Accès refusé'}), 403)
+        return {'etudiant_id': etudiant_id, 'periode': parametres.get('periode', 'annuel')}, None
+
+    if job_type == 'recu':
+        paiement_id = ids.get('paiement_id')
+        if not paiement_id:
+            return None, (jsonify({'error': 'paiement_id requis'}), 400)
+        paiement = db.execute("""
+            SELECT p.etudiant_id, e.user_id FROM paiements p
+            JOIN etudiants e ON p.etudiant_id = e.id
+            WHERE p.id = ?
+        """, (paiement_id,)).fetchone()
+        if not paiement:
+            return None, (jsonify({'error': 'Paiement non trouvé'}), 404)
+        if user['role'] == 'etudiant' and paiement['user_id'] != user['id']:
+            return None, (jsonify({'error': 'Accès refusé'}), 403)
+        if user['role'] == 'parent' and not is_parent_of_student(db, user['id'], paiement['etudiant_id']):
+            return None, (jsonify({'error': 'Accès refusé'}), 403)
+        return {'paiement_id': paiement_id}, None
+
+    if job_type == 'bulletins_classe':
+        if not ids.get('classe_id'):
+            return None, (jsonify({'error': 'classe_id requis'}), 400)
+        return {'classe_id': ids['classe_id'], 'periode': parametres.get('periode', 'annuel')}, None
+
+    if ids.get('classe_id'):
+        return {'classe_id': ids['classe_id']}, None
+    return {}, None
+
+def _get_own_job(job_id):
+    """Travail de l'utilisateur courant (l'administrateur voit tous les travaux)"""
+    user = get_current_user()
+    job = get_job(get_db(), job_id)
+    if not job or (job['user_id'] != user['id'] and user['role'] != 'admin'):
+        return None
+    return job
+
+@jobs_bp.route('', methods=['POST'])
+@jwt_required()
+def submit():
+    """Dépose un travail de génération de document"""
+    data = request.get_json() or {}
+    job_type = data.get('type')
+    if not job_type:
+        return jsonify({'error': 'type requis'}), 400
+
+    current_user = get_current_user()
+    parametres, error = authorize_job(get_db(), current_user, job_type, data.get('parametres') or {})
+    if error:
+        return error
+
+    job_id = enqueue_job(job_type, current_user['id'], parametres)
+    return job_status_response(get_job(get_db(), job_id))
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """Liste les derniers travaux de l'utilisateur"""
+    current_user = get_current_user()
+    return paginate(get_db(), "SELECT * FROM jobs WHERE user_id = ?", (current_user['id'],),
+                    [('id', 'DESC')], transform=job_to_dict)
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    """Obtient l'état d'un travail"""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    return job_status_response(job, 200)
+
+@jobs_bp.route('/<int:job_id>/download', methods=['GET'])
+@jwt_required()
+def download_job(job_id):
+    """Télécharge le document d'un travail terminé"""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    if job['statut'] != 'termine':
+        return jsonify({'error': 'Document non disponible', 'statut': job['statut']}), 409
+    if not job['fichier_path'] or not os.path.exists(job['fichier_path']):
+        return jsonify({'error': 'Fichier expiré'}), 410
+    return send_job_file(job)
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel(job_id):
+    """Annule un travail en attente ou en cours"""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    if not abort_job(job_id):
+        return jsonify({'error': 'Travail déjà terminé', 'statut': job['statut']}), 409
+    return jsonify({'message': 'Travail annulé'}), 200
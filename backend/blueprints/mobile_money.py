@@ -5,7 +5,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
+from utils.cache_service import invalidate_cache
 from utils.validators import validate_required, validate_montant
+from utils.pagination import paginate
 from datetime import datetime
 import hashlib
 import hmac
@@ -165,6 +167,7 @@ def initier_paiement():
             'valide'
         ))
         db.commit()
+        invalidate_cache('paiements', f"etudiant:{data['etudiant_id']}")
         
         log_action(current_user['id'], 'paiement_mobile_money', 'transactions_mobile_money', transaction_id)
         
@@ -229,6 +232,7 @@ def webhook_mobile_money():
             'valide'
         ))
         db.commit()
+        invalidate_cache('paiements', f"etudiant:{transaction['etudiant_id']}")
     
     return jsonify({'message': 'Webhook traité avec succès'}), 200
 
@@ -267,10 +271,7 @@ def list_transactions():
         query += " AND t.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY t.date_transaction DESC"
-    
-    transactions = db.execute(query, params).fetchall()
-    return jsonify([dict(t) for t in transactions]), 200
+    return paginate(db, query, params, [('date_transaction', 'DESC'), ('id', 'DESC')])
 
 def appeler_api_mobile_money(config, numero, montant, reference):
     """Appelle l'API Mobile Money (simulation)"""
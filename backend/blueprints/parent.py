@@ -5,6 +5,9 @@ from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import get_current_user
+from utils.cache_service import cached
+from utils.jobs import document_response
+from utils.pagination import paginate
 import os
 
 parent_bp = Blueprint('parent', __name__)
@@ -52,18 +55,16 @@ def get_enfant_notes(etudiant_id):
     etudiant = db.execute("SELECT user_id FROM etudiants WHERE id = ?", 
                          (etudiant_id,)).fetchone()
     
-    notes = db.execute("""
+    return paginate(db, """
         SELECT n.*, m.libelle as matiere_libelle, m.code as matiere_code
         FROM notes n
         JOIN matieres m ON n.matiere_id = m.id
         WHERE n.etudiant_id = ? AND n.is_valide = 1
-        ORDER BY n.date_note DESC
-    """, (etudiant_id,)).fetchall()
-    
-    return jsonify([dict(note) for note in notes]), 200
+    """, (etudiant_id,), [('date_note', 'DESC'), ('id', 'DESC')])
 
 @parent_bp.route('/enfants/<int:etudiant_id>/moyennes', methods=['GET'])
 @jwt_required()
+@cached(tags=['moyennes', 'etudiant:{etudiant_id}'], per_user=True)
 def get_enfant_moyennes(etudiant_id):
     """Obtient les moyennes d'un enfant"""
     current_user = get_current_user()
@@ -98,16 +99,13 @@ def get_enfant_absences(etudiant_id):
     if not is_parent_of_student(db, current_user['id'], etudiant_id):
         return jsonify({'error': 'Accès refusé'}), 403
     
-    absences = db.execute("""
+    return paginate(db, """
         SELECT a.*, m.libelle as matiere_libelle, c.libelle as classe_libelle
         FROM absences a
         LEFT JOIN matieres m ON a.matiere_id = m.id
         JOIN classes c ON a.classe_id = c.id
         WHERE a.etudiant_id = ?
-        ORDER BY a.date_absence DESC
-    """, (etudiant_id,)).fetchall()
-    
-    return jsonify([dict(absence) for absence in absences]), 200
+    """, (etudiant_id,), [('date_absence', 'DESC'), ('id', 'DESC')])
 
 @parent_bp.route('/enfants/<int:etudiant_id>/situation-financiere', methods=['GET'])
 @jwt_required()
@@ -133,57 +131,14 @@ def get_enfant_bulletin(etudiant_id):
     if not is_parent_of_student(db, current_user['id'], etudiant_id):
         return jsonify({'error': 'Accès refusé'}), 403
     
-    # Utiliser la fonction du blueprint étudiant
-    from blueprints.etudiant import get_bulletin as get_bul
-    # Note: Cette fonction nécessite d'être adaptée pour accepter un etudiant_id
-    
-    etudiant = db.execute("""
-        SELECT e.*, u.nom, u.prenom, c.libelle as classe_libelle
-        FROM etudiants e
-        JOIN users u ON e.user_id = u.id
-        LEFT JOIN classes c ON e.classe_id = c.id
-        WHERE e.id = ?
-    """, (etudiant_id,)).fetchone()
-    
+    etudiant = db.execute("SELECT id FROM etudiants WHERE id = ?", (etudiant_id,)).fetchone()
     if not etudiant:
         return jsonify({'error': 'Étudiant non trouvé'}), 404
     
-    # Obtenir les moyennes
-    moyennes = db.execute("""
-        SELECT m.*, mat.libelle as matiere, mat.coefficient
-        FROM moyennes m
-        JOIN matieres mat ON m.matiere_id = mat.id
-        WHERE m.etudiant_id = ? AND m.periode = ?
-    """, (etudiant_id, periode)).fetchall()
-    
-    from utils.pdf_generator import generate_bulletin
-    from flask import send_file
-    
-    output_path = os.path.join(
-        request.application.config['UPLOAD_FOLDER'],
-        'pdf',
-        f'bulletin_{etudiant_id}_{periode}.pdf'
-    )
-    
-    etudiant_data = {
-        'nom': etudiant['nom'],
-        'prenom': etudiant['prenom'],
-        'classe': etudiant['classe_libelle'],
-        'periode': periode,
-        'moyenne_generale': sum(m['moyenne'] for m in moyennes) / len(moyennes) if moyennes else 0
-    }
-    
-    notes_data = [{
-        'matiere': m['matiere'],
-        'note': m['moyenne'],
-        'coefficient': m['coefficient'],
-        'moyenne': m['moyenne']
-    } for m in moyennes]
-    
-    generate_bulletin(etudiant_data, notes_data, output_path)
-    
-    return send_file(output_path, mimetype='application/pdf', as_attachment=True,
-                    download_name=f'bulletin_{etudiant["numero_etudiant"]}.pdf')
+    # Servi depuis le cache s'il est à jour, sinon rendu en arrière-plan
+    attendre = 0 if request.args.get('async') == '1' else None
+    parametres = {'etudiant_id': etudiant_id, 'periode': periode}
+    return document_response('bulletin', current_user['id'], parametres, attendre=attendre)
 
 @parent_bp.route('/notifications', methods=['GET'])
 @jwt_required()
@@ -200,10 +155,7 @@ def get_notifications():
         query += " AND is_lu = ?"
         params.append(1 if is_lu == 'true' else 0)
     
-    query += " ORDER BY created_at DESC LIMIT 50"
-    
-    notifications = db.execute(query, params).fetchall()
-    return jsonify([dict(n) for n in notifications]), 200
+    return paginate(db, query, params, [('created_at', 'DESC'), ('id', 'DESC')])
 
 def is_parent_of_student(db, parent_user_id, etudiant_id):
     """Vérifie si le parent est bien parent de l'étudiant"""
@@ -3,7 +3,7 @@ Blueprint pour le Portfolio Numérique
 """
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
-from database.db import get_db
+from database.db import get_db, writes_db
 from utils.auth import get_current_user, role_required, log_action
 from utils.validators import validate_required
 from datetime import datetime
@@ -14,6 +14,7 @@ portfolio_bp = Blueprint('portfolio', __name__)
 
 @portfolio_bp.route('/mon-portfolio', methods=['GET'])
 @jwt_required()
+@writes_db
 def get_my_portfolio():
     """Obtient le portfolio de l'étudiant connecté"""
     current_user = get_current_user()
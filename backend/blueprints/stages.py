@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required, validate_date
+from utils.pagination import paginate
 from datetime import datetime
 
 stages_bp = Blueprint('stages', __name__)
@@ -77,10 +78,7 @@ def list_offres_stage():
         query += " AND o.filiere_id = ?"
         params.append(filiere_id)
     
-    query += " ORDER BY o.date_publication DESC"
-    
-    offres = db.execute(query, params).fetchall()
-    return jsonify([dict(o) for o in offres]), 200
+    return paginate(db, query, params, [('date_publication', 'DESC'), ('id', 'DESC')])
 
 @stages_bp.route('/offres', methods=['POST'])
 @jwt_required()
@@ -154,10 +152,7 @@ def list_conventions():
         query += " AND c.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY c.date_debut DESC"
-    
-    conventions = db.execute(query, params).fetchall()
-    return jsonify([dict(c) for c in conventions]), 200
+    return paginate(db, query, params, [('date_debut', 'DESC'), ('id', 'DESC')])
 
 @stages_bp.route('/conventions', methods=['POST'])
 @jwt_required()
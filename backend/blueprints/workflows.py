@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required
 from database.db import get_db
 from utils.auth import role_required, get_current_user, log_action
 from utils.validators import validate_required
+from utils.pagination import paginate
 from datetime import datetime, timedelta
 import json
 from functools import wraps
@@ -230,10 +231,7 @@ def list_instances():
         query += " AND i.statut = ?"
         params.append(statut)
     
-    query += " ORDER BY i.date_debut DESC"
-    
-    instances = db.execute(query, params).fetchall()
-    return jsonify([dict(i) for i in instances]), 200
+    return paginate(db, query, params, [('date_debut', 'DESC'), ('id', 'DESC')])
 
 def executer_etape(db, instance_id, etape_id):
     """Exécute une étape de workflow"""
@@ -0,0 +1,67 @@
+"""
+Compteurs de messages non lus du chat
+
+Les compteurs (table chat_non_lus, schema_chat.sql) sont tenus à jour par
+triggers dans la même transaction que l'envoi d'un message ou la lecture
+d'une conversation: la boîte de réception est une jointure indexée au lieu
+d'un comptage des messages de chaque conversation.
+"""
+import logging
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema_chat.sql"
+
+def install_chat_unread(db):
+    """Crée la table des compteurs et ses triggers; la remplit si elle vient d'être créée
+
+    Retourne False sans rien créer si les tables du chat sont absentes.
+    """
+    tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {'participants_conversations', 'messages_chat'} <= tables:
+        logger.info("Compteurs de messages non lus ignorés: tables du chat absentes")
+        return False
+    existait = 'chat_non_lus' in tables
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+    if not existait:
+        rebuild_chat_unread(db)
+    return True
+
+def rebuild_chat_unread(db):
+    """Recalcule les compteurs à partir des messages et des dates de dernière lecture
+
+    Un message compte s'il vient d'un autre participant et qu'il est
+    postérieur à la dernière lecture (tous les messages si jamais lue).
+    """
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("DELETE FROM chat_non_lus")
+        db.execute("""
+            INSERT INTO chat_non_lus (user_id, conversation_id, nombre)
+            SELECT p.user_id, p.conversation_id, COUNT(*)
+            FROM participants_conversations p
+            JOIN messages_chat m ON m.conversation_id = p.conversation_id
+            WHERE m.expediteur_id != p.user_id
+              AND m.created_at > COALESCE(p.date_derniere_lecture, '')
+            GROUP BY p.user_id, p.conversation_id
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def init_chat_unread(app):
+    """Installe les compteurs de non lus au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_chat_unread(db)
+            except sqlite3.OperationalError as e:
+                logger.warning("Compteurs de messages non lus non installés: %s", e)
@@ -5,48 +5,139 @@ import sqlite3
 import os
 from contextlib import contextmanager
 from functools import wraps
-from flask import g, current_app
+from flask import g, current_app, request, has_app_context, has_request_context
+from database.pool import PooledConnection, create_pool, open_connection, supports_read_only
+
+# Méthodes HTTP servies par le pool de lecture
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+def init_db_pool(app):
+    """Initialise les pools de connexions (écriture et lecture) et les libère en fin de requête"""
+    pool = create_pool(app.config)
+    app.extensions['db_pool'] = pool
+
+    if supports_read_only(app.config['DATABASE']):
+        # Ouvrir l'écrivain d'abord: il active le mode WAL dont dépendent les lecteurs
+        pool.release(pool.acquire())
+        app.extensions['db_read_pool'] = create_pool(app.config, read_only=True)
+
+    app.teardown_appcontext(close_db)
+    return pool
+
+def get_pool(app=None, read_only=False):
+    """Retourne un pool de l'application (None si non initialisé)"""
+    app = app or current_app
+    if read_only:
+        return app.extensions.get('db_read_pool')
+    return app.extensions.get('db_pool')
+
+def writes_db(f):
+    """Marque une vue GET qui écrit en base: elle reçoit la connexion d'écriture"""
+    f._writes_db = True
+    return f
+
+def _is_read_only_request():
+    """Indique si la requête courante peut être servie en lecture seule"""
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return view is not None and not getattr(view, '_writes_db', False)
+
+def _acquire(read_only=False):
+    """Emprunte une connexion au pool adéquat"""
+    pool = get_pool(read_only=True) if read_only else None
+    pool = pool or get_pool()
+    if pool is None:
+        # Application sans pool (scripts, tests): connexion directe
+        return open_connection(current_app.config['DATABASE'])
+    db = pool.acquire()
+    # Profil SQL de la requête HTTP en cours (utils/query_profiler.py)
+    db.profiler = g.get('sql_profile') if has_app_context() else None
+    return db
+
+def _release(db):
+    """Rend une connexion à son pool, ou la ferme si elle n'en a pas"""
+    pool = getattr(db, 'pool', None)
+    if isinstance(db, PooledConnection):
+        db.profiler = None
+    if pool is not None:
+        pool.release(db)
+    else:
+        db.close()
 
 def get_db():
-    """Obtient une connexion à la base de données"""
+    """Obtient une connexion à la base de données
+
+    Les requêtes GET/HEAD reçoivent une connexion en lecture seule, sauf
+    si la vue est marquée @writes_db; les autres reçoivent la connexion
+    d'écriture. Celle-ci reste détenue jusqu'à la fin de la requête: avec
+    un seul écrivain (DB_WRITER_POOL_SIZE=1), les requêtes d'écriture d'un
+    processus s'exécutent l'une après l'autre. Un traitement long avant la
+    première écriture (bcrypt à la connexion, par exemple) lit plutôt par
+    get_db_connection(read_only=True) et n'appelle get_db() qu'ensuite.
+    """
     if 'db' not in g:
-        g.db = sqlite3.connect(current_app.config['DATABASE'])
-        g.db.row_factory = sqlite3.Row
+        if _is_read_only_request():
+            g.db = _acquire(read_only=True)
+        else:
+            g.db = get_write_db()
     return g.db
 
+def get_write_db():
+    """Obtient la connexion d'écriture, quelle que soit la méthode HTTP"""
+    if 'db_write' not in g:
+        db = g.get('db')
+        if db is not None and not getattr(db, 'read_only', False):
+            g.db_write = db
+        else:
+            g.db_write = _acquire()
+    return g.db_write
+
 def close_db(e=None):
     """Ferme la connexion à la base de données"""
     db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    db_write = g.pop('db_write', None)
+    for conn in {id(c): c for c in (db, db_write) if c is not None}.values():
+        _release(conn)
 
 @contextmanager
-def get_db_connection():
-    """Context manager pour la connexion à la base de données"""
-    db = sqlite3.connect(current_app.config['DATABASE'])
-    db.row_factory = sqlite3.Row
+def get_db_connection(read_only=False):
+    """Context manager pour la connexion à la base de données
+
+    Dans une requête, la connexion déjà détenue par la requête est
+    réutilisée (et rendue en fin de requête): emprunter une seconde
+    connexion d'écriture attendrait celle que la requête détient déjà, et
+    une seconde connexion de lecture par requête épuiserait le pool de
+    lecture. En écriture, c'est la connexion d'écriture de la requête
+    (get_write_db); en lecture, celle de get_db() ou get_write_db() si la
+    requête en détient une, sinon une connexion de lecture empruntée le
+    temps du bloc.
+    """
+    if has_request_context():
+        held = g.get('db') or g.get('db_write') if read_only else get_write_db()
+        if held is not None:
+            yield held
+            return
+    db = _acquire(read_only=read_only)
     try:
         yield db
     finally:
-        db.close()
+        _release(db)
 
 def dict_factory(cursor, row):
     """Convertit les lignes en dictionnaires"""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 def query_db(query, args=(), one=False):
-    """Exécute une requête et retourne les résultats"""
+    """Exécute une requête de lecture et retourne les résultats"""
     db = get_db()
     cursor = db.execute(query, args)
-    db.commit()
     results = cursor.fetchall()
     return (dict(row) for row in results) if results else None
 
 def execute_db(query, args=()):
     """Exécute une requête d'insertion/modification"""
-    db = get_db()
+    db = get_write_db()
     cursor = db.execute(query, args)
     db.commit()
     return cursor.lastrowid
-
-
@@ -0,0 +1,132 @@
+"""
+Moteur de calcul des moyennes et classements
+
+Chaque note validée est ajoutée aux sommes courantes (Σ note × coef, Σ coef)
+de notes_agregats, puis la moyenne de la matière est réécrite par un seul
+UPSERT. Le classement d'une classe est recalculé par un unique UPSERT
+ensembliste (fonction de fenêtre RANK), une fois par classe touchée. Les
+fonctions n'effectuent pas de commit: l'appelant valide le tout en une
+seule transaction.
+"""
+import logging
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema_grades.sql"
+PERIODE_ANNUELLE = 'annuel'
+
+def install_grade_engine(db):
+    """Crée la table des sommes courantes et les index d'unicité (migration idempotente)"""
+    indexes = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name IN ('idx_moyennes_unique', 'idx_classements_unique')"
+    )}
+    # Doublons hérités de l'ancien calcul: conserver la première ligne, mise à jour jusqu'ici
+    if 'idx_moyennes_unique' not in indexes:
+        db.execute("""
+            DELETE FROM moyennes WHERE id NOT IN (
+                SELECT MIN(id) FROM moyennes GROUP BY etudiant_id, matiere_id, classe_id, periode
+            )
+        """)
+    if 'idx_classements_unique' not in indexes:
+        db.execute("""
+            DELETE FROM classements WHERE id NOT IN (
+                SELECT MIN(id) FROM classements GROUP BY etudiant_id, classe_id, periode
+            )
+        """)
+    db.commit()
+
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+    if db.execute("SELECT COUNT(*) FROM notes_agregats").fetchone()[0] == 0:
+        rebuild_note_aggregates(db)
+        db.commit()
+
+def rebuild_note_aggregates(db):
+    """Recalcule les sommes courantes à partir des notes validées"""
+    db.execute("DELETE FROM notes_agregats")
+    db.execute("""
+        INSERT INTO notes_agregats (etudiant_id, matiere_id, classe_id, periode,
+                                    somme_points, somme_coefficients, nombre_notes)
+        SELECT etudiant_id, matiere_id, classe_id, ?,
+               SUM(note * coefficient), SUM(coefficient), COUNT(*)
+        FROM notes
+        WHERE is_valide = 1
+        GROUP BY etudiant_id, matiere_id, classe_id
+    """, (PERIODE_ANNUELLE,))
+
+def init_grade_engine(app):
+    """Installe le moteur de calcul des moyennes au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_grade_engine(db)
+            except sqlite3.OperationalError as e:
+                logger.warning("Moteur de calcul des moyennes non installé: %s", e)
+
+def apply_note(db, etudiant_id, matiere_id, classe_id, note, coefficient=1.0,
+               periode=PERIODE_ANNUELLE, sign=1):
+    """Ajoute (sign=1) ou retire (sign=-1) une note validée et met à jour la moyenne"""
+    coefficient = 1.0 if coefficient is None else coefficient
+    db.execute("""
+        INSERT INTO notes_agregats (etudiant_id, matiere_id, classe_id, periode,
+                                    somme_points, somme_coefficients, nombre_notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(etudiant_id, matiere_id, classe_id, periode) DO UPDATE SET
+            somme_points = somme_points + excluded.somme_points,
+            somme_coefficients = somme_coefficients + excluded.somme_coefficients,
+            nombre_notes = nombre_notes + excluded.nombre_notes,
+            updated_at = CURRENT_TIMESTAMP
+    """, (etudiant_id, matiere_id, classe_id, periode,
+          sign * note * coefficient, sign * coefficient, sign))
+
+    db.execute("""
+        INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+        SELECT a.etudiant_id, a.matiere_id, a.classe_id,
+               a.somme_points / a.somme_coefficients, a.periode, c.annee_academique_id
+        FROM notes_agregats a
+        JOIN classes c ON c.id = a.classe_id
+        WHERE a.etudiant_id = ? AND a.matiere_id = ? AND a.classe_id = ? AND a.periode = ?
+          AND a.somme_coefficients > 0
+        ON CONFLICT(etudiant_id, matiere_id, classe_id, periode) DO UPDATE SET
+            moyenne = excluded.moyenne
+    """, (etudiant_id, matiere_id, classe_id, periode))
+
+def recompute_classement(db, classe_id, periode=PERIODE_ANNUELLE):
+    """Recalcule les rangs d'une classe en une seule requête (ex aequo au même rang)"""
+    db.execute("""
+        INSERT INTO classements (etudiant_id, classe_id, rang, moyenne_generale, periode, annee_academique_id)
+        SELECT g.etudiant_id, c.id, RANK() OVER (ORDER BY g.moyenne_generale DESC),
+               g.moyenne_generale, ?, c.annee_academique_id
+        FROM (
+            SELECT e.id as etudiant_id, AVG(m.moyenne) as moyenne_generale
+            FROM etudiants e
+            JOIN moyennes m ON e.id = m.etudiant_id
+            WHERE e.classe_id = ? AND m.periode = ?
+            GROUP BY e.id
+        ) g
+        JOIN classes c ON c.id = ?
+        WHERE true
+        ON CONFLICT(etudiant_id, classe_id, periode) DO UPDATE SET
+            rang = excluded.rang,
+            moyenne_generale = excluded.moyenne_generale
+    """, (periode, classe_id, periode, classe_id))
+
+def record_validated_notes(db, notes):
+    """Intègre des notes nouvellement validées aux moyennes puis aux classements
+
+    `notes` est une liste de lignes/dicts (etudiant_id, matiere_id,
+    classe_id, note, coefficient). Le classement est recalculé une fois
+    par classe concernée.
+    """
+    classes = set()
+    for note in notes:
+        apply_note(db, note['etudiant_id'], note['matiere_id'], note['classe_id'],
+                   note['note'], note['coefficient'])
+        classes.add(note['classe_id'])
+    for classe_id in sorted(classes):
+        recompute_classement(db, classe_id)
+    return classes
@@ -8,11 +8,17 @@ from pathlib import Path
 from flask_bcrypt import Bcrypt
 import sys
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.search_index import install_search_index
+from database.chat_unread import install_chat_unread
+from database.query_indexes import install_query_indexes
+
 bcrypt = Bcrypt()
 
-def init_complete_database():
-    """Initialise la base de données avec tous les schémas"""
-    db_path = Path(__file__).parent / "esa.db"
+def init_complete_database(db_path=None):
+    """Initialise la base de données avec tous les schémas (par défaut database/esa.db)"""
+    db_path = Path(db_path) if db_path else Path(__file__).parent / "esa.db"
     
     # Supprimer la base existante pour une réinitialisation propre
     if db_path.exists():
@@ -55,6 +61,75 @@ def init_complete_database():
         except sqlite3.OperationalError as e:
             print(f"   ⚠️  Erreur dans schema_top10.sql (peut être normal): {e}")
     
+    # 4. Moteur de calcul des moyennes (sommes courantes, index d'unicité)
+    schema_grades_path = Path(__file__).parent / "schema_grades.sql"
+    if schema_grades_path.exists():
+        print("   - Chargement schema_grades.sql...")
+        with open(schema_grades_path, 'r', encoding='utf-8') as f:
+            schema_grades = f.read()
+        cursor.executescript(schema_grades)
+    
+    # 5. Instantané des statistiques (tables de synthèse et triggers)
+    schema_stats_path = Path(__file__).parent / "schema_stats.sql"
+    if schema_stats_path.exists():
+        print("   - Chargement schema_stats.sql...")
+        with open(schema_stats_path, 'r', encoding='utf-8') as f:
+            schema_stats = f.read()
+        cursor.executescript(schema_stats)
+    
+    # 6. File de travaux en arrière-plan (et suivi dans historique_exports)
+    schema_jobs_path = Path(__file__).parent / "schema_jobs.sql"
+    if schema_jobs_path.exists():
+        print("   - Chargement schema_jobs.sql...")
+        with open(schema_jobs_path, 'r', encoding='utf-8') as f:
+            schema_jobs = f.read()
+        cursor.executescript(schema_jobs)
+    
+    # 7. Cache des documents générés (index et triggers d'invalidation)
+    schema_documents_path = Path(__file__).parent / "schema_documents.sql"
+    if schema_documents_path.exists():
+        print("   - Chargement schema_documents.sql...")
+        with open(schema_documents_path, 'r', encoding='utf-8') as f:
+            schema_documents = f.read()
+        cursor.executescript(schema_documents)
+    
+    # 8. Index des listes paginées (tri par curseur)
+    schema_pagination_path = Path(__file__).parent / "schema_pagination.sql"
+    if schema_pagination_path.exists():
+        print("   - Chargement schema_pagination.sql...")
+        with open(schema_pagination_path, 'r', encoding='utf-8') as f:
+            schema_pagination = f.read()
+        try:
+            cursor.executescript(schema_pagination)
+        except sqlite3.OperationalError as e:
+            print(f"   ⚠️  Erreur dans schema_pagination.sql (peut être normal): {e}")
+    
+    # 9. Recherche plein texte (index FTS5 et triggers de synchronisation)
+    schema_search_path = Path(__file__).parent / "schema_search.sql"
+    if schema_search_path.exists():
+        print("   - Chargement schema_search.sql...")
+        install_search_index(conn)
+    
+    # 10. Compteurs de messages non lus du chat
+    schema_chat_path = Path(__file__).parent / "schema_chat.sql"
+    if schema_chat_path.exists():
+        print("   - Chargement schema_chat.sql...")
+        install_chat_unread(conn)
+    
+    # 11. Boîte d'envoi des notifications externes
+    schema_notifications_path = Path(__file__).parent / "schema_notifications.sql"
+    if schema_notifications_path.exists():
+        print("   - Chargement schema_notifications.sql...")
+        with open(schema_notifications_path, 'r', encoding='utf-8') as f:
+            schema_notifications = f.read()
+        cursor.executescript(schema_notifications)
+    
+    # 12. Index composites des requêtes des blueprints (scripts/index_advisor.py)
+    schema_indexes_path = Path(__file__).parent / "schema_indexes.sql"
+    if schema_indexes_path.exists():
+        print("   - Chargement schema_indexes.sql...")
+        install_query_indexes(conn)
+    
     print("✅ Schémas chargés")
     print("")
     
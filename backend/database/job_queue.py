@@ -0,0 +1,160 @@
+"""
+File de travaux en arrière-plan stockée dans SQLite
+
+Un travail est déposé par une requête, réclamé par un worker (UPDATE ...
+RETURNING sous BEGIN IMMEDIATE: deux workers ne réclament jamais le même
+travail), puis terminé, en échec ou annulé. Chaque transition est reportée
+dans historique_exports (statut, début, fin, durée). Les fonctions qui
+modifient la file n'effectuent pas de commit, sauf claim_job.
+"""
+import json
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).parent / "schema_jobs.sql"
+
+STATUTS_FINAUX = ('termine', 'echoue', 'annule')
+
+DEFAULT_BAIL = 300          # secondes avant qu'un travail en cours soit repris
+DEFAULT_MAX_TENTATIVES = 3
+
+# Colonnes ajoutées à historique_exports pour le suivi des travaux
+HISTORIQUE_COLUMNS = {
+    'job_id': 'INTEGER',
+    'statut': 'VARCHAR(20)',
+    'date_debut': 'TIMESTAMP',
+    'date_fin': 'TIMESTAMP',
+    'duree_ms': 'INTEGER',
+}
+
+# Colonnes ajoutées à jobs après sa création (suivi de progression des lots)
+JOBS_COLUMNS = {
+    'progression': 'INTEGER NOT NULL DEFAULT 0',
+    'total': 'INTEGER',
+}
+
+def _add_missing_columns(db, table, columns):
+    existing = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+    for name, sql_type in columns.items():
+        if name not in existing:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
+def install_job_queue(db):
+    """Crée la table des travaux et complète historique_exports (migration idempotente)"""
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+    _add_missing_columns(db, 'jobs', JOBS_COLUMNS)
+    _add_missing_columns(db, 'historique_exports', HISTORIQUE_COLUMNS)
+    db.commit()
+
+def _sync_historique(db, job_id, nombre_lignes=None, taille=None):
+    """Reporte l'état d'un travail dans son entrée de l'historique des exports"""
+    db.execute("""
+        UPDATE historique_exports
+        SET statut = j.statut, date_debut = j.date_debut, date_fin = j.date_fin,
+            duree_ms = j.duree_ms, fichier_path = j.fichier_path,
+            nombre_lignes = COALESCE(?, historique_exports.nombre_lignes),
+            taille_fichier = COALESCE(?, historique_exports.taille_fichier)
+        FROM jobs j
+        WHERE j.id = ? AND historique_exports.id = j.historique_export_id
+    """, (nombre_lignes, taille, job_id))
+
+def submit_job(db, job_type, user_id, parametres=None, type_export='pdf'):
+    """Dépose un travail dans la file et l'inscrit à l'historique; retourne son identifiant"""
+    parametres = parametres or {}
+    historique_id = db.execute("""
+        INSERT INTO historique_exports (user_id, type_export, parametres, statut)
+        VALUES (?, ?, ?, 'en_attente')
+    """, (user_id, type_export, json.dumps({'donnees_type': job_type, **parametres}))).lastrowid
+    job_id = db.execute("""
+        INSERT INTO jobs (type, user_id, parametres, historique_export_id)
+        VALUES (?, ?, ?, ?)
+    """, (job_type, user_id, json.dumps(parametres), historique_id)).lastrowid
+    db.execute("UPDATE historique_exports SET job_id = ? WHERE id = ?", (job_id, historique_id))
+    return job_id
+
+def claim_job(db, bail=DEFAULT_BAIL, max_tentatives=DEFAULT_MAX_TENTATIVES):
+    """Réclame le plus ancien travail disponible (None si la file est vide)
+
+    Un travail en cours dont le bail a expiré (worker arrêté) est repris,
+    jusqu'à `max_tentatives` fois; au-delà il passe en échec.
+    """
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        abandonnes = db.execute("""
+            UPDATE jobs SET statut = 'echoue', erreur = 'Délai de traitement dépassé',
+                   date_fin = CURRENT_TIMESTAMP, bail_expire_at = NULL
+            WHERE statut = 'en_cours' AND bail_expire_at < CURRENT_TIMESTAMP AND tentatives >= ?
+            RETURNING id
+        """, (max_tentatives,)).fetchall()
+        for row in abandonnes:
+            _sync_historique(db, row['id'])
+
+        job = db.execute("""
+            UPDATE jobs SET statut = 'en_cours', tentatives = tentatives + 1, progression = 0,
+                   date_debut = CURRENT_TIMESTAMP, bail_expire_at = datetime('now', ?)
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE statut = 'en_attente'
+                   OR (statut = 'en_cours' AND bail_expire_at < CURRENT_TIMESTAMP)
+                ORDER BY id
+                LIMIT 1
+            )
+            RETURNING *
+        """, (f'{int(bail):+d} seconds',)).fetchone()
+        if job is not None:
+            _sync_historique(db, job['id'])
+        db.commit()
+        return job
+    except Exception:
+        db.rollback()
+        raise
+
+def finish_job(db, job_id, statut, fichier_path=None, download_name=None, erreur=None,
+               duree_ms=None, nombre_lignes=None, taille=None):
+    """Clôt un travail en cours (termine ou echoue)
+
+    Retourne False si le travail n'était plus en cours (annulé entre-temps).
+    """
+    cursor = db.execute("""
+        UPDATE jobs SET statut = ?, fichier_path = ?, download_name = ?, erreur = ?,
+               duree_ms = ?, date_fin = CURRENT_TIMESTAMP, bail_expire_at = NULL
+        WHERE id = ? AND statut = 'en_cours'
+    """, (statut, fichier_path, download_name, erreur, duree_ms, job_id))
+    if cursor.rowcount == 0:
+        return False
+    _sync_historique(db, job_id, nombre_lignes, taille)
+    return True
+
+def update_progress(db, job_id, progression, total=None):
+    """Met à jour l'avancement d'un travail en cours (documents produits / à produire)"""
+    db.execute("""
+        UPDATE jobs SET progression = ?, total = COALESCE(?, total)
+        WHERE id = ? AND statut = 'en_cours'
+    """, (progression, total, job_id))
+
+def cancel_job(db, job_id):
+    """Annule un travail en attente ou en cours; retourne False s'il était déjà clos"""
+    cursor = db.execute("""
+        UPDATE jobs SET statut = 'annule', date_fin = CURRENT_TIMESTAMP, bail_expire_at = NULL,
+               duree_ms = CASE WHEN date_debut IS NULL THEN NULL
+                          ELSE CAST((julianday('now') - julianday(date_debut)) * 86400000 AS INTEGER) END
+        WHERE id = ? AND statut IN ('en_attente', 'en_cours')
+    """, (job_id,))
+    if cursor.rowcount == 0:
+        return False
+    _sync_historique(db, job_id)
+    return True
+
+def get_job(db, job_id):
+    """Retourne un travail (None s'il n'existe pas)"""
+    return db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+def job_to_dict(job):
+    """Représentation JSON d'un travail (sans chemin de fichier)"""
+    data = dict(job)
+    data.pop('fichier_path', None)
+    data.pop('bail_expire_at', None)
+    data['parametres'] = json.loads(data['parametres'] or '{}')
+    return data
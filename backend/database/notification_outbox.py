@@ -0,0 +1,110 @@
+"""
+Boîte d'envoi des notifications externes stockée dans SQLite
+
+Les messages (email, SMS, push) sont déposés par lots avec les
+notifications internes, puis réclamés par lots par le worker de leur canal
+(UPDATE ... RETURNING sous BEGIN IMMEDIATE: deux workers ne réclament
+jamais le même message). Un échec est retenté après un délai qui double à
+chaque tentative. Les fonctions qui modifient la boîte n'effectuent pas de
+commit, sauf claim_messages.
+"""
+import json
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).parent / "schema_notifications.sql"
+
+CANAUX = ('email', 'sms', 'push')
+
+DEFAULT_BAIL = 120              # secondes avant qu'un message réclamé soit repris
+DEFAULT_MAX_TENTATIVES = 5
+DEFAULT_BACKOFF = 30            # délai avant la première nouvelle tentative (secondes)
+
+def install_notification_outbox(db):
+    """Crée la boîte d'envoi et ses index"""
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+    db.commit()
+
+def enqueue_messages(db, messages):
+    """Dépose des messages: dicts {canal, user_id, destinataire, sujet, contenu, data}
+
+    Retourne le nombre de messages déposés.
+    """
+    lignes = [(m['canal'], m.get('user_id'), m.get('destinataire'), m.get('sujet'), m['contenu'],
+               json.dumps(m['data']) if m.get('data') is not None else None)
+              for m in messages]
+    if lignes:
+        db.executemany("""
+            INSERT INTO notifications_outbox (canal, user_id, destinataire, sujet, contenu, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, lignes)
+    return len(lignes)
+
+def claim_messages(db, canal, limit=50, bail=DEFAULT_BAIL):
+    """Réclame jusqu'à `limit` messages à envoyer sur le canal (les plus anciens d'abord)
+
+    Sont disponibles les messages en attente dont la date de nouvelle
+    tentative est passée, et les messages en cours dont le bail a expiré.
+    """
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        messages = db.execute("""
+            UPDATE notifications_outbox
+            SET statut = 'en_cours', tentatives = tentatives + 1, bail_expire_at = datetime('now', ?)
+            WHERE id IN (
+                SELECT id FROM notifications_outbox
+                WHERE canal = ?
+                  AND ((statut = 'en_attente' AND prochaine_tentative <= CURRENT_TIMESTAMP)
+                       OR (statut = 'en_cours' AND bail_expire_at < CURRENT_TIMESTAMP))
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING *
+        """, (f'{int(bail):+d} seconds', canal, limit)).fetchall()
+        db.commit()
+        return sorted(messages, key=lambda m: m['id'])
+    except Exception:
+        db.rollback()
+        raise
+
+def mark_sent(db, message_ids):
+    """Marque des messages comme envoyés"""
+    db.executemany("""
+        UPDATE notifications_outbox
+        SET statut = 'envoye', sent_at = CURRENT_TIMESTAMP, bail_expire_at = NULL, derniere_erreur = NULL
+        WHERE id = ?
+    """, [(message_id,) for message_id in message_ids])
+
+def mark_failed(db, message, erreur, max_tentatives=DEFAULT_MAX_TENTATIVES, backoff=DEFAULT_BACKOFF):
+    """Reporte un échec d'envoi; retourne True si le message sera retenté
+
+    Le délai avant la tentative suivante double à chaque échec
+    (backoff, 2 × backoff, 4 × backoff...); après `max_tentatives` le
+    message passe en échec définitif.
+    """
+    if message['tentatives'] >= max_tentatives:
+        db.execute("""
+            UPDATE notifications_outbox
+            SET statut = 'echoue', derniere_erreur = ?, bail_expire_at = NULL
+            WHERE id = ?
+        """, (erreur, message['id']))
+        return False
+    delai = backoff * 2 ** (message['tentatives'] - 1)
+    db.execute("""
+        UPDATE notifications_outbox
+        SET statut = 'en_attente', derniere_erreur = ?, bail_expire_at = NULL,
+            prochaine_tentative = datetime('now', ?)
+        WHERE id = ?
+    """, (erreur, f'{int(delai):+d} seconds', message['id']))
+    return True
+
+def outbox_counts(db):
+    """Nombre de messages par canal et par statut"""
+    counts = {canal: {} for canal in CANAUX}
+    for row in db.execute("""
+        SELECT canal, statut, COUNT(*) as nombre FROM notifications_outbox GROUP BY canal, statut
+    """):
+        counts[row['canal']][row['statut']] = row['nombre']
+    return counts
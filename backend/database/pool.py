@@ -0,0 +1,318 @@
+"""
+Pool de connexions SQLite (mode WAL, PRAGMAs configurables)
+"""
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+# PRAGMAs appliqués à chaque nouvelle connexion
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # millisecondes
+    'cache_size': -16000,          # valeur négative = Kio (16 Mo)
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# PRAGMAs qui modifient le fichier: réservés aux connexions d'écriture
+WRITE_ONLY_PRAGMAS = ('journal_mode',)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_WRITER_POOL_SIZE = 1
+DEFAULT_POOL_TIMEOUT = 30.0
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+DEFAULT_LOCK_RETRIES = 3
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Aucune connexion disponible dans le délai imparti"""
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connexion SQLite appartenant à un pool
+
+    Réessaie les instructions qui échouent sur « database is locked » et
+    comptabilise ces nouvelles tentatives dans les statistiques du pool.
+    """
+    pool = None
+    owner_thread = None
+    read_only = False
+    profiler = None    # profil SQL de la requête HTTP qui emprunte la connexion
+
+    def execute(self, sql, parameters=(), /):
+        return self._profiled(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self._profiled(sql, super().executemany, sql, seq_of_parameters)
+
+    def commit(self):
+        return self._profiled('COMMIT', super().commit)
+
+    def _profiled(self, sql, func, *args):
+        profiler = self.profiler
+        if profiler is None:
+            return self._with_retry(func, *args)
+        start = time.perf_counter()
+        try:
+            return self._with_retry(func, *args)
+        finally:
+            profiler.record(sql, time.perf_counter() - start)
+
+    def _with_retry(self, func, *args):
+        retries = self.pool.lock_retries if self.pool else 0
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if attempt >= retries or not _is_lock_error(e):
+                    raise
+                attempt += 1
+                if self.pool:
+                    self.pool.record_lock_retry()
+                # Attente exponentielle courte (10 ms, 20 ms, 40 ms...)
+                time.sleep(0.01 * (2 ** (attempt - 1)))
+
+
+class ReadOnlyConnection(PooledConnection):
+    """Connexion en lecture seule (URI mode=ro + PRAGMA query_only)
+
+    Toute tentative d'écriture lève sqlite3.OperationalError.
+    """
+    read_only = True
+
+
+def _is_lock_error(error):
+    """Indique si l'erreur SQLite correspond à un verrouillage"""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def apply_pragmas(conn, pragmas):
+    """Applique une série de PRAGMAs à une connexion"""
+    for name, value in pragmas.items():
+        if not name.isidentifier():
+            raise ValueError(f"PRAGMA invalide: {name}")
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def open_connection(database, pragmas=None, cached_statements=DEFAULT_STATEMENT_CACHE_SIZE,
+                    factory=sqlite3.Connection, uri=False):
+    """Ouvre une connexion configurée (row_factory, PRAGMAs, cache d'instructions)"""
+    conn = sqlite3.connect(
+        database,
+        factory=factory,
+        cached_statements=cached_statements,
+        check_same_thread=False,
+        uri=uri,
+    )
+    conn.row_factory = sqlite3.Row
+    apply_pragmas(conn, DEFAULT_PRAGMAS if pragmas is None else pragmas)
+    return conn
+
+
+def supports_read_only(database):
+    """Indique si la base peut être ouverte par des connexions en lecture seule"""
+    return bool(database) and database != ':memory:' and 'mode=memory' not in database \
+        and not database.startswith('file:')
+
+
+def read_only_uri(database):
+    """Construit l'URI SQLite en lecture seule d'un fichier de base"""
+    return f"file:{quote(database)}?mode=ro"
+
+
+class ConnectionPool:
+    """Pool borné de connexions SQLite longue durée
+
+    Une connexion est empruntée pour la durée d'une requête puis rendue au
+    pool. Le pool rend de préférence à un thread la connexion qu'il
+    utilisait déjà, afin de conserver son cache d'instructions préparées.
+    Avec read_only=True, les connexions sont ouvertes en mode=ro avec
+    PRAGMA query_only et peuvent lire en parallèle de l'écrivain (WAL).
+    """
+
+    def __init__(self, database, max_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT,
+                 pragmas=None, cached_statements=DEFAULT_STATEMENT_CACHE_SIZE,
+                 lock_retries=DEFAULT_LOCK_RETRIES, uri=False, read_only=False):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self.lock_retries = lock_retries
+        self.uri = uri
+        self.read_only = read_only
+
+        if read_only:
+            for name in WRITE_ONLY_PRAGMAS:
+                self.pragmas.pop(name, None)
+            self.pragmas['query_only'] = 'ON'
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0,
+            'connections_created': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'timeouts': 0,
+            'lock_retries': 0,
+        }
+
+    def _connect(self):
+        if self.read_only and not self.uri:
+            database, uri = read_only_uri(self.database), True
+        else:
+            database, uri = self.database, self.uri
+        conn = open_connection(
+            database,
+            pragmas=self.pragmas,
+            cached_statements=self.cached_statements,
+            factory=ReadOnlyConnection if self.read_only else PooledConnection,
+            uri=uri,
+        )
+        conn.pool = self
+        return conn
+
+    def _take_idle(self, thread_id):
+        """Retire une connexion libre, de préférence celle du thread courant"""
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._idle[index].owner_thread == thread_id:
+                return self._idle.pop(index)
+        return self._idle.pop()
+
+    def acquire(self, timeout=None):
+        """Emprunte une connexion au pool (bloque si le pool est saturé)"""
+        timeout = self.timeout if timeout is None else timeout
+        thread_id = threading.get_ident()
+        start = time.perf_counter()
+        conn = None
+        create = False
+
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Le pool de connexions est fermé")
+            while True:
+                if self._idle:
+                    conn = self._take_idle(thread_id)
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                    break
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"Aucune connexion disponible après {timeout:.1f}s "
+                        f"(pool de {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+            waited_ms = (time.perf_counter() - start) * 1000
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total_ms'] += waited_ms
+            self._stats['wait_time_max_ms'] = max(self._stats['wait_time_max_ms'], waited_ms)
+
+        if create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['connections_created'] += 1
+
+        conn.owner_thread = thread_id
+        return conn
+
+    def release(self, conn):
+        """Rend une connexion au pool (annule toute transaction laissée ouverte)"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Connexion inutilisable: la fermer et libérer sa place
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def record_lock_retry(self):
+        with self._cond:
+            self._stats['lock_retries'] += 1
+
+    def stats(self):
+        """Statistiques du pool (emprunts, attente, réessais sur verrouillage)"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'database': self.database,
+                'read_only': self.read_only,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+            })
+        checkouts = stats['checkouts']
+        stats['wait_time_avg_ms'] = stats['wait_time_total_ms'] / checkouts if checkouts else 0.0
+        for key in ('wait_time_total_ms', 'wait_time_max_ms', 'wait_time_avg_ms'):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+    def close(self):
+        """Ferme toutes les connexions libres; les autres seront fermées à leur retour"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+
+def create_pool(config, read_only=False):
+    """Crée un pool à partir de la configuration Flask
+
+    Le pool d'écriture est limité à DB_WRITER_POOL_SIZE connexions (une
+    seule par défaut: les écritures sont sérialisées), le pool de lecture
+    à DB_POOL_SIZE.
+    """
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(config.get('SQLITE_PRAGMAS') or {})
+    if read_only:
+        max_size = config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE)
+    else:
+        max_size = config.get('DB_WRITER_POOL_SIZE', DEFAULT_WRITER_POOL_SIZE)
+    return ConnectionPool(
+        config['DATABASE'],
+        max_size=max_size,
+        read_only=read_only,
+        timeout=config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        pragmas=pragmas,
+        cached_statements=config.get('DB_STATEMENT_CACHE_SIZE', DEFAULT_STATEMENT_CACHE_SIZE),
+        lock_retries=config.get('DB_LOCK_RETRIES', DEFAULT_LOCK_RETRIES),
+    )
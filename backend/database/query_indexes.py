@@ -0,0 +1,36 @@
+"""
+Index composites des requêtes fréquentes des blueprints
+
+Les index de database/schema_indexes.sql sont issus du conseiller d'index
+(scripts/index_advisor.py). L'installation est idempotente; un index dont
+la table n'existe pas dans la base est ignoré.
+"""
+import logging
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema_indexes.sql"
+
+def install_query_indexes(db):
+    """Crée les index composites (migration idempotente)"""
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        statements = [s.strip() for s in f.read().split(';')]
+    for statement in statements:
+        lignes = [l for l in statement.splitlines() if not l.strip().startswith('--')]
+        if not ''.join(lignes).strip():
+            continue
+        try:
+            db.execute(statement)
+        except sqlite3.OperationalError as e:
+            logger.debug("Index ignoré: %s", e)
+    db.commit()
+
+def init_query_indexes(app):
+    """Installe les index composites au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            install_query_indexes(db)
@@ -0,0 +1,43 @@
+-- Compteurs de messages non lus du chat temps réel
+-- Un compteur par (utilisateur, conversation), incrémenté par trigger à
+-- chaque message reçu d'un autre participant et remis à zéro quand le
+-- participant marque la conversation comme lue (date_derniere_lecture).
+-- La boîte de réception et le badge lisent ces compteurs au lieu de
+-- compter les messages. Reconstruction complète:
+-- database.chat_unread.rebuild_chat_unread
+
+CREATE TABLE IF NOT EXISTS chat_non_lus (
+    user_id INTEGER NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    nombre INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, conversation_id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Conversations d'un utilisateur (boîte de réception)
+CREATE INDEX IF NOT EXISTS idx_participants_conversations_user ON participants_conversations(user_id);
+
+-- ========== MESSAGES ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_non_lus_message AFTER INSERT ON messages_chat
+BEGIN
+    INSERT INTO chat_non_lus (user_id, conversation_id, nombre)
+    SELECT user_id, NEW.conversation_id, 1 FROM participants_conversations
+    WHERE conversation_id = NEW.conversation_id AND user_id != NEW.expediteur_id
+    ON CONFLICT (user_id, conversation_id) DO UPDATE SET nombre = nombre + 1;
+END;
+
+-- ========== PARTICIPANTS ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_non_lus_lecture
+AFTER UPDATE OF date_derniere_lecture ON participants_conversations
+BEGIN
+    UPDATE chat_non_lus SET nombre = 0
+    WHERE user_id = NEW.user_id AND conversation_id = NEW.conversation_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_chat_non_lus_depart AFTER DELETE ON participants_conversations
+BEGIN
+    DELETE FROM chat_non_lus WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id;
+END;
@@ -0,0 +1,56 @@
+-- Cache des documents générés (bulletins, reçus, listes PDF)
+-- Un document est identifié par l'empreinte de ses données d'entrée; son
+-- entrée disparaît dès que les moyennes ou le paiement dont il dépend
+-- changent. Les fichiers sans entrée sont supprimés par
+-- utils.document_cache.DocumentCache.evict.
+
+CREATE TABLE IF NOT EXISTS documents_cache (
+    cle CHAR(64) PRIMARY KEY,               -- SHA-256 des données d'entrée
+    type VARCHAR(50) NOT NULL,
+    etudiant_id INTEGER,
+    paiement_id INTEGER,
+    taille INTEGER NOT NULL DEFAULT 0,      -- en bytes
+    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_acces TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_documents_cache_etudiant ON documents_cache(etudiant_id);
+CREATE INDEX IF NOT EXISTS idx_documents_cache_paiement ON documents_cache(paiement_id);
+CREATE INDEX IF NOT EXISTS idx_documents_cache_acces ON documents_cache(date_acces);
+
+-- ========== MOYENNES (bulletins) ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_moyennes_insert AFTER INSERT ON moyennes
+BEGIN
+    DELETE FROM documents_cache WHERE type = 'bulletin' AND etudiant_id = NEW.etudiant_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_moyennes_update AFTER UPDATE ON moyennes
+BEGIN
+    DELETE FROM documents_cache WHERE type = 'bulletin' AND etudiant_id IN (OLD.etudiant_id, NEW.etudiant_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_moyennes_delete AFTER DELETE ON moyennes
+BEGIN
+    DELETE FROM documents_cache WHERE type = 'bulletin' AND etudiant_id = OLD.etudiant_id;
+END;
+
+-- ========== PAIEMENTS (reçus) ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_paiements_update AFTER UPDATE ON paiements
+BEGIN
+    DELETE FROM documents_cache WHERE type = 'recu' AND paiement_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_paiements_delete AFTER DELETE ON paiements
+BEGIN
+    DELETE FROM documents_cache WHERE type = 'recu' AND paiement_id = OLD.id;
+END;
+
+-- ========== IDENTITÉ (nom affiché sur les documents) ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_documents_users_update AFTER UPDATE OF nom, prenom ON users
+BEGIN
+    DELETE FROM documents_cache
+    WHERE etudiant_id IN (SELECT id FROM etudiants WHERE user_id = NEW.id);
+END;
@@ -0,0 +1,24 @@
+-- Moteur de calcul des moyennes et classements
+-- Sommes pondérées courantes des notes validées: la moyenne d'une matière
+-- se met à jour en O(1) à chaque note, sans relire les notes existantes.
+
+CREATE TABLE IF NOT EXISTS notes_agregats (
+    etudiant_id INTEGER NOT NULL,
+    matiere_id INTEGER NOT NULL,
+    classe_id INTEGER NOT NULL,
+    periode VARCHAR(20) NOT NULL DEFAULT 'annuel',
+    somme_points REAL NOT NULL DEFAULT 0,         -- Σ note × coefficient
+    somme_coefficients REAL NOT NULL DEFAULT 0,   -- Σ coefficient
+    nombre_notes INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (etudiant_id, matiere_id, classe_id, periode),
+    FOREIGN KEY (etudiant_id) REFERENCES etudiants(id),
+    FOREIGN KEY (matiere_id) REFERENCES matieres(id),
+    FOREIGN KEY (classe_id) REFERENCES classes(id)
+);
+
+-- Clés d'unicité nécessaires aux UPSERT des moyennes et classements
+CREATE UNIQUE INDEX IF NOT EXISTS idx_moyennes_unique
+    ON moyennes(etudiant_id, matiere_id, classe_id, periode);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_classements_unique
+    ON classements(etudiant_id, classe_id, periode);
@@ -0,0 +1,56 @@
+-- Index composites des requêtes des blueprints (database/query_indexes.py)
+-- Issus de scripts/index_advisor.py: EXPLAIN QUERY PLAN de chaque requête
+-- littérale de backend/blueprints, parcours complets (SCAN) et tris
+-- temporaires (USE TEMP B-TREE) signalés, index proposé = égalités, puis
+-- jointures, puis intervalle, puis tri. Seuls les index des tables qui
+-- grossissent avec les effectifs ou l'activité sont retenus; les tables de
+-- référence (filières, niveaux, types de frais, ...) restent lues en entier.
+-- Les propositions déjà servies par un index existant sans gain mesuré
+-- (notes validées d'un étudiant, classement annuel, paiements d'un
+-- étudiant par type de frais: quelques lignes par étudiant) sont écartées;
+-- paiements(statut, date_paiement) et absences(etudiant_id, date_absence)
+-- existent déjà (schema_pagination.sql).
+--
+-- Mesures (python scripts/index_advisor.py --benchmark 5000: 5000 étudiants,
+-- 150 000 notes, 200 000 connexions; ms par requête, avant -> après):
+--   note existante (enseignant.py)                       0.019 ->  0.008
+--   moyenne par matière (dashboards.py)                  5.421 ->  1.141
+--   emprunt en cours d'un exemplaire (bibliotheque.py)   1.216 ->  0.008
+--   journal de la dernière heure (utils/anomaly.py)     16.198 ->  1.317
+--   échecs de connexion récents (security)               8.057 ->  0.008
+-- Requêtes des blueprints avec parcours complet: 72 -> 61 (surtout des
+-- tables de référence et des listes sans filtre).
+
+-- ========== NOTES ==========
+-- enseignant.py: saisie et import (doublons par étudiant, matière, classe)
+CREATE INDEX IF NOT EXISTS idx_notes_etudiant_matiere_classe ON notes(etudiant_id, matiere_id, classe_id);
+-- dashboards.py, exports.py, ai_analytics.py: agrégats par matière
+CREATE INDEX IF NOT EXISTS idx_notes_matiere_valide ON notes(matiere_id, is_valide, note);
+
+-- ========== ENSEIGNEMENT ==========
+-- enseignant.py: classes et matières d'un enseignant
+CREATE INDEX IF NOT EXISTS idx_classe_matieres_enseignant ON classe_matieres(enseignant_id, classe_id, matiere_id);
+CREATE INDEX IF NOT EXISTS idx_classe_matieres_classe_matiere ON classe_matieres(classe_id, matiere_id, enseignant_id);
+-- etudiant.py: emploi du temps d'une classe
+CREATE INDEX IF NOT EXISTS idx_emplois_temps_classe ON emplois_temps(classe_id, matiere_id, enseignant_id);
+-- auth.py: réinitialisation du mot de passe
+CREATE INDEX IF NOT EXISTS idx_users_reset_token ON users(reset_token);
+
+-- ========== MODULES ÉTENDUS ==========
+-- bibliotheque.py: emprunt en cours d'un exemplaire
+CREATE INDEX IF NOT EXISTS idx_emprunts_exemplaire_statut ON emprunts(exemplaire_id, statut);
+CREATE INDEX IF NOT EXISTS idx_reservations_bibliotheque_ouvrage ON reservations_bibliotheque(ouvrage_id, statut);
+-- commun.py, chat_realtime.py: messages envoyés
+CREATE INDEX IF NOT EXISTS idx_messages_expediteur ON messages(expediteur_id, destinataire_id);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_expediteur ON messages_chat(expediteur_id);
+-- elearning.py: tentatives d'un étudiant à un quiz
+CREATE INDEX IF NOT EXISTS idx_tentatives_quiz_etudiant ON tentatives_quiz(quiz_id, etudiant_id);
+-- infrastructure.py: réservations d'une salle
+CREATE INDEX IF NOT EXISTS idx_reservations_salles_salle ON reservations_salles(salle_id, reserve_par);
+
+-- ========== JOURNAUX ==========
+-- Hors blueprints: rechargement des fenêtres de détection au démarrage
+-- (utils/anomaly.py) et historique d'un utilisateur (utils/security_improvements.py)
+CREATE INDEX IF NOT EXISTS idx_logs_connexion_date ON logs_connexion(created_at);
+CREATE INDEX IF NOT EXISTS idx_logs_connexion_user ON logs_connexion(user_id, statut, created_at);
+CREATE INDEX IF NOT EXISTS idx_logs_actions_date ON logs_actions(created_at);
@@ -0,0 +1,48 @@
+-- File de travaux en arrière-plan (bulletins, reçus, exports PDF)
+-- Les travaux sont réclamés par les workers de façon atomique
+-- (UPDATE ... RETURNING); un travail dont le bail expire est repris.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type VARCHAR(50) NOT NULL,              -- bulletin, recu, liste_etudiants, bulletins_classe
+    user_id INTEGER NOT NULL,
+    parametres TEXT,                        -- JSON
+    statut VARCHAR(20) NOT NULL DEFAULT 'en_attente', -- en_attente, en_cours, termine, echoue, annule
+    fichier_path VARCHAR(255),
+    download_name VARCHAR(255),
+    erreur TEXT,
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    progression INTEGER NOT NULL DEFAULT 0, -- documents produits (lots)
+    total INTEGER,                          -- documents à produire (lots)
+    historique_export_id INTEGER,
+    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_debut TIMESTAMP,
+    date_fin TIMESTAMP,
+    duree_ms INTEGER,
+    bail_expire_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    FOREIGN KEY (historique_export_id) REFERENCES historique_exports(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_statut ON jobs(statut, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, id);
+
+-- Historique des exports (défini aussi dans schema_top10.sql), avec le cycle de vie des travaux
+CREATE TABLE IF NOT EXISTS historique_exports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    template_id INTEGER,
+    type_export VARCHAR(50),
+    fichier_path VARCHAR(255),
+    parametres TEXT, -- JSON
+    nombre_lignes INTEGER,
+    taille_fichier INTEGER, -- en bytes
+    date_export TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    job_id INTEGER,
+    statut VARCHAR(20),
+    date_debut TIMESTAMP,
+    date_fin TIMESTAMP,
+    duree_ms INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    FOREIGN KEY (template_id) REFERENCES templates_export(id)
+);
@@ -0,0 +1,28 @@
+-- Boîte d'envoi des notifications externes (email, SMS, push)
+-- Les notifications sont déposées dans la même transaction que leur
+-- notification interne, puis envoyées par les workers de chaque canal
+-- (utils/notifications_service.py). Un envoi en échec est retenté avec un
+-- délai croissant; un message réclamé dont le bail expire est repris.
+
+CREATE TABLE IF NOT EXISTS notifications_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    canal VARCHAR(10) NOT NULL CHECK(canal IN ('email', 'sms', 'push')),
+    user_id INTEGER,
+    destinataire VARCHAR(255),              -- email ou téléphone (NULL pour push)
+    sujet VARCHAR(200),
+    contenu TEXT NOT NULL,
+    data TEXT,                              -- JSON (push)
+    statut VARCHAR(20) NOT NULL DEFAULT 'en_attente', -- en_attente, en_cours, envoye, echoue
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    prochaine_tentative TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    bail_expire_at TIMESTAMP,
+    derniere_erreur TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_canal_statut ON notifications_outbox(canal, statut, prochaine_tentative);
+
+-- Parents d'un étudiant (destinataires d'une notification en une jointure)
+CREATE INDEX IF NOT EXISTS idx_parent_etudiants_etudiant ON parent_etudiants(etudiant_id);
@@ -0,0 +1,60 @@
+-- Index des tris des routes de liste paginées (utils/pagination.py)
+-- et renseignement des clés de tri NULL
+-- Chaque index couvre le filtre usuel de la route suivi de sa clé de tri
+-- (l'identifiant, dernière clé, est implicite): une page est lue par une
+-- recherche dans l'index, quelle que soit sa position dans la liste.
+-- Les index des tables absentes d'une base sont ignorés à l'installation.
+
+-- ========== CLÉS DE TRI ==========
+-- Une clé de tri NULL rendrait son curseur illisible et ses lignes invisibles
+-- aux pages suivantes: les anciennes lignes sans date prennent celle de leur
+-- création (les écritures renseignent désormais toujours la date).
+UPDATE paiements SET date_paiement = COALESCE(date(created_at), date('now')) WHERE date_paiement IS NULL;
+UPDATE notes SET date_note = COALESCE(date(created_at), date('now')) WHERE date_note IS NULL;
+UPDATE emprunts SET date_emprunt = COALESCE(date(created_at), date('now')) WHERE date_emprunt IS NULL;
+UPDATE paiements_bourses SET date_paiement = COALESCE(date(created_at), date('now')) WHERE date_paiement IS NULL;
+UPDATE bourses SET date_attribution = COALESCE(date(created_at), date('now')) WHERE date_attribution IS NULL;
+UPDATE offres_stage SET date_publication = COALESCE(date(created_at), date('now')) WHERE date_publication IS NULL;
+UPDATE candidatures SET date_candidature = COALESCE(date(created_at), date('now')) WHERE date_candidature IS NULL;
+UPDATE annonces SET is_urgent = 0 WHERE is_urgent IS NULL;
+UPDATE annonces SET date_publication = datetime('now') WHERE date_publication IS NULL;
+UPDATE cours_online SET date_creation = date('now') WHERE date_creation IS NULL;
+UPDATE transactions_mobile_money SET date_transaction = datetime('now') WHERE date_transaction IS NULL;
+UPDATE instances_workflow SET date_debut = datetime('now') WHERE date_debut IS NULL;
+UPDATE decisions_academiques SET created_at = datetime('now') WHERE created_at IS NULL;
+UPDATE notifications SET created_at = datetime('now') WHERE created_at IS NULL;
+UPDATE messages SET created_at = datetime('now') WHERE created_at IS NULL;
+UPDATE historique_exports SET date_export = datetime('now') WHERE date_export IS NULL;
+
+-- ========== SCOLARITÉ ==========
+CREATE INDEX IF NOT EXISTS idx_paiements_date ON paiements(date_paiement);
+CREATE INDEX IF NOT EXISTS idx_paiements_etudiant_date ON paiements(etudiant_id, date_paiement);
+CREATE INDEX IF NOT EXISTS idx_paiements_statut_date ON paiements(statut, date_paiement);
+CREATE INDEX IF NOT EXISTS idx_notes_etudiant_date ON notes(etudiant_id, date_note);
+CREATE INDEX IF NOT EXISTS idx_absences_etudiant_date ON absences(etudiant_id, date_absence);
+CREATE INDEX IF NOT EXISTS idx_decisions_etudiant_date ON decisions_academiques(etudiant_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_date ON notifications(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_destinataire_date ON messages(destinataire_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_annonces_publication ON annonces(is_urgent, date_publication);
+
+-- ========== MODULES ÉTENDUS ==========
+CREATE INDEX IF NOT EXISTS idx_candidatures_date ON candidatures(date_candidature);
+CREATE INDEX IF NOT EXISTS idx_bourses_attribution ON bourses(date_attribution);
+CREATE INDEX IF NOT EXISTS idx_bourses_etudiant_attribution ON bourses(etudiant_id, date_attribution);
+CREATE INDEX IF NOT EXISTS idx_paiements_bourses_bourse_date ON paiements_bourses(bourse_id, date_paiement);
+CREATE INDEX IF NOT EXISTS idx_reservations_salles_date ON reservations_salles(date_reservation, heure_debut);
+CREATE INDEX IF NOT EXISTS idx_maintenances_date ON maintenances(date_intervention);
+CREATE INDEX IF NOT EXISTS idx_ouvrages_titre ON ouvrages(titre);
+CREATE INDEX IF NOT EXISTS idx_emprunts_date ON emprunts(date_emprunt);
+CREATE INDEX IF NOT EXISTS idx_emprunts_emprunteur_date ON emprunts(emprunteur_id, date_emprunt);
+CREATE INDEX IF NOT EXISTS idx_offres_stage_publication ON offres_stage(date_publication);
+CREATE INDEX IF NOT EXISTS idx_conventions_stage_debut ON conventions_stage(date_debut);
+
+-- ========== TOP 10 ==========
+CREATE INDEX IF NOT EXISTS idx_cours_online_creation ON cours_online(date_creation);
+CREATE INDEX IF NOT EXISTS idx_transactions_mm_date ON transactions_mobile_money(date_transaction);
+CREATE INDEX IF NOT EXISTS idx_transactions_mm_etudiant ON transactions_mobile_money(etudiant_id, date_transaction);
+CREATE INDEX IF NOT EXISTS idx_instances_workflow_debut ON instances_workflow(date_debut);
+CREATE INDEX IF NOT EXISTS idx_historique_exports_user ON historique_exports(user_id, date_export);
+-- Historique et rattrapage du chat par identifiant (l'id est implicite)
+CREATE INDEX IF NOT EXISTS idx_messages_chat_conversation ON messages_chat(conversation_id);
@@ -0,0 +1,124 @@
+-- Index de recherche plein texte (FTS5)
+-- Tables virtuelles à contenu externe: le texte reste dans la table source,
+-- l'index est tenu à jour par triggers dans la même transaction que
+-- l'écriture. Tokenisation insensible aux accents et à la casse
+-- (« Élève » = « eleve »), index des préfixes de 2 et 3 caractères pour
+-- la recherche à la saisie. Reconstruction complète:
+-- database.search_index.rebuild_search_index
+
+-- ========== OUVRAGES (bibliothèque) ==========
+
+CREATE VIRTUAL TABLE IF NOT EXISTS recherche_ouvrages USING fts5(
+    titre, auteur, isbn, editeur, description,
+    content='ouvrages', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_ouvrages_insert AFTER INSERT ON ouvrages
+BEGIN
+    INSERT INTO recherche_ouvrages (rowid, titre, auteur, isbn, editeur, description)
+    VALUES (NEW.id, NEW.titre, NEW.auteur, NEW.isbn, NEW.editeur, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_ouvrages_delete AFTER DELETE ON ouvrages
+BEGIN
+    INSERT INTO recherche_ouvrages (recherche_ouvrages, rowid, titre, auteur, isbn, editeur, description)
+    VALUES ('delete', OLD.id, OLD.titre, OLD.auteur, OLD.isbn, OLD.editeur, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_ouvrages_update
+AFTER UPDATE OF titre, auteur, isbn, editeur, description ON ouvrages
+BEGIN
+    INSERT INTO recherche_ouvrages (recherche_ouvrages, rowid, titre, auteur, isbn, editeur, description)
+    VALUES ('delete', OLD.id, OLD.titre, OLD.auteur, OLD.isbn, OLD.editeur, OLD.description);
+    INSERT INTO recherche_ouvrages (rowid, titre, auteur, isbn, editeur, description)
+    VALUES (NEW.id, NEW.titre, NEW.auteur, NEW.isbn, NEW.editeur, NEW.description);
+END;
+
+-- ========== UTILISATEURS (messagerie) ==========
+
+CREATE VIRTUAL TABLE IF NOT EXISTS recherche_users USING fts5(
+    nom, prenom, username, email,
+    content='users', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_users_insert AFTER INSERT ON users
+BEGIN
+    INSERT INTO recherche_users (rowid, nom, prenom, username, email)
+    VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.username, NEW.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_users_delete AFTER DELETE ON users
+BEGIN
+    INSERT INTO recherche_users (recherche_users, rowid, nom, prenom, username, email)
+    VALUES ('delete', OLD.id, OLD.nom, OLD.prenom, OLD.username, OLD.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_users_update
+AFTER UPDATE OF nom, prenom, username, email ON users
+BEGIN
+    INSERT INTO recherche_users (recherche_users, rowid, nom, prenom, username, email)
+    VALUES ('delete', OLD.id, OLD.nom, OLD.prenom, OLD.username, OLD.email);
+    INSERT INTO recherche_users (rowid, nom, prenom, username, email)
+    VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.username, NEW.email);
+END;
+
+-- ========== BASE DE CONNAISSANCES (chatbot) ==========
+
+CREATE VIRTUAL TABLE IF NOT EXISTS recherche_connaissances USING fts5(
+    question, reponse, categorie, tags,
+    content='base_connaissances', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_connaissances_insert AFTER INSERT ON base_connaissances
+BEGIN
+    INSERT INTO recherche_connaissances (rowid, question, reponse, categorie, tags)
+    VALUES (NEW.id, NEW.question, NEW.reponse, NEW.categorie, NEW.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_connaissances_delete AFTER DELETE ON base_connaissances
+BEGIN
+    INSERT INTO recherche_connaissances (recherche_connaissances, rowid, question, reponse, categorie, tags)
+    VALUES ('delete', OLD.id, OLD.question, OLD.reponse, OLD.categorie, OLD.tags);
+END;
+
+-- Pas de mise à jour de l'index sur nombre_utilisations / score_utilite
+CREATE TRIGGER IF NOT EXISTS trg_recherche_connaissances_update
+AFTER UPDATE OF question, reponse, categorie, tags ON base_connaissances
+BEGIN
+    INSERT INTO recherche_connaissances (recherche_connaissances, rowid, question, reponse, categorie, tags)
+    VALUES ('delete', OLD.id, OLD.question, OLD.reponse, OLD.categorie, OLD.tags);
+    INSERT INTO recherche_connaissances (rowid, question, reponse, categorie, tags)
+    VALUES (NEW.id, NEW.question, NEW.reponse, NEW.categorie, NEW.tags);
+END;
+
+-- ========== COURS EN LIGNE (e-learning) ==========
+
+CREATE VIRTUAL TABLE IF NOT EXISTS recherche_cours USING fts5(
+    titre, code, description,
+    content='cours_online', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_cours_insert AFTER INSERT ON cours_online
+BEGIN
+    INSERT INTO recherche_cours (rowid, titre, code, description)
+    VALUES (NEW.id, NEW.titre, NEW.code, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_cours_delete AFTER DELETE ON cours_online
+BEGIN
+    INSERT INTO recherche_cours (recherche_cours, rowid, titre, code, description)
+    VALUES ('delete', OLD.id, OLD.titre, OLD.code, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recherche_cours_update
+AFTER UPDATE OF titre, code, description ON cours_online
+BEGIN
+    INSERT INTO recherche_cours (recherche_cours, rowid, titre, code, description)
+    VALUES ('delete', OLD.id, OLD.titre, OLD.code, OLD.description);
+    INSERT INTO recherche_cours (rowid, titre, code, description)
+    VALUES (NEW.id, NEW.titre, NEW.code, NEW.description);
+END;
@@ -0,0 +1,260 @@
+-- Instantané des statistiques (tableaux de bord admin et analytics)
+-- Tables de synthèse maintenues par triggers à chaque écriture sur
+-- etudiants, enseignants, classes, moyennes, paiements et absences.
+-- Reconstruction complète: database.stats_snapshot.rebuild_stats_snapshot
+
+-- Compteurs globaux (etudiants_actifs, enseignants_actifs, classes_actives,
+-- moyennes_annuelles, moyennes_annuelles_reussies)
+CREATE TABLE IF NOT EXISTS stats_compteurs (
+    cle VARCHAR(50) PRIMARY KEY,
+    valeur REAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indicateurs mensuels (revenus, inscriptions, absences) au format 'AAAA-MM'
+CREATE TABLE IF NOT EXISTS stats_mensuelles (
+    indicateur VARCHAR(30) NOT NULL,
+    mois CHAR(7) NOT NULL,
+    valeur REAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (indicateur, mois)
+);
+
+-- Étudiants actifs par filière
+CREATE TABLE IF NOT EXISTS stats_filieres (
+    filiere_id INTEGER PRIMARY KEY,
+    nombre_etudiants INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (filiere_id) REFERENCES filieres(id)
+);
+
+-- Moyenne générale annuelle par étudiant (classement)
+CREATE TABLE IF NOT EXISTS stats_etudiants (
+    etudiant_id INTEGER PRIMARY KEY,
+    somme_moyennes REAL NOT NULL DEFAULT 0,
+    nombre_moyennes INTEGER NOT NULL DEFAULT 0,
+    moyenne_generale REAL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (etudiant_id) REFERENCES etudiants(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stats_etudiants_moyenne ON stats_etudiants(moyenne_generale DESC);
+
+-- ========== ÉTUDIANTS ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_etudiants_insert AFTER INSERT ON etudiants
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur) VALUES ('etudiants_actifs', IFNULL(NEW.is_active, 0) = 1)
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+
+    INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+    SELECT 'inscriptions', strftime('%Y-%m', NEW.date_inscription), 1
+    WHERE strftime('%Y-%m', NEW.date_inscription) IS NOT NULL
+    ON CONFLICT(indicateur, mois) DO UPDATE SET valeur = valeur + 1, updated_at = CURRENT_TIMESTAMP;
+
+    INSERT INTO stats_filieres (filiere_id, nombre_etudiants)
+    SELECT filiere_id, 1 FROM classes WHERE id = NEW.classe_id AND IFNULL(NEW.is_active, 0) = 1
+    ON CONFLICT(filiere_id) DO UPDATE SET nombre_etudiants = nombre_etudiants + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_etudiants_delete AFTER DELETE ON etudiants
+BEGIN
+    UPDATE stats_compteurs SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'etudiants_actifs' AND IFNULL(OLD.is_active, 0) = 1;
+
+    UPDATE stats_mensuelles SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE indicateur = 'inscriptions' AND mois = strftime('%Y-%m', OLD.date_inscription);
+
+    UPDATE stats_filieres SET nombre_etudiants = nombre_etudiants - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE filiere_id = (SELECT filiere_id FROM classes WHERE id = OLD.classe_id)
+      AND IFNULL(OLD.is_active, 0) = 1;
+
+    DELETE FROM stats_etudiants WHERE etudiant_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_etudiants_update
+AFTER UPDATE OF is_active, classe_id, date_inscription ON etudiants
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur)
+    VALUES ('etudiants_actifs', (IFNULL(NEW.is_active, 0) = 1) - (IFNULL(OLD.is_active, 0) = 1))
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+
+    UPDATE stats_mensuelles SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE indicateur = 'inscriptions' AND mois = strftime('%Y-%m', OLD.date_inscription);
+    INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+    SELECT 'inscriptions', strftime('%Y-%m', NEW.date_inscription), 1
+    WHERE strftime('%Y-%m', NEW.date_inscription) IS NOT NULL
+    ON CONFLICT(indicateur, mois) DO UPDATE SET valeur = valeur + 1, updated_at = CURRENT_TIMESTAMP;
+
+    UPDATE stats_filieres SET nombre_etudiants = nombre_etudiants - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE filiere_id = (SELECT filiere_id FROM classes WHERE id = OLD.classe_id)
+      AND IFNULL(OLD.is_active, 0) = 1;
+    INSERT INTO stats_filieres (filiere_id, nombre_etudiants)
+    SELECT filiere_id, 1 FROM classes WHERE id = NEW.classe_id AND IFNULL(NEW.is_active, 0) = 1
+    ON CONFLICT(filiere_id) DO UPDATE SET nombre_etudiants = nombre_etudiants + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- ========== ENSEIGNANTS ET CLASSES ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_enseignants_insert AFTER INSERT ON enseignants
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur) VALUES ('enseignants_actifs', IFNULL(NEW.is_active, 0) = 1)
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_enseignants_delete AFTER DELETE ON enseignants
+BEGIN
+    UPDATE stats_compteurs SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'enseignants_actifs' AND IFNULL(OLD.is_active, 0) = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_enseignants_update AFTER UPDATE OF is_active ON enseignants
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur)
+    VALUES ('enseignants_actifs', (IFNULL(NEW.is_active, 0) = 1) - (IFNULL(OLD.is_active, 0) = 1))
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_classes_insert AFTER INSERT ON classes
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur) VALUES ('classes_actives', IFNULL(NEW.is_active, 0) = 1)
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_classes_delete AFTER DELETE ON classes
+BEGIN
+    UPDATE stats_compteurs SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'classes_actives' AND IFNULL(OLD.is_active, 0) = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_classes_update AFTER UPDATE OF is_active ON classes
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur)
+    VALUES ('classes_actives', (IFNULL(NEW.is_active, 0) = 1) - (IFNULL(OLD.is_active, 0) = 1))
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- Changement de filière d'une classe: déplacer ses étudiants actifs
+CREATE TRIGGER IF NOT EXISTS trg_stats_classes_filiere AFTER UPDATE OF filiere_id ON classes
+WHEN OLD.filiere_id IS NOT NEW.filiere_id
+BEGIN
+    UPDATE stats_filieres
+    SET nombre_etudiants = nombre_etudiants
+        - (SELECT COUNT(*) FROM etudiants WHERE classe_id = NEW.id AND is_active = 1),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE filiere_id = OLD.filiere_id;
+    INSERT INTO stats_filieres (filiere_id, nombre_etudiants)
+    VALUES (NEW.filiere_id, (SELECT COUNT(*) FROM etudiants WHERE classe_id = NEW.id AND is_active = 1))
+    ON CONFLICT(filiere_id) DO UPDATE SET nombre_etudiants = nombre_etudiants + excluded.nombre_etudiants,
+                                          updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- ========== MOYENNES ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_moyennes_insert AFTER INSERT ON moyennes
+WHEN NEW.periode = 'annuel'
+BEGIN
+    INSERT INTO stats_compteurs (cle, valeur) VALUES ('moyennes_annuelles', 1)
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + 1, updated_at = CURRENT_TIMESTAMP;
+    INSERT INTO stats_compteurs (cle, valeur) VALUES ('moyennes_annuelles_reussies', NEW.moyenne >= 10)
+    ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+
+    INSERT INTO stats_etudiants (etudiant_id, somme_moyennes, nombre_moyennes, moyenne_generale)
+    VALUES (NEW.etudiant_id, NEW.moyenne, 1, NEW.moyenne)
+    ON CONFLICT(etudiant_id) DO UPDATE SET
+        somme_moyennes = somme_moyennes + excluded.somme_moyennes,
+        nombre_moyennes = nombre_moyennes + 1,
+        moyenne_generale = (somme_moyennes + excluded.somme_moyennes) / (nombre_moyennes + 1),
+        updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_moyennes_delete AFTER DELETE ON moyennes
+WHEN OLD.periode = 'annuel'
+BEGIN
+    UPDATE stats_compteurs SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'moyennes_annuelles';
+    UPDATE stats_compteurs SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'moyennes_annuelles_reussies' AND OLD.moyenne >= 10;
+
+    UPDATE stats_etudiants SET
+        somme_moyennes = somme_moyennes - OLD.moyenne,
+        nombre_moyennes = nombre_moyennes - 1,
+        moyenne_generale = (somme_moyennes - OLD.moyenne) / NULLIF(nombre_moyennes - 1, 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE etudiant_id = OLD.etudiant_id;
+END;
+
+-- Mise à jour = retrait de l'ancienne valeur puis ajout de la nouvelle
+CREATE TRIGGER IF NOT EXISTS trg_stats_moyennes_update
+AFTER UPDATE OF moyenne, periode, etudiant_id ON moyennes
+BEGIN
+    UPDATE stats_compteurs SET
+        valeur = valeur + (NEW.periode = 'annuel') - (OLD.periode = 'annuel'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'moyennes_annuelles';
+    UPDATE stats_compteurs SET
+        valeur = valeur + (NEW.periode = 'annuel' AND NEW.moyenne >= 10)
+                        - (OLD.periode = 'annuel' AND OLD.moyenne >= 10),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE cle = 'moyennes_annuelles_reussies';
+
+    UPDATE stats_etudiants SET
+        somme_moyennes = somme_moyennes - OLD.moyenne,
+        nombre_moyennes = nombre_moyennes - 1,
+        moyenne_generale = (somme_moyennes - OLD.moyenne) / NULLIF(nombre_moyennes - 1, 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE etudiant_id = OLD.etudiant_id AND OLD.periode = 'annuel';
+    INSERT INTO stats_etudiants (etudiant_id, somme_moyennes, nombre_moyennes, moyenne_generale)
+    SELECT NEW.etudiant_id, NEW.moyenne, 1, NEW.moyenne WHERE NEW.periode = 'annuel'
+    ON CONFLICT(etudiant_id) DO UPDATE SET
+        somme_moyennes = somme_moyennes + excluded.somme_moyennes,
+        nombre_moyennes = nombre_moyennes + 1,
+        moyenne_generale = (somme_moyennes + excluded.somme_moyennes) / (nombre_moyennes + 1),
+        updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- ========== PAIEMENTS (revenus: paiements validés) ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_paiements_insert AFTER INSERT ON paiements
+WHEN NEW.statut = 'valide'
+BEGIN
+    INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+    SELECT 'revenus', strftime('%Y-%m', NEW.date_paiement), NEW.montant
+    WHERE strftime('%Y-%m', NEW.date_paiement) IS NOT NULL
+    ON CONFLICT(indicateur, mois) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_paiements_delete AFTER DELETE ON paiements
+WHEN OLD.statut = 'valide'
+BEGIN
+    UPDATE stats_mensuelles SET valeur = valeur - OLD.montant, updated_at = CURRENT_TIMESTAMP
+    WHERE indicateur = 'revenus' AND mois = strftime('%Y-%m', OLD.date_paiement);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_paiements_update
+AFTER UPDATE OF statut, montant, date_paiement ON paiements
+WHEN OLD.statut = 'valide' OR NEW.statut = 'valide'
+BEGIN
+    UPDATE stats_mensuelles SET valeur = valeur - OLD.montant, updated_at = CURRENT_TIMESTAMP
+    WHERE indicateur = 'revenus' AND mois = strftime('%Y-%m', OLD.date_paiement) AND OLD.statut = 'valide';
+    INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+    SELECT 'revenus', strftime('%Y-%m', NEW.date_paiement), NEW.montant
+    WHERE NEW.statut = 'valide' AND strftime('%Y-%m', NEW.date_paiement) IS NOT NULL
+    ON CONFLICT(indicateur, mois) DO UPDATE SET valeur = valeur + excluded.valeur, updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- ========== ABSENCES ==========
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_absences_insert AFTER INSERT ON absences
+BEGIN
+    INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+    SELECT 'absences', strftime('%Y-%m', NEW.date_absence), 1
+    WHERE strftime('%Y-%m', NEW.date_absence) IS NOT NULL
+    ON CONFLICT(indicateur, mois) DO UPDATE SET valeur = valeur + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_absences_delete AFTER DELETE ON absences
+BEGIN
+    UPDATE stats_mensuelles SET valeur = valeur - 1, updated_at = CURRENT_TIMESTAMP
+    WHERE indicateur = 'absences' AND mois = strftime('%Y-%m', OLD.date_absence);
+END;
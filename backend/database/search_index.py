@@ -0,0 +1,110 @@
+"""
+Recherche plein texte (SQLite FTS5)
+
+Les tables recherche_* (schema_search.sql) indexent ouvrages, utilisateurs,
+base de connaissances et cours; les triggers les tiennent à jour. Une
+recherche est une requête MATCH classée par BM25 (les colonnes portent des
+poids: un titre pèse plus qu'une description) au lieu d'un LIKE '%terme%'
+sur chaque colonne, qui parcourt toute la table.
+"""
+import logging
+import re
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema_search.sql"
+
+# Index: table source et poids des colonnes pour bm25(), dans l'ordre de leur déclaration
+INDEX_RECHERCHE = {
+    'recherche_ouvrages': ('ouvrages', (10.0, 5.0, 8.0, 2.0, 1.0)),       # titre, auteur, isbn, editeur, description
+    'recherche_users': ('users', (10.0, 10.0, 5.0, 2.0)),                # nom, prenom, username, email
+    'recherche_connaissances': ('base_connaissances', (10.0, 2.0, 3.0, 5.0)),  # question, reponse, categorie, tags
+    'recherche_cours': ('cours_online', (10.0, 8.0, 1.0)),               # titre, code, description
+}
+
+# Mots ignorés dans les questions en langage naturel (chatbot)
+MOTS_VIDES = frozenset("""
+    a au aux avec ce ces comment dans de des du elle en est et il je la le les
+    leur ma mais me mes mon ne ni nous on ou par pas pour qu que quel quelle
+    qui sa se ses son sur ta te tes ton tu un une vos votre vous y
+""".split())
+
+def _sections(script):
+    """Découpe schema_search.sql en une section (table virtuelle et triggers) par index"""
+    sections = {}
+    for section in re.split(r'^-- =+ .* =+$', script, flags=re.MULTILINE)[1:]:
+        table = re.search(r'CREATE VIRTUAL TABLE IF NOT EXISTS (\w+)', section).group(1)
+        sections[table] = section
+    return sections
+
+def _tables(db):
+    return {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def install_search_index(db):
+    """Crée les index plein texte et leurs triggers; remplit les index nouvellement créés
+
+    Un index dont la table source n'existe pas dans cette base est ignoré.
+    Retourne la liste des index disponibles.
+    """
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        sections = _sections(f.read())
+    tables = _tables(db)
+    disponibles = []
+    for table, (source, _) in INDEX_RECHERCHE.items():
+        if source not in tables:
+            logger.info("Index %s ignoré: table %s absente", table, source)
+            continue
+        db.executescript(sections[table])
+        if table not in tables:
+            db.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+        disponibles.append(table)
+    db.commit()
+    return disponibles
+
+def rebuild_search_index(db):
+    """Reconstruit entièrement les index à partir des tables sources"""
+    tables = _tables(db)
+    for table in INDEX_RECHERCHE:
+        if table in tables:
+            db.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+    db.commit()
+
+def init_search_index(app):
+    """Installe la recherche plein texte au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_search_index(db)
+            except sqlite3.OperationalError as e:
+                # SQLite compilé sans FTS5
+                logger.warning("Recherche plein texte non installée: %s", e)
+
+def match_expression(texte, ignorer_mots_vides=False, tous_les_mots=True):
+    """Expression MATCH d'une saisie utilisateur (None si elle ne contient aucun mot)
+
+    Chaque mot devient un préfixe entre guillemets ("hug"* trouve Hugo): la
+    syntaxe FTS5 de la saisie (AND, NEAR, guillemets, *) n'est pas
+    interprétée. Avec tous_les_mots=False, un seul mot suffit et BM25 classe
+    en tête les lignes qui en contiennent le plus (questions du chatbot).
+    """
+    mots = re.findall(r'\w+', (texte or '').lower())
+    if ignorer_mots_vides:
+        mots = [m for m in mots if m not in MOTS_VIDES and len(m) > 1]
+    if not mots:
+        return None
+    return (' ' if tous_les_mots else ' OR ').join(f'"{mot}"*' for mot in mots)
+
+def available_indexes(db):
+    """Index plein texte installés dans cette base"""
+    return {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ', '.join('?' * len(INDEX_RECHERCHE))), list(INDEX_RECHERCHE))}
+
+def bm25(table):
+    """Expression SQL du score BM25 d'un index (plus petit = plus pertinent)"""
+    poids = ', '.join(str(p) for p in INDEX_RECHERCHE[table][1])
+    return f"bm25({table}, {poids})"
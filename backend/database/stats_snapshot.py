@@ -0,0 +1,160 @@
+"""
+Instantané des statistiques des tableaux de bord
+
+Les agrégats (effectifs, taux de réussite, revenus et inscriptions
+mensuels, répartition par filière, moyennes générales) sont tenus à jour
+par les triggers de schema_stats.sql dans la même transaction que
+l'écriture qui les modifie: les tableaux de bord lisent quelques lignes
+au lieu de parcourir les tables.
+"""
+import logging
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema_stats.sql"
+
+COMPTEURS = ('etudiants_actifs', 'enseignants_actifs', 'classes_actives',
+             'moyennes_annuelles', 'moyennes_annuelles_reussies')
+
+def install_stats_snapshot(db):
+    """Crée les tables et triggers de l'instantané; le reconstruit s'il est vide"""
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+    if db.execute("SELECT COUNT(*) FROM stats_compteurs").fetchone()[0] == 0:
+        rebuild_stats_snapshot(db)
+
+def rebuild_stats_snapshot(db):
+    """Recalcule entièrement l'instantané à partir des tables sources"""
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        for table in ('stats_compteurs', 'stats_mensuelles', 'stats_filieres', 'stats_etudiants'):
+            db.execute(f"DELETE FROM {table}")
+
+        db.execute("""
+            INSERT INTO stats_compteurs (cle, valeur)
+            SELECT 'etudiants_actifs', COUNT(*) FROM etudiants WHERE is_active = 1
+            UNION ALL SELECT 'enseignants_actifs', COUNT(*) FROM enseignants WHERE is_active = 1
+            UNION ALL SELECT 'classes_actives', COUNT(*) FROM classes WHERE is_active = 1
+            UNION ALL SELECT 'moyennes_annuelles', COUNT(*) FROM moyennes WHERE periode = 'annuel'
+            UNION ALL SELECT 'moyennes_annuelles_reussies', COUNT(*) FROM moyennes
+                      WHERE periode = 'annuel' AND moyenne >= 10
+        """)
+        db.execute("""
+            INSERT INTO stats_mensuelles (indicateur, mois, valeur)
+            SELECT 'revenus', strftime('%Y-%m', date_paiement), SUM(montant) FROM paiements
+            WHERE statut = 'valide' AND strftime('%Y-%m', date_paiement) IS NOT NULL
+            GROUP BY 2
+            UNION ALL
+            SELECT 'inscriptions', strftime('%Y-%m', date_inscription), COUNT(*) FROM etudiants
+            WHERE strftime('%Y-%m', date_inscription) IS NOT NULL
+            GROUP BY 2
+            UNION ALL
+            SELECT 'absences', strftime('%Y-%m', date_absence), COUNT(*) FROM absences
+            WHERE strftime('%Y-%m', date_absence) IS NOT NULL
+            GROUP BY 2
+        """)
+        db.execute("""
+            INSERT INTO stats_filieres (filiere_id, nombre_etudiants)
+            SELECT c.filiere_id, COUNT(*) FROM etudiants e
+            JOIN classes c ON e.classe_id = c.id
+            WHERE e.is_active = 1
+            GROUP BY c.filiere_id
+        """)
+        db.execute("""
+            INSERT INTO stats_etudiants (etudiant_id, somme_moyennes, nombre_moyennes, moyenne_generale)
+            SELECT etudiant_id, SUM(moyenne), COUNT(*), AVG(moyenne) FROM moyennes
+            WHERE periode = 'annuel'
+            GROUP BY etudiant_id
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def init_stats_snapshot(app):
+    """Installe l'instantané des statistiques au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_stats_snapshot(db)
+            except sqlite3.OperationalError as e:
+                # Base incomplète (tables sources absentes): tableaux de bord indisponibles
+                logger.warning("Instantané des statistiques non installé: %s", e)
+
+def _derniers_mois(nombre, today=None):
+    """Les `nombre` derniers mois ('AAAA-MM'), du plus récent au plus ancien"""
+    today = today or date.today()
+    annee, mois = today.year, today.month
+    result = []
+    for _ in range(nombre):
+        result.append(f"{annee:04d}-{mois:02d}")
+        mois -= 1
+        if mois == 0:
+            annee, mois = annee - 1, 12
+    return result
+
+def read_stats_snapshot(db, nombre_mois=6, top=10, details=True, today=None):
+    """Lit l'instantané des statistiques
+
+    Retourne les compteurs, les séries mensuelles, la répartition par
+    filière et le top des étudiants (si details), et l'horodatage de la
+    dernière mise à jour.
+    """
+    mois = _derniers_mois(nombre_mois, today)
+    updated = []
+
+    compteurs = dict.fromkeys(COMPTEURS, 0)
+    for row in db.execute("SELECT cle, valeur, updated_at FROM stats_compteurs"):
+        compteurs[row['cle']] = row['valeur']
+        updated.append(row['updated_at'])
+
+    series = {indicateur: dict.fromkeys(mois, 0) for indicateur in ('revenus', 'inscriptions', 'absences')}
+    placeholders = ','.join('?' * len(mois))
+    for row in db.execute(f"""
+        SELECT indicateur, mois, valeur, updated_at FROM stats_mensuelles
+        WHERE mois IN ({placeholders})
+    """, mois):
+        if row['indicateur'] in series:
+            series[row['indicateur']][row['mois']] = row['valeur']
+            updated.append(row['updated_at'])
+
+    repartition, top_etudiants = [], []
+    if details:
+        repartition = db.execute("""
+            SELECT f.libelle, COALESCE(s.nombre_etudiants, 0) as nombre
+            FROM filieres f
+            LEFT JOIN stats_filieres s ON s.filiere_id = f.id
+            ORDER BY f.id
+        """).fetchall()
+
+        top_etudiants = db.execute("""
+            SELECT e.id, u.nom, u.prenom, s.moyenne_generale
+            FROM stats_etudiants s
+            JOIN etudiants e ON s.etudiant_id = e.id
+            JOIN users u ON e.user_id = u.id
+            WHERE e.is_active = 1 AND s.nombre_moyennes > 0
+            ORDER BY s.moyenne_generale DESC
+            LIMIT ?
+        """, (top,)).fetchall()
+
+    total_moyennes = compteurs['moyennes_annuelles']
+    taux_reussite = (compteurs['moyennes_annuelles_reussies'] / total_moyennes * 100) if total_moyennes > 0 else 0
+
+    return {
+        'total_etudiants': int(compteurs['etudiants_actifs']),
+        'total_enseignants': int(compteurs['enseignants_actifs']),
+        'total_classes': int(compteurs['classes_actives']),
+        'taux_reussite': round(taux_reussite, 2),
+        'mois': mois,
+        'series': series,
+        'repartition_filieres': [dict(r) for r in repartition],
+        'top_etudiants': [dict(t) for t in top_etudiants],
+        'updated_at': max(updated) if updated else None,
+    }
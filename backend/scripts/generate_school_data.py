@@ -0,0 +1,484 @@
+"""
+Générateur de données synthétiques d'un grand établissement
+
+Crée une base complète (schémas et comptes de test de init_complete_db.py:
+admin, comptable, enseignant1, etudiant1, parent1 / password123) puis la
+remplit pour N étudiants sur plusieurs années académiques: classes,
+enseignants et emplois du temps, notes (moyennes et classements calculés
+comme par le moteur de notes), paiements, absences, parents, chat de
+classe, messagerie, bibliothèque et journal de connexions. L'année en
+cours contient la date du jour, pour que les requêtes « récentes » des
+blueprints trouvent des lignes.
+
+Même graine, mêmes paramètres: même base (hors horodatages created_at).
+
+Usage:
+    python scripts/generate_school_data.py                        # 5000 étudiants, 3 ans
+    python scripts/generate_school_data.py --etudiants 20000 --annees 4
+    python scripts/generate_school_data.py --output /tmp/esa_bench.db --seed 7
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.grade_engine import PERIODE_ANNUELLE, rebuild_note_aggregates, recompute_classement
+from database.init_complete_db import init_complete_database
+
+DEFAULT_OUTPUT = BACKEND_DIR / 'database' / 'benchmark.db'
+DEFAULT_ETUDIANTS = 5000
+DEFAULT_ANNEES = 3
+DEFAULT_SEED = 42
+
+TAILLE_CLASSE = 40
+MATIERES_PAR_CLASSE = 8
+ETUDIANTS_PAR_ENSEIGNANT = 30
+MESSAGES_CHAT_PAR_ETUDIANT = 3
+
+FILIERES = [
+    ('GEST', 'Gestion des entreprises'), ('COMPTA', 'Comptabilité et audit'), ('MKT', 'Marketing'),
+    ('INFO', 'Informatique de gestion'), ('BANQ', 'Banque et finance'),
+]
+NIVEAUX = [('L1', 'Licence 1'), ('L2', 'Licence 2'), ('L3', 'Licence 3'), ('M1', 'Master 1'), ('M2', 'Master 2')]
+MATIERES = [
+    ('MATH', 'Mathématiques', 3), ('STAT', 'Statistiques', 2), ('ECO', 'Économie générale', 2),
+    ('COMPTA', 'Comptabilité générale', 3), ('DROIT', 'Droit des affaires', 2), ('MKT', 'Marketing', 2),
+    ('INFO', 'Informatique', 2), ('ANG', 'Anglais', 1), ('FIN', 'Finance d\'entreprise', 3),
+    ('GRH', 'Ressources humaines', 1), ('FISC', 'Fiscalité', 2), ('COMM', 'Communication', 1),
+]
+TYPES_FRAIS = [('INSC', 'Frais d\'inscription', 50000), ('SCOL', 'Frais de scolarité', 350000),
+               ('EXAM', 'Frais d\'examen', 25000)]
+NOMS = ['Agbeko', 'Amegah', 'Kodjo', 'Mensah', 'Lawson', 'Adjovi', 'Koffi', 'Dossou', 'Akakpo', 'Ayivi',
+        'Tchalla', 'Gbadoe', 'Kpade', 'Sossou', 'Atsou', 'Edoh', 'Afanou', 'Assiongbon', 'Dzidzienyo', 'Kouma']
+PRENOMS = ['Kossi', 'Ama', 'Yao', 'Akossiwa', 'Komlan', 'Afi', 'Kodjovi', 'Enyonam', 'Messan', 'Abla',
+           'Koami', 'Dela', 'Sena', 'Elom', 'Mawuli', 'Yawa', 'Kafui', 'Edem', 'Selom', 'Akpene']
+CRENEAUX = [('08:00', '10:00'), ('10:00', '12:00'), ('14:00', '16:00'), ('16:00', '18:00')]
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi']
+
+def _annees(nombre, aujourd_hui):
+    """(code, libellé, début, fin) des années académiques, la plus récente (en cours) d'abord"""
+    debut = aujourd_hui.year if aujourd_hui.month >= 9 else aujourd_hui.year - 1
+    return [(f'{a}-{a + 1}', f'Année académique {a}-{a + 1}', date(a, 9, 1), date(a + 1, 7, 31))
+            for a in range(debut, debut - nombre, -1)]
+
+def _jour(r, debut, fin):
+    """Date aléatoire de l'intervalle [debut, fin]"""
+    return debut + timedelta(days=r.randrange((fin - debut).days + 1))
+
+def _insert(db, table, colonnes, lignes):
+    """INSERT par lots; retourne le nombre de lignes insérées (hors triggers)"""
+    sql = f"INSERT INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join('?' * len(colonnes))})"
+    return db.executemany(sql, lignes).rowcount
+
+class SchoolGenerator:
+    """Remplit une base initialisée par init_complete_db.py"""
+
+    def __init__(self, db, etudiants=DEFAULT_ETUDIANTS, annees=DEFAULT_ANNEES, seed=DEFAULT_SEED,
+                 aujourd_hui=None, verbose=True):
+        self.db = db
+        self.nombre_etudiants = etudiants
+        self.nombre_annees = annees
+        self.r = random.Random(seed)
+        self.aujourd_hui = aujourd_hui or date.today()
+        self.verbose = verbose
+        self.comptes = {}
+
+    def _log(self, message):
+        if self.verbose:
+            print(message, flush=True)
+
+    def _max_id(self, table):
+        return self.db.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    def run(self):
+        debut = time.perf_counter()
+        for etape in (self._structure, self._personnes, self._classes, self._notes, self._moyennes,
+                      self._paiements, self._absences, self._chat, self._messagerie, self._bibliotheque,
+                      self._connexions):
+            t = time.perf_counter()
+            etape()
+            self.db.commit()
+            self._log(f"   - {etape.__name__.strip('_')}: {time.perf_counter() - t:.1f} s")
+        self._log(f"✅ Données générées en {time.perf_counter() - debut:.1f} s")
+        return self.comptes
+
+    # ========== STRUCTURE ==========
+
+    def _structure(self):
+        db, r = self.db, self.r
+        self.annees = []
+        for index, (code, libelle, debut, fin) in enumerate(_annees(self.nombre_annees, self.aujourd_hui)):
+            if index == 0:
+                # L'année active du jeu de base devient l'année en cours
+                db.execute("""
+                    UPDATE annees_academiques SET code = ?, libelle = ?, date_debut = ?, date_fin = ?
+                    WHERE is_active = 1
+                """, (code, libelle, debut.isoformat(), fin.isoformat()))
+                annee_id = db.execute("SELECT id FROM annees_academiques WHERE is_active = 1").fetchone()[0]
+            else:
+                annee_id = db.execute("""
+                    INSERT INTO annees_academiques (code, libelle, date_debut, date_fin, is_active)
+                    VALUES (?, ?, ?, ?, 0)
+                """, (code, libelle, debut.isoformat(), fin.isoformat())).lastrowid
+            # Les événements de l'année en cours s'arrêtent à aujourd'hui
+            self.annees.append((annee_id, debut, min(fin, self.aujourd_hui)))
+
+        self.filieres = [db.execute("INSERT INTO filieres (code, libelle) VALUES (?, ?)", f).lastrowid
+                         for f in FILIERES]
+        self.niveaux = [db.execute("INSERT INTO niveaux (code, libelle, ordre) VALUES (?, ?, ?)",
+                                   (code, libelle, ordre)).lastrowid
+                        for ordre, (code, libelle) in enumerate(NIVEAUX, 1)]
+        self.matieres = [db.execute("INSERT INTO matieres (code, libelle, coefficient, volume_horaire) VALUES (?, ?, ?, ?)",
+                                    (code, libelle, coef, 30 * coef)).lastrowid
+                         for code, libelle, coef in MATIERES]
+        self.types_frais = [db.execute("INSERT INTO types_frais (code, libelle, montant) VALUES (?, ?, ?)", t).lastrowid
+                            for t in TYPES_FRAIS]
+        self.montants = dict(zip(self.types_frais, (m for _, _, m in TYPES_FRAIS)))
+        # Programme de chaque (filière, niveau)
+        self.programmes = {(f, n): r.sample(self.matieres, MATIERES_PAR_CLASSE)
+                           for f in range(len(self.filieres)) for n in range(len(self.niveaux))}
+
+    # ========== PERSONNES ==========
+
+    def _users(self, role, prefixe, nombre):
+        """Crée `nombre` utilisateurs d'un rôle; retourne leurs identifiants"""
+        r = self.r
+        debut = self._max_id('users') + 1
+        _insert(self.db, 'users', ('id', 'username', 'email', 'password_hash', 'role', 'nom', 'prenom', 'telephone'),
+                ((debut + i, f'{prefixe}{i + 1:05d}', f'{prefixe}{i + 1:05d}@esa.test', self.password_hash, role,
+                  r.choice(NOMS), r.choice(PRENOMS), f'+2289{r.randrange(10 ** 7):07d}')
+                 for i in range(nombre)))
+        return list(range(debut, debut + nombre))
+
+    def _personnes(self):
+        db, r = self.db, self.r
+        self.password_hash = db.execute("SELECT password_hash FROM users WHERE username = 'admin'").fetchone()[0]
+        self.admin_id = db.execute("SELECT id FROM users WHERE username = 'admin'").fetchone()[0]
+        annee_courante = self.annees[0][0]
+
+        # Enseignants: ceux du jeu de base d'abord (enseignant1 reçoit des classes)
+        existants = [row[0] for row in db.execute("SELECT id FROM users WHERE role = 'enseignant' ORDER BY id")]
+        nouveaux = self._users('enseignant', 'ens', max(0, self.nombre_etudiants // ETUDIANTS_PAR_ENSEIGNANT - len(existants)))
+        _insert(db, 'enseignants', ('user_id', 'matricule', 'specialite', 'date_embauche'),
+                ((u, f'ENS{u:06d}', r.choice(MATIERES)[1], _jour(r, date(2005, 1, 1), self.annees[-1][1]).isoformat())
+                 for u in nouveaux))
+        self.enseignants = existants + nouveaux
+
+        # Étudiants: etudiant1 et etudiant2 du jeu de base en font partie
+        existants = [row[0] for row in db.execute("SELECT id FROM etudiants ORDER BY id")]
+        users = self._users('etudiant', 'etu', max(0, self.nombre_etudiants - len(existants)))
+        debut = self._max_id('etudiants') + 1
+        _insert(db, 'etudiants', ('id', 'user_id', 'numero_etudiant', 'date_naissance', 'lieu_naissance', 'sexe',
+                                  'nationalite', 'annee_academique_id', 'date_inscription'),
+                ((debut + i, u, f'ESA{debut + i:07d}', _jour(r, date(1995, 1, 1), date(2006, 12, 31)).isoformat(),
+                  r.choice(('Lomé', 'Kara', 'Sokodé', 'Atakpamé', 'Kpalimé')), r.choice('MF'), 'Togolaise',
+                  annee_courante, self.annees[0][1].isoformat())
+                 for i, u in enumerate(users)))
+        self.etudiants = existants + list(range(debut, debut + len(users)))
+        self.user_etudiant = dict(db.execute("SELECT id, user_id FROM etudiants"))
+
+        # Parents: un à trois enfants; parent1 est le parent de etudiant1
+        parent1 = db.execute("SELECT id FROM parents ORDER BY id LIMIT 1").fetchone()
+        liens = []
+        if parent1:
+            liens.append((parent1[0], self.etudiants[0], 1))
+        restants = self.etudiants[1:]
+        groupes = []
+        while restants:
+            taille = r.choice((1, 1, 1, 2, 2, 3))
+            groupes.append(restants[:taille])
+            restants = restants[taille:]
+        users = self._users('parent', 'par', len(groupes))
+        debut = self._max_id('parents') + 1
+        _insert(db, 'parents', ('id', 'user_id', 'profession', 'lien_parente'),
+                ((debut + i, u, r.choice(('Commerçant', 'Enseignant', 'Fonctionnaire', 'Médecin', 'Artisan')),
+                  r.choice(('pere', 'mere', 'tuteur'))) for i, u in enumerate(users)))
+        for i, enfants in enumerate(groupes):
+            liens.extend((debut + i, e, 1) for e in enfants)
+        _insert(db, 'parent_etudiants', ('parent_id', 'etudiant_id', 'is_principal'), liens)
+        self.comptes.update(enseignants=len(self.enseignants), etudiants=len(self.etudiants), parents=len(groupes))
+
+    # ========== CLASSES ==========
+
+    def _classes(self):
+        """Classes de chaque année et parcours de chaque étudiant (un niveau par an)"""
+        db, r = self.db, self.r
+        # Filière et niveau actuels; l'étudiant était au niveau inférieur l'année précédente
+        cursus = {e: (r.randrange(len(self.filieres)), r.randrange(len(self.niveaux))) for e in self.etudiants}
+        rangs = {}
+        self.inscriptions = []  # (etudiant_id, index de l'année, clé de classe)
+        for e in self.etudiants:
+            f, n = cursus[e]
+            groupe = rangs.setdefault((f, n), 0) // TAILLE_CLASSE
+            rangs[(f, n)] += 1
+            for k in range(self.nombre_annees):
+                if n - k >= 0:
+                    self.inscriptions.append((e, k, (k, f, n - k, groupe)))
+
+        self.classes = {}
+        for cle in sorted({cle for _, _, cle in self.inscriptions}):
+            k, f, n, groupe = cle
+            annee_id = self.annees[k][0]
+            code = f"{FILIERES[f][0]}-{NIVEAUX[n][0]}-{groupe + 1}-{annee_id}"
+            self.classes[cle] = db.execute("""
+                INSERT INTO classes (code, libelle, filiere_id, niveau_id, annee_academique_id, effectif_max)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (code, f"{NIVEAUX[n][1]} {FILIERES[f][1]} {groupe + 1}", self.filieres[f], self.niveaux[n],
+                  annee_id, TAILLE_CLASSE + 5)).lastrowid
+
+        # Enseignant de chaque matière de chaque classe
+        self.enseignements = {}
+        for cle, classe_id in self.classes.items():
+            for matiere_id in self.programmes[(cle[1], cle[2])]:
+                self.enseignements[(classe_id, matiere_id)] = r.choice(self.enseignants)
+        _insert(db, 'classe_matieres', ('classe_id', 'matiere_id', 'enseignant_id'),
+                ((c, m, ens) for (c, m), ens in self.enseignements.items()))
+        db.executemany("UPDATE etudiants SET classe_id = ? WHERE id = ?",
+                       ((self.classes[cle], e) for e, k, cle in self.inscriptions if k == 0))
+
+        # Emploi du temps de l'année en cours
+        lignes = []
+        for cle, classe_id in self.classes.items():
+            if cle[0] != 0:
+                continue
+            creneaux = r.sample([(j, c) for j in JOURS[:5] for c in CRENEAUX], MATIERES_PAR_CLASSE)
+            for matiere_id, (jour, (debut, fin)) in zip(self.programmes[(cle[1], cle[2])], creneaux):
+                lignes.append((classe_id, matiere_id, self.enseignements[(classe_id, matiere_id)], jour, debut, fin,
+                               f'Salle {r.randint(1, 30)}', self.annees[0][0]))
+        _insert(db, 'emplois_temps', ('classe_id', 'matiere_id', 'enseignant_id', 'jour_semaine', 'heure_debut',
+                                      'heure_fin', 'salle', 'annee_academique_id'), lignes)
+        self.comptes['classes'] = len(self.classes)
+
+    # ========== NOTES ==========
+
+    def _notes(self):
+        r = self.r
+
+        def lignes():
+            for e, k, cle in self.inscriptions:
+                classe_id = self.classes[cle]
+                _, debut, fin = self.annees[k]
+                for matiere_id in self.programmes[(cle[1], cle[2])]:
+                    enseignant_id = self.enseignements[(classe_id, matiere_id)]
+                    for type_note, coefficient in (('devoir', 1), ('controle', 1), ('examen', 2)):
+                        jour = _jour(r, debut, fin)
+                        valide = k > 0 or r.random() < 0.9
+                        yield (e, matiere_id, classe_id, type_note, round(min(20, max(0, r.gauss(11.5, 3.5))), 2),
+                               coefficient, jour.isoformat(), enseignant_id, int(valide),
+                               self.admin_id if valide else None, jour.isoformat() if valide else None)
+
+        self.comptes['notes'] = _insert(self.db, 'notes', (
+            'etudiant_id', 'matiere_id', 'classe_id', 'type_note', 'note', 'coefficient', 'date_note',
+            'enseignant_id', 'is_valide', 'valide_par', 'date_validation'), lignes())
+
+    def _moyennes(self):
+        """Moyennes et classements, comme après validation par le moteur de notes"""
+        db = self.db
+        rebuild_note_aggregates(db)
+        self.comptes['moyennes'] = db.execute("""
+            INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+            SELECT a.etudiant_id, a.matiere_id, a.classe_id, ROUND(a.somme_points / a.somme_coefficients, 2),
+                   a.periode, c.annee_academique_id
+            FROM notes_agregats a
+            JOIN classes c ON c.id = a.classe_id
+            WHERE a.somme_coefficients > 0
+        """).rowcount
+        for cle, classe_id in self.classes.items():
+            if cle[0] == 0:
+                recompute_classement(db, classe_id, PERIODE_ANNUELLE)
+
+    # ========== FINANCES ==========
+
+    def _paiements(self):
+        db, r = self.db, self.r
+        _insert(db, 'frais_classes', ('classe_id', 'type_frais_id', 'montant', 'annee_academique_id'),
+                ((classe_id, t, self.montants[t], self.annees[cle[0]][0])
+                 for cle, classe_id in self.classes.items() for t in self.types_frais))
+
+        def lignes():
+            for e, k, cle in self.inscriptions:
+                _, debut, fin = self.annees[k]
+                # Un étudiant sur dix n'a pas soldé sa scolarité de l'année en cours
+                tranches = r.choice((1, 2, 3)) if k > 0 or r.random() >= 0.1 else r.choice((0, 1))
+                versements = [(self.types_frais[0], self.montants[self.types_frais[0]])]
+                versements += [(self.types_frais[1], self.montants[self.types_frais[1]] // 3)] * tranches
+                versements += [(self.types_frais[2], self.montants[self.types_frais[2]])]
+                for type_frais_id, montant in versements:
+                    jour = _jour(r, debut, fin)
+                    statut = 'valide' if k > 0 else r.choices(('valide', 'en_attente', 'rejete'), (90, 8, 2))[0]
+                    yield (e, type_frais_id, montant, r.choice(('especes', 'mobile_money', 'virement')),
+                           f'PAY-{e}-{k}-{r.randrange(10 ** 8):08d}', jour.isoformat(), statut,
+                           self.admin_id if statut != 'en_attente' else None)
+
+        self.comptes['paiements'] = _insert(db, 'paiements', (
+            'etudiant_id', 'type_frais_id', 'montant', 'mode_paiement', 'reference_paiement', 'date_paiement',
+            'statut', 'valide_par'), lignes())
+
+    def _absences(self):
+        r = self.r
+
+        def lignes():
+            for e, k, cle in self.inscriptions:
+                classe_id = self.classes[cle]
+                _, debut, fin = self.annees[k]
+                for _ in range(r.randint(0, 12)):
+                    matiere_id = r.choice(self.programmes[(cle[1], cle[2])])
+                    heure_debut, heure_fin = r.choice(CRENEAUX)
+                    yield (e, classe_id, matiere_id, _jour(r, debut, fin).isoformat(), heure_debut, heure_fin,
+                           r.choices(('absence', 'retard', 'justifie'), (5, 3, 2))[0],
+                           self.enseignements[(classe_id, matiere_id)])
+
+        self.comptes['absences'] = _insert(self.db, 'absences', (
+            'etudiant_id', 'classe_id', 'matiere_id', 'date_absence', 'heure_debut', 'heure_fin', 'type_absence',
+            'enseignant_id'), lignes())
+
+    # ========== COMMUNICATION ==========
+
+    def _chat(self):
+        """Une conversation par classe de l'année en cours (étudiants et enseignants)"""
+        db, r = self.db, self.r
+        membres = {}
+        for e, k, cle in self.inscriptions:
+            if k == 0:
+                membres.setdefault(self.classes[cle], []).append(self.user_etudiant[e])
+        _, debut, fin = self.annees[0]
+        messages = 0
+        for classe_id, etudiants in sorted(membres.items()):
+            enseignants = sorted({ens for (c, _), ens in self.enseignements.items() if c == classe_id})
+            conversation_id = db.execute("""
+                INSERT INTO conversations (type_conversation, titre, createur_id) VALUES ('classe', ?, ?)
+            """, (f'Classe {classe_id}', enseignants[0])).lastrowid
+            participants = etudiants + enseignants
+            _insert(db, 'participants_conversations', ('conversation_id', 'user_id', 'role'),
+                    ((conversation_id, u, 'admin' if u in enseignants else 'membre') for u in participants))
+            jours = sorted(_jour(r, debut, fin) for _ in range(len(etudiants) * MESSAGES_CHAT_PAR_ETUDIANT))
+            messages += _insert(db, 'messages_chat', ('conversation_id', 'expediteur_id', 'contenu', 'created_at'),
+                                ((conversation_id, r.choice(participants), f'Message {i + 1} de la classe',
+                                  f'{jour.isoformat()} {r.randint(7, 21):02d}:{r.randint(0, 59):02d}:00')
+                                 for i, jour in enumerate(jours)))
+            # Chacun a lu la conversation jusqu'à une date récente
+            db.executemany("""
+                UPDATE participants_conversations SET date_derniere_lecture = ?
+                WHERE conversation_id = ? AND user_id = ?
+            """, ((f'{_jour(r, debut, fin).isoformat()} 23:59:59', conversation_id, u) for u in participants))
+        self.comptes.update(conversations=len(membres), messages_chat=messages)
+
+    def _messagerie(self):
+        r = self.r
+        _, debut, fin = self.annees[0]
+        parents = [row[0] for row in self.db.execute("SELECT user_id FROM parents")]
+        destinataires = list(self.user_etudiant.values()) + parents
+        self.comptes['messages'] = _insert(self.db, 'messages', (
+            'expediteur_id', 'destinataire_id', 'sujet', 'contenu', 'is_lu', 'created_at'),
+            ((r.choice(self.enseignants + [self.admin_id]), r.choice(destinataires), 'Suivi pédagogique',
+              'Merci de consulter les résultats du semestre.', int(r.random() < 0.7),
+              f'{_jour(r, debut, fin).isoformat()} {r.randint(7, 21):02d}:00:00')
+             for _ in range(len(self.etudiants))))
+        self.comptes['annonces'] = _insert(self.db, 'annonces', (
+            'titre', 'contenu', 'type_annonce', 'auteur_id', 'is_urgent', 'date_publication'),
+            ((f'Annonce {i + 1}', 'Information à l\'attention des étudiants.', r.choice(('generale', 'classe', 'filiere')),
+              self.admin_id, int(r.random() < 0.1), f'{_jour(r, debut, fin).isoformat()} 09:00:00')
+             for i in range(50)))
+
+    # ========== BIBLIOTHÈQUE ==========
+
+    def _bibliotheque(self):
+        db, r = self.db, self.r
+        nombre = max(50, len(self.etudiants) // 10)
+        debut = self._max_id('ouvrages') + 1
+        exemplaires_par_ouvrage = [r.randint(1, 4) for _ in range(nombre)]
+        _insert(db, 'ouvrages', ('id', 'isbn', 'titre', 'auteur', 'editeur', 'annee_publication', 'categorie',
+                                 'nombre_exemplaires', 'nombre_disponibles', 'cote'),
+                ((debut + i, f'978{r.randrange(10 ** 10):010d}', f'{r.choice(MATIERES)[1]}, tome {i + 1}',
+                  f'{r.choice(PRENOMS)} {r.choice(NOMS)}', r.choice(('Dunod', 'Nathan', 'Vuibert', 'Foucher')),
+                  r.randint(1990, 2024), r.choice(('Gestion', 'Économie', 'Droit', 'Informatique')), n, n, f'C-{i + 1}')
+                 for i, n in enumerate(exemplaires_par_ouvrage)))
+        exemplaires = []
+        for i, n in enumerate(exemplaires_par_ouvrage):
+            for j in range(n):
+                exemplaires.append((debut + i, f'EX-{debut + i}-{j + 1}'))
+        premier = self._max_id('exemplaires') + 1
+        _insert(db, 'exemplaires', ('ouvrage_id', 'numero_exemplaire', 'etat', 'date_acquisition'),
+                ((o, numero, r.choice(('neuf', 'bon', 'bon', 'moyen')), '2020-09-01') for o, numero in exemplaires))
+        ids = list(range(premier, premier + len(exemplaires)))
+        ouvrage_de = {premier + i: o for i, (o, _) in enumerate(exemplaires)}
+
+        lignes, en_cours = [], set()
+        for e, k, _ in self.inscriptions:
+            _, debut_annee, fin = self.annees[k]
+            for _ in range(r.choice((0, 1, 2, 3))):
+                exemplaire_id = r.choice(ids)
+                jour = _jour(r, debut_annee, fin)
+                retour = jour + timedelta(days=14)
+                # Emprunts récents de l'année en cours non rendus (un seul par exemplaire)
+                if k == 0 and retour >= self.aujourd_hui - timedelta(days=30) and exemplaire_id not in en_cours:
+                    en_cours.add(exemplaire_id)
+                    statut, rendu = ('retarde' if retour < self.aujourd_hui else 'en_cours'), None
+                else:
+                    statut, rendu = 'retourne', (jour + timedelta(days=r.randint(1, 20))).isoformat()
+                lignes.append((exemplaire_id, self.user_etudiant[e], jour.isoformat(), retour.isoformat(), rendu, statut))
+        self.comptes['emprunts'] = _insert(db, 'emprunts', (
+            'exemplaire_id', 'emprunteur_id', 'date_emprunt', 'date_retour_prevue', 'date_retour_effective', 'statut'),
+            lignes)
+        sortis = {}
+        for exemplaire_id in en_cours:
+            sortis[ouvrage_de[exemplaire_id]] = sortis.get(ouvrage_de[exemplaire_id], 0) + 1
+        db.executemany("UPDATE ouvrages SET nombre_disponibles = nombre_exemplaires - ? WHERE id = ?",
+                       ((n, o) for o, n in sortis.items()))
+        self.comptes.update(ouvrages=nombre, exemplaires=len(exemplaires))
+
+    # ========== JOURNAL ==========
+
+    def _connexions(self):
+        """Connexions des 90 derniers jours (une sur vingt échoue)"""
+        r = self.r
+        users = list(self.user_etudiant.values()) + self.enseignants
+        fin = self.aujourd_hui
+        debut = fin - timedelta(days=90)
+        self.comptes['logs_connexion'] = _insert(self.db, 'logs_connexion', (
+            'user_id', 'username', 'ip_address', 'user_agent', 'statut', 'raison_echec', 'created_at'),
+            ((u, f'user{u}', f'41.207.{r.randint(0, 255)}.{r.randint(1, 254)}', 'Mozilla/5.0 (Android) ESA/1.0',
+              *(('echec', 'Identifiants invalides') if r.random() < 0.05 else ('succes', None)),
+              f'{_jour(r, debut, fin).isoformat()} {r.randint(6, 23):02d}:{r.randint(0, 59):02d}:00')
+             for _ in range(len(users) * 10) for u in (r.choice(users),)))
+
+def generate(db_path=DEFAULT_OUTPUT, etudiants=DEFAULT_ETUDIANTS, annees=DEFAULT_ANNEES, seed=DEFAULT_SEED,
+             aujourd_hui=None, verbose=True):
+    """Crée la base `db_path` (écrasée) et la remplit; retourne le nombre de lignes par table"""
+    init_complete_database(db_path)
+    db = sqlite3.connect(str(db_path))
+    # Génération seulement: pas de durabilité à garantir avant la fin
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("PRAGMA journal_mode = WAL")
+    try:
+        comptes = SchoolGenerator(db, etudiants, annees, seed, aujourd_hui, verbose).run()
+        db.execute("ANALYZE")
+        db.commit()
+    finally:
+        db.close()
+    return comptes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une base synthétique d'un grand établissement")
+    parser.add_argument('--etudiants', type=int, default=DEFAULT_ETUDIANTS)
+    parser.add_argument('--annees', type=int, default=DEFAULT_ANNEES, help='années académiques de notes')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='fichier de base (écrasé)')
+    args = parser.parse_args(argv)
+    if args.annees < 1 or args.etudiants < 2:
+        parser.error("au moins 2 étudiants et une année")
+
+    comptes = generate(args.output, args.etudiants, args.annees, args.seed)
+    print("")
+    for table, nombre in comptes.items():
+        print(f"   {table:<16} {nombre:>10}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Conseiller d'index: plans d'exécution des requêtes des blueprints
+
+Extrait les requêtes SQL littérales de backend/blueprints (chaînes et
+f-strings, dont les parties dynamiques sont remplacées par '?'), les soumet
+à EXPLAIN QUERY PLAN sur une base vide construite à partir des schémas,
+signale les parcours complets de table (SCAN) et les tris temporaires
+(USE TEMP B-TREE), et propose pour chacun un index composite: colonnes
+d'égalité, puis une colonne d'intervalle, puis les colonnes du tri.
+
+Les index retenus sont livrés dans database/schema_indexes.sql; le mode
+--benchmark mesure quelques requêtes représentatives avant et après cette
+migration sur des données synthétiques.
+
+Usage:
+    python scripts/index_advisor.py                     # rapport
+    python scripts/index_advisor.py --sql               # CREATE INDEX proposés
+    python scripts/index_advisor.py --sans-migration    # plans sans schema_indexes.sql
+    python scripts/index_advisor.py --benchmark 5000    # avant/après, 5000 étudiants
+"""
+import argparse
+import ast
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.query_indexes import install_query_indexes
+
+BLUEPRINTS_DIR = BACKEND_DIR / 'blueprints'
+DATABASE_DIR = BACKEND_DIR / 'database'
+
+# Schémas dans l'ordre de init_complete_db.py (la migration des index vient en dernier)
+SCHEMA_FILES = [
+    'schema.sql', 'schema_extended.sql', 'schema_top10.sql', 'schema_stats.sql', 'schema_grades.sql',
+    'schema_jobs.sql', 'schema_documents.sql', 'schema_pagination.sql', 'schema_search.sql',
+    'schema_chat.sql', 'schema_notifications.sql',
+]
+
+SQL_START = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE)\b|^\s*INSERT\b.*\bSELECT\b', re.I | re.S)
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+COMPARAISON = re.compile(
+    r'(?:\b(\w+)\.)?\b(\w+)\s*(==|=|!=|<>|<=|>=|<|>|\bNOT\s+IN\b|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b)'
+    r'\s*(?:(\w+)\.(\w+))?', re.I)
+TRI = re.compile(r'\b(ORDER|GROUP)\s+BY\s+(.+?)(?=\bLIMIT\b|\bHAVING\b|\bORDER\s+BY\b|\)|$)', re.I | re.S)
+MOTS_CLES = {
+    'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'on', 'group', 'order', 'limit', 'set',
+    'union', 'having', 'natural', 'using', 'as', 'and', 'or', 'values', 'select', 'returning', 'except',
+    'intersect', 'window', 'full',
+}
+EGALITES = {'=', '==', 'in', 'is'}
+INTERVALLES = {'<', '>', '<=', '>=', 'between', 'like'}
+
+Query = namedtuple('Query', ['sql', 'emplacements'])
+Probleme = namedtuple('Probleme', ['table', 'alias', 'nature', 'detail'])
+
+# ========== EXTRACTION ==========
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+def extract_queries(directory=BLUEPRINTS_DIR):
+    """Requêtes SQL littérales des modules, regroupées par texte normalisé"""
+    requetes = {}
+    for path in sorted(Path(directory).glob('*.py')):
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+        parties = {id(v) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for v in node.values}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in parties:
+                texte = node.value
+            elif isinstance(node, ast.JoinedStr):
+                texte = ''.join(v.value if isinstance(v, ast.Constant) else '?' for v in node.values)
+            else:
+                continue
+            if SQL_START.match(texte):
+                sql = _normalize(texte)
+                requetes.setdefault(sql, []).append(f"{path.relative_to(Path(directory).parent)}:{node.lineno}")
+    return [Query(sql, emplacements) for sql, emplacements in requetes.items()]
+
+# ========== BASE D'ANALYSE ==========
+
+def _statements(script):
+    """Instructions complètes d'un script (les triggers BEGIN ... END restent entiers)"""
+    courante = ''
+    for ligne in script.splitlines(keepends=True):
+        courante += ligne
+        if sqlite3.complete_statement(courante):
+            yield courante
+            courante = ''
+
+def build_schema(conn, avec_migration=True):
+    """Crée toutes les tables et index connus; une instruction en erreur est ignorée"""
+    for nom in SCHEMA_FILES:
+        with open(DATABASE_DIR / nom, 'r', encoding='utf-8') as f:
+            for statement in _statements(f.read()):
+                try:
+                    conn.execute(statement)
+                except sqlite3.Error:
+                    pass
+    if avec_migration:
+        install_query_indexes(conn)
+    conn.commit()
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _index_columns(conn, table):
+    """Colonnes de chaque index de la table"""
+    return [[row[2] for row in conn.execute(f"PRAGMA index_info({index[1]})")]
+            for index in conn.execute(f"PRAGMA index_list({table})")]
+
+# ========== ANALYSE ==========
+
+def _parametres(sql):
+    """Paramètres factices (NULL) pour préparer la requête"""
+    sans_litteraux = re.sub(r"'[^']*'", "''", sql)
+    noms = re.findall(r'(?<![:\w]):(\w+)', sans_litteraux)
+    if noms:
+        return {nom: None for nom in noms}
+    return [None] * sans_litteraux.count('?')
+
+def _aliases(conn, sql):
+    """Alias (et noms) des tables de la requête -> table"""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        if not _columns(conn, table):
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in MOTS_CLES:
+            aliases[alias] = table
+    return aliases
+
+def explain(conn, sql):
+    """Plan d'exécution, ou l'erreur de préparation"""
+    try:
+        return conn.execute(f"EXPLAIN QUERY PLAN {sql}", _parametres(sql)).fetchall(), None
+    except (sqlite3.Error, ValueError) as e:
+        return None, str(e)
+
+def problems(conn, sql, plan):
+    """Parcours complets et tris temporaires du plan"""
+    aliases = _aliases(conn, sql)
+    resultat, premiere_table = [], None
+    for row in plan:
+        detail = row[3]
+        acces = re.match(r'(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (COVERING )?INDEX (\w+))?', detail)
+        if acces and acces.group(2) in aliases:
+            alias = acces.group(2)
+            premiere_table = premiere_table or alias
+            if acces.group(1) == 'SCAN':
+                resultat.append(Probleme(aliases[alias], alias, 'parcours', detail))
+        elif detail.startswith('USE TEMP B-TREE') and premiere_table:
+            resultat.append(Probleme(aliases[premiere_table], premiere_table, 'tri', detail))
+    return resultat
+
+def _colonnes_de(conn, aliases, table, alias, qualif, colonne):
+    """Indique si une colonne (éventuellement qualifiée) désigne la table"""
+    if qualif:
+        return aliases.get(qualif) == table and (qualif == alias or qualif == table) \
+            and colonne in _columns(conn, table)
+    if colonne not in _columns(conn, table):
+        return False
+    # Colonne non qualifiée: seulement si aucune autre table de la requête ne la possède
+    return all(t == table or colonne not in _columns(conn, t) for t in set(aliases.values()))
+
+def propose_index(conn, sql, probleme):
+    """Colonnes d'un index composite pour le problème, ou None
+
+    Ordre des colonnes: égalités sur une valeur (paramètre, constante),
+    égalités de jointure, une colonne d'intervalle, puis les colonnes du tri
+    si toutes appartiennent à la table.
+    """
+    aliases = _aliases(conn, sql)
+    table, alias = probleme.table, probleme.alias
+    filtres, jointures, intervalles = [], [], []
+    for qualif, colonne, operateur, qualif_droite, colonne_droite in COMPARAISON.findall(sql):
+        operateur = ' '.join(operateur.lower().split())
+        jointure = bool(qualif_droite) and qualif_droite in aliases
+        if jointure and operateur in EGALITES \
+                and _colonnes_de(conn, aliases, table, alias, qualif_droite, colonne_droite):
+            jointures.append(colonne_droite)
+        if not _colonnes_de(conn, aliases, table, alias, qualif, colonne):
+            continue
+        if operateur in EGALITES:
+            (jointures if jointure else filtres).append(colonne)
+        elif operateur in INTERVALLES:
+            intervalles.append(colonne)
+
+    colonnes = []
+    for colonne in filtres + jointures + intervalles[:1]:
+        if colonne not in colonnes:
+            colonnes.append(colonne)
+    if probleme.nature == 'tri':
+        tri = []
+        for _, liste in TRI.findall(sql):
+            for terme in liste.split(','):
+                m = re.match(r'\s*(?:(\w+)\.)?(\w+)\s*(?:ASC|DESC)?\s*$', terme, re.I)
+                if not m or not _colonnes_de(conn, aliases, table, alias, m.group(1), m.group(2)):
+                    return None
+                tri.append(m.group(2))
+        colonnes += [c for c in tri if c not in colonnes]
+    if not colonnes or colonnes[0] == 'id':
+        return None
+    # Déjà servi par un index existant (le planificateur a préféré un autre chemin)
+    if any(existant[:len(colonnes)] == colonnes for existant in _index_columns(conn, table)):
+        return None
+    return tuple(colonnes)
+
+def advise(conn, queries):
+    """Analyse toutes les requêtes; retourne (rapport par requête, index proposés)"""
+    rapport, propositions = [], {}
+    for query in queries:
+        plan, erreur = explain(conn, query.sql)
+        if erreur:
+            rapport.append({'query': query, 'erreur': erreur, 'problemes': [], 'index': []})
+            continue
+        entree = {'query': query, 'erreur': None, 'problemes': problems(conn, query.sql, plan), 'index': []}
+        for probleme in entree['problemes']:
+            colonnes = propose_index(conn, query.sql, probleme)
+            if colonnes:
+                entree['index'].append((probleme.table, colonnes))
+                propositions.setdefault((probleme.table, colonnes), []).extend(query.emplacements)
+        rapport.append(entree)
+
+    # Un index dont les colonnes préfixent un autre index proposé est inutile
+    for (table, colonnes) in list(propositions):
+        plus_long = [c for (t, c) in propositions if t == table and len(c) > len(colonnes)
+                     and c[:len(colonnes)] == colonnes]
+        if plus_long:
+            propositions[(table, plus_long[0])].extend(propositions.pop((table, colonnes)))
+    return rapport, propositions
+
+def index_sql(table, colonnes):
+    return f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(colonnes)} ON {table}({', '.join(colonnes)});"
+
+# ========== BENCHMARK ==========
+
+# Requêtes représentatives des prédicats chauds (même forme que dans les blueprints)
+BENCHMARK = [
+    ("note existante (enseignant.py)", """
+        SELECT id FROM notes WHERE etudiant_id = ? AND matiere_id = ? AND classe_id = ?
+    """, lambda r, n: (r.randint(1, n), r.randint(1, 12), r.randint(1, max(1, n // 40)))),
+    ("moyenne par matière (dashboards.py)", """
+        SELECT m.libelle, AVG(n.note) as moyenne FROM notes n JOIN matieres m ON n.matiere_id = m.id
+        WHERE n.is_valide = 1 AND n.matiere_id = ? GROUP BY m.id, m.libelle
+    """, lambda r, n: (r.randint(1, 12),)),
+    ("emprunt en cours d'un exemplaire (bibliotheque.py)", """
+        SELECT id FROM emprunts WHERE exemplaire_id = ? AND statut = 'en_cours'
+    """, lambda r, n: (r.randint(1, n),)),
+    ("journal de la dernière heure (utils/anomaly.py)", """
+        SELECT user_id, ip_address, statut FROM logs_connexion WHERE created_at > ? ORDER BY created_at, id
+    """, lambda r, n: ('2025-07-28 00:00:00',)),
+    ("échecs de connexion récents (security)", """
+        SELECT COUNT(*) FROM logs_connexion WHERE user_id = ? AND statut = 'echec' AND created_at > ?
+    """, lambda r, n: (r.randint(1, n), '2025-07-20 00:00:00')),
+]
+
+def fill_synthetic(conn, etudiants, seed=42):
+    """Données synthétiques des tables mesurées (clés étrangères non vérifiées)"""
+    r = random.Random(seed)
+    classes = max(1, etudiants // 40)
+    jours = [f'2025-{m:02d}-{j:02d}' for m in range(1, 8) for j in range(1, 29)]
+    conn.executemany("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES (?, ?, ?, 'x', 'etudiant', 'N', 'P')
+    """, ((i, f'u{i}', f'u{i}@esa.test') for i in range(1, etudiants + 1)))
+    conn.executemany("""
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id, is_active)
+        VALUES (?, ?, ?, ?, 1, ?)
+    """, ((i, i, f'E{i:06d}', (i - 1) // 40 + 1, int(r.random() < 0.95)) for i in range(1, etudiants + 1)))
+    conn.executemany("INSERT INTO matieres (id, code, libelle) VALUES (?, ?, ?)",
+                     [(i, f'M{i}', f'Matière {i}') for i in range(1, 13)])
+    conn.executemany("""
+        INSERT INTO notes (etudiant_id, matiere_id, classe_id, type_note, note, coefficient, date_note,
+                           enseignant_id, is_valide)
+        VALUES (?, ?, ?, 'devoir', ?, 1, ?, 1, ?)
+    """, ((e, r.randint(1, 12), (e - 1) // 40 + 1, r.randint(0, 20), r.choice(jours), int(r.random() < 0.9))
+          for e in range(1, etudiants + 1) for _ in range(30)))
+    conn.executemany("""
+        INSERT OR IGNORE INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+        VALUES (?, ?, ?, ?, ?, 1)
+    """, ((e, m, (e - 1) // 40 + 1, r.randint(0, 20), periode)
+          for e in range(1, etudiants + 1) for m in range(1, 13) for periode in ('S1', 'S2', 'annuel')))
+    conn.executemany("""
+        INSERT INTO paiements (etudiant_id, type_frais_id, montant, date_paiement, statut)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((e, r.randint(1, 3), r.randint(10, 200) * 1000, r.choice(jours), r.choice(('valide', 'valide', 'en_attente', 'rejete')))
+          for e in range(1, etudiants + 1) for _ in range(4)))
+    conn.executemany("""
+        INSERT INTO logs_connexion (user_id, username, ip_address, statut, created_at) VALUES (?, 'u', ?, ?, ?)
+    """, ((r.randint(1, etudiants), f'10.0.{r.randint(0, 255)}.{r.randint(0, 255)}',
+           'echec' if r.random() < 0.1 else 'succes', f'{r.choice(jours)} {r.randint(0, 23):02d}:00:00')
+          for _ in range(etudiants * 40)))
+    conn.executemany("""
+        INSERT INTO emprunts (exemplaire_id, emprunteur_id, date_emprunt, date_retour_prevue, statut)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((r.randint(1, etudiants), r.randint(1, etudiants), d, d, r.choice(('retourne',) * 9 + ('en_cours',)))
+          for d in (r.choice(jours) for _ in range(etudiants * 6))))
+    conn.commit()
+
+def _mesure(conn, repetitions, seed, etudiants):
+    """Durée moyenne (ms) de chaque requête du benchmark"""
+    durees = {}
+    for nom, sql, parametres in BENCHMARK:
+        r = random.Random(seed)
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            conn.execute(sql, parametres(r, etudiants)).fetchall()
+        durees[nom] = (time.perf_counter() - debut) * 1000 / repetitions
+    return durees
+
+def benchmark(etudiants, repetitions=50, seed=42):
+    """Durées avant et après la migration sur une base synthétique"""
+    with tempfile.TemporaryDirectory() as dossier:
+        conn = sqlite3.connect(os.path.join(dossier, 'benchmark.db'))
+        build_schema(conn, avec_migration=False)
+        fill_synthetic(conn, etudiants, seed)
+        avant = _mesure(conn, repetitions, seed, etudiants)
+        install_query_indexes(conn)
+        apres = _mesure(conn, repetitions, seed, etudiants)
+        conn.close()
+    return [(nom, avant[nom], apres[nom]) for nom, _, _ in BENCHMARK]
+
+# ========== LIGNE DE COMMANDE ==========
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conseiller d'index des requêtes des blueprints")
+    parser.add_argument('--sql', action='store_true', help="n'afficher que les CREATE INDEX proposés")
+    parser.add_argument('--sans-migration', action='store_true', help='analyser sans database/schema_indexes.sql')
+    parser.add_argument('--benchmark', type=int, metavar='ETUDIANTS', help='mesurer avant/après la migration')
+    parser.add_argument('--repetitions', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(f"Benchmark: {args.benchmark} étudiants, {args.repetitions} exécutions par requête")
+        print(f"{'requête':<52} {'avant (ms)':>11} {'après (ms)':>11} {'gain':>7}")
+        for nom, avant, apres in benchmark(args.benchmark, args.repetitions):
+            print(f"{nom:<52} {avant:>11.3f} {apres:>11.3f} {avant / apres if apres else 0:>6.1f}x")
+        return 0
+
+    conn = sqlite3.connect(':memory:')
+    build_schema(conn, avec_migration=not args.sans_migration)
+    rapport, propositions = advise(conn, extract_queries())
+
+    if args.sql:
+        for (table, colonnes), emplacements in sorted(propositions.items()):
+            print(f"-- {', '.join(sorted(set(emplacements))[:3])}{' ...' if len(set(emplacements)) > 3 else ''}")
+            print(index_sql(table, colonnes))
+        return 0
+
+    erreurs = [e for e in rapport if e['erreur']]
+    for entree in rapport:
+        if not entree['problemes']:
+            continue
+        print(', '.join(entree['query'].emplacements))
+        for probleme in entree['problemes']:
+            print(f"    {probleme.nature:<9} {probleme.detail}")
+        for table, colonnes in entree['index']:
+            print(f"    -> {table}({', '.join(colonnes)})")
+    print()
+    print(f"{len(rapport)} requêtes, {len(erreurs)} non analysables (SQL dynamique), "
+          f"{sum(any(p.nature == 'parcours' for p in e['problemes']) for e in rapport)} avec parcours complet, "
+          f"{sum(any(p.nature == 'tri' for p in e['problemes']) for e in rapport)} avec tri temporaire, "
+          f"{len(propositions)} index proposés")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Benchmark de charge des routes GET de l'API
+
+Appelle chaque route GET de chaque blueprint avec des clients concurrents
+et mesure, par route: latences p50/p95/p99, débit, codes de retour,
+nombre d'instructions SQL et temps passé en base par requête (en-tête
+Server-Timing du profilage SQL, utils/query_profiler.py). Chaque route est jouée avec le
+premier compte de test (admin, comptable, enseignant1, etudiant1,
+parent1) qui y a accès; les paramètres d'URL (etudiant_id, ...) sont pris
+dans la base, parmi les données visibles de ce compte.
+
+Les résultats sont écrits en JSON (indexés par endpoint, stables d'un
+commit à l'autre); --comparer signale les routes dont le p95 ou le nombre
+de requêtes SQL a augmenté et termine en erreur s'il y en a.
+
+Deux modes:
+- en processus (défaut): l'application est créée sur la base --database
+  et appelée par le client de test Flask, un client par thread;
+- HTTP (--url): un serveur déjà lancé avec DATABASE_PATH=<base> et
+  RATELIMIT_ENABLED=false; --database sert alors aux paramètres d'URL.
+Avec SQL_PROFILING=false, les mesures SQL sont absentes des résultats.
+
+Usage:
+    python scripts/generate_school_data.py                  # database/benchmark.db
+    python scripts/load_benchmark.py                        # 8 clients, 50 requêtes par route
+    python scripts/load_benchmark.py --clients 16 --requetes 200 --filtre 'etudiant|parent'
+    python scripts/load_benchmark.py --url http://localhost:5000
+    python scripts/load_benchmark.py --comparer benchmarks/20260101-120000_abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_DATABASE = BACKEND_DIR / 'database' / 'benchmark.db'
+DEFAULT_OUTPUT_DIR = BACKEND_DIR / 'benchmarks'
+DEFAULT_CLIENTS = 8
+DEFAULT_REQUETES = 50
+DEFAULT_SEUIL = 0.2   # régression: p95 plus de 20 % au-dessus de la référence
+
+# Comptes de test (init_complete_db.py), par ordre d'essai
+COMPTES = ('admin', 'comptable', 'enseignant1', 'etudiant1', 'parent1')
+# Compte essayé en premier pour les routes d'un blueprint
+COMPTE_DU_BLUEPRINT = {
+    'admin': 'admin', 'comptabilite': 'comptable', 'enseignant': 'enseignant1',
+    'etudiant': 'etudiant1', 'parent': 'parent1',
+}
+MOT_DE_PASSE = 'password123'
+
+# Routes non mesurables par des requêtes successives
+EXCLUES = {
+    'chat_realtime.stream_messages': 'flux SSE sans fin',
+}
+
+# Valeur des paramètres d'URL pour le compte qui joue la route (:user_id)
+PARAMETRES = {
+    'etudiant_id': """
+        SELECT COALESCE(
+            (SELECT pe.etudiant_id FROM parent_etudiants pe JOIN parents p ON p.id = pe.parent_id
+             WHERE p.user_id = :user_id ORDER BY pe.etudiant_id LIMIT 1),
+            (SELECT id FROM etudiants WHERE user_id = :user_id),
+            (SELECT e.id FROM etudiants e JOIN classe_matieres cm ON cm.classe_id = e.classe_id
+             WHERE cm.enseignant_id = :user_id ORDER BY e.id LIMIT 1),
+            (SELECT MIN(id) FROM etudiants))
+    """,
+    'conversation_id': """
+        SELECT COALESCE(
+            (SELECT conversation_id FROM participants_conversations WHERE user_id = :user_id
+             ORDER BY conversation_id LIMIT 1),
+            (SELECT MIN(id) FROM conversations))
+    """,
+    'paiement_id': """
+        SELECT COALESCE(
+            (SELECT p.id FROM paiements p JOIN etudiants e ON e.id = p.etudiant_id
+             WHERE e.user_id = :user_id ORDER BY p.id LIMIT 1),
+            (SELECT MIN(id) FROM paiements))
+    """,
+    'user_id': "SELECT MAX(id) FROM users WHERE :user_id IS NOT NULL",
+    'annonce_id': "SELECT MAX(id) FROM annonces WHERE :user_id IS NOT NULL",
+    'bourse_id': "SELECT MIN(id) FROM bourses WHERE :user_id IS NOT NULL",
+    'cours_id': "SELECT MIN(id) FROM cours WHERE :user_id IS NOT NULL",
+    'tableau_id': "SELECT MIN(id) FROM tableaux_bord WHERE user_id = :user_id",
+    'widget_id': "SELECT MIN(id) FROM widgets WHERE :user_id IS NOT NULL",
+    'workflow_id': "SELECT MIN(id) FROM workflows WHERE :user_id IS NOT NULL",
+    'job_id': "SELECT MAX(id) FROM jobs WHERE user_id = :user_id",
+    'numero_dossier': "SELECT MIN(numero_dossier) FROM candidatures WHERE :user_id IS NOT NULL",
+    'url_public': "SELECT MIN(url_public) FROM portfolios WHERE is_public = 1 AND :user_id IS NOT NULL",
+}
+
+# Tables dont le volume est rapporté avec les résultats
+VOLUMES = ('etudiants', 'classes', 'notes', 'moyennes', 'paiements', 'absences', 'messages_chat', 'emprunts',
+           'logs_connexion')
+
+Cible = namedtuple('Cible', ['endpoint', 'chemin', 'compte', 'statut'])
+Reponse = namedtuple('Reponse', ['statut', 'duree', 'sql', 'duree_sql'])
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) sql"')
+
+# ========== CLIENTS ==========
+
+def _reponse(statut, duree, server_timing):
+    """Réponse mesurée; instructions SQL et temps en base lus dans l'en-tête Server-Timing"""
+    mesure = _SERVER_TIMING_DB.search(server_timing or '')
+    if mesure is None:
+        return Reponse(statut, duree, None, None)
+    return Reponse(statut, duree, int(mesure.group(2)), float(mesure.group(1)) / 1000)
+
+class InProcessClient:
+    """Application créée dans ce processus, un client de test par thread"""
+
+    def __init__(self, database):
+        os.environ['DATABASE_PATH'] = str(database)
+        os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+        from app import create_app
+        self.app = create_app()
+        self._local = threading.local()
+
+    def tokens(self, db):
+        """Token d'accès de chaque compte de test, émis comme à la connexion"""
+        from flask_jwt_extended import create_access_token
+        from utils.auth import build_role_claims
+        tokens = {}
+        with self.app.app_context():
+            for username in COMPTES:
+                user = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+                if user:
+                    token = create_access_token(identity=user['id'], additional_claims=build_role_claims(dict(user)))
+                    tokens[username] = (user['id'], token)
+        return tokens
+
+    def get(self, chemin, token):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        debut = time.perf_counter()
+        response = client.get(chemin, headers={'Authorization': f'Bearer {token}'})
+        response.close()
+        return _reponse(response.status_code, time.perf_counter() - debut, response.headers.get('Server-Timing'))
+
+class HttpClient:
+    """Serveur déjà lancé"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def tokens(self, db):
+        tokens = {}
+        for username in COMPTES:
+            requete = urllib.request.Request(
+                f'{self.url}/api/auth/login', method='POST',
+                data=json.dumps({'username': username, 'password': MOT_DE_PASSE}).encode(),
+                headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(requete, timeout=30) as response:
+                    data = json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                print(f"   ⚠️  Connexion de {username} refusée ({e.code})")
+                continue
+            tokens[username] = (data['user']['id'], data['access_token'])
+        return tokens
+
+    def get(self, chemin, token):
+        requete = urllib.request.Request(f'{self.url}{chemin}', headers={'Authorization': f'Bearer {token}'})
+        debut = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requete, timeout=60) as response:
+                response.read()
+                statut, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            statut, headers = e.code, e.headers
+        return _reponse(statut, time.perf_counter() - debut, headers.get('Server-Timing'))
+
+# ========== ROUTES ==========
+
+def discover_routes(app=None):
+    """(endpoint, règle) des routes GET de l'API, triées"""
+    if app is None:
+        os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+        from app import create_app
+        app = create_app()
+    return sorted((rule.endpoint, rule) for rule in app.url_map.iter_rules()
+                  if 'GET' in rule.methods and rule.rule.startswith('/api/'))
+
+def _chemin(rule, db, user_id):
+    """Chemin de la règle avec des paramètres valides pour l'utilisateur (None si impossible)"""
+    valeurs = {}
+    for argument in rule.arguments:
+        if argument not in PARAMETRES or db is None:
+            return None
+        try:
+            valeur = db.execute(PARAMETRES[argument], {'user_id': user_id}).fetchone()[0]
+        except sqlite3.Error:
+            valeur = None
+        if valeur is None:
+            return None
+        valeurs[argument] = valeur
+    chemin = rule.rule
+    for argument, valeur in valeurs.items():
+        chemin = re.sub(rf'<(?:\w+:)?{argument}>', str(valeur), chemin)
+    return chemin
+
+def _comptes_a_essayer(endpoint):
+    prefere = COMPTE_DU_BLUEPRINT.get(endpoint.split('.')[0])
+    return ([prefere] if prefere else []) + [c for c in COMPTES if c != prefere]
+
+def resolve_targets(client, routes, db, tokens, filtre=None):
+    """Compte et chemin de chaque route; la première requête réussie sert de préchauffage
+
+    Retourne (cibles, routes ignorées avec leur raison).
+    """
+    cibles, ignorees = [], {}
+    for endpoint, rule in routes:
+        if filtre and not re.search(filtre, endpoint):
+            continue
+        if endpoint in EXCLUES:
+            ignorees[endpoint] = EXCLUES[endpoint]
+            continue
+        essais = {}
+        for compte in _comptes_a_essayer(endpoint):
+            if compte not in tokens:
+                continue
+            user_id, token = tokens[compte]
+            chemin = _chemin(rule, db, user_id)
+            if chemin is None:
+                essais[compte] = 'paramètres introuvables'
+                continue
+            statut = client.get(chemin, token).statut
+            if statut < 400:
+                cibles.append(Cible(endpoint, chemin, compte, statut))
+                break
+            essais[compte] = statut
+        else:
+            ignorees[endpoint] = ', '.join(f'{c}: {s}' for c, s in essais.items()) or 'aucun compte'
+    return cibles, ignorees
+
+# ========== MESURES ==========
+
+def percentile(valeurs, p):
+    """Percentile p (rang le plus proche) d'une liste triée"""
+    if not valeurs:
+        return None
+    rang = max(1, -(-len(valeurs) * p // 100))
+    return valeurs[int(rang) - 1]
+
+def _resume(reponses, duree):
+    latences = sorted(r.duree * 1000 for r in reponses)
+    profilees = [r for r in reponses if r.sql is not None]
+    return {
+        'requetes': len(reponses),
+        'erreurs': sum(r.statut >= 400 for r in reponses),
+        'statuts': dict(sorted(Counter(str(r.statut) for r in reponses).items())),
+        'p50_ms': round(percentile(latences, 50), 3),
+        'p95_ms': round(percentile(latences, 95), 3),
+        'p99_ms': round(percentile(latences, 99), 3),
+        'moyenne_ms': round(sum(latences) / len(latences), 3),
+        'max_ms': round(latences[-1], 3),
+        'debit_rps': round(len(reponses) / duree, 1) if duree else None,
+        'sql_par_requete': round(sum(r.sql for r in profilees) / len(profilees), 2) if profilees else None,
+        'sql_ms_par_requete': round(sum(r.duree_sql for r in profilees) * 1000 / len(profilees), 3) if profilees else None,
+    }
+
+def run_target(client, cible, token, requetes, clients):
+    """Joue `requetes` requêtes de la cible avec `clients` threads; retourne (réponses, durée)"""
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        debut = time.perf_counter()
+        reponses = list(executor.map(lambda _: client.get(cible.chemin, token), range(requetes)))
+        return reponses, time.perf_counter() - debut
+
+def run_benchmark(client, db, requetes=DEFAULT_REQUETES, clients=DEFAULT_CLIENTS, filtre=None, app=None,
+                  verbose=True):
+    """Mesure toutes les routes; retourne le dictionnaire de résultats"""
+    tokens = client.tokens(db)
+    cibles, ignorees = resolve_targets(client, discover_routes(app), db, tokens, filtre)
+    routes, toutes, duree_totale = {}, [], 0.0
+    for cible in cibles:
+        reponses, duree = run_target(client, cible, tokens[cible.compte][1], requetes, clients)
+        routes[cible.endpoint] = dict(chemin=cible.chemin, compte=cible.compte, **_resume(reponses, duree))
+        toutes.extend(reponses)
+        duree_totale += duree
+        if verbose:
+            r = routes[cible.endpoint]
+            sql = f"{r['sql_par_requete']:>7}" if r['sql_par_requete'] is not None else '      -'
+            print(f"   {cible.endpoint:<52} p50 {r['p50_ms']:>8.1f}  p95 {r['p95_ms']:>8.1f}  "
+                  f"p99 {r['p99_ms']:>8.1f} ms  {r['debit_rps']:>7.1f} req/s  sql {sql}  erreurs {r['erreurs']}",
+                  flush=True)
+    return {
+        'routes': routes,
+        'ignorees': ignorees,
+        'total': _resume(toutes, duree_totale) if toutes else None,
+    }
+
+# ========== RÉSULTATS ==========
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def metadata(db, client, requetes, clients):
+    volumes = {}
+    for table in VOLUMES:
+        try:
+            volumes[table] = db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except (sqlite3.Error, AttributeError):
+            volumes[table] = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'modifications_locales': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'mode': 'http' if isinstance(client, HttpClient) else 'processus',
+        'url': getattr(client, 'url', None),
+        'clients': clients,
+        'requetes_par_route': requetes,
+        'volumes': volumes,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} cœurs",
+    }
+
+def compare(resultats, reference, seuil=DEFAULT_SEUIL):
+    """Routes dont le p95 dépasse la référence de plus de `seuil` ou qui font plus de requêtes SQL"""
+    regressions = []
+    for endpoint, actuel in resultats['routes'].items():
+        ancien = reference.get('routes', {}).get(endpoint)
+        if not ancien:
+            continue
+        if ancien['p95_ms'] and actuel['p95_ms'] > ancien['p95_ms'] * (1 + seuil):
+            regressions.append((endpoint, 'p95_ms', ancien['p95_ms'], actuel['p95_ms']))
+        if ancien.get('sql_par_requete') is not None and actuel.get('sql_par_requete') is not None \
+                and actuel['sql_par_requete'] > ancien['sql_par_requete']:
+            regressions.append((endpoint, 'sql_par_requete', ancien['sql_par_requete'], actuel['sql_par_requete']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de charge des routes GET de l'API")
+    parser.add_argument('--database', default=str(DEFAULT_DATABASE),
+                        help='base synthétique (scripts/generate_school_data.py)')
+    parser.add_argument('--url', help='serveur à mesurer (sinon: application en processus)')
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS, help='clients concurrents')
+    parser.add_argument('--requetes', type=int, default=DEFAULT_REQUETES, help='requêtes par route')
+    parser.add_argument('--filtre', help='expression régulière sur les endpoints (ex. "etudiant|parent")')
+    parser.add_argument('--output', help='fichier JSON des résultats (défaut: benchmarks/<date>_<commit>.json)')
+    parser.add_argument('--comparer', metavar='JSON', help='résultats de référence')
+    parser.add_argument('--seuil', type=float, default=DEFAULT_SEUIL, help='hausse tolérée du p95 (0.2 = 20 %%)')
+    args = parser.parse_args(argv)
+
+    db = None
+    if Path(args.database).exists():
+        db = sqlite3.connect(f"file:{args.database}?mode=ro", uri=True)
+        db.row_factory = sqlite3.Row
+    elif not args.url:
+        parser.error(f"base introuvable: {args.database} (python scripts/generate_school_data.py)")
+
+    client = HttpClient(args.url) if args.url else InProcessClient(args.database)
+    print(f"Benchmark: {args.clients} clients, {args.requetes} requêtes par route")
+    resultats = {'meta': metadata(db, client, args.requetes, args.clients)}
+    resultats.update(run_benchmark(client, db, args.requetes, args.clients, args.filtre,
+                                   app=getattr(client, 'app', None)))
+    total = resultats['total'] or {}
+    print(f"\n{len(resultats['routes'])} routes mesurées, {len(resultats['ignorees'])} ignorées; "
+          f"p50 {total.get('p50_ms')} ms, p95 {total.get('p95_ms')} ms, p99 {total.get('p99_ms')} ms, "
+          f"{total.get('debit_rps')} req/s")
+    for endpoint, raison in resultats['ignorees'].items():
+        print(f"   ignorée: {endpoint} ({raison})")
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / (
+        f"{datetime.now():%Y%m%d-%H%M%S}_{resultats['meta']['commit'] or 'sans-commit'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(resultats, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"Résultats: {output}")
+
+    if args.comparer:
+        reference = json.loads(Path(args.comparer).read_text(encoding='utf-8'))
+        regressions = compare(resultats, reference, args.seuil)
+        print(f"\nComparaison avec {args.comparer} ({reference.get('meta', {}).get('commit')}): "
+              f"{len(regressions)} régression(s)")
+        for endpoint, mesure, avant, apres in regressions:
+            print(f"   {endpoint:<52} {mesure:<16} {avant} -> {apres}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Tests de la détection d'activité suspecte sur fenêtres glissantes
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database.db import init_db_pool
+from utils.anomaly import AnomalyDetector, init_anomaly_detector
+from utils.auth import log_connection
+from utils.security import detect_suspicious_activity
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def detector():
+    return AnomalyDetector()
+
+class TestRules:
+    """Tests des règles de détection"""
+
+    def test_failed_logins_per_user(self, detector):
+        for i in range(5):
+            detector.record_login(7, f'10.0.0.{i}', False, now=1000.0 + i)
+        assert detector.check(7, 'login', '10.0.0.9', now=1010.0) == (False, None)
+        detector.record_login(7, '10.0.0.5', False, now=1010.0)
+        assert detector.check(7, 'login', '10.0.0.9', now=1011.0) == (True, "Trop de tentatives de connexion échouées")
+        # Les échecs sortent de la fenêtre de 15 minutes
+        assert detector.check(7, 'login', '10.0.0.9', now=1001.0 + 900) == (False, None)
+
+    def test_failed_logins_per_ip(self, detector):
+        for user_id in range(21):
+            detector.record_login(None if user_id % 2 else user_id, '10.0.0.1', False, now=0.0)
+        suspect, raison = detector.check(99, 'login', '10.0.0.1', now=1.0)
+        assert suspect and 'adresse IP' in raison
+        assert detector.check(99, 'login', '10.0.0.2', now=1.0) == (False, None)
+
+    def test_distinct_ips_per_user(self, detector):
+        for ip in ('a', 'b', 'a', 'c'):
+            detector.record_login(3, ip, True, now=0.0)
+        assert detector.check(3, 'login', 'd', now=1.0) == (False, None)
+        detector.record_login(3, 'd', True, now=2.0)
+        assert detector.check(3, 'login', 'd', now=3.0) == (True, "Changements d'adresse IP suspects")
+        assert detector.check(3, 'login', 'd', now=3601.0) == (False, None)
+
+    def test_sensitive_actions(self, detector):
+        for _ in range(11):
+            detector.record_action(4, 'export_donnees', now=0.0)
+            detector.record_action(4, 'consultation', now=0.0)
+        assert detector.check(4, 'export_donnees', 'ip', now=1.0) == (True, "Trop d'actions suspectes détectées")
+        assert detector.check(4, 'suppression', 'ip', now=1.0) == (False, None)
+        assert detector.stats()['actions'] == 11
+
+    def test_memory_is_bounded(self):
+        detector = AnomalyDetector(max_keys=50)
+        for i in range(1000):
+            for _ in range(100):
+                detector.record_login(i, f'10.0.{i}', False, now=0.0)
+        assert detector.stats()['fenetres'] == 50
+        assert all(len(f._dates) <= 21 for f, _ in detector._fenetres._data.values())
+
+class TestApplication:
+    """Tests du détecteur de l'application"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        path = str(tmp_path / 'anomaly.db')
+        conn = sqlite3.connect(path)
+        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+        conn.executemany("""
+            INSERT INTO logs_connexion (user_id, username, ip_address, statut, created_at)
+            VALUES (?, 'u', ?, ?, datetime('now', ?))
+        """, [(1, '10.0.0.1', 'echec', '-2 minutes')] * 6 + [(2, '10.0.0.2', 'echec', '-2 hours')] * 6)
+        conn.commit()
+        conn.close()
+        app = Flask(__name__)
+        app.config['DATABASE'] = path
+        init_db_pool(app)
+        init_anomaly_detector(app)
+        return app
+
+    def test_recent_logs_are_reloaded(self, app):
+        with app.app_context():
+            assert detect_suspicious_activity(1, 'login', '10.0.0.9')[0] is True
+            assert detect_suspicious_activity(2, 'login', '10.0.0.9')[0] is False
+
+    def test_log_connection_feeds_detector(self, app):
+        with app.test_request_context():
+            for _ in range(6):
+                log_connection(2, 'u', '10.0.0.2', 'ua', 'echec', 'Identifiants invalides')
+            assert detect_suspicious_activity(2, 'login', '10.0.0.2')[0] is True
+        assert app.extensions['anomaly_detector'].stats()['alertes']['echecs_utilisateur'] == 1
@@ -0,0 +1,127 @@
+"""
+Tests de l'écriture différée du journal d'audit
+"""
+import pytest
+import sys
+import os
+import glob
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database.db import init_db_pool
+from utils.audit_log import AuditWriter, init_audit_log
+from utils.auth import log_action, log_connection
+from utils.security import log_security_event
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'audit.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.close()
+    return path
+
+def _create_app(db_path, **config):
+    app = Flask(__name__)
+    app.config['DATABASE'] = db_path
+    app.config['AUDIT_WRITER_THREAD'] = False
+    app.config.update(config)
+    init_db_pool(app)
+    init_audit_log(app)
+    return app
+
+@pytest.fixture
+def app(db_path):
+    return _create_app(db_path)
+
+def _rows(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+def _writer(app, **options):
+    """Remplace l'écrivain de l'application par un écrivain configuré pour le test"""
+    writer = AuditWriter(app, spill_path=app.extensions['audit_writer'].spill_path, **options)
+    app.extensions['audit_writer'] = writer
+    return writer
+
+class TestAuditWriter:
+    """Tests de la file et de l'écriture par lots"""
+
+    def test_events_are_written_in_batches(self, app, db_path):
+        with app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            log_connection(None, 'inconnu', '10.0.0.1', 'ua', 'echec', 'Identifiants invalides')
+            log_security_event('failed_login', None, {'username': 'inconnu'}, 'warning')
+            log_action(1, 'suppression', 'users', 5, {'nom': 'A'}, None)
+        assert _rows(db_path, "SELECT COUNT(*) FROM logs_connexion") == [(0,)]
+
+        writer = app.extensions['audit_writer']
+        assert writer.flush() == 3
+        assert _rows(db_path, "SELECT user_id, username, statut FROM logs_connexion") == [(0, 'inconnu', 'echec')]
+        assert _rows(db_path, "SELECT user_id, action, ip_address, anciennes_valeurs FROM logs_actions ORDER BY id") == [
+            (0, 'security_failed_login', '10.0.0.1', None), (1, 'suppression', '10.0.0.1', '{"nom": "A"}')]
+        # Date de l'événement, pas de l'écriture
+        assert _rows(db_path, """
+            SELECT COUNT(*) FROM logs_actions WHERE created_at BETWEEN datetime('now', '-1 minute') AND datetime('now')
+        """) == [(2,)]
+        stats = writer.stats()
+        assert (stats['recus'], stats['ecrits'], stats['en_file']) == (3, 3, 0)
+
+    def test_large_queue_uses_several_transactions(self, app, db_path):
+        writer = _writer(app, batch_size=10)
+        for i in range(25):
+            writer.submit('connexion', (i, 'u', 'ip', 'ua', 'succes', None, '2025-01-01 08:00:00'))
+        assert writer.flush() == 25
+        assert writer.stats()['lots'] == 3
+        assert _rows(db_path, "SELECT COUNT(*) FROM logs_connexion") == [(25,)]
+
+    def test_drop_policy(self, app):
+        writer = _writer(app, queue_size=2, overflow='drop')
+        resultats = [writer.submit('connexion', (1, 'u', 'ip', 'ua', 'succes', None, None)) for _ in range(3)]
+        assert resultats == [True, True, False]
+        assert writer.stats()['abandonnes'] == 1
+
+    def test_block_policy_waits_then_drops(self, app):
+        writer = _writer(app, queue_size=1, overflow='block', block_timeout=0.01)
+        writer.submit('connexion', (1, 'u', 'ip', 'ua', 'succes', None, None))
+        assert writer.submit('connexion', (1, 'u', 'ip', 'ua', 'succes', None, None)) is False
+        stats = writer.stats()
+        assert stats['attentes'] == 1 and stats['abandonnes'] == 1
+
+    def test_spill_policy_writes_overflow_later(self, app, db_path):
+        writer = _writer(app, queue_size=1, overflow='spill')
+        for i in range(4):
+            writer.submit('action', (i, 'consultation', None, None, None, None, 'ip', '2025-01-01 08:00:00'))
+        assert len(glob.glob(f"{writer.spill_path}.*.jsonl")) == 1
+        assert writer.flush() == 4
+        assert _rows(db_path, "SELECT user_id FROM logs_actions ORDER BY user_id") == [(0,), (1,), (2,), (3,)]
+        assert glob.glob(f"{writer.spill_path}.*") == []
+        stats = writer.stats()
+        assert (stats['deverses'], stats['repris'], stats['abandonnes']) == (3, 3, 0)
+
+    def test_failed_batch_is_spilled_and_retried(self, app, db_path):
+        writer = app.extensions['audit_writer']
+        writer.submit('connexion', (1, 'u', 'ip', 'ua', 'succes', None, '2025-01-01 08:00:00'))
+        conn = sqlite3.connect(db_path)
+        conn.execute("ALTER TABLE logs_connexion RENAME TO logs_connexion_old")
+        conn.commit()
+        assert writer.flush() == 0
+        assert writer.stats()['erreurs'] >= 1
+        conn.execute("ALTER TABLE logs_connexion_old RENAME TO logs_connexion")
+        conn.commit()
+        conn.close()
+        assert writer.flush() == 1
+        assert _rows(db_path, "SELECT COUNT(*) FROM logs_connexion") == [(1,)]
+
+    def test_synchronous_without_writer(self, db_path):
+        app = _create_app(db_path, AUDIT_ASYNC=False)
+        assert 'audit_writer' not in app.extensions
+        with app.test_request_context(method='POST'):
+            log_connection(2, 'u', 'ip', 'ua', 'succes')
+        assert _rows(db_path, "SELECT user_id, statut FROM logs_connexion") == [(2, 'succes')]
@@ -0,0 +1,150 @@
+"""
+Tests de la génération des bulletins d'une classe (lot)
+"""
+import pytest
+import sys
+import os
+import io
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.job_queue import install_job_queue
+from blueprints.admin import admin_bp
+from blueprints.jobs import jobs_bp
+from utils.document_cache import DocumentCache, install_document_cache
+from utils.jobs import JobWorker
+from utils import auth as auth_utils
+import utils.jobs as jobs_module
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Une classe de trois étudiants actifs (et un inactif) avec leurs moyennes"""
+    path = str(tmp_path / 'bulletins.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'ESA'),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi'),
+            (3, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'Mensah', 'Afi'),
+            (4, 'e3', 'e3@esa.tg', 'x', 'etudiant', 'Koffi', 'Yao'),
+            (5, 'e4', 'e4@esa.tg', 'x', 'etudiant', 'Ancien', 'Eleve');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO filieres (id, code, libelle) VALUES (1, 'INF', 'Informatique');
+        INSERT INTO niveaux (id, code, libelle, ordre) VALUES (1, 'L1', 'Licence 1', 1);
+        INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id)
+        VALUES (1, 'INF-L1', 'Informatique L1', 1, 1, 1);
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths'), (2, 'ALGO', 'Algorithmique');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id, is_active) VALUES
+            (1, 2, 'ESA001', 1, 1, 1), (2, 3, 'ESA002', 1, 1, 1), (3, 4, 'ESA003', 1, 1, 1),
+            (4, 5, 'ESA004', 1, 1, 0);
+        INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id) VALUES
+            (1, 1, 1, 14.5, 'annuel', 1), (1, 2, 1, 12, 'annuel', 1),
+            (2, 1, 1, 9.5, 'annuel', 1);
+    """)
+    install_job_queue(conn)
+    install_document_cache(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Compte les rendus de bulletins"""
+    appels = []
+    original = jobs_module.generate_bulletin
+
+    def generate(etudiant_data, notes_data, output_path):
+        appels.append(output_path)
+        return original(etudiant_data, notes_data, output_path)
+
+    monkeypatch.setattr(jobs_module, 'generate_bulletin', generate)
+    return appels
+
+@pytest.fixture
+def app(db_path, tmp_path, renders):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    app.config['JOB_SYNC_WAIT'] = 10
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    cache = DocumentCache(str(tmp_path / 'documents'))
+    app.extensions['document_cache'] = cache
+    worker = JobWorker(app, max_workers=2, poll_interval=0.05, executor=ThreadPoolExecutor(2), cache=cache)
+    app.extensions['job_worker'] = worker.start()
+    auth_utils._user_cache.clear()
+    yield app
+    worker.stop()
+    auth_utils._user_cache.clear()
+
+def _headers(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=1)}'}
+
+def _wait(client, headers, job_id, timeout=10):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = client.get(f'/api/jobs/{job_id}', headers=headers).get_json()
+        if job['statut'] in ('termine', 'echoue', 'annule'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Travail {job_id} non terminé')
+
+class TestBulletinsClasse:
+    """Tests du lot de bulletins d'une classe"""
+
+    def test_batch_produces_one_bulletin_per_active_student(self, app, renders):
+        client = app.test_client()
+        headers = _headers(app)
+        response = client.post('/api/admin/classes/1/bulletins', headers=headers, json={})
+        assert response.status_code == 202
+        job = _wait(client, headers, response.get_json()['id'])
+        assert job['statut'] == 'termine'
+        assert job['progression'] == job['total'] == 3
+
+        download = client.get(f"/api/jobs/{job['id']}/download", headers=headers)
+        assert download.status_code == 200
+        assert download.mimetype == 'application/zip'
+        with zipfile.ZipFile(io.BytesIO(download.data)) as archive:
+            noms = sorted(archive.namelist())
+            assert noms == ['bulletin_ESA001.pdf', 'bulletin_ESA002.pdf', 'bulletin_ESA003.pdf']
+            assert all(archive.read(nom).startswith(b'%PDF') for nom in noms)
+        assert len(renders) == 3
+
+    def test_cached_bulletins_are_reused(self, app, renders):
+        client = app.test_client()
+        headers = _headers(app)
+        individuel = client.post('/api/jobs', headers=headers,
+                                 json={'type': 'bulletin', 'parametres': {'etudiant_id': 1}})
+        assert _wait(client, headers, individuel.get_json()['id'])['statut'] == 'termine'
+        assert len(renders) == 1
+
+        # Seuls les deux bulletins absents du cache sont rendus
+        lot = client.post('/api/admin/classes/1/bulletins', headers=headers, json={})
+        assert _wait(client, headers, lot.get_json()['id'])['statut'] == 'termine'
+        assert len(renders) == 3
+
+        # Données inchangées: l'archive entière est resservie
+        lot = client.post('/api/admin/classes/1/bulletins', headers=headers, json={})
+        job = _wait(client, headers, lot.get_json()['id'])
+        assert job['statut'] == 'termine'
+        assert len(renders) == 3
+
+    def test_unknown_class(self, app):
+        client = app.test_client()
+        response = client.post('/api/admin/classes/99/bulletins', headers=_headers(app), json={})
+        assert response.status_code == 404
@@ -0,0 +1,248 @@
+"""
+Tests du service de cache (backends, tags, single-flight)
+"""
+import pytest
+import sys
+import os
+import fnmatch
+import sqlite3
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from blueprints.comptabilite import comptabilite_bp
+from blueprints.etudiant import etudiant_bp
+from blueprints.parent import parent_bp
+from utils import auth as auth_utils
+from utils.cache_service import (
+    Cache, MemoryBackend, RedisBackend, init_cache, cached, invalidate_cache, get_cache
+)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+class FakeRedis:
+    """Substitut minimal de redis-py (get / mget / set nx px / delete / scan_iter)"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._alive(key)
+            return entry[0] if entry else None
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and self._alive(key):
+                return None
+            self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def scan_iter(self, match='*'):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+@pytest.fixture(params=['memory', 'redis'])
+def cache(request):
+    if request.param == 'redis':
+        return Cache(RedisBackend(FakeRedis()))
+    return Cache(MemoryBackend())
+
+class TestCache:
+    """Tests de la façade Cache sur les deux backends"""
+
+    def test_get_set_delete(self, cache):
+        assert cache.get('k') is None
+        cache.set('k', {'a': 1})
+        assert cache.get('k') == {'a': 1}
+        cache.delete('k')
+        assert cache.get('k', 'absent') == 'absent'
+
+    def test_expiration(self, cache):
+        cache.set('k', 1, timeout=0.05)
+        time.sleep(0.06)
+        assert cache.get('k') is None
+
+    def test_tag_invalidation(self, cache):
+        cache.set('notes:42', 'a', tags=['etudiant:42', 'classe:7'])
+        cache.set('notes:43', 'b', tags=['etudiant:43', 'classe:7'])
+        cache.set('recu:42', 'c', tags=['paiements'])
+
+        cache.invalidate_tags('etudiant:42')
+        assert cache.get('notes:42') is None
+        assert cache.get('notes:43') == 'b'
+
+        cache.invalidate_tags('classe:7')
+        assert cache.get('notes:43') is None
+        assert cache.get('recu:42') == 'c'
+
+    def test_invalidation_during_computation(self, cache):
+        """Une valeur calculée avant une invalidation n'est pas servie"""
+        def compute():
+            cache.invalidate_tags('paiements')
+            return 'ancien'
+
+        assert cache.get_or_set('solde', compute, tags=['paiements']) == 'ancien'
+        assert cache.get('solde') is None
+
+    def test_single_flight(self, cache):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return 'valeur'
+
+        results = []
+        def worker():
+            results.append(cache.get_or_set('lent', compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+
+        assert results == ['valeur'] * 5
+        assert len(calls) == 1
+        assert cache.stats()['coalesced'] == 4
+
+    def test_unless(self, cache):
+        cache.get_or_set('k', lambda: 'erreur', unless=lambda value: value == 'erreur')
+        assert cache.get('k') is None
+
+class TestCachedDecorator:
+    """Tests du décorateur @cached sur une vue"""
+
+    @pytest.fixture
+    def app(self):
+        app = Flask(__name__)
+        init_cache(app)
+        app.calls = 0
+
+        @app.route('/etudiants/<int:etudiant_id>/solde')
+        @cached(tags=['etudiant:{etudiant_id}'])
+        def solde(etudiant_id):
+            app.calls += 1
+            if etudiant_id == 0:
+                return jsonify({'error': 'Étudiant non trouvé'}), 404
+            return jsonify({'etudiant_id': etudiant_id, 'calcul': app.calls})
+
+        @app.route('/etudiants/<int:etudiant_id>/payer', methods=['POST'])
+        def payer(etudiant_id):
+            invalidate_cache(f'etudiant:{etudiant_id}')
+            return jsonify({})
+
+        return app
+
+    def test_response_cached_and_invalidated(self, app):
+        client = app.test_client()
+        first = client.get('/etudiants/1/solde')
+        assert first.get_json() == {'etudiant_id': 1, 'calcul': 1}
+        assert first.mimetype == 'application/json'
+        assert client.get('/etudiants/1/solde').get_json()['calcul'] == 1
+
+        client.post('/etudiants/1/payer')
+        assert client.get('/etudiants/1/solde').get_json()['calcul'] == 2
+
+    def test_errors_not_cached(self, app):
+        client = app.test_client()
+        assert client.get('/etudiants/0/solde').status_code == 404
+        assert client.get('/etudiants/0/solde').status_code == 404
+        assert app.calls == 2
+
+    def test_memory_fallback_when_redis_unavailable(self):
+        app = Flask(__name__)
+        app.config['CACHE_TYPE'] = 'redis'
+        app.config['CACHE_REDIS_URL'] = 'redis://127.0.0.1:1/0'
+        init_cache(app)
+        with app.app_context():
+            assert isinstance(get_cache().backend, MemoryBackend)
+
+class TestFinancialSituationRoutes:
+    """Tests des routes qui appellent la vue en cache de la comptabilité en passant l'étudiant par position"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        path = str(tmp_path / 'situation.db')
+        conn = sqlite3.connect(path)
+        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+        conn.executescript("""
+            INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+                (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi'),
+                (3, 'p1', 'p1@esa.tg', 'x', 'parent', 'Amah', 'Yao');
+            INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id)
+            VALUES (1, 'L1', 'Licence 1', 1, 1, 1);
+            INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id)
+            VALUES (1, 2, 'ESA001', 1, 1);
+            INSERT INTO parents (id, user_id, lien_parente) VALUES (1, 3, 'pere');
+            INSERT INTO parent_etudiants (parent_id, etudiant_id) VALUES (1, 1);
+            INSERT INTO types_frais (id, code, libelle, montant) VALUES (1, 'SCOL', 'Scolarité', 100000);
+            INSERT INTO frais_classes (classe_id, type_frais_id, montant, annee_academique_id) VALUES (1, 1, 100000, 1);
+            INSERT INTO paiements (etudiant_id, type_frais_id, montant, statut) VALUES (1, 1, 40000, 'valide');
+        """)
+        conn.commit()
+        conn.close()
+
+        app = Flask(__name__)
+        app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+        app.config['DATABASE'] = path
+        JWTManager(app)
+        init_db_pool(app)
+        init_cache(app)
+        app.register_blueprint(comptabilite_bp, url_prefix='/api/comptabilite')
+        app.register_blueprint(etudiant_bp, url_prefix='/api/etudiant')
+        app.register_blueprint(parent_bp, url_prefix='/api/parent')
+        auth_utils._user_cache.clear()
+        yield app
+        auth_utils._user_cache.clear()
+
+    def _get(self, app, url, user_id):
+        with app.app_context():
+            headers = {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+        return app.test_client().get(url, headers=headers)
+
+    def _payer(self, app):
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("INSERT INTO paiements (etudiant_id, type_frais_id, montant, statut) VALUES (1, 1, 60000, 'valide')")
+        conn.commit()
+        conn.close()
+
+    @pytest.mark.parametrize('url, user_id', [
+        ('/api/etudiant/situation-financiere', 2),
+        ('/api/parent/enfants/1/situation-financiere', 3),
+    ])
+    def test_positional_call_is_cached_under_student_tag(self, app, url, user_id):
+        response = self._get(app, url, user_id)
+        assert response.status_code == 200
+        assert response.get_json()['solde'] == 60000
+
+        # Servie depuis le cache jusqu'à l'invalidation du tag de l'étudiant
+        self._payer(app)
+        assert self._get(app, url, user_id).get_json()['solde'] == 60000
+        with app.app_context():
+            invalidate_cache('etudiant:1')
+        assert self._get(app, url, user_id).get_json()['solde'] == 0
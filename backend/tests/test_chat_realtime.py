@@ -0,0 +1,210 @@
+"""
+Tests du chat temps réel (diffusion SSE, compteurs de non lus)
+"""
+import pytest
+import sys
+import os
+import json
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.chat_unread import install_chat_unread
+from blueprints.chat_realtime import chat_realtime_bp
+from utils.realtime import Hub, init_realtime, sse_stream
+from utils import auth as auth_utils
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+
+def _chat_schema():
+    """Section « chat temps réel » de schema_top10.sql"""
+    with open(os.path.join(DATABASE_DIR, 'schema_top10.sql'), 'r', encoding='utf-8') as f:
+        script = f.read()
+    debut = script.index('-- ========== 4. CHAT TEMPS RÉEL')
+    return script[debut:script.index('-- ========== 5.', debut)]
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Une conversation entre deux utilisateurs avec trois messages; un tiers exclu"""
+    path = str(tmp_path / 'chat.db')
+    conn = sqlite3.connect(path)
+    with open(os.path.join(DATABASE_DIR, 'schema.sql'), 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript(_chat_schema())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'ens', 'ens@esa.tg', 'x', 'enseignant', 'Mensah', 'Afi'),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi'),
+            (3, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'Dogbe', 'Yao');
+        INSERT INTO conversations (id, type_conversation, titre, createur_id) VALUES (1, 'individuelle', 'Projet', 1);
+        INSERT INTO participants_conversations (conversation_id, user_id, role) VALUES (1, 1, 'admin'), (1, 2, 'membre');
+        INSERT INTO messages_chat (id, conversation_id, expediteur_id, contenu) VALUES
+            (1, 1, 1, 'Bonjour'), (2, 1, 2, 'Bonjour professeur'), (3, 1, 1, 'Le rapport ?');
+    """)
+    install_chat_unread(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['REALTIME_KEEPALIVE'] = 0.1
+    app.config['CHAT_REPLAY_LIMIT'] = 5
+    JWTManager(app)
+    init_db_pool(app)
+    init_realtime(app)
+    app.register_blueprint(chat_realtime_bp, url_prefix='/api/chat')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+def _next_event(chunks):
+    """Prochain événement SSE du flux (les commentaires de maintien sont ignorés)"""
+    for chunk in chunks:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith(('retry:', ':')):
+            continue
+        champs = dict(ligne.split(': ', 1) for ligne in chunk.strip().split('\n'))
+        return int(champs['id']), json.loads(champs['data'])
+    return None
+
+class TestHub:
+    """Tests du hub de publication/abonnement"""
+
+    def test_publish_reaches_channel_subscribers_only(self):
+        hub = Hub()
+        a = hub.subscribe('conversation:1', 1)
+        b = hub.subscribe('conversation:2', 2)
+        assert hub.publish('conversation:1', {'id': 1, 'data': 'x'}) == 1
+        assert a.get(timeout=0) == {'id': 1, 'data': 'x'}
+        assert b.get(timeout=0) is None
+        hub.unsubscribe(a)
+        assert hub.subscribers('conversation:1') == set()
+
+    def test_slow_subscriber_is_dropped_then_drained(self):
+        hub = Hub(queue_size=2)
+        lent = hub.subscribe('c', 1)
+        for i in range(1, 4):
+            hub.publish('c', {'id': i, 'event': 'message', 'data': i})
+        assert lent.decroche
+        assert hub.stats()['abonnes'] == 0
+        chunks = list(sse_stream(lent, hub, keepalive=0.01))
+        assert [c for c in chunks if c.startswith('id:')] == [
+            'id: 1\nevent: message\ndata: 1\n\n', 'id: 2\nevent: message\ndata: 2\n\n']
+
+    def test_stream_skips_events_already_replayed(self):
+        hub = Hub()
+        subscription = hub.subscribe('c')
+        hub.publish('c', {'id': 2, 'data': 'doublon'})
+        hub.publish('c', {'id': 3, 'data': 'nouveau'})
+        stream = sse_stream(subscription, hub, [{'id': 2, 'data': 'rattrapage'}], keepalive=0.01)
+        chunks = [next(stream) for _ in range(3)]
+        assert chunks[1:] == ['id: 2\ndata: "rattrapage"\n\n', 'id: 3\ndata: "nouveau"\n\n']
+        stream.close()
+        assert hub.stats()['abonnes'] == 0
+
+class TestChatStream:
+    """Tests du flux SSE des conversations"""
+
+    def test_replay_then_live_delivery(self, app):
+        client = app.test_client()
+        response = client.get('/api/chat/conversations/1/stream',
+                              headers={**_headers(app, 2), 'Last-Event-ID': '1'}, buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert _next_event(chunks)[0] == 2
+        assert _next_event(chunks)[0] == 3
+
+        envoi = client.post('/api/chat/conversations/1/messages', json={'contenu': 'En cours'},
+                            headers=_headers(app, 1))
+        assert envoi.status_code == 201
+        message_id, message = _next_event(chunks)
+        assert message_id == envoi.get_json()['message_id']
+        assert message['contenu'] == 'En cours'
+        assert message['expediteur_nom'] == 'Mensah'
+        response.close()
+        assert app.extensions['realtime_hub'].stats()['abonnes'] == 0
+
+    def test_replay_beyond_limit_ends_stream(self, app, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO messages_chat (conversation_id, expediteur_id, contenu) VALUES (1, 1, ?)",
+                         [(f'm{i}',) for i in range(10)])
+        conn.commit()
+        conn.close()
+        client = app.test_client()
+        response = client.get('/api/chat/conversations/1/stream?last_id=1', headers=_headers(app, 2))
+        ids = [int(l[4:]) for l in response.get_data(as_text=True).split('\n') if l.startswith('id: ')]
+        assert ids == [2, 3, 4, 5, 6]
+        assert app.extensions['realtime_hub'].stats()['abonnes'] == 0
+
+    def test_non_participant_is_refused(self, app):
+        client = app.test_client()
+        assert client.get('/api/chat/conversations/1/stream', headers=_headers(app, 3)).status_code == 403
+        assert client.get('/api/chat/conversations/1/messages', headers=_headers(app, 3)).status_code == 403
+        assert client.post('/api/chat/conversations/1/read', headers=_headers(app, 3)).status_code == 403
+
+    def test_history_read_does_not_write(self, app, db_path):
+        client = app.test_client()
+        response = client.get('/api/chat/conversations/1/messages?before_id=3&limit=1', headers=_headers(app, 2))
+        assert [m['id'] for m in response.get_json()] == [2]
+
+        conn = sqlite3.connect(db_path)
+        lecture = "SELECT date_derniere_lecture FROM participants_conversations WHERE user_id = 2"
+        assert conn.execute(lecture).fetchone()[0] is None
+        assert client.post('/api/chat/conversations/1/read', headers=_headers(app, 2)).status_code == 200
+        assert conn.execute(lecture).fetchone()[0] is not None
+        conn.close()
+
+class TestUnreadCounters:
+    """Tests des compteurs de messages non lus"""
+
+    def _inbox(self, client, app, user_id):
+        return {c['id']: c['messages_non_lus']
+                for c in client.get('/api/chat/conversations', headers=_headers(app, user_id)).get_json()}
+
+    def test_counters_rebuilt_from_existing_messages(self, app):
+        client = app.test_client()
+        assert self._inbox(client, app, 1) == {1: 1}
+        assert self._inbox(client, app, 2) == {1: 2}
+        assert self._inbox(client, app, 3) == {}
+
+    def test_send_increments_others_and_read_resets(self, app):
+        client = app.test_client()
+        client.post('/api/chat/conversations/1/messages', json={'contenu': 'Relance'}, headers=_headers(app, 1))
+        assert self._inbox(client, app, 1) == {1: 1}
+        assert client.get('/api/chat/unread', headers=_headers(app, 2)).get_json() == {'total': 3, 'conversations': 1}
+
+        client.post('/api/chat/conversations/1/read', headers=_headers(app, 2))
+        assert self._inbox(client, app, 2) == {1: 0}
+        assert client.get('/api/chat/unread', headers=_headers(app, 2)).get_json() == {'total': 0, 'conversations': 0}
+
+    def test_leaving_conversation_drops_counter(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM participants_conversations WHERE user_id = 2")
+        assert conn.execute("SELECT COUNT(*) FROM chat_non_lus WHERE user_id = 2").fetchone()[0] == 0
+        conn.close()
+
+    def test_inbox_is_an_indexed_join(self, db_path):
+        conn = sqlite3.connect(db_path)
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT c.*, COALESCE(n.nombre, 0) FROM participants_conversations p
+            JOIN conversations c ON c.id = p.conversation_id
+            LEFT JOIN chat_non_lus n ON n.user_id = p.user_id AND n.conversation_id = p.conversation_id
+            WHERE p.user_id = ? AND c.is_active = 1
+        """, (2,)).fetchall()
+        conn.close()
+        details = ' '.join(row[3] for row in plan)
+        assert 'idx_participants_conversations_user' in details
+        assert 'SCAN n' not in details and 'CORRELATED' not in details
@@ -0,0 +1,209 @@
+"""
+Tests du pool de connexions SQLite
+"""
+import pytest
+import sys
+import os
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database.pool import ConnectionPool, PoolTimeout
+from database.db import init_db_pool, get_db, get_db_connection, get_pool
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Base de données fichier temporaire"""
+    path = str(tmp_path / 'pool.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, label TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def pool(db_path):
+    pool = ConnectionPool(db_path, max_size=2, timeout=0.2)
+    yield pool
+    pool.close()
+
+class TestConnectionPool:
+    """Tests du ConnectionPool"""
+
+    def test_pragmas_applied(self, pool):
+        """Les PRAGMAs WAL / synchronous / busy_timeout sont appliqués"""
+        conn = pool.acquire()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        pool.release(conn)
+
+    def test_connection_reused(self, pool):
+        """Une connexion rendue est réutilisée par le même thread"""
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+        assert second is first
+        pool.release(second)
+
+        stats = pool.stats()
+        assert stats['checkouts'] == 2
+        assert stats['connections_created'] == 1
+
+    def test_timeout_when_exhausted(self, pool):
+        """Le pool saturé lève PoolTimeout"""
+        a = pool.acquire()
+        b = pool.acquire()
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+        assert pool.stats()['timeouts'] == 1
+        pool.release(a)
+        pool.release(b)
+
+    def test_waiter_is_woken_on_release(self, pool):
+        """Un thread en attente obtient la connexion rendue"""
+        a = pool.acquire()
+        b = pool.acquire()
+        obtained = []
+
+        def worker():
+            conn = pool.acquire(timeout=2)
+            obtained.append(conn)
+            pool.release(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        pool.release(a)
+        thread.join(timeout=2)
+        pool.release(b)
+
+        assert obtained == [a]
+        assert pool.stats()['wait_time_max_ms'] > 0
+
+    def test_release_rolls_back_open_transaction(self, pool):
+        """Une transaction non validée est annulée au retour dans le pool"""
+        conn = pool.acquire()
+        conn.execute("INSERT INTO items (label) VALUES ('x')")
+        pool.release(conn)
+
+        conn = pool.acquire()
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        pool.release(conn)
+
+class TestFlaskIntegration:
+    """Tests de l'intégration avec get_db()"""
+
+    def test_get_db_uses_pool(self, db_path):
+        app = Flask(__name__)
+        app.config['DATABASE'] = db_path
+        init_db_pool(app)
+
+        with app.app_context():
+            db = get_db()
+            assert db is get_db()
+            assert db.pool is get_pool()
+            assert get_pool().stats()['in_use'] == 1
+
+        # Connexion rendue à la fin du contexte
+        assert get_pool(app).stats()['in_use'] == 0
+        assert get_pool(app).stats()['idle'] == 1
+
+class TestReadWriteSplit:
+    """Tests de la séparation lecture / écriture"""
+
+    @pytest.fixture
+    def app(self, db_path):
+        from database.db import writes_db
+        from flask import jsonify
+
+        app = Flask(__name__)
+        app.config['DATABASE'] = db_path
+        init_db_pool(app)
+
+        @app.route('/items', methods=['GET', 'POST'])
+        def items():
+            db = get_db()
+            return jsonify({'read_only': db.read_only})
+
+        @app.route('/touch', methods=['GET'])
+        @writes_db
+        def touch():
+            db = get_db()
+            db.execute("INSERT INTO items (label) VALUES ('touch')")
+            db.commit()
+            return jsonify({'read_only': db.read_only})
+
+        return app
+
+    def test_read_only_pool_rejects_writes(self, db_path):
+        pool = ConnectionPool(db_path, read_only=True)
+        conn = pool.acquire()
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO items (label) VALUES ('x')")
+        pool.release(conn)
+        pool.close()
+
+    def test_get_routed_to_reader(self, app):
+        client = app.test_client()
+        assert client.get('/items').get_json() == {'read_only': True}
+        assert client.post('/items').get_json() == {'read_only': False}
+        assert get_pool(app, read_only=True).stats()['checkouts'] == 1
+
+    def test_writes_db_marker(self, app):
+        client = app.test_client()
+        assert client.get('/touch').get_json() == {'read_only': False}
+        assert client.get('/touch').status_code == 200
+
+    def test_single_writer(self, app):
+        assert get_pool(app).max_size == 1
+        assert get_pool(app, read_only=True).max_size > 1
+
+    def test_nested_connection_reuses_request_writer(self, app):
+        """Un helper qui demande une connexion dans une requête POST ne s'attend pas lui-même"""
+        get_pool(app).timeout = 0.2
+
+        @app.route('/nested', methods=['POST'])
+        def nested():
+            db = get_db()
+            db.execute("INSERT INTO items (label) VALUES ('vue')")
+            with get_db_connection() as helper:
+                helper.execute("INSERT INTO items (label) VALUES ('helper')")
+                helper.commit()
+            with get_db_connection(read_only=True) as lecture:
+                nombre = lecture.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            return {'meme': helper is db and lecture is db, 'nombre': nombre}
+
+        assert app.test_client().post('/nested').get_json() == {'meme': True, 'nombre': 2}
+        assert get_pool(app).stats()['in_use'] == 0
+
+    def test_nested_read_reuses_request_reader(self, app):
+        """Une lecture imbriquée dans un GET n'emprunte pas un second lecteur"""
+        @app.route('/lecture')
+        def lecture():
+            db = get_db()
+            with get_db_connection(read_only=True) as nested:
+                meme = nested is db
+            return {'meme': meme}
+
+        client = app.test_client()
+        assert client.get('/lecture').get_json() == {'meme': True}
+        stats = get_pool(app, read_only=True).stats()
+        assert (stats['checkouts'], stats['in_use']) == (1, 0)
+
+    def test_read_without_held_connection_is_released(self, app):
+        """Sans connexion détenue, la lecture emprunte un lecteur le temps du bloc"""
+        with app.test_request_context('/items', method='POST'):
+            with get_db_connection(read_only=True) as db:
+                assert db.read_only
+                assert get_pool(app, read_only=True).stats()['in_use'] == 1
+            assert get_pool(app, read_only=True).stats()['in_use'] == 0
+            assert get_pool(app).stats()['in_use'] == 0
+
+    def test_memory_database_has_no_reader(self):
+        app = Flask(__name__)
+        app.config['DATABASE'] = ':memory:'
+        init_db_pool(app)
+        assert get_pool(app, read_only=True) is None
@@ -0,0 +1,201 @@
+"""
+Tests du cache des documents générés
+"""
+import pytest
+import sys
+import os
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool, get_pool
+from database.job_queue import install_job_queue
+from blueprints.etudiant import etudiant_bp
+from blueprints.exports import exports_bp
+from utils.document_cache import DocumentCache, install_document_cache, document_key
+from utils import jobs
+from utils.jobs import JobWorker, prepare_liste_etudiants
+from utils import auth as auth_utils
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Un étudiant avec une moyenne"""
+    path = str(tmp_path / 'documents.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, annee_academique_id) VALUES (1, 2, 'ESA001', 1);
+        INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+        VALUES (1, 1, 1, 14.5, 'annuel', 1);
+    """)
+    install_job_queue(conn)
+    install_document_cache(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path, tmp_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    app.config['JOB_SYNC_WAIT'] = 10
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(etudiant_bp, url_prefix='/api/etudiant')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    cache = DocumentCache(str(tmp_path / 'documents'))
+    app.extensions['document_cache'] = cache
+    worker = JobWorker(app, max_workers=1, poll_interval=0.05, executor=ThreadPoolExecutor(1), cache=cache)
+    app.extensions['job_worker'] = worker.start()
+    auth_utils._user_cache.clear()
+    yield app
+    worker.stop()
+    auth_utils._user_cache.clear()
+
+def _headers(app, **extra):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=2)}', **extra}
+
+def _count(app, sql):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+class TestDocumentCache:
+    """Tests du cache adressé par le contenu"""
+
+    def test_bulletin_is_rendered_once_and_revalidated(self, app):
+        client = app.test_client()
+        first = client.get('/api/etudiant/bulletin', headers=_headers(app))
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+
+        second = client.get('/api/etudiant/bulletin', headers=_headers(app))
+        assert second.status_code == 200
+        assert second.headers['ETag'] == etag
+        assert second.headers['Last-Modified']
+        assert second.data == first.data
+        # Un seul travail: le second téléchargement vient du cache
+        assert _count(app, "SELECT COUNT(*) FROM jobs") == 1
+
+        response = client.get('/api/etudiant/bulletin', headers=_headers(app, **{'If-None-Match': etag}))
+        assert response.status_code == 304
+
+    def test_pdf_export_touches_entry_on_request_writer(self, app):
+        client = app.test_client()
+        # Un seul écrivain: un second emprunt pendant le POST échouerait au bout du délai
+        get_pool(app).timeout = 0.5
+        data = {'type_export': 'pdf', 'donnees_type': 'bulletin'}
+        first = client.post('/api/exports/export', json=data, headers=_headers(app))
+        assert first.status_code == 200
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("UPDATE documents_cache SET date_acces = datetime('now', '-2 hours')")
+        conn.commit()
+        conn.close()
+        second = client.post('/api/exports/export', json=data, headers=_headers(app))
+        assert second.status_code == 200
+        assert second.data == first.data
+        assert _count(app, "SELECT COUNT(*) FROM documents_cache "
+                           "WHERE date_acces > datetime('now', '-1 minute')") == 1
+        assert _count(app, "SELECT COUNT(*) FROM jobs") == 1
+
+    def test_new_moyenne_invalidates_bulletin(self, app):
+        client = app.test_client()
+        etag = client.get('/api/etudiant/bulletin', headers=_headers(app)).headers['ETag']
+        assert _count(app, "SELECT COUNT(*) FROM documents_cache") == 1
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("UPDATE moyennes SET moyenne = 16 WHERE etudiant_id = 1")
+        conn.commit()
+        conn.close()
+        assert _count(app, "SELECT COUNT(*) FROM documents_cache") == 0
+
+        response = client.get('/api/etudiant/bulletin', headers=_headers(app, **{'If-None-Match': etag}))
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert _count(app, "SELECT COUNT(*) FROM jobs") == 2
+
+    def test_edition_date_is_part_of_the_key(self, db_path, monkeypatch):
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        maintenant = [datetime(2025, 3, 12, 9, 30)]
+
+        class Horloge(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return maintenant[0]
+
+        monkeypatch.setattr(jobs, 'datetime', Horloge)
+        cles = []
+        for instant in (datetime(2025, 3, 12, 9, 30), datetime(2025, 3, 12, 18, 0), datetime(2025, 3, 13, 8, 0)):
+            maintenant[0] = instant
+            document = prepare_liste_etudiants(conn, {})
+            cles.append(document_key(document['type'], document, jobs.TEMPLATE_VERSION))
+        conn.close()
+        # Le gabarit imprime la date passée: même jour, même document; le lendemain, nouveau rendu
+        assert document['args'][1] == '13/03/2025'
+        assert cles[0] == cles[1] != cles[2]
+
+    def test_size_cap_evicts_least_recently_used(self, db_path, tmp_path):
+        cache = DocumentCache(str(tmp_path / 'lru'), max_bytes=300)
+        db = sqlite3.connect(db_path)
+        db.row_factory = sqlite3.Row
+        for i, key in enumerate(('a' * 64, 'b' * 64, 'c' * 64)):
+            source = cache.staging_path(key)
+            with open(source, 'wb') as f:
+                f.write(b'x' * 100)
+            cache.put(db, key, source, 'liste_etudiants')
+            db.execute("UPDATE documents_cache SET date_acces = datetime('now', ?) WHERE cle = ?",
+                       (f'-{10 - i} minutes', key))
+        # 'a' plus récemment servi que 'b'
+        cache.touch(db, 'a' * 64)
+        cache.max_bytes = 250
+        assert cache.evict(db) == 1
+
+        assert {row['cle'][0] for row in db.execute("SELECT cle FROM documents_cache")} == {'a', 'c'}
+        assert not os.path.exists(cache.path('b' * 64))
+        assert cache.get(db, 'a' * 64) is not None
+        db.close()
+
+    def test_orphan_files_are_swept_outside_put(self, db_path, tmp_path, monkeypatch):
+        cache = DocumentCache(str(tmp_path / 'orphelins'))
+        db = sqlite3.connect(db_path)
+        db.row_factory = sqlite3.Row
+        orphelin = cache.path('d' * 64)
+        os.makedirs(os.path.dirname(orphelin))
+        with open(orphelin, 'wb') as f:
+            f.write(b'x')
+        os.utime(orphelin, (0, 0))
+
+        # put() ne parcourt pas le répertoire (transaction d'écriture ouverte)
+        def scandir(path):
+            raise AssertionError('répertoire parcouru pendant put()')
+        with monkeypatch.context() as m:
+            m.setattr(os, 'scandir', scandir)
+            source = cache.staging_path('e' * 64)
+            with open(source, 'wb') as f:
+                f.write(b'pdf')
+            cache.put(db, 'e' * 64, source, 'bulletin')
+        db.commit()
+        assert os.path.exists(orphelin)
+
+        assert cache.sweep(db) == 1
+        assert not os.path.exists(orphelin)
+        assert os.path.exists(cache.path('e' * 64))
+        db.close()
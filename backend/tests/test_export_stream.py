@@ -0,0 +1,161 @@
+"""
+Tests des exports en flux
+"""
+import pytest
+import sys
+import os
+import json
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool, get_pool
+from blueprints import exports
+from blueprints.exports import exports_bp
+from utils.export_stream import csv_chunks, json_chunks
+from utils import auth as auth_utils
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+NOMBRE_ETUDIANTS = 1200
+
+@pytest.fixture
+def app(tmp_path):
+    """Base avec 1200 étudiants et l'historique des exports"""
+    db_path = str(tmp_path / 'exports.db')
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(DATABASE_DIR, 'schema.sql'), 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        CREATE TABLE historique_exports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            template_id INTEGER,
+            type_export VARCHAR(50),
+            fichier_path VARCHAR(255),
+            parametres TEXT,
+            nombre_lignes INTEGER,
+            taille_fichier INTEGER,
+            date_export TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'A'),
+            (2, 'etu', 'etu@esa.tg', 'x', 'etudiant', 'Etu', 'A');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+    """)
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES (?, ?, ?, 'x', 'etudiant', ?, 'Prénom')",
+        [(100 + i, f'u{i}', f'u{i}@esa.tg', f'Nom{i}') for i in range(NOMBRE_ETUDIANTS)]
+    )
+    conn.executemany(
+        "INSERT INTO etudiants (user_id, numero_etudiant, annee_academique_id) VALUES (?, ?, 1)",
+        [(100 + i, f'ESA{i:05d}') for i in range(NOMBRE_ETUDIANTS)]
+    )
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+class TestExportChunks:
+    """Tests des générateurs de blocs"""
+
+    def test_csv_chunks(self):
+        rows = [{'a': i, 'b': f'x{i}'} for i in range(5)]
+        stats = {}
+        data = b''.join(csv_chunks(rows, [('A', 'a'), ('B', lambda r: r['b'].upper())], chunk_size=2, stats=stats))
+        lines = data.decode('utf-8-sig').splitlines()
+        assert lines[0] == 'A,B'
+        assert lines[-1] == '4,X4'
+        assert stats == {'lignes': 5, 'octets': len(data)}
+
+    @pytest.mark.parametrize('count', [0, 1, 7])
+    def test_json_chunks(self, count):
+        rows = [{'id': i} for i in range(count)]
+        assert json.loads(b''.join(json_chunks(rows, chunk_size=3))) == rows
+        ndjson = b''.join(json_chunks(rows, chunk_size=3, ndjson=True)).decode('utf-8')
+        assert [json.loads(line) for line in ndjson.splitlines()] == rows
+
+class TestExportEndpoint:
+    """Tests de POST /api/exports/export"""
+
+    def test_csv_export_is_streamed_without_limit(self, app):
+        client = app.test_client()
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'csv', 'donnees_type': 'liste_etudiants'})
+        assert response.status_code == 200
+        assert response.is_streamed
+        lines = response.get_data().decode('utf-8-sig').splitlines()
+        assert len(lines) == NOMBRE_ETUDIANTS + 1
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        historique = conn.execute("SELECT type_export, nombre_lignes, taille_fichier FROM historique_exports").fetchall()
+        conn.close()
+        assert historique == [('csv', NOMBRE_ETUDIANTS, len(response.get_data()))]
+
+    def test_json_and_ndjson_exports(self, app):
+        client = app.test_client()
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'json', 'donnees_type': 'liste_etudiants'})
+        assert len(json.loads(response.get_data())) == NOMBRE_ETUDIANTS
+
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'ndjson', 'donnees_type': 'liste_etudiants'})
+        assert response.mimetype == 'application/x-ndjson'
+        assert len(response.get_data().splitlines()) == NOMBRE_ETUDIANTS
+
+    def test_xlsx_export_releases_writer(self, app, monkeypatch):
+        def write_xlsx(path, title, rows, columns, stats=None):
+            # openpyxl absent de l'environnement de test: une ligne par étudiant
+            ecrivain.append(get_pool(app).stats()['in_use'])
+            nombre = 0
+            with open(path, 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(f"{row['numero_etudiant']}\n")
+                    nombre += 1
+            return nombre
+
+        ecrivain = []
+        monkeypatch.setattr(exports, 'write_xlsx', write_xlsx)
+        # Un seul écrivain: un second emprunt pendant le POST échouerait au bout du délai
+        get_pool(app).timeout = 0.5
+        client = app.test_client()
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'excel', 'donnees_type': 'liste_etudiants'})
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'] == 'attachment; filename=liste_etudiants.xlsx'
+        taille = len(response.get_data())
+        assert len(response.get_data().splitlines()) == NOMBRE_ETUDIANTS
+        response.close()
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        historique = conn.execute("SELECT type_export, fichier_path, nombre_lignes, taille_fichier "
+                                  "FROM historique_exports").fetchall()
+        conn.close()
+        assert historique == [('excel', None, NOMBRE_ETUDIANTS, taille)]
+        # Connexion d'écriture libre pendant l'écriture du classeur
+        assert ecrivain == [0]
+        # Fichier temporaire supprimé une fois la réponse envoyée
+        assert os.listdir(os.path.join(app.config['UPLOAD_FOLDER'], 'exports')) == []
+
+    def test_access_by_role(self, app):
+        client = app.test_client()
+        response = client.post('/api/exports/export', headers=_headers(app, 2),
+                               json={'type_export': 'csv', 'donnees_type': 'paiements'})
+        assert response.status_code == 403
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'csv', 'donnees_type': 'inconnu'})
+        assert response.status_code == 400
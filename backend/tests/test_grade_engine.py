@@ -0,0 +1,105 @@
+"""
+Tests du moteur de calcul des moyennes et classements
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.grade_engine import install_grade_engine, record_validated_notes, apply_note
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db(tmp_path):
+    """Classe de trois étudiants avec deux matières"""
+    conn = sqlite3.connect(str(tmp_path / 'grades.db'))
+    conn.row_factory = sqlite3.Row
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO filieres (id, code, libelle) VALUES (1, 'INF', 'Informatique');
+        INSERT INTO niveaux (id, code, libelle, ordre) VALUES (1, 'L1', 'Licence 1', 1);
+        INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id) VALUES (1, 'INF1', 'INF1', 1, 1, 1);
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths'), (2, 'ECO', 'Économie');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id) VALUES
+            (1, 1, 'N1', 1, 1), (2, 2, 'N2', 1, 1), (3, 3, 'N3', 1, 1);
+    """)
+    install_grade_engine(conn)
+    yield conn
+    conn.close()
+
+def _note(etudiant_id, matiere_id, note, coefficient=1.0):
+    return {'etudiant_id': etudiant_id, 'matiere_id': matiere_id, 'classe_id': 1,
+            'note': note, 'coefficient': coefficient}
+
+def _moyenne(db, etudiant_id, matiere_id):
+    return db.execute("""
+        SELECT moyenne FROM moyennes WHERE etudiant_id = ? AND matiere_id = ? AND periode = 'annuel'
+    """, (etudiant_id, matiere_id)).fetchone()['moyenne']
+
+def _rangs(db):
+    return {r['etudiant_id']: r['rang'] for r in db.execute("SELECT etudiant_id, rang FROM classements")}
+
+class TestGradeEngine:
+    """Tests des moyennes pondérées et du classement"""
+
+    def test_weighted_average(self, db):
+        record_validated_notes(db, [_note(1, 1, 10, 1), _note(1, 1, 16, 2)])
+        db.commit()
+        assert _moyenne(db, 1, 1) == pytest.approx(14.0)
+        assert db.execute("SELECT COUNT(*) FROM moyennes").fetchone()[0] == 1
+
+        apply_note(db, 1, 1, 1, 16, 2, sign=-1)
+        assert _moyenne(db, 1, 1) == pytest.approx(10.0)
+
+    def test_classement_with_ties(self, db):
+        record_validated_notes(db, [
+            _note(1, 1, 12), _note(1, 2, 14),
+            _note(2, 1, 15), _note(2, 2, 15),
+            _note(3, 1, 13),
+        ])
+        db.commit()
+        assert _rangs(db) == {1: 2, 2: 1, 3: 2}
+
+        record_validated_notes(db, [_note(3, 2, 20)])
+        db.commit()
+        assert _rangs(db) == {1: 3, 2: 2, 3: 1}
+        assert db.execute("SELECT COUNT(*) FROM classements").fetchone()[0] == 3
+
+    def test_matches_full_recomputation(self, db):
+        notes = [_note(e, m, (e * 7 + m * 3) % 21, 1 + (e + m) % 3) for e in (1, 2, 3) for m in (1, 2)]
+        for n in notes:
+            db.execute("""
+                INSERT INTO notes (etudiant_id, matiere_id, classe_id, type_note, note, coefficient, enseignant_id, is_valide)
+                VALUES (?, ?, ?, 'devoir', ?, ?, 1, 1)
+            """, (n['etudiant_id'], n['matiere_id'], n['classe_id'], n['note'], n['coefficient']))
+        record_validated_notes(db, notes)
+        db.commit()
+
+        expected = db.execute("""
+            SELECT etudiant_id, matiere_id, SUM(note * coefficient) / SUM(coefficient) as moyenne
+            FROM notes WHERE is_valide = 1 GROUP BY etudiant_id, matiere_id
+        """).fetchall()
+        for row in expected:
+            assert _moyenne(db, row['etudiant_id'], row['matiere_id']) == pytest.approx(row['moyenne'])
+
+    def test_install_backfills_and_deduplicates(self, tmp_path):
+        conn = sqlite3.connect(str(tmp_path / 'legacy.db'))
+        conn.row_factory = sqlite3.Row
+        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+        conn.executescript("""
+            INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+            VALUES (1, 1, 1, 12, 'annuel', 1), (1, 1, 1, 13, 'annuel', 1);
+            INSERT INTO notes (etudiant_id, matiere_id, classe_id, type_note, note, coefficient, enseignant_id, is_valide)
+            VALUES (1, 1, 1, 'devoir', 12, 1, 1, 1);
+        """)
+        install_grade_engine(conn)
+        assert conn.execute("SELECT COUNT(*) FROM moyennes").fetchone()[0] == 1
+        assert conn.execute("SELECT nombre_notes FROM notes_agregats").fetchone()[0] == 1
+        install_grade_engine(conn)
+        conn.close()
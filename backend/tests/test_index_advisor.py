@@ -0,0 +1,88 @@
+"""
+Tests du conseiller d'index et de la migration des index composites
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.query_indexes import install_query_indexes
+from scripts.index_advisor import Probleme, Query, advise, build_schema, explain, extract_queries, problems, propose_index
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE matieres (id INTEGER PRIMARY KEY, libelle TEXT);
+        CREATE TABLE notes (id INTEGER PRIMARY KEY, etudiant_id INTEGER, matiere_id INTEGER,
+                            note REAL, is_valide INTEGER, date_note DATE);
+        CREATE INDEX idx_notes_etudiant ON notes(etudiant_id);
+    """)
+    return conn
+
+class TestExtraction:
+    """Tests de l'extraction des requêtes des modules"""
+
+    def test_literals_and_fstrings(self, tmp_path):
+        (tmp_path / 'module.py').write_text(
+            'def route(db, colonnes):\n'
+            '    db.execute("""\n        SELECT * FROM notes\n        WHERE etudiant_id = ?\n    """)\n'
+            '    db.execute(f"SELECT {colonnes} FROM notes WHERE id = ?")\n'
+            '    db.execute("SELECT * FROM notes WHERE etudiant_id = ?")\n'
+            '    return "Sélectionnez une matière"\n', encoding='utf-8')
+        queries = {q.sql: q.emplacements for q in extract_queries(tmp_path)}
+        assert set(queries) == {'SELECT * FROM notes WHERE etudiant_id = ?', 'SELECT ? FROM notes WHERE id = ?'}
+        assert len(queries['SELECT * FROM notes WHERE etudiant_id = ?']) == 2
+
+class TestAnalyse:
+    """Tests des problèmes signalés et des index proposés"""
+
+    def _advise(self, conn, sql):
+        plan, erreur = explain(conn, sql)
+        assert erreur is None
+        return [(p, propose_index(conn, sql, p)) for p in problems(conn, sql, plan)]
+
+    def test_full_scan_proposes_equalities_then_range(self, conn):
+        resultat = self._advise(conn, """
+            SELECT AVG(n.note) FROM notes n JOIN matieres m ON n.matiere_id = m.id
+            WHERE n.is_valide = 1 AND n.date_note >= ?
+        """)
+        assert resultat == [(Probleme('notes', 'n', 'parcours', 'SCAN n'), ('is_valide', 'matiere_id', 'date_note'))]
+
+    def test_sort_columns_are_appended(self, conn):
+        conn.execute("DROP INDEX idx_notes_etudiant")
+        sql = "SELECT * FROM notes WHERE etudiant_id = ? ORDER BY date_note DESC"
+        resultat = self._advise(conn, sql)
+        assert [colonnes for _, colonnes in resultat] == [('etudiant_id',), ('etudiant_id', 'date_note')]
+        # L'index du filtre préfixe celui du tri: une seule proposition
+        _, propositions = advise(conn, [Query(sql, ['module.py:1'])])
+        assert list(propositions) == [('notes', ('etudiant_id', 'date_note'))]
+
+    def test_no_proposal_when_sort_is_on_expression(self, conn):
+        resultat = self._advise(conn, "SELECT matiere_id, AVG(note) AS moyenne FROM notes GROUP BY matiere_id ORDER BY moyenne")
+        assert [p.nature for p, _ in resultat] == ['parcours', 'tri', 'tri']
+        assert resultat[2][1] is None
+
+    def test_existing_index_is_not_proposed_again(self, conn):
+        assert self._advise(conn, "SELECT * FROM notes WHERE etudiant_id = ?") == []
+
+class TestMigration:
+    """Tests de la migration livrée"""
+
+    def test_migration_removes_scans(self):
+        conn = sqlite3.connect(':memory:')
+        build_schema(conn, avec_migration=False)
+        sql = "SELECT id FROM emprunts WHERE exemplaire_id = ? AND statut = 'en_cours'"
+        assert problems(conn, sql, explain(conn, sql)[0])[0].nature == 'parcours'
+        install_query_indexes(conn)
+        install_query_indexes(conn)
+        assert problems(conn, sql, explain(conn, sql)[0]) == []
+
+    def test_blueprints_have_fewer_proposals_after_migration(self):
+        avant, apres = sqlite3.connect(':memory:'), sqlite3.connect(':memory:')
+        build_schema(avant, avec_migration=False)
+        build_schema(apres)
+        queries = extract_queries()
+        assert len(advise(apres, queries)[1]) < len(advise(avant, queries)[1])
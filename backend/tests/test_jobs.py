@@ -0,0 +1,197 @@
+"""
+Tests de la file de travaux en arrière-plan
+"""
+import pytest
+import sys
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.job_queue import install_job_queue, submit_job, claim_job, finish_job
+from blueprints.jobs import jobs_bp
+from blueprints.etudiant import etudiant_bp
+from blueprints.exports import exports_bp
+from utils.jobs import JobWorker
+from utils import auth as auth_utils
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Un administrateur et deux étudiants avec des moyennes"""
+    path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'A'),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi'),
+            (3, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'Mensah', 'Afi');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, annee_academique_id) VALUES
+            (1, 2, 'ESA001', 1), (2, 3, 'ESA002', 1);
+        INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+        VALUES (1, 1, 1, 14.5, 'annuel', 1);
+    """)
+    install_job_queue(conn)
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path, tmp_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    app.config['JOB_SYNC_WAIT'] = 10
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    app.register_blueprint(etudiant_bp, url_prefix='/api/etudiant')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    auth_utils._user_cache.clear()
+    yield app
+    worker = app.extensions.get('job_worker')
+    if worker is not None:
+        worker.stop()
+    auth_utils._user_cache.clear()
+
+@pytest.fixture
+def worker(app):
+    """Répartiteur avec un pool de threads (pas de processus dans les tests)"""
+    worker = JobWorker(app, max_workers=2, poll_interval=0.05, executor=ThreadPoolExecutor(2))
+    app.extensions['job_worker'] = worker.start()
+    return worker
+
+def _headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+class TestJobQueue:
+    """Tests des transitions de la file"""
+
+    def test_lifecycle_is_recorded_in_historique(self, db_path):
+        db = _connect(db_path)
+        job_id = submit_job(db, 'bulletin', 1, {'etudiant_id': 1})
+        db.commit()
+
+        job = claim_job(db)
+        assert job['id'] == job_id and job['statut'] == 'en_cours' and job['tentatives'] == 1
+        assert claim_job(db) is None
+
+        assert finish_job(db, job_id, 'termine', fichier_path='/tmp/x.pdf', duree_ms=42,
+                          nombre_lignes=3, taille=100)
+        db.commit()
+        historique = db.execute("SELECT * FROM historique_exports WHERE job_id = ?", (job_id,)).fetchone()
+        assert historique['statut'] == 'termine'
+        assert historique['duree_ms'] == 42
+        assert historique['nombre_lignes'] == 3
+        assert historique['date_debut'] is not None and historique['date_fin'] is not None
+        db.close()
+
+    def test_expired_lease_is_reclaimed_then_failed(self, db_path):
+        db = _connect(db_path)
+        job_id = submit_job(db, 'bulletin', 1, {'etudiant_id': 1})
+        db.commit()
+
+        assert claim_job(db, bail=-1, max_tentatives=2)['tentatives'] == 1
+        assert claim_job(db, bail=-1, max_tentatives=2)['tentatives'] == 2
+        assert claim_job(db, bail=-1, max_tentatives=2) is None
+        assert db.execute("SELECT statut FROM jobs WHERE id = ?", (job_id,)).fetchone()[0] == 'echoue'
+        # Un worker en retard ne peut plus clore le travail
+        assert not finish_job(db, job_id, 'termine')
+        db.close()
+
+class TestJobEndpoints:
+    """Tests des endpoints /api/jobs et des vues PDF"""
+
+    def test_submit_and_download(self, app, worker):
+        client = app.test_client()
+        response = client.post('/api/jobs', headers=_headers(app, 1),
+                               json={'type': 'bulletin', 'parametres': {'etudiant_id': 1}})
+        assert response.status_code == 202
+        job = response.get_json()
+        assert job['statut'] == 'en_attente'
+        assert response.headers['Location'] == job['status_url']
+
+        with app.app_context():
+            from utils.jobs import wait_for_job
+            assert wait_for_job(job['id'], 10)['statut'] == 'termine'
+
+        response = client.get(job['download_url'], headers=_headers(app, 1))
+        assert response.status_code == 200
+        assert response.data.startswith(b'%PDF')
+
+        # Le travail d'un autre utilisateur n'est pas visible
+        assert client.get(job['status_url'], headers=_headers(app, 2)).status_code == 404
+
+    def test_legacy_view_waits_for_document(self, app, worker):
+        client = app.test_client()
+        response = client.get('/api/etudiant/bulletin', headers=_headers(app, 2))
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+
+        response = client.get('/api/etudiant/bulletin?async=1', headers=_headers(app, 2))
+        assert response.status_code in (200, 202)
+
+    def test_cancel_pending_job(self, app):
+        client = app.test_client()
+        response = client.post('/api/jobs', headers=_headers(app, 1),
+                               json={'type': 'liste_etudiants'})
+        job = response.get_json()
+
+        response = client.post(f"/api/jobs/{job['id']}/cancel", headers=_headers(app, 1))
+        assert response.status_code == 200
+        response = client.post(f"/api/jobs/{job['id']}/cancel", headers=_headers(app, 1))
+        assert response.status_code == 409
+        assert client.get(job['download_url'], headers=_headers(app, 1)).status_code == 409
+
+        conn = _connect(app.config['DATABASE'])
+        assert conn.execute("SELECT statut FROM historique_exports WHERE job_id = ?",
+                            (job['id'],)).fetchone()[0] == 'annule'
+        conn.close()
+
+    def test_authorization(self, app):
+        client = app.test_client()
+        # Un étudiant ne demande que son propre bulletin, et pas la liste des étudiants
+        response = client.post('/api/jobs', headers=_headers(app, 3),
+                               json={'type': 'bulletin', 'parametres': {'etudiant_id': 1}})
+        assert response.get_json()['parametres']['etudiant_id'] == 2
+        response = client.post('/api/jobs', headers=_headers(app, 3), json={'type': 'liste_etudiants'})
+        assert response.status_code == 403
+        response = client.post('/api/jobs', headers=_headers(app, 1), json={'type': 'inconnu'})
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('type_travail, parametres', [
+        ('bulletin', {'etudiant_id': 'abc'}),
+        ('recu', {'paiement_id': [1]}),
+        ('bulletins_classe', {'classe_id': 1.5}),
+        ('liste_etudiants', {'classe_id': True}),
+    ])
+    def test_invalid_ids_are_rejected(self, app, type_travail, parametres):
+        client = app.test_client()
+        response = client.post('/api/jobs', headers=_headers(app, 1),
+                               json={'type': type_travail, 'parametres': parametres})
+        assert response.status_code == 400
+        assert 'doit être un entier' in response.get_json()['error']
+
+    def test_invalid_ids_are_rejected_by_pdf_export(self, app):
+        client = app.test_client()
+        response = client.post('/api/exports/export', headers=_headers(app, 1),
+                               json={'type_export': 'pdf', 'donnees_type': 'bulletin', 'etudiant_id': 'abc'})
+        assert response.status_code == 400
+        response = client.post('/api/jobs', headers=_headers(app, 1),
+                               json={'type': 'bulletin', 'parametres': ['etudiant_id']})
+        assert response.status_code == 400
@@ -0,0 +1,138 @@
+"""
+Tests des métriques Prometheus (registre sans verrou, mesures des requêtes)
+"""
+import pytest
+import sys
+import os
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database.db import init_db_pool, get_db
+from utils.metrics import MetricsRegistry, init_metrics, observe_pdf_render
+from utils.query_profiler import init_query_profiler
+from utils.jobs import _render
+
+@pytest.fixture
+def app(tmp_path):
+    path = str(tmp_path / 'metrics.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (id INTEGER PRIMARY KEY, statut TEXT)")
+    conn.executemany("INSERT INTO jobs (statut) VALUES (?)", [('en_attente',), ('en_attente',), ('termine',)])
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['DATABASE'] = path
+    app.config['METRICS_TOKEN'] = 'secret'
+    init_db_pool(app)
+    init_query_profiler(app)
+    init_metrics(app)
+
+    @app.route('/api/jobs-en-attente')
+    def jobs_en_attente():
+        return {'nombre': get_db().execute("SELECT COUNT(*) FROM jobs WHERE statut = 'en_attente'").fetchone()[0]}
+
+    return app
+
+def _scrape(client):
+    response = client.get('/api/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return response.get_data(as_text=True).splitlines()
+
+class TestRegistry:
+    """Tests du registre"""
+
+    def test_concurrent_increments_are_not_lost(self):
+        registry = MetricsRegistry()
+        registry.describe('evenements_total', 'counter', 'Événements')
+
+        def travail():
+            for _ in range(10000):
+                registry.inc('evenements_total', (('source', 'test'),))
+
+        threads = [threading.Thread(target=travail) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 'esa_evenements_total{source="test"} 80000' in registry.render()
+        # Fragments des threads terminés fusionnés, sans double comptage
+        assert registry._shards == []
+        assert 'esa_evenements_total{source="test"} 80000' in registry.render()
+
+    def test_histogram_is_cumulative(self):
+        registry = MetricsRegistry()
+        registry.describe('duree_seconds', 'histogram', 'Durée', (0.1, 1.0))
+        for valeur in (0.05, 0.1, 0.5, 3.0):
+            registry.observe('duree_seconds', valeur)
+        lignes = registry.render().splitlines()
+        assert lignes[:2] == ['# HELP esa_duree_seconds Durée', '# TYPE esa_duree_seconds histogram']
+        assert lignes[2:] == [
+            'esa_duree_seconds_bucket{le="0.1"} 2',
+            'esa_duree_seconds_bucket{le="1.0"} 3',
+            'esa_duree_seconds_bucket{le="+Inf"} 4',
+            'esa_duree_seconds_sum 3.65',
+            'esa_duree_seconds_count 4',
+        ]
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.inc('erreurs_total', (('message', 'dit "non"\\\n'),))
+        assert 'esa_erreurs_total{message="dit \\"non\\"\\\\\\n"} 1' in registry.render()
+
+class TestEndpoint:
+    """Tests des mesures exposées par /api/metrics"""
+
+    def test_request_latency_db_time_and_queues(self, app):
+        client = app.test_client()
+        for _ in range(3):
+            assert client.get('/api/jobs-en-attente').get_json() == {'nombre': 2}
+        client.get('/api/inconnue')
+        lignes = _scrape(client)
+        labels = 'blueprint="",endpoint="jobs_en_attente"'
+        assert f'esa_http_request_duration_seconds_count{{{labels},status="200"}} 3' in lignes
+        assert 'esa_http_request_duration_seconds_count{blueprint="",endpoint="aucun",status="404"} 1' in lignes
+        assert f'esa_db_duration_seconds_count{{{labels}}} 3' in lignes
+        assert f'esa_db_statements_total{{{labels}}} 3' in lignes
+        # La collecte en cours est la seule requête en vol
+        assert 'esa_http_requests_in_flight 1' in lignes
+        assert 'esa_job_queue_depth{state="en_attente"} 2' in lignes
+        assert 'esa_db_pool_connections{pool="writer",state="in_use"} 0' in lignes
+
+    def test_token_required(self, app):
+        client = app.test_client()
+        assert client.get('/api/metrics').status_code == 401
+        assert client.get('/api/metrics', headers={'Authorization': 'Bearer autre'}).status_code == 401
+
+    def test_without_token_only_served_in_debug_or_testing(self, app, caplog):
+        app.config['METRICS_TOKEN'] = ''
+        client = app.test_client()
+        assert client.get('/api/metrics').status_code == 403
+        app.testing = True
+        assert client.get('/api/metrics').status_code == 200
+
+        autre = Flask(__name__)
+        with caplog.at_level('WARNING', logger='utils.metrics'):
+            init_metrics(autre)
+        assert 'METRICS_TOKEN' in caplog.text
+
+    def test_pdf_render_duration(self, app, tmp_path):
+        def render(texte, output_path):
+            with open(output_path, 'w') as f:
+                f.write(texte)
+
+        taille, duree = _render(render, ('%PDF',), str(tmp_path / 'pdf' / 'document.pdf'))
+        assert taille == 4 and duree >= 0
+        observe_pdf_render(app, 'bulletin', duree)
+        assert 'esa_pdf_render_duration_seconds_count{type="bulletin"} 1' in _scrape(app.test_client())
+
+    def test_disabled(self):
+        app = Flask(__name__)
+        app.config['METRICS_ENABLED'] = False
+        assert init_metrics(app) is None
+        assert 'metrics' not in app.view_functions
+        observe_pdf_render(app, 'bulletin', 0.1)
@@ -0,0 +1,192 @@
+"""
+Tests de l'import de notes en lot
+"""
+import pytest
+import sys
+import os
+import io
+import sqlite3
+import types
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.grade_engine import install_grade_engine
+from blueprints.enseignant import enseignant_bp
+from utils import auth as auth_utils
+from utils.pagination import install_pagination_indexes
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def app(tmp_path):
+    """Enseignant (id 10) affecté à MATH en INF1, trois étudiants inscrits"""
+    db_path = str(tmp_path / 'import.db')
+    conn = sqlite3.connect(db_path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (10, 'prof', 'prof@esa.tg', 'x', 'enseignant', 'Koffi', 'A'),
+            (1, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'E1', 'A'),
+            (2, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'E2', 'A'),
+            (3, 'e3', 'e3@esa.tg', 'x', 'etudiant', 'E3', 'A');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO filieres (id, code, libelle) VALUES (1, 'INF', 'Informatique');
+        INSERT INTO niveaux (id, code, libelle, ordre) VALUES (1, 'L1', 'Licence 1', 1);
+        INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id) VALUES
+            (1, 'INF1', 'INF1', 1, 1, 1), (2, 'INF2', 'INF2', 1, 1, 1);
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths'), (2, 'ECO', 'Économie');
+        INSERT INTO classe_matieres (classe_id, matiere_id, enseignant_id) VALUES (1, 1, 10);
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id) VALUES
+            (1, 1, 'ESA001', 1, 1), (2, 2, 'ESA002', 1, 1), (3, 3, 'ESA003', 2, 1);
+    """)
+    install_grade_engine(conn)
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(enseignant_bp, url_prefix='/api/enseignant')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=10)}'}
+
+def _query(app, sql):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+class TestNotesImport:
+    """Tests de POST /api/enseignant/notes/import"""
+
+    def test_json_import_with_validation(self, app, headers):
+        client = app.test_client()
+        response = client.post('/api/enseignant/notes/import', headers=headers, json={
+            'classe_id': 1, 'matiere_id': 1, 'type_note': 'examen', 'valider': True,
+            'notes': [
+                {'etudiant_id': 1, 'note': 12},
+                {'numero_etudiant': 'ESA002', 'note': 15.5, 'coefficient': 2},
+            ]
+        })
+        assert response.status_code == 201
+        assert response.get_json()['nombre'] == 2
+
+        assert _query(app, "SELECT COUNT(*) FROM notes WHERE is_valide = 1")[0][0] == 2
+        assert sorted(_query(app, "SELECT etudiant_id, rang FROM classements")) == [(1, 2), (2, 1)]
+
+    def test_invalid_rows_reject_whole_batch(self, app, headers):
+        client = app.test_client()
+        response = client.post('/api/enseignant/notes/import', headers=headers, json=[
+            {'etudiant_id': 1, 'classe_id': 1, 'matiere_id': 1, 'type_note': 'devoir', 'note': 12},
+            {'etudiant_id': 3, 'classe_id': 1, 'matiere_id': 1, 'type_note': 'devoir', 'note': 12},
+            {'etudiant_id': 2, 'classe_id': 1, 'matiere_id': 2, 'type_note': 'devoir', 'note': 12},
+            {'etudiant_id': 2, 'classe_id': 1, 'matiere_id': 1, 'type_note': 'devoir', 'note': 25},
+        ])
+        assert response.status_code == 400
+        assert [e['ligne'] for e in response.get_json()['erreurs']] == [2, 3, 4]
+        assert _query(app, "SELECT COUNT(*) FROM notes")[0][0] == 0
+
+    def test_csv_upload(self, app, headers):
+        client = app.test_client()
+        content = "numero_etudiant;note\nESA001;12,5\nESA002;9\n".encode('utf-8')
+        response = client.post('/api/enseignant/notes/import', headers=headers, data={
+            'fichier': (io.BytesIO(content), 'notes.csv'),
+            'classe_id': '1', 'matiere_id': '1', 'type_note': 'controle',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201
+        assert response.get_json()['validees'] is False
+        assert _query(app, "SELECT etudiant_id, note, is_valide FROM notes ORDER BY etudiant_id") == [
+            (1, 12.5, 0), (2, 9, 0)
+        ]
+        assert _query(app, "SELECT COUNT(*) FROM moyennes")[0][0] == 0
+
+    def test_csv_dates_are_validated(self, app, headers):
+        client = app.test_client()
+        content = "numero_etudiant;note;date_note\nESA001;12;15/01/2025\nESA002;9;2025-01-16\n".encode('utf-8')
+        response = client.post('/api/enseignant/notes/import', headers=headers, data={
+            'fichier': (io.BytesIO(content), 'notes.csv'),
+            'classe_id': '1', 'matiere_id': '1', 'type_note': 'controle',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201
+        assert _query(app, "SELECT etudiant_id, date_note FROM notes ORDER BY etudiant_id") == [
+            (1, '2025-01-15'), (2, '2025-01-16')
+        ]
+
+        content = "numero_etudiant;note;date_note\nESA001;12;2025-01-17\nESA002;9;31/02/2025\nESA002;9;hier\n".encode('utf-8')
+        response = client.post('/api/enseignant/notes/import', headers=headers, data={
+            'fichier': (io.BytesIO(content), 'notes.csv'),
+            'classe_id': '1', 'matiere_id': '1', 'type_note': 'controle',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
+        erreurs = response.get_json()['erreurs']
+        assert [e['ligne'] for e in erreurs] == [2, 3]
+        assert all('Date invalide' in e['error'] for e in erreurs)
+        assert _query(app, "SELECT COUNT(*) FROM notes")[0][0] == 2
+
+    def test_xlsx_upload_normalizes_dates(self, app, headers, monkeypatch):
+        lignes = [
+            ('numero_etudiant', 'note', 'date_note'),
+            ('ESA001', 14, datetime(2025, 3, 12)),
+            ('ESA002', 11.5, date(2025, 3, 13)),
+            (None, None, None),
+        ]
+
+        def load_workbook(stream, read_only=False, data_only=False):
+            # openpyxl absent de l'environnement de test: cellules telles qu'il les lit
+            feuille = types.SimpleNamespace(iter_rows=lambda values_only=False: iter(lignes))
+            return types.SimpleNamespace(active=feuille)
+
+        monkeypatch.setitem(sys.modules, 'openpyxl', types.SimpleNamespace(load_workbook=load_workbook))
+        client = app.test_client()
+        response = client.post('/api/enseignant/notes/import', headers=headers, data={
+            'fichier': (io.BytesIO(b'PK'), 'notes.xlsx'),
+            'classe_id': '1', 'matiere_id': '1', 'type_note': 'examen',
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201
+        assert _query(app, "SELECT etudiant_id, note, date_note FROM notes ORDER BY etudiant_id") == [
+            (1, 14, '2025-03-12'), (2, 11.5, '2025-03-13')
+        ]
+
+class TestNotesPagination:
+    """Tests de la clé de tri date_note de GET /api/enseignant/etudiants/<id>/notes"""
+
+    def test_null_note_dates_are_listed(self, app, headers):
+        # Note ancienne sans date, renseignée par la migration des index
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("""
+            INSERT INTO notes (etudiant_id, matiere_id, classe_id, type_note, note, date_note, enseignant_id, created_at)
+            VALUES (1, 1, 1, 'devoir', 8, NULL, 10, '2025-01-03 09:30:00')
+        """)
+        conn.commit()
+        install_pagination_indexes(conn)
+        conn.close()
+        client = app.test_client()
+        for note in (12, 15):
+            response = client.post('/api/enseignant/notes', headers=headers, json={
+                'etudiant_id': 1, 'matiere_id': 1, 'classe_id': 1, 'type_note': 'examen',
+                'note': note, 'date_note': None})
+            assert response.status_code == 201
+
+        # Une note par page: chaque note est en limite de page
+        rows, cursor = [], ''
+        while cursor is not None:
+            response = client.get(f'/api/enseignant/etudiants/1/notes?limit=1&cursor={cursor}', headers=headers)
+            assert response.status_code == 200
+            rows += response.get_json()
+            cursor = response.headers.get('X-Next-Cursor')
+        assert sorted(r['note'] for r in rows) == [8, 12, 15]
+        assert all(r['date_note'] for r in rows)
+        assert {r['note']: r['date_note'] for r in rows}[8] == '2025-01-03'
@@ -0,0 +1,271 @@
+"""
+Tests du service de notifications (lots, boîte d'envoi, workers par canal)
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.notification_outbox import install_notification_outbox
+from blueprints.admin import admin_bp
+from utils.notifications_service import (
+    ChannelWorker, init_notifications, notify_absence_recorded, notify_grade_added, notify_payment_received,
+    notify_unpaid_fees, send_bulk_notification,
+)
+from utils import auth as auth_utils
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Un étudiant et ses deux parents, sa sœur (même premier parent), un administrateur"""
+    path = str(tmp_path / 'notifications.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom, telephone) VALUES
+            (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'ESA', NULL),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi', '+22890000001'),
+            (3, 'p1', 'p1@esa.tg', 'x', 'parent', 'Amah', 'Yawa', '+22890000002'),
+            (4, 'p2', 'p2@esa.tg', 'x', 'parent', 'Amah', 'Komla', NULL),
+        (5, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'Amah', 'Esi', NULL);
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, annee_academique_id) VALUES (1, 2, 'ESA001', 1), (2, 5, 'ESA002', 1);
+        INSERT INTO parents (id, user_id) VALUES (1, 3), (2, 4);
+        INSERT INTO parent_etudiants (parent_id, etudiant_id) VALUES (1, 1), (2, 1), (1, 2);
+    """)
+    install_notification_outbox(conn)
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['NOTIFICATION_CHANNELS'] = ('email', 'sms', 'push')
+    app.config['NOTIFICATION_WORKERS'] = False
+    JWTManager(app)
+    init_db_pool(app)
+    init_notifications(app)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _rows(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+class TestFanOut:
+    """Tests de la diffusion des notifications"""
+
+    def test_student_and_parents_notified_in_one_batch(self, app, db_path):
+        with app.app_context():
+            assert notify_grade_added(1, 'Maths', 15) == 3
+        assert _rows(db_path, "SELECT user_id, type_notification FROM notifications ORDER BY user_id") == [
+            (2, 'note_ajoutee'), (3, 'note_enfant'), (4, 'note_enfant')]
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications_outbox") == [(0,)]
+
+    def test_unknown_student_notifies_nobody(self, app, db_path):
+        with app.app_context():
+            assert notify_grade_added(99, 'Maths', 15) == 0
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications") == [(0,)]
+
+    def test_external_channels_go_through_outbox(self, app, db_path):
+        with app.app_context():
+            notify_unpaid_fees(1, 50000)
+            send_bulk_notification([3, 4], 'annonce', 'Réunion', 'Réunion des parents', canaux=('sms', 'push'))
+        assert _rows(db_path, """
+            SELECT canal, user_id, destinataire, sujet, statut FROM notifications_outbox ORDER BY id
+        """) == [
+            ('email', 2, 'e1@esa.tg', 'Rappel: Frais impayés', 'en_attente'),
+            ('sms', 2, '+22890000001', None, 'en_attente'),
+            ('sms', 3, '+22890000002', None, 'en_attente'),
+            ('push', 3, None, 'Réunion', 'en_attente'),
+            ('push', 4, None, 'Réunion', 'en_attente'),
+        ]
+
+    def test_disabled_channels_are_skipped(self, app, db_path):
+        app.config['NOTIFICATION_CHANNELS'] = ('email',)
+        with app.app_context():
+            notify_unpaid_fees(1, 50000)
+        assert _rows(db_path, "SELECT canal FROM notifications_outbox") == [('email',)]
+
+class TestChannels:
+    """Tests de la résolution des canaux au démarrage"""
+
+    @pytest.fixture
+    def bare_app(self, db_path, monkeypatch):
+        for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+            monkeypatch.delenv(name, raising=False)
+        app = Flask(__name__)
+        app.config['DATABASE'] = db_path
+        app.config['NOTIFICATION_CHANNELS'] = None
+        init_db_pool(app)
+        return app
+
+    def test_default_channels_need_a_configured_sender(self, bare_app):
+        assert init_notifications(bare_app) == {}
+        assert bare_app.config['NOTIFICATION_CHANNELS'] == ()
+
+    def test_requested_channel_without_sender_fails_at_startup(self, bare_app):
+        bare_app.config['NOTIFICATION_CHANNELS'] = ('email', 'sms')
+        with pytest.raises(ValueError, match='email, sms'):
+            init_notifications(bare_app)
+
+    def test_email_enabled_once_mail_is_initialized(self, bare_app):
+        bare_app.config['NOTIFICATION_CHANNELS'] = ('email',)
+        bare_app.extensions['mail'] = object()
+        workers = init_notifications(bare_app)
+        try:
+            assert list(workers) == ['email']
+        finally:
+            workers['email'].stop()
+
+class TestChannelWorker:
+    """Tests des workers d'envoi"""
+
+    def _enqueue_sms(self, app):
+        with app.app_context():
+            send_bulk_notification([2, 3], 'annonce', 'Info', 'Info', canaux=('sms',))
+
+    def test_batch_is_sent_and_counted(self, app, db_path):
+        self._enqueue_sms(app)
+        envoyes = []
+        worker = ChannelWorker(app, 'sms', lambda m: envoyes.append(m['destinataire']) or True)
+        assert worker.run_once() == 2
+        assert worker.run_once() == 0
+        assert envoyes == ['+22890000001', '+22890000002']
+        assert _rows(db_path, "SELECT DISTINCT statut FROM notifications_outbox") == [('envoye',)]
+        stats = worker.stats()
+        assert stats['envoyes'] == 2 and stats['lots'] == 1 and stats['debit'] > 0
+
+    def test_failures_are_retried_with_backoff_then_abandoned(self, app, db_path):
+        self._enqueue_sms(app)
+        def sender(message):
+            if message['destinataire'].endswith('1'):
+                raise ConnectionError('passerelle indisponible')
+            return True
+
+        worker = ChannelWorker(app, 'sms', sender, backoff=3600)
+        worker.run_once()
+        assert _rows(db_path, """
+            SELECT statut, tentatives, derniere_erreur, prochaine_tentative > CURRENT_TIMESTAMP
+            FROM notifications_outbox ORDER BY id
+        """) == [('en_attente', 1, 'passerelle indisponible', 1), ('envoye', 1, None, 0)]
+        # Pas de nouvelle tentative avant le délai
+        assert worker.run_once() == 0
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE notifications_outbox SET prochaine_tentative = CURRENT_TIMESTAMP WHERE id = 1")
+        conn.commit()
+        conn.close()
+        worker = ChannelWorker(app, 'sms', sender, max_tentatives=2)
+        assert worker.run_once() == 1
+        assert _rows(db_path, "SELECT statut, tentatives FROM notifications_outbox WHERE id = 1") == [('echoue', 2)]
+        assert worker.stats()['echecs'] == 1
+
+    def test_expired_claim_is_taken_over(self, app, db_path):
+        self._enqueue_sms(app)
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            UPDATE notifications_outbox SET statut = 'en_cours', tentatives = 1,
+                   bail_expire_at = datetime('now', '-1 seconds') WHERE id = 1
+        """)
+        conn.commit()
+        conn.close()
+        worker = ChannelWorker(app, 'sms', lambda m: True)
+        assert worker.run_once() == 2
+
+    def test_admin_stats(self, app):
+        self._enqueue_sms(app)
+        app.extensions['notification_workers'] = {'sms': ChannelWorker(app, 'sms', lambda m: True)}
+        app.extensions['notification_workers']['sms'].run_once()
+        with app.app_context():
+            token = create_access_token(identity=1)
+        response = app.test_client().get('/api/admin/system/notifications',
+                                         headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        stats = response.get_json()
+        assert stats['sms']['boite'] == {'envoye': 2}
+        assert stats['sms']['worker']['envoyes'] == 2
+        assert stats['email'] == {'boite': {}, 'worker': None}
+
+class TestDigest:
+    """Tests du regroupement des notifications par destinataire"""
+
+    @pytest.fixture
+    def digest_app(self, app):
+        app.config['NOTIFICATION_DIGEST_WINDOW'] = 3600
+        init_notifications(app)
+        yield app
+        app.extensions['notification_digest'].stop()
+
+    def test_grades_and_absences_are_grouped_per_recipient(self, digest_app, db_path):
+        with digest_app.app_context():
+            assert notify_grade_added(1, 'Maths', 15, canaux=('sms',)) == 3
+            notify_grade_added(2, 'Maths', 12, canaux=('sms',))
+            notify_absence_recorded(2, '2025-01-10', canaux=('sms',))
+        # Notifications internes écrites tout de suite, seuls les SMS attendent
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications") == [(7,)]
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications_outbox") == [(0,)]
+        digest = digest_app.extensions['notification_digest']
+        assert digest.stats()['en_attente'] == 7 and digest.stats()['destinataires'] == 4
+        # Fenêtre non expirée
+        assert digest.flush() == 0
+
+        assert digest.flush(tout=True) == 4
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications") == [(7,)]
+        # Un seul SMS par destinataire ayant un téléphone
+        assert _rows(db_path, "SELECT user_id, contenu FROM notifications_outbox ORDER BY user_id") == [
+            (2, 'ESA: Une nouvelle note a été ajoutée en Maths: 15/20'),
+            (3, 'ESA: 2 nouvelles notes, 1 absence. Détails dans votre espace.'),
+        ]
+        stats = digest.stats()
+        assert (stats['regroupees'], stats['resumes'], stats['deposes'], stats['en_attente']) == (7, 2, 2, 0)
+
+    def test_digest_message_lists_events(self, digest_app, db_path):
+        with digest_app.app_context():
+            notify_grade_added(1, 'Maths', 15, canaux=('email',))
+            notify_absence_recorded(1, '2025-01-10', canaux=('email',))
+        digest_app.extensions['notification_digest'].flush(tout=True)
+        sujet, contenu = _rows(db_path, "SELECT sujet, contenu FROM notifications_outbox WHERE user_id = 3")[0]
+        assert sujet == 'ESA - 1 nouvelle note, 1 absence'
+        assert contenu.count('\n') == 1 and 'Maths: 15/20' in contenu and '2025-01-10' in contenu
+
+    def test_other_types_and_in_app_only_are_not_delayed(self, digest_app, db_path):
+        with digest_app.app_context():
+            notify_payment_received(1, 50000, 'scolarité', canaux=('sms',))
+            notify_grade_added(1, 'Maths', 15)
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications") == [(6,)]
+        # SMS du paiement: l'étudiant et le premier parent ont un téléphone
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications_outbox") == [(2,)]
+        assert digest_app.extensions['notification_digest'].stats()['en_attente'] == 0
+
+    def test_expired_window_is_flushed(self, digest_app, db_path):
+        digest = digest_app.extensions['notification_digest']
+        digest.window = 0
+        with digest_app.app_context():
+            notify_grade_added(2, 'Maths', 12, canaux=('email',))
+        assert digest.flush() == 2
+        assert _rows(db_path, "SELECT user_id FROM notifications_outbox ORDER BY user_id") == [(3,), (5,)]
+
+    def test_pending_sends_deposited_on_stop(self, digest_app, db_path):
+        with digest_app.app_context():
+            notify_absence_recorded(1, '2025-01-10', canaux=('email',))
+        digest_app.extensions['notification_digest'].stop()
+        assert _rows(db_path, "SELECT COUNT(*) FROM notifications_outbox") == [(3,)]
+
+    def test_flush_thread_runs_without_workers(self, digest_app, db_path):
+        digest = digest_app.extensions['notification_digest']
+        assert not digest_app.config['NOTIFICATION_WORKERS']
+        assert digest._thread is not None and digest._thread.is_alive()
@@ -0,0 +1,171 @@
+"""
+Tests de la pagination par curseur des routes de liste
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool, get_db
+from blueprints.comptabilite import comptabilite_bp
+from utils.pagination import paginate, encode_cursor, decode_cursor, PaginationError, install_pagination_indexes
+from utils import auth as auth_utils
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """25 paiements répartis sur 5 dates (plusieurs paiements par date)"""
+    path = str(tmp_path / 'pagination.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'compta', 'compta@esa.tg', 'x', 'comptabilite', 'Compta', 'ESA'),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, annee_academique_id) VALUES (1, 2, 'ESA001', 1);
+        INSERT INTO types_frais (id, code, libelle, montant) VALUES (1, 'SCO', 'Scolarité', 100000);
+    """)
+    conn.executemany("""
+        INSERT INTO paiements (etudiant_id, type_frais_id, montant, date_paiement, statut)
+        VALUES (1, 1, ?, ?, ?)
+    """, [(1000 + i, f'2025-01-0{i % 5 + 1}', 'valide' if i % 2 else 'en_attente') for i in range(25)])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['PAGE_SIZE'] = 10
+    app.config['PAGE_SIZE_MAX'] = 20
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(comptabilite_bp, url_prefix='/api/comptabilite')
+
+    @app.route('/paiements-mixtes')
+    def paiements_mixtes():
+        return paginate(get_db(), "SELECT * FROM paiements", (),
+                        [('date_paiement', 'DESC'), ('id', 'ASC')])
+
+    with app.app_context():
+        with sqlite3.connect(db_path) as conn:
+            install_pagination_indexes(conn)
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _headers(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=1)}'}
+
+def _walk(client, url, headers=None):
+    """Parcourt toutes les pages d'une liste; retourne (lignes, nombre de pages)"""
+    rows, pages, cursor = [], 0, None
+    while True:
+        separateur = '&' if '?' in url else '?'
+        response = client.get(url + (f'{separateur}cursor={cursor}' if cursor else ''), headers=headers)
+        assert response.status_code == 200
+        rows.extend(response.get_json())
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return rows, pages
+
+class TestCursor:
+    """Tests des curseurs opaques"""
+
+    def test_round_trip(self):
+        assert decode_cursor(encode_cursor(['2025-01-05', 42]), 2) == ['2025-01-05', 42]
+
+    def test_rejects_tampered_or_foreign_cursor(self):
+        with pytest.raises(PaginationError):
+            decode_cursor('pas-un-curseur!', 2)
+        with pytest.raises(PaginationError):
+            decode_cursor(encode_cursor([42]), 2)
+
+class TestPaginatedRoutes:
+    """Tests des listes paginées"""
+
+    def test_pages_cover_list_once_in_order(self, app):
+        client = app.test_client()
+        rows, pages = _walk(client, '/api/comptabilite/paiements', _headers(app))
+        assert pages == 3
+        assert len(rows) == 25
+        assert len({r['id'] for r in rows}) == 25
+        cles = [(r['date_paiement'], r['id']) for r in rows]
+        assert cles == sorted(cles, reverse=True)
+
+    def test_filters_apply_to_every_page(self, app):
+        client = app.test_client()
+        rows, _ = _walk(client, '/api/comptabilite/paiements?statut=valide&limit=5', _headers(app))
+        assert len(rows) == 12
+        assert {r['statut'] for r in rows} == {'valide'}
+
+    def test_mixed_directions(self, app):
+        client = app.test_client()
+        rows, pages = _walk(client, '/paiements-mixtes?limit=4')
+        assert pages == 7
+        cles = [(r['date_paiement'], -r['id']) for r in rows]
+        assert cles == sorted(cles, reverse=True)
+        assert len({r['id'] for r in rows}) == 25
+
+    def test_null_payment_dates_on_page_boundaries(self, app, db_path):
+        # Paiement ancien sans date, renseigné par la migration des index
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            INSERT INTO paiements (etudiant_id, type_frais_id, montant, date_paiement, statut, created_at)
+            VALUES (1, 1, 500, NULL, 'valide', '2025-01-03 09:30:00')
+        """)
+        conn.commit()
+        install_pagination_indexes(conn)
+        conn.close()
+        client = app.test_client()
+        response = client.post('/api/comptabilite/paiements', headers=_headers(app), json={
+            'etudiant_id': 1, 'type_frais_id': 1, 'montant': 700, 'mode_paiement': 'especes', 'date_paiement': None})
+        assert response.status_code == 201
+
+        # Une ligne par page: chaque paiement est en limite de page
+        rows, pages = _walk(client, '/api/comptabilite/paiements?limit=1', _headers(app))
+        assert pages == 27
+        assert len({r['id'] for r in rows}) == 27
+        assert all(r['date_paiement'] for r in rows)
+        cles = [(r['date_paiement'], r['id']) for r in rows]
+        assert cles == sorted(cles, reverse=True)
+        assert {r['montant']: r['date_paiement'] for r in rows if r['montant'] < 1000}[500] == '2025-01-03'
+
+    def test_limit_is_capped_and_total_on_demand(self, app):
+        client = app.test_client()
+        response = client.get('/api/comptabilite/paiements?limit=1000', headers=_headers(app))
+        assert len(response.get_json()) == 20
+        assert 'X-Total-Count' not in response.headers
+        assert 'cursor=' in response.headers['Link']
+
+        response = client.get('/api/comptabilite/paiements?count=1', headers=_headers(app))
+        assert response.headers['X-Total-Count'] == '25'
+
+    def test_invalid_parameters(self, app):
+        client = app.test_client()
+        assert client.get('/api/comptabilite/paiements?limit=abc', headers=_headers(app)).status_code == 400
+        assert client.get('/api/comptabilite/paiements?cursor=xyz', headers=_headers(app)).status_code == 400
+
+    def test_page_reads_through_index(self, app, db_path):
+        conn = sqlite3.connect(db_path)
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT * FROM (SELECT * FROM paiements WHERE statut = ?) AS page
+            WHERE ("date_paiement", "id") < (?, ?)
+            ORDER BY "date_paiement" DESC, "id" DESC LIMIT 11
+        """, ('valide', '2025-01-03', 10)).fetchall()
+        conn.close()
+        details = ' '.join(row[3] for row in plan)
+        assert 'idx_paiements_statut_date' in details
+        assert 'TEMP B-TREE' not in details
@@ -0,0 +1,150 @@
+"""
+Tests du service de présence en mémoire
+"""
+import pytest
+import sys
+import os
+import json
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from blueprints.chat_realtime import chat_realtime_bp
+from utils.presence import init_presence, presence_channel
+from utils.realtime import init_realtime
+from utils import auth as auth_utils
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Trois utilisateurs; le premier a une présence enregistrée (en ligne)"""
+    path = str(tmp_path / 'presence.db')
+    conn = sqlite3.connect(path)
+    with open(os.path.join(DATABASE_DIR, 'schema.sql'), 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    with open(os.path.join(DATABASE_DIR, 'schema_top10.sql'), 'r', encoding='utf-8') as f:
+        script = f.read()
+    debut = script.index('-- ========== 4. CHAT TEMPS RÉEL')
+    conn.executescript(script[debut:script.index('-- ========== 5.', debut)])
+    conn.executescript("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'ens', 'ens@esa.tg', 'x', 'enseignant', 'Mensah', 'Afi'),
+            (2, 'e1', 'e1@esa.tg', 'x', 'etudiant', 'Amah', 'Kossi'),
+            (3, 'e2', 'e2@esa.tg', 'x', 'etudiant', 'Dogbe', 'Yao');
+        INSERT INTO presence_users (user_id, is_online, derniere_activite, device_info)
+        VALUES (1, 1, '2025-01-01 08:00:00', '{"os": "android"}');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+def _create_app(db_path, **config):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    app.config['REALTIME_KEEPALIVE'] = 0.1
+    app.config['PRESENCE_FLUSH_INTERVAL'] = 3600
+    app.config.update(config)
+    JWTManager(app)
+    init_db_pool(app)
+    init_realtime(app)
+    init_presence(app)
+    app.register_blueprint(chat_realtime_bp, url_prefix='/api/chat')
+    return app
+
+@pytest.fixture
+def app(db_path):
+    app = _create_app(db_path)
+    auth_utils._user_cache.clear()
+    yield app
+    app.extensions['presence'].stop()
+    auth_utils._user_cache.clear()
+
+def _headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+def _saved(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT user_id, is_online, device_info FROM presence_users")}
+    conn.close()
+    return rows
+
+class TestPresence:
+    """Tests du registre de présence"""
+
+    def test_heartbeats_are_written_in_one_batch(self, app, db_path):
+        client = app.test_client()
+        for _ in range(5):
+            for user_id in (2, 3):
+                assert client.post('/api/chat/presence', json={}, headers=_headers(app, user_id)).status_code == 200
+        assert set(_saved(db_path)) == {1}
+
+        service = app.extensions['presence']
+        assert service.flush() == 2
+        assert _saved(db_path) == {1: (1, '{"os": "android"}'), 2: (1, None), 3: (1, None)}
+        assert service.stats()['lots'] == 1 and service.stats()['battements'] == 10
+
+    def test_lookup_is_served_from_memory(self, app, db_path):
+        client = app.test_client()
+        client.post('/api/chat/presence', json={'device_info': {'os': 'ios'}}, headers=_headers(app, 2))
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM presence_users")
+        conn.commit()
+        conn.close()
+
+        response = client.get('/api/chat/presence?user_ids=1,2&user_ids=3', headers=_headers(app, 3))
+        presences = {p['user_id']: p['is_online'] for p in response.get_json()}
+        assert presences == {1: True, 2: True}
+        assert client.get('/api/chat/presence?user_ids=abc', headers=_headers(app, 3)).status_code == 400
+
+    def test_device_info_kept_across_heartbeats(self, app, db_path):
+        service = app.extensions['presence']
+        service.heartbeat(1)
+        service.flush()
+        assert _saved(db_path)[1] == (1, '{"os": "android"}')
+
+    def test_expiry_goes_offline_and_is_persisted(self, db_path):
+        app = _create_app(db_path, PRESENCE_TTL=0.05)
+        service = app.extensions['presence']
+        abonne = app.extensions['realtime_hub'].subscribe(presence_channel(2))
+        service.heartbeat(2)
+        assert abonne.get(timeout=0)['data']['is_online'] is True
+
+        time.sleep(0.1)
+        assert service.get_many([2])[0]['is_online'] is False
+        assert service.expire() == 2
+        assert abonne.get(timeout=0)['data'] == {
+            'user_id': 2, 'is_online': False, 'derniere_activite': service.get_many([2])[0]['derniere_activite']}
+        service.flush()
+        assert _saved(db_path)[2] == (0, None)
+        service.stop()
+
+    def test_write_through_without_flush_interval(self, db_path):
+        app = _create_app(db_path, PRESENCE_FLUSH_INTERVAL=0)
+        app.extensions['presence'].heartbeat(3)
+        assert _saved(db_path)[3] == (1, None)
+
+    def test_presence_stream(self, app):
+        client = app.test_client()
+        response = client.get('/api/chat/presence/stream?user_ids=2', headers=_headers(app, 1), buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+
+        client.post('/api/chat/presence', json={'is_online': True}, headers=_headers(app, 2))
+        client.post('/api/chat/presence', json={'is_online': True}, headers=_headers(app, 2))
+        client.post('/api/chat/presence', json={'is_online': False}, headers=_headers(app, 2))
+        evenements = []
+        while len(evenements) < 2:
+            chunk = next(chunks).decode()
+            if chunk.startswith('event: presence'):
+                evenements.append(json.loads(chunk.split('data: ', 1)[1]))
+        # Un événement par changement d'état, pas par battement
+        assert [e['is_online'] for e in evenements] == [True, False]
+        response.close()
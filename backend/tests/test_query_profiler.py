@@ -0,0 +1,117 @@
+"""
+Tests du profilage SQL par requête (Server-Timing, N+1, agrégats par route)
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, g
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool, get_db, get_db_connection
+from blueprints.admin import admin_bp
+from blueprints.infrastructure import infrastructure_bp
+from utils.query_profiler import QueryProfiler, RequestProfile, init_query_profiler, statement_shape
+from utils import auth as auth_utils
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+
+@pytest.fixture
+def app(tmp_path):
+    path = str(tmp_path / 'profil.db')
+    conn = sqlite3.connect(path)
+    for schema in ('schema.sql', 'schema_extended.sql'):
+        with open(os.path.join(DATABASE_DIR, schema), 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+    conn.execute("""
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom)
+        VALUES (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'ESA')
+    """)
+    conn.executemany("INSERT INTO salles (code, libelle, type_salle) VALUES (?, ?, 'classe')",
+                     [(f'S{i}', f'Salle {i}') for i in range(6)])
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = path
+    app.config['SQL_PROFILING_N_PLUS_ONE'] = 5
+    JWTManager(app)
+    init_db_pool(app)
+    init_query_profiler(app)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(infrastructure_bp, url_prefix='/api/infrastructure')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _headers(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=1)}'}
+
+class TestFormes:
+    """Tests de la normalisation des instructions"""
+
+    def test_literals_and_in_lists(self):
+        assert statement_shape("SELECT *  FROM notes\n WHERE id = 12 AND statut = 'valide' AND x IN (?, ?, ?)") == \
+            "SELECT * FROM notes WHERE id = ? AND statut = ? AND x IN (?)"
+        assert statement_shape("SELECT t1.a FROM t1 WHERE b > -2.5") == "SELECT t1.a FROM t1 WHERE b > ?"
+
+    def test_repeated_shape_is_n_plus_one(self):
+        profile = RequestProfile()
+        for i in range(5):
+            profile.record(f"SELECT * FROM salles WHERE id = {i}", 0.001)
+        profile.record("SELECT COUNT(*) FROM salles", 0.002)
+        profiler = QueryProfiler(seuil=5)
+        profiler.add('infrastructure.list_salles', profile, 0.01)
+        route = profiler.stats()['routes'][0]
+        assert (route['sql_max'], route['requetes_n_plus_un']) == (6, 1)
+        assert [f['sql'] for f in route['n_plus_un']] == ['SELECT * FROM salles WHERE id = ?']
+        profiler.reset()
+        assert profiler.stats()['routes'] == []
+
+class TestMiddleware:
+    """Tests du profil attaché aux connexions des requêtes"""
+
+    def test_server_timing_and_n_plus_one(self, app):
+        client = app.test_client()
+        headers = _headers(app)
+        response = client.get('/api/infrastructure/salles?disponible=true&date=2026-01-10'
+                              '&heure_debut=08:00&heure_fin=10:00', headers=headers)
+        assert response.status_code == 200
+        # Liste des salles puis une requête de réservations par salle
+        assert response.headers['Server-Timing'].startswith('db;dur=')
+        assert 'desc="7 sql"' in response.headers['Server-Timing']
+        client.get('/api/infrastructure/salles', headers=headers)
+
+        perf = client.get('/api/admin/perf', headers=headers).get_json()
+        assert perf['routes_n_plus_un'] == ['infrastructure.list_salles']
+        route = next(r for r in perf['routes'] if r['endpoint'] == 'infrastructure.list_salles')
+        assert (route['requetes'], route['requetes_n_plus_un'], route['sql_max']) == (2, 1, 7)
+        assert route['n_plus_un'][0]['max_par_requete'] == 6
+        assert 'FROM reservations_salles' in route['n_plus_un'][0]['sql']
+
+        assert client.delete('/api/admin/perf', headers=headers).status_code == 200
+        routes = client.get('/api/admin/perf', headers=headers).get_json()['routes']
+        assert [r['endpoint'] for r in routes] == ['admin.reset_perf_stats']
+
+    def test_connections_outside_requests_are_not_profiled(self, app):
+        with app.app_context():
+            with get_db_connection() as db:
+                assert db.profiler is None
+        with app.test_request_context('/'):
+            g.sql_profile = RequestProfile()
+            db = get_db()
+            db.execute("SELECT 1")
+            assert g.sql_profile.nombre == 1
+        with app.app_context():
+            with get_db_connection() as db:
+                assert db.profiler is None
+
+    def test_disabled(self):
+        app = Flask(__name__)
+        app.config['SQL_PROFILING'] = False
+        assert init_query_profiler(app) is None
+        assert 'query_profiler' not in app.extensions
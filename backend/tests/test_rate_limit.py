@@ -0,0 +1,103 @@
+"""
+Tests de la limitation de débit (seaux à jetons en mémoire et SQLite)
+"""
+import pytest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from utils.rate_limit import MemoryStorage, SQLiteStorage, RateLimiter, init_rate_limiter
+from utils.security import check_rate_limit
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStorage()
+    return SQLiteStorage(str(tmp_path / 'ratelimit.db'))
+
+class TestTokenBucket:
+    """Tests communs aux deux stockages"""
+
+    def test_limit_then_refill(self, storage):
+        resultats = [storage.consume('ip', 5, 60, now=1000.0)[0] for _ in range(6)]
+        assert resultats == [True] * 5 + [False]
+        # Un jeton toutes les 12 secondes
+        assert storage.consume('ip', 5, 60, now=1011.0)[0] is False
+        assert storage.consume('ip', 5, 60, now=1012.5)[0] is True
+        assert storage.consume('ip', 5, 60, now=1013.0)[0] is False
+        # Seau plein après une fenêtre, sans dépasser la capacité
+        assert [storage.consume('ip', 5, 60, now=2000.0)[0] for _ in range(6)] == [True] * 5 + [False]
+
+    def test_refusal_does_not_consume(self, storage):
+        storage.consume('ip', 1, 10, now=0.0)
+        for _ in range(5):
+            assert storage.consume('ip', 1, 10, now=5.0)[0] is False
+        assert storage.consume('ip', 1, 10, now=10.0)[0] is True
+
+    def test_keys_are_independent(self, storage):
+        assert storage.consume('a', 1, 60, now=0.0)[0] is True
+        assert storage.consume('a', 1, 60, now=0.0)[0] is False
+        assert storage.consume('b', 1, 60, now=0.0)[0] is True
+        storage.reset('a')
+        assert storage.consume('a', 1, 60, now=0.0)[0] is True
+
+    def test_concurrent_hits_never_exceed_limit(self, storage):
+        autorises = []
+        def worker():
+            for _ in range(20):
+                autorises.append(storage.consume('ip', 30, 3600)[0])
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert autorises.count(True) == 30
+
+class TestStorages:
+    """Tests propres à chaque stockage"""
+
+    def test_memory_is_bounded(self):
+        storage = MemoryStorage(max_keys=100)
+        for i in range(1000):
+            storage.consume(f'ip{i}', 5, 60)
+        stats = storage.stats()
+        assert stats['cles'] == 100 and stats['evictions'] == 900
+
+    def test_sqlite_is_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / 'ratelimit.db')
+        worker_a, worker_b = SQLiteStorage(path), SQLiteStorage(path)
+        assert worker_a.consume('ip', 2, 60, now=0.0)[0] is True
+        assert worker_b.consume('ip', 2, 60, now=0.0)[0] is True
+        assert worker_a.consume('ip', 2, 60, now=0.0)[0] is False
+
+    def test_sqlite_purges_full_buckets(self, tmp_path):
+        storage = SQLiteStorage(str(tmp_path / 'ratelimit.db'), purge_every=0)
+        storage.consume('ancien', 5, 60, now=0.0)
+        storage.consume('recent', 5, 60, now=100.0)
+        assert storage.purge(now=100.0) == 1
+        assert storage.stats()['cles'] == 1
+
+class TestRateLimiter:
+    """Tests de la façade et de check_rate_limit"""
+
+    def test_result_and_stats(self):
+        limiter = RateLimiter()
+        limiter.hit('ip', 2, 60)
+        assert limiter.hit('ip', 2, 60).autorise is True
+        refus = limiter.hit('ip', 2, 60)
+        assert refus.autorise is False and refus.restant == 0 and 0 < refus.reessayer_dans <= 30
+        stats = limiter.stats()
+        assert (stats['autorisees'], stats['refusees'], stats['backend']) == (2, 1, 'memory')
+
+    def test_check_rate_limit_uses_application_limiter(self, tmp_path):
+        app = Flask(__name__)
+        app.config['DATABASE'] = str(tmp_path / 'esa.db')
+        app.config['RATELIMIT_STORAGE'] = 'sqlite'
+        limiter = init_rate_limiter(app)
+        assert os.path.exists(tmp_path / 'ratelimit.db')
+        with app.app_context():
+            assert [check_rate_limit('login_1.2.3.4', limit=3, window=60) for _ in range(4)] == [True] * 3 + [False]
+        assert limiter.stats()['refusees'] == 1
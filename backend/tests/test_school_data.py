@@ -0,0 +1,85 @@
+"""
+Tests du générateur de données synthétiques et du benchmark de charge
+"""
+import pytest
+import sys
+import os
+import sqlite3
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.generate_school_data import generate
+from scripts.load_benchmark import InProcessClient, compare, percentile, run_benchmark
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    path = tmp_path_factory.mktemp('school') / 'benchmark.db'
+    comptes = generate(path, etudiants=80, annees=2, seed=7, aujourd_hui=date(2026, 3, 15), verbose=False)
+    return path, comptes
+
+class TestGenerateur:
+    """Tests de la base générée"""
+
+    def test_volumes(self, base):
+        path, comptes = base
+        db = sqlite3.connect(str(path))
+        assert db.execute("SELECT COUNT(*) FROM etudiants").fetchone()[0] == 80
+        assert db.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == comptes['notes'] > 0
+        assert comptes['moyennes'] > 0 and comptes['paiements'] > 0
+
+    def test_donnees_coherentes(self, base):
+        db = sqlite3.connect(str(base[0]))
+        # Notes dans les classes de l'étudiant, année courante active
+        assert db.execute("""
+            SELECT COUNT(*) FROM notes n LEFT JOIN classes c ON c.id = n.classe_id WHERE c.id IS NULL
+        """).fetchone()[0] == 0
+        assert db.execute("""
+            SELECT COUNT(*) FROM annees_academiques
+            WHERE is_active = 1 AND date_debut <= '2026-03-15' AND date_fin >= '2026-03-15'
+        """).fetchone()[0] == 1
+        # Le parent de test suit etudiant1
+        assert db.execute("""
+            SELECT COUNT(*) FROM parent_etudiants pe JOIN parents p ON p.id = pe.parent_id
+            JOIN users u ON u.id = p.user_id JOIN etudiants e ON e.id = pe.etudiant_id
+            JOIN users ue ON ue.id = e.user_id
+            WHERE u.username = 'parent1' AND ue.username = 'etudiant1'
+        """).fetchone()[0] == 1
+
+    def test_deterministe(self, base, tmp_path):
+        autre = generate(tmp_path / 'autre.db', etudiants=80, annees=2, seed=7, aujourd_hui=date(2026, 3, 15),
+                         verbose=False)
+        assert autre == base[1]
+
+class TestBenchmark:
+    """Tests des mesures et de la comparaison"""
+
+    def test_percentile(self):
+        valeurs = list(range(1, 101))
+        assert (percentile(valeurs, 50), percentile(valeurs, 95), percentile(valeurs, 99)) == (50, 95, 99)
+        assert percentile([4.0], 99) == 4.0
+        assert percentile([], 50) is None
+
+    def test_run_on_generated_base(self, base, monkeypatch):
+        monkeypatch.setenv('DATABASE_PATH', str(base[0]))
+        monkeypatch.setenv('RATELIMIT_ENABLED', 'false')
+        client = InProcessClient(base[0])
+        db = sqlite3.connect(str(base[0]))
+        db.row_factory = sqlite3.Row
+        resultats = run_benchmark(client, db, requetes=6, clients=3, app=client.app, verbose=False,
+                                  filtre=r'^(parent\.get_enfant_notes|etudiant\.get_my_notes|chat_realtime\.stream_messages)$')
+        assert set(resultats['routes']) == {'parent.get_enfant_notes', 'etudiant.get_my_notes'}
+        assert resultats['routes']['parent.get_enfant_notes']['compte'] == 'parent1'
+        assert resultats['routes']['etudiant.get_my_notes']['erreurs'] == 0
+        assert resultats['routes']['etudiant.get_my_notes']['sql_par_requete'] >= 1
+        assert 'chat_realtime.stream_messages' in resultats['ignorees']
+        assert resultats['total']['requetes'] == 12
+
+    def test_compare_flags_regressions(self):
+        reference = {'routes': {'a': {'p95_ms': 10.0, 'sql_par_requete': 2.0},
+                                'b': {'p95_ms': 10.0, 'sql_par_requete': 2.0}}}
+        resultats = {'routes': {'a': {'p95_ms': 11.0, 'sql_par_requete': 2.0},
+                                'b': {'p95_ms': 13.0, 'sql_par_requete': 5.0},
+                                'c': {'p95_ms': 99.0, 'sql_par_requete': 9.0}}}
+        assert compare(resultats, reference, seuil=0.2) == [
+            ('b', 'p95_ms', 10.0, 13.0), ('b', 'sql_par_requete', 2.0, 5.0)]
@@ -0,0 +1,152 @@
+"""
+Tests de la recherche plein texte (FTS5)
+"""
+import pytest
+import sys
+import os
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from database.search_index import install_search_index, match_expression
+from blueprints.commun import commun_bp
+from blueprints.bibliotheque import bibliotheque_bp
+from blueprints.chatbot import generer_reponse
+from utils import auth as auth_utils
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Utilisateurs, ouvrages, cours et connaissances existant avant l'installation de l'index"""
+    path = str(tmp_path / 'search.db')
+    conn = sqlite3.connect(path)
+    for schema in ('schema.sql', 'schema_extended.sql'):
+        with open(os.path.join(DATABASE_DIR, schema), 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+    conn.executescript("""
+        CREATE TABLE cours_online (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, code VARCHAR(20) UNIQUE NOT NULL,
+            titre VARCHAR(200) NOT NULL, description TEXT, classe_id INTEGER,
+            enseignant_id INTEGER NOT NULL, is_public BOOLEAN DEFAULT 0, is_active BOOLEAN DEFAULT 1
+        );
+        CREATE TABLE base_connaissances (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT NOT NULL, reponse TEXT NOT NULL,
+            categorie VARCHAR(50), tags TEXT, score_utilite INTEGER DEFAULT 0,
+            nombre_utilisations INTEGER DEFAULT 0, is_active BOOLEAN DEFAULT 1
+        );
+        INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES
+            (1, 'admin', 'admin@esa.tg', 'x', 'admin', 'Admin', 'ESA'),
+            (2, 'ekpegba', 'elodie@esa.tg', 'x', 'etudiant', 'Kpégba', 'Élodie'),
+            (3, 'amensah', 'afi@esa.tg', 'x', 'enseignant', 'Mensah', 'Afi');
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id) VALUES (1, 2, 'ESA001', 1, 1);
+        INSERT INTO ouvrages (id, titre, auteur, description) VALUES
+            (1, 'Les Misérables', 'Victor Hugo', 'Roman'),
+            (2, 'Introduction aux algorithmes', 'Cormen', 'Ouvrage de référence cité par Hugo Lemaire'),
+            (3, 'Algèbre linéaire', 'Lay', NULL);
+        INSERT INTO cours_online (id, code, titre, description, classe_id, enseignant_id, is_public) VALUES
+            (1, 'ALG1', 'Algèbre pour débutants', 'Matrices et vecteurs', 1, 3, 0),
+            (2, 'ALG2', 'Algèbre avancée', 'Réservé à une autre classe', 2, 3, 0);
+        INSERT INTO base_connaissances (id, question, reponse, categorie) VALUES
+            (1, 'Comment payer les frais de scolarité ?', 'Via Mobile Money depuis la section Finances.', 'paiement'),
+            (2, 'Où consulter mon emploi du temps ?', 'Dans la section Emploi du temps.', 'scolarite');
+    """)
+    install_search_index(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def app(db_path):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    JWTManager(app)
+    init_db_pool(app)
+    app.register_blueprint(commun_bp, url_prefix='/api/commun')
+    app.register_blueprint(bibliotheque_bp, url_prefix='/api/bibliotheque')
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _headers(app, user_id=1):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+def _execute(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+class TestMatchExpression:
+    """Tests de la traduction des saisies en requêtes FTS5"""
+
+    def test_words_become_quoted_prefixes(self):
+        assert match_expression('Victor Hu') == '"victor"* "hu"*'
+
+    def test_fts_syntax_is_not_interpreted(self):
+        assert match_expression('NEAR("a" OR *)') == '"near"* "a"* "or"*'
+        assert match_expression(' -- ') is None
+
+    def test_stopwords_dropped_for_questions(self):
+        assert match_expression('Comment payer les frais ?', ignorer_mots_vides=True,
+                                tous_les_mots=False) == '"payer"* OR "frais"*'
+
+class TestSearch:
+    """Tests des recherches plein texte"""
+
+    def test_accent_insensitive_prefix_search_on_users(self, app):
+        client = app.test_client()
+        response = client.get('/api/commun/users/search?q=elodie kpe', headers=_headers(app))
+        assert [u['id'] for u in response.get_json()] == [2]
+
+    def test_books_ranked_by_relevance(self, app):
+        client = app.test_client()
+        rows = client.get('/api/bibliotheque/ouvrages?q=hugo', headers=_headers(app)).get_json()
+        # Auteur avant simple mention dans la description
+        assert [o['id'] for o in rows] == [1, 2]
+        rows = client.get('/api/bibliotheque/ouvrages?q=algebre', headers=_headers(app)).get_json()
+        assert [o['id'] for o in rows] == [3]
+
+    def test_triggers_keep_index_in_sync(self, app, db_path):
+        client = app.test_client()
+        _execute(db_path, "UPDATE users SET nom = 'Agbodjan' WHERE id = 3")
+        _execute(db_path, "DELETE FROM ouvrages WHERE id = 1")
+        _execute(db_path, "INSERT INTO ouvrages (titre, auteur) VALUES ('Le Petit Prince', 'Saint-Exupéry')")
+
+        assert client.get('/api/commun/users/search?q=mensah', headers=_headers(app)).get_json() == []
+        assert [u['id'] for u in client.get('/api/commun/users/search?q=agbod', headers=_headers(app)).get_json()] == [3]
+        rows = client.get('/api/bibliotheque/ouvrages?q=hugo', headers=_headers(app)).get_json()
+        assert [o['id'] for o in rows] == [2]
+        rows = client.get('/api/bibliotheque/ouvrages?q=exupery', headers=_headers(app)).get_json()
+        assert [o['titre'] for o in rows] == ['Le Petit Prince']
+
+    def test_unified_search(self, app):
+        client = app.test_client()
+        response = client.get('/api/commun/search?q=alg', headers=_headers(app))
+        assert response.status_code == 200
+        resultats = response.get_json()['resultats']
+        assert [o['id'] for o in resultats['ouvrages']] == [3, 2]
+        assert {c['id'] for c in resultats['cours']} == {1, 2}
+        assert '[' in resultats['ouvrages'][0]['extrait']
+
+        # Étudiant: seulement les cours de sa classe ou publics
+        response = client.get('/api/commun/search?q=algebre&types=cours', headers=_headers(app, 2))
+        assert list(response.get_json()['resultats']) == ['cours']
+        assert [c['id'] for c in response.get_json()['resultats']['cours']] == [1]
+
+        assert client.get('/api/commun/search?q=x&types=inconnu', headers=_headers(app)).status_code == 400
+        assert client.get('/api/commun/search', headers=_headers(app)).status_code == 400
+
+    def test_chatbot_answers_from_knowledge_base(self, db_path):
+        db = sqlite3.connect(db_path)
+        db.row_factory = sqlite3.Row
+        reponse = generer_reponse('Comment je peux payer mes frais ?', 'paiement', {}, db)
+        assert reponse.startswith('Via Mobile Money')
+        assert db.execute("SELECT nombre_utilisations FROM base_connaissances WHERE id = 1").fetchone()[0] == 1
+        db.close()
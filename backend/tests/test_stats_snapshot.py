@@ -0,0 +1,105 @@
+"""
+Tests de l'instantané des statistiques (tables de synthèse et triggers)
+"""
+import pytest
+import sys
+import os
+import sqlite3
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.stats_snapshot import install_stats_snapshot, rebuild_stats_snapshot, read_stats_snapshot
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+TODAY = date(2025, 3, 15)
+
+@pytest.fixture
+def db(tmp_path):
+    """Base complète avec l'instantané installé"""
+    conn = sqlite3.connect(str(tmp_path / 'stats.db'))
+    conn.row_factory = sqlite3.Row
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO annees_academiques (id, code, libelle, date_debut, date_fin) VALUES (1, 'A', 'A', '2024-09-01', '2025-07-31');
+        INSERT INTO filieres (id, code, libelle) VALUES (1, 'INF', 'Informatique'), (2, 'GES', 'Gestion');
+        INSERT INTO niveaux (id, code, libelle, ordre) VALUES (1, 'L1', 'Licence 1', 1);
+        INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id) VALUES (1, 'INF1', 'INF1', 1, 1, 1);
+        INSERT INTO classes (id, code, libelle, filiere_id, niveau_id, annee_academique_id) VALUES (2, 'GES1', 'GES1', 2, 1, 1);
+        INSERT INTO matieres (id, code, libelle) VALUES (1, 'MATH', 'Maths'), (2, 'ECO', 'Économie');
+        INSERT INTO types_frais (id, code, libelle, montant) VALUES (1, 'SCO', 'Scolarité', 1000);
+    """)
+    # Données antérieures à l'installation: prises en compte par la reconstruction
+    _add_etudiant(conn, 1, 1, '2025-01-10')
+    conn.commit()
+    install_stats_snapshot(conn)
+    yield conn
+    conn.close()
+
+def _add_etudiant(db, etudiant_id, classe_id, date_inscription):
+    db.execute("INSERT INTO users (id, username, email, password_hash, role, nom, prenom) VALUES (?, ?, ?, 'x', 'etudiant', ?, 'P')",
+               (etudiant_id, f'e{etudiant_id}', f'e{etudiant_id}@esa.tg', f'Nom{etudiant_id}'))
+    db.execute("""
+        INSERT INTO etudiants (id, user_id, numero_etudiant, classe_id, annee_academique_id, date_inscription)
+        VALUES (?, ?, ?, ?, 1, ?)
+    """, (etudiant_id, etudiant_id, f'N{etudiant_id}', classe_id, date_inscription))
+
+def _snapshot(db):
+    stats = read_stats_snapshot(db, nombre_mois=3, today=TODAY)
+    stats.pop('updated_at')
+    return stats
+
+class TestStatsSnapshot:
+    """Tests de cohérence triggers / reconstruction"""
+
+    def test_initial_rebuild(self, db):
+        stats = _snapshot(db)
+        assert stats['total_etudiants'] == 1
+        assert stats['total_classes'] == 2
+        assert stats['series']['inscriptions']['2025-01'] == 1
+        assert stats['repartition_filieres'] == [
+            {'libelle': 'Informatique', 'nombre': 1},
+            {'libelle': 'Gestion', 'nombre': 0},
+        ]
+
+    def test_incremental_updates_match_rebuild(self, db):
+        _add_etudiant(db, 2, 2, '2025-03-02')
+        _add_etudiant(db, 3, 2, '2025-03-05')
+        db.execute("UPDATE etudiants SET is_active = 0 WHERE id = 3")
+        db.execute("UPDATE etudiants SET classe_id = 2 WHERE id = 1")
+
+        db.executemany("""
+            INSERT INTO moyennes (etudiant_id, matiere_id, classe_id, moyenne, periode, annee_academique_id)
+            VALUES (?, ?, 1, ?, ?, 1)
+        """, [(1, 1, 12.0, 'annuel'), (1, 2, 8.0, 'annuel'), (2, 1, 15.0, 'annuel'), (2, 1, 9.0, 'trimestre1')])
+        db.execute("UPDATE moyennes SET moyenne = 11.0 WHERE etudiant_id = 1 AND matiere_id = 2")
+        db.execute("DELETE FROM moyennes WHERE etudiant_id = 2 AND periode = 'trimestre1'")
+
+        db.executemany("""
+            INSERT INTO paiements (etudiant_id, type_frais_id, montant, mode_paiement, date_paiement, statut)
+            VALUES (?, 1, ?, 'especes', ?, ?)
+        """, [(1, 500, '2025-03-01', 'valide'), (2, 300, '2025-02-10', 'en_attente'), (2, 200, '2025-03-10', 'valide')])
+        db.execute("UPDATE paiements SET statut = 'valide' WHERE montant = 300")
+        db.execute("UPDATE paiements SET statut = 'rejete' WHERE montant = 200")
+        db.execute("INSERT INTO absences (etudiant_id, classe_id, date_absence, type_absence) VALUES (1, 1, '2025-03-03', 'absence')")
+        db.commit()
+
+        incremental = _snapshot(db)
+        assert incremental['total_etudiants'] == 2
+        assert incremental['taux_reussite'] == 100.0
+        assert incremental['series']['revenus'] == {'2025-03': 500, '2025-02': 300, '2025-01': 0}
+        assert incremental['series']['absences']['2025-03'] == 1
+        assert [t['id'] for t in incremental['top_etudiants']] == [2, 1]
+        assert incremental['top_etudiants'][1]['moyenne_generale'] == pytest.approx(11.5)
+
+        rebuild_stats_snapshot(db)
+        assert _snapshot(db) == incremental
+
+    def test_class_moved_to_other_filiere(self, db):
+        db.execute("UPDATE classes SET filiere_id = 2 WHERE id = 1")
+        db.commit()
+        assert [r['nombre'] for r in _snapshot(db)['repartition_filieres']] == [0, 1]
+
+    def test_freshness_timestamp(self, db):
+        assert read_stats_snapshot(db)['updated_at'] is not None
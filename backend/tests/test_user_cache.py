@@ -0,0 +1,118 @@
+"""
+Tests du cache des utilisateurs authentifiés
+"""
+import pytest
+import sys
+import os
+import sqlite3
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from database.db import init_db_pool
+from utils.lru import LRUCache
+from utils import auth as auth_utils
+from utils.auth import role_required, get_current_user, invalidate_user_cache, build_role_claims
+
+@pytest.fixture
+def app(tmp_path):
+    """Application minimale avec une table users"""
+    db_path = str(tmp_path / 'users.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50), role VARCHAR(20), nom VARCHAR(100),
+            is_active BOOLEAN DEFAULT 1
+        )
+    """)
+    conn.execute("INSERT INTO users (username, role, nom) VALUES ('prof', 'enseignant', 'Koffi')")
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-jwt-secret-key'
+    app.config['DATABASE'] = db_path
+    JWTManager(app)
+    init_db_pool(app)
+
+    @app.route('/protected')
+    @role_required('enseignant')
+    def protected():
+        return jsonify({'nom': get_current_user()['nom']})
+
+    auth_utils._user_cache.clear()
+    yield app
+    auth_utils._user_cache.clear()
+
+def _token(app, **claims):
+    with app.app_context():
+        return create_access_token(identity=1, additional_claims=claims)
+
+def _set_user(app, **fields):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    for field, value in fields.items():
+        conn.execute(f"UPDATE users SET {field} = ? WHERE id = 1", (value,))
+    conn.commit()
+    conn.close()
+
+class TestLRUCache:
+    """Tests du cache LRU/TTL"""
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_size=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert 'b' not in cache
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiration(self):
+        cache = LRUCache(max_size=10, ttl=0.05)
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        time.sleep(0.06)
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+class TestUserCache:
+    """Tests de role_required / get_current_user avec cache"""
+
+    def test_user_loaded_once(self, app):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {_token(app)}'}
+
+        assert client.get('/protected', headers=headers).get_json() == {'nom': 'Koffi'}
+        _set_user(app, nom='Modifié')
+        # Servi depuis le cache
+        assert client.get('/protected', headers=headers).get_json() == {'nom': 'Koffi'}
+        assert auth_utils.get_user_cache_stats()['hits'] >= 1
+
+    def test_invalidation(self, app):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {_token(app)}'}
+
+        assert client.get('/protected', headers=headers).status_code == 200
+        _set_user(app, is_active=0)
+        with app.test_request_context():
+            invalidate_user_cache(1)
+        assert client.get('/protected', headers=headers).status_code == 403
+
+    def test_role_claims_skip_database(self, app):
+        app.config['JWT_ROLE_CLAIMS'] = True
+        with app.app_context():
+            assert build_role_claims({'role': 'enseignant'}) == {'role': 'enseignant'}
+
+        @app.route('/claims')
+        @role_required('admin')
+        def claims():
+            return jsonify({})
+
+        client = app.test_client()
+        headers = {'Authorization': f"Bearer {_token(app, role='enseignant')}"}
+        assert client.get('/claims', headers=headers).status_code == 403
+        assert len(auth_utils._user_cache) == 0
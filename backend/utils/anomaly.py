@@ -0,0 +1,191 @@
+"""
+Détection d'activité suspecte sur fenêtres glissantes en mémoire
+
+Les tentatives de connexion et les actions sensibles sont enregistrées au
+fil de l'eau (log_connection, log_action) dans des fenêtres par
+utilisateur et par IP; la vérification faite à chaque connexion ne lit plus
+logs_connexion ni logs_actions et son coût ne dépend pas de leur taille.
+
+Une fenêtre ne conserve que `seuil + 1` événements: au-delà, le verdict ne
+change plus. Le nombre de fenêtres est borné (LRU). Chaque worker a ses
+propres fenêtres, rechargées au démarrage depuis la dernière heure de logs.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from flask import current_app, has_app_context
+from database.db import get_db_connection
+from utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_KEYS = 50000
+
+# Règles: (seuil, fenêtre en secondes); suspect au-delà du seuil
+DEFAULT_SEUILS = {
+    'echecs_utilisateur': (5, 15 * 60),
+    'echecs_ip': (20, 15 * 60),
+    'ips_utilisateur': (3, 60 * 60),
+    'actions': (10, 60 * 60),
+}
+
+SUSPICIOUS_ACTIONS = ('suppression', 'modification_massive', 'export_donnees')
+
+RAISONS = {
+    'echecs_utilisateur': "Trop de tentatives de connexion échouées",
+    'echecs_ip': "Trop de tentatives de connexion échouées depuis cette adresse IP",
+    'ips_utilisateur': "Changements d'adresse IP suspects",
+    'actions': "Trop d'actions suspectes détectées",
+}
+
+class SlidingWindow:
+    """Dates des derniers événements d'une fenêtre (au plus `seuil + 1`)"""
+
+    def __init__(self, seuil, duree):
+        self.duree = duree
+        self._dates = deque(maxlen=seuil + 1)
+
+    def add(self, now):
+        self._dates.append(now)
+
+    def count(self, now):
+        limite = now - self.duree
+        while self._dates and self._dates[0] <= limite:
+            self._dates.popleft()
+        return len(self._dates)
+
+class DistinctWindow:
+    """Valeurs distinctes vues dans la fenêtre (au plus `seuil + 1`, les plus récentes)"""
+
+    def __init__(self, seuil, duree):
+        self.seuil = seuil
+        self.duree = duree
+        self._vues = OrderedDict()  # valeur -> dernière date, de la plus ancienne à la plus récente
+
+    def add(self, valeur, now):
+        self._vues[valeur] = now
+        self._vues.move_to_end(valeur)
+        while len(self._vues) > self.seuil + 1:
+            self._vues.popitem(last=False)
+
+    def count(self, now):
+        limite = now - self.duree
+        while self._vues and next(iter(self._vues.values())) <= limite:
+            self._vues.popitem(last=False)
+        return len(self._vues)
+
+class AnomalyDetector:
+    """Fenêtres glissantes par utilisateur et par IP"""
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, seuils=None):
+        self.seuils = dict(DEFAULT_SEUILS, **(seuils or {}))
+        self._fenetres = LRUCache(max_size=max_keys, ttl=None)
+        self._lock = threading.Lock()
+        self._stats = {'connexions': 0, 'actions': 0, 'verifications': 0,
+                       'alertes': {regle: 0 for regle in self.seuils}}
+
+    def _fenetre(self, regle, cle, classe=SlidingWindow):
+        """Fenêtre d'une règle pour une clé (créée au besoin); appelée sous le verrou"""
+        seuil, duree = self.seuils[regle]
+        fenetre = self._fenetres.get((regle, cle))
+        if fenetre is None:
+            fenetre = classe(seuil, duree)
+        # Une fenêtre inactive depuis sa durée est vide: elle peut être oubliée
+        self._fenetres.set((regle, cle), fenetre, ttl=duree)
+        return fenetre
+
+    def _count(self, regle, cle, now):
+        fenetre = self._fenetres.get((regle, cle))
+        return fenetre.count(now) if fenetre is not None else 0
+
+    def record_login(self, user_id, ip_address, succes, now=None):
+        """Enregistre une tentative de connexion"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._stats['connexions'] += 1
+            if succes:
+                if user_id:
+                    self._fenetre('ips_utilisateur', user_id, DistinctWindow).add(ip_address, now)
+                return
+            if user_id:
+                self._fenetre('echecs_utilisateur', user_id).add(now)
+            if ip_address:
+                self._fenetre('echecs_ip', ip_address).add(now)
+
+    def record_action(self, user_id, action, now=None):
+        """Enregistre une action (seules les actions sensibles sont comptées)"""
+        if action not in SUSPICIOUS_ACTIONS:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._stats['actions'] += 1
+            self._fenetre('actions', (user_id, action)).add(now)
+
+    def check(self, user_id, action, ip_address, now=None):
+        """Retourne (suspect, raison) pour une action de l'utilisateur depuis une IP"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._stats['verifications'] += 1
+            comptes = [
+                ('echecs_utilisateur', self._count('echecs_utilisateur', user_id, now)),
+                ('echecs_ip', self._count('echecs_ip', ip_address, now)),
+                ('ips_utilisateur', self._count('ips_utilisateur', user_id, now)),
+            ]
+            if action in SUSPICIOUS_ACTIONS:
+                comptes.append(('actions', self._count('actions', (user_id, action), now)))
+            for regle, nombre in comptes:
+                if nombre > self.seuils[regle][0]:
+                    self._stats['alertes'][regle] += 1
+                    return True, RAISONS[regle]
+        return False, None
+
+    def load(self, db):
+        """Recharge les fenêtres depuis les logs récents (au démarrage)"""
+        duree = max(duree for _, duree in self.seuils.values())
+        depuis = f'-{int(duree)} seconds'
+        connexions = db.execute("""
+            SELECT user_id, ip_address, statut, CAST(strftime('%s', created_at) AS REAL) as date
+            FROM logs_connexion WHERE created_at > datetime('now', ?) ORDER BY created_at, id
+        """, (depuis,)).fetchall()
+        for row in connexions:
+            self.record_login(row['user_id'], row['ip_address'], row['statut'] == 'succes', row['date'])
+
+        placeholders = ','.join('?' * len(SUSPICIOUS_ACTIONS))
+        actions = db.execute(f"""
+            SELECT user_id, action, CAST(strftime('%s', created_at) AS REAL) as date
+            FROM logs_actions
+            WHERE created_at > datetime('now', ?) AND action IN ({placeholders})
+            ORDER BY created_at, id
+        """, (depuis, *SUSPICIOUS_ACTIONS)).fetchall()
+        for row in actions:
+            self.record_action(row['user_id'], row['action'], row['date'])
+        return len(connexions) + len(actions)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, alertes=dict(self._stats['alertes']))
+        stats['fenetres'] = len(self._fenetres)
+        return stats
+
+def init_anomaly_detector(app):
+    """Crée le détecteur de l'application et le recharge depuis les logs récents"""
+    detector = AnomalyDetector(max_keys=app.config.get('ANOMALY_MAX_KEYS', DEFAULT_MAX_KEYS))
+    with app.app_context():
+        try:
+            with get_db_connection(read_only=True) as db:
+                detector.load(db)
+        except sqlite3.Error as e:
+            logger.warning("Fenêtres de détection non rechargées: %s", e)
+    app.extensions['anomaly_detector'] = detector
+    return detector
+
+# Détecteur hors application (scripts, tests)
+_default_detector = AnomalyDetector()
+
+def get_anomaly_detector():
+    """Retourne le détecteur de l'application courante (ou celui du processus)"""
+    if has_app_context():
+        return current_app.extensions.get('anomaly_detector', _default_detector)
+    return _default_detector
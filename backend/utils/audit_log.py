@@ -0,0 +1,275 @@
+"""
+Écriture différée et groupée du journal d'audit (logs_connexion, logs_actions)
+
+log_connection, log_action et log_security_event déposent leurs lignes
+dans une file bornée en mémoire; un thread les écrit toutes les
+AUDIT_FLUSH_INTERVAL secondes par lots (executemany, une transaction par
+lot). La requête ne paie plus ni l'INSERT ni le commit.
+
+File pleine (AUDIT_OVERFLOW):
+- 'block': la requête attend une place au plus AUDIT_BLOCK_TIMEOUT
+  secondes, puis la ligne est abandonnée;
+- 'drop': la ligne est abandonnée aussitôt;
+- 'spill': la ligne est ajoutée à un fichier JSON lines, relu et écrit
+  en base dès que la file est vide (ce fichier reçoit aussi les lots dont
+  l'écriture a échoué).
+Les abandons et débordements sont comptés dans stats().
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+from database.db import get_db, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0   # secondes entre deux écritures
+DEFAULT_BLOCK_TIMEOUT = 1.0
+OVERFLOW_POLICIES = ('block', 'drop', 'spill')
+
+INSERTS = {
+    'connexion': """
+        INSERT INTO logs_connexion (user_id, username, ip_address, user_agent, statut, raison_echec, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    'action': """
+        INSERT INTO logs_actions (user_id, action, table_affectee, enregistrement_id,
+                                  anciennes_valeurs, nouvelles_valeurs, ip_address, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+def _horodatage():
+    """Date de l'événement au format de CURRENT_TIMESTAMP (UTC)"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def _write_rows(db, evenements):
+    """Insère des événements (type, valeurs) en un executemany par table; sans commit"""
+    par_type = {}
+    for type_evenement, valeurs in evenements:
+        par_type.setdefault(type_evenement, []).append(valeurs)
+    for type_evenement, lignes in par_type.items():
+        db.executemany(INSERTS[type_evenement], lignes)
+
+class AuditWriter:
+    """File bornée d'événements d'audit et thread d'écriture par lots"""
+
+    def __init__(self, app, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, overflow='spill', spill_path=None,
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {overflow}")
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        # Un fichier par processus; les fichiers de tous les processus sont repris
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'recus': 0, 'ecrits': 0, 'lots': 0, 'abandonnes': 0, 'deverses': 0,
+                       'repris': 0, 'attentes': 0, 'erreurs': 0}
+
+    def _count(self, nom, nombre=1):
+        with self._stats_lock:
+            self._stats[nom] += nombre
+
+    # ---- Dépôt ----
+
+    def submit(self, type_evenement, valeurs):
+        """Dépose un événement ('connexion' ou 'action', valeurs de l'INSERT)"""
+        self._count('recus')
+        evenement = (type_evenement, tuple(valeurs))
+        try:
+            self._queue.put_nowait(evenement)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == 'block':
+            self._count('attentes')
+            try:
+                self._queue.put(evenement, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                pass
+        elif self.overflow == 'spill' and self.spill_path:
+            return self._spill([evenement])
+        self._count('abandonnes')
+        return False
+
+    # ---- Débordement sur fichier ----
+
+    def _spill_file(self):
+        return f"{self.spill_path}.{os.getpid()}.jsonl"
+
+    def _spill(self, evenements):
+        """Ajoute des événements au fichier de débordement du processus"""
+        try:
+            with self._spill_lock, open(self._spill_file(), 'a', encoding='utf-8') as f:
+                for type_evenement, valeurs in evenements:
+                    f.write(json.dumps([type_evenement, valeurs]) + '\n')
+        except OSError as e:
+            logger.warning("Débordement du journal d'audit impossible: %s", e)
+            self._count('abandonnes', len(evenements))
+            return False
+        self._count('deverses', len(evenements))
+        return True
+
+    def _recover(self, db):
+        """Écrit les événements des fichiers de débordement; retourne leur nombre
+
+        Un fichier est écrit en une transaction: en cas d'échec il est remis
+        en place sous un nouveau nom et sera repris intégralement plus tard.
+        """
+        repris = 0
+        for chemin in glob.glob(f"{glob.escape(self.spill_path)}.*.jsonl"):
+            # Le renommage est atomique: un seul processus reprend un fichier donné
+            en_cours = f"{chemin}.reprise-{os.getpid()}"
+            try:
+                with self._spill_lock:
+                    os.rename(chemin, en_cours)
+            except OSError:
+                continue
+            try:
+                with open(en_cours, 'r', encoding='utf-8') as f:
+                    evenements = [tuple(json.loads(ligne)) for ligne in f if ligne.strip()]
+                for debut in range(0, len(evenements), self.batch_size):
+                    _write_rows(db, evenements[debut:debut + self.batch_size])
+                db.commit()
+            except Exception:
+                db.rollback()
+                os.rename(en_cours, f"{self.spill_path}.{os.getpid()}-{time.time_ns()}.jsonl")
+                raise
+            os.remove(en_cours)
+            repris += len(evenements)
+        if repris:
+            self._count('repris', repris)
+        return repris
+
+    # ---- Écriture ----
+
+    def flush(self):
+        """Écrit tous les événements en file par lots; retourne le nombre écrit"""
+        with self._flush_lock, self.app.app_context():
+            ecrits = 0
+            with get_db_connection() as db:
+                while True:
+                    lot = []
+                    while len(lot) < self.batch_size:
+                        try:
+                            lot.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    if not lot:
+                        break
+                    try:
+                        _write_rows(db, lot)
+                        db.commit()
+                    except sqlite3.Error as e:
+                        db.rollback()
+                        logger.warning("Écriture du journal d'audit échouée: %s", e)
+                        self._count('erreurs')
+                        if self.spill_path:
+                            self._spill(lot)
+                        else:
+                            self._count('abandonnes', len(lot))
+                        break
+                    ecrits += len(lot)
+                    self._count('ecrits', len(lot))
+                    self._count('lots')
+
+                if self.spill_path and self._queue.empty():
+                    try:
+                        ecrits += self._recover(db)
+                    except (OSError, ValueError, sqlite3.Error) as e:
+                        db.rollback()
+                        logger.warning("Reprise du journal d'audit échouée: %s", e)
+                        self._count('erreurs')
+        return ecrits
+
+    def start(self):
+        """Démarre le thread d'écriture"""
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le thread puis écrit les événements restants"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning("Journal d'audit non vidé à l'arrêt: %s", e)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Écriture du journal d'audit échouée: %s", e)
+
+    def stats(self):
+        """Compteurs de la file et taille courante"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['en_file'] = self._queue.qsize()
+        stats['capacite'] = self._queue.maxsize
+        stats['debordement'] = self.overflow
+        return stats
+
+def record_audit(type_evenement, valeurs):
+    """Enregistre un événement d'audit: en file si l'écriture différée est active, sinon en base"""
+    writer = current_app.extensions.get('audit_writer') if has_app_context() else None
+    valeurs = tuple(valeurs) + (_horodatage(),)
+    if writer is not None:
+        writer.submit(type_evenement, valeurs)
+        return
+    db = get_db()
+    try:
+        _write_rows(db, [(type_evenement, valeurs)])
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+def init_audit_log(app):
+    """Démarre l'écriture différée du journal d'audit (AUDIT_ASYNC)"""
+    if not app.config.get('AUDIT_ASYNC', True):
+        return None
+    spill_path = app.config.get('AUDIT_SPILL_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(app.config['DATABASE'])), 'audit_spill')
+    writer = AuditWriter(
+        app,
+        queue_size=app.config.get('AUDIT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+        overflow=app.config.get('AUDIT_OVERFLOW', 'spill'),
+        spill_path=spill_path,
+        block_timeout=app.config.get('AUDIT_BLOCK_TIMEOUT', DEFAULT_BLOCK_TIMEOUT),
+    )
+    if app.config.get('AUDIT_WRITER_THREAD', True):
+        writer.start()
+    atexit.register(writer.stop)
+    app.extensions['audit_writer'] = writer
+    return writer
+
+def get_audit_writer():
+    """Retourne l'écrivain du journal d'audit de l'application (None si écriture synchrone)"""
+    return current_app.extensions.get('audit_writer')
@@ -4,14 +4,24 @@ Utilitaires d'authentification et de sécurité
 import secrets
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import jsonify, request, session
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask import jsonify, request, session, g, current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 from flask_bcrypt import Bcrypt
 from database.db import get_db, execute_db
+from utils.lru import LRUCache
+from utils.anomaly import get_anomaly_detector
+from utils.audit_log import record_audit
 
 # Initialiser bcrypt
 bcrypt = Bcrypt()
 
+# Cache des utilisateurs authentifiés, indexé par identité JWT.
+# Local au processus: la durée de vie (USER_CACHE_TTL) borne le délai de
+# propagation d'une modification faite par un autre worker.
+USER_CACHE_SIZE = 4096
+DEFAULT_USER_CACHE_TTL = 60
+_user_cache = LRUCache(max_size=USER_CACHE_SIZE, ttl=DEFAULT_USER_CACHE_TTL)
+
 def hash_password(password):
     """Hash un mot de passe avec bcrypt (sécurisé)"""
     return bcrypt.generate_password_hash(password).decode('utf-8')
@@ -34,55 +44,62 @@ def generate_reset_token():
     return secrets.token_urlsafe(32)
 
 def log_connection(user_id, username, ip_address, user_agent, statut, raison_echec=None):
-    """Enregistre une tentative de connexion"""
+    """Enregistre une tentative de connexion (écriture différée, voir utils/audit_log.py)"""
+    get_anomaly_detector().record_login(user_id, ip_address, statut == 'succes')
     try:
-        db = get_db()
         # Si user_id est None, utiliser 0 (utilisateur système/anonyme)
         effective_user_id = user_id if user_id is not None else 0
-        
-        db.execute("""
-            INSERT INTO logs_connexion (user_id, username, ip_address, user_agent, statut, raison_echec)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (effective_user_id, username, ip_address, user_agent, statut, raison_echec))
-        db.commit()
+        record_audit('connexion', (effective_user_id, username, ip_address, user_agent, statut, raison_echec))
     except Exception as e:
         # Ne pas faire échouer l'application si le logging échoue
         # Logger l'erreur mais continuer l'exécution
         import logging
         logging.warning(f"Erreur lors du logging de connexion: {e}")
-        # Rollback si nécessaire
-        try:
-            db.rollback()
-        except:
-            pass
 
 def log_action(user_id, action, table_affectee=None, enregistrement_id=None, 
                anciennes_valeurs=None, nouvelles_valeurs=None):
-    """Enregistre une action sensible"""
+    """Enregistre une action sensible (écriture différée, voir utils/audit_log.py)"""
+    get_anomaly_detector().record_action(user_id, action)
     try:
         import json
-        db = get_db()
         # Si user_id est None, utiliser 0 (utilisateur système/anonyme)
         effective_user_id = user_id if user_id is not None else 0
-        
-        db.execute("""
-            INSERT INTO logs_actions (user_id, action, table_affectee, enregistrement_id, 
-                                     anciennes_valeurs, nouvelles_valeurs, ip_address)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (effective_user_id, action, table_affectee, enregistrement_id,
-              json.dumps(anciennes_valeurs) if anciennes_valeurs else None,
-              json.dumps(nouvelles_valeurs) if nouvelles_valeurs else None,
-              request.remote_addr if hasattr(request, 'remote_addr') else 'unknown'))
-        db.commit()
+        record_audit('action', (effective_user_id, action, table_affectee, enregistrement_id,
+                                json.dumps(anciennes_valeurs) if anciennes_valeurs else None,
+                                json.dumps(nouvelles_valeurs) if nouvelles_valeurs else None,
+                                request.remote_addr if hasattr(request, 'remote_addr') else 'unknown'))
     except Exception as e:
         # Ne pas faire échouer l'application si le logging échoue
         import logging
         logging.warning(f"Erreur lors du logging d'action: {e}")
-        # Rollback si nécessaire
-        try:
-            db.rollback()
-        except:
-            pass
+
+def load_user(user_id):
+    """Charge un utilisateur depuis le cache, ou depuis la base en cas d'absence"""
+    key = str(user_id)
+    user = _user_cache.get(key)
+    if user is None:
+        row = get_db().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        _user_cache.set(key, user, ttl=current_app.config.get('USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL))
+    return user
+
+def invalidate_user_cache(user_id):
+    """Retire un utilisateur du cache (à appeler après toute modification de users)"""
+    _user_cache.delete(str(user_id))
+    if g.get('current_user') and str(g.current_user['id']) == str(user_id):
+        g.pop('current_user')
+
+def get_user_cache_stats():
+    """Statistiques du cache des utilisateurs"""
+    return _user_cache.stats()
+
+def build_role_claims(user):
+    """Claims additionnels du JWT (rôle embarqué si JWT_ROLE_CLAIMS est activé)"""
+    if current_app.config.get('JWT_ROLE_CLAIMS'):
+        return {'role': user['role']}
+    return {}
 
 def role_required(*roles):
     """Décorateur pour vérifier le rôle de l'utilisateur"""
@@ -90,14 +107,17 @@ def role_required(*roles):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            db = get_db()
-            user = db.execute(
-                "SELECT role FROM users WHERE id = ? AND is_active = 1",
-                (user_id,)
-            ).fetchone()
             
-            if not user or user['role'] not in roles:
+            # Rôle embarqué dans le token: aucune requête en base
+            if current_app.config.get('JWT_ROLE_CLAIMS'):
+                role = get_jwt().get('role')
+                if role is not None:
+                    if role not in roles:
+                        return jsonify({'error': 'Accès refusé'}), 403
+                    return f(*args, **kwargs)
+            
+            user = get_current_user()
+            if not user or not user['is_active'] or user['role'] not in roles:
                 return jsonify({'error': 'Accès refusé'}), 403
             
             return f(*args, **kwargs)
@@ -105,13 +125,9 @@ def role_required(*roles):
     return decorator
 
 def get_current_user():
-    """Obtient l'utilisateur actuellement connecté"""
-    verify_jwt_in_request()
-    user_id = get_jwt_identity()
-    db = get_db()
-    user = db.execute(
-        "SELECT * FROM users WHERE id = ?",
-        (user_id,)
-    ).fetchone()
-    return dict(user) if user else None
-
+    """Obtient l'utilisateur actuellement connecté (chargé une fois par requête)"""
+    if 'current_user' not in g:
+        verify_jwt_in_request()
+        user = load_user(get_jwt_identity())
+        g.current_user = dict(user) if user else None
+    return g.current_user
@@ -1,72 +1,355 @@
 """
 Service de cache pour améliorer les performances
+
+Backend en mémoire (LRU/TTL, par défaut) ou Redis, invalidation par tags
+(ex. 'etudiant:42', 'classe:7', 'paiements') et protection contre les
+recalculs simultanés d'une même entrée (single-flight).
 """
-from flask_caching import Cache
-import json
+import inspect
+import logging
+import pickle
+import secrets
+import threading
+import time
+from contextlib import contextmanager
 from functools import wraps
+from flask import current_app, request, Response
+from flask_jwt_extended import get_jwt_identity
+from utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300          # secondes
+DEFAULT_MAX_ENTRIES = 10000
+LOCK_TIMEOUT = 30              # durée maximale d'un recalcul protégé (secondes)
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+class MemoryBackend:
+    """Backend en mémoire du processus (LRU borné avec expiration)"""
+    distributed = False
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, default_timeout=DEFAULT_TIMEOUT):
+        self._cache = LRUCache(max_size=max_entries, ttl=default_timeout)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_many(self, keys):
+        return [self._cache.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        self._cache.set(key, value, ttl=timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._cache.add(key, value, ttl=timeout)
+
+    def delete(self, key):
+        return self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return dict(self._cache.stats(), backend='memory')
+
+class RedisBackend:
+    """Backend Redis partagé entre processus (valeurs sérialisées avec pickle)
+
+    `client` est un client redis-py ou tout objet exposant get / mget / set
+    (nx, px) / delete / scan_iter.
+    """
+    distributed = True
+
+    def __init__(self, client, prefix='esa:', default_timeout=DEFAULT_TIMEOUT):
+        self.client = client
+        self.prefix = prefix
+        self.default_timeout = default_timeout
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def _expiry(self, timeout):
+        timeout = self.default_timeout if timeout is None else timeout
+        return int(timeout * 1000) if timeout else None
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return None if raw is None else pickle.loads(raw)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        raws = self.client.mget([self._key(key) for key in keys])
+        return [None if raw is None else pickle.loads(raw) for raw in raws]
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self._key(key), pickle.dumps(value), px=self._expiry(timeout))
+
+    def add(self, key, value, timeout=None):
+        return bool(self.client.set(self._key(key), pickle.dumps(value), nx=True,
+                                    px=self._expiry(timeout)))
+
+    def delete(self, key):
+        return bool(self.client.delete(self._key(key)))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            self.client.delete(key)
+
+    def stats(self):
+        return {'backend': 'redis', 'prefix': self.prefix}
+
+class Cache:
+    """Façade du cache: tags générationnels et recalcul unique par clé
+
+    Chaque tag possède un jeton aléatoire stocké sous 'tag:<nom>'. Une entrée
+    mémorise les jetons de ses tags au moment du calcul; invalider un tag
+    change son jeton, ce qui rend caduques toutes les entrées qui le portent
+    sans avoir à les énumérer.
+    """
+
+    def __init__(self, backend=None, default_timeout=DEFAULT_TIMEOUT):
+        self.backend = backend or MemoryBackend(default_timeout=default_timeout)
+        self.default_timeout = default_timeout
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'computations': 0, 'coalesced': 0,
+                       'invalidations': 0}
 
-cache = Cache()
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
 
-def init_cache(app):
+    # ---- Tags ----
+
+    def _tag_tokens(self, tags):
+        """Jetons courants des tags (créés s'ils n'existent pas encore)"""
+        if not tags:
+            return {}
+        keys = [f"tag:{tag}" for tag in tags]
+        tokens = dict(zip(tags, self.backend.get_many(keys)))
+        for tag, token in tokens.items():
+            if token is None:
+                token = secrets.token_hex(8)
+                if not self.backend.add(f"tag:{tag}", token, timeout=0):
+                    token = self.backend.get(f"tag:{tag}")
+                tokens[tag] = token
+        return tokens
+
+    def _is_fresh(self, entry):
+        tags = entry['tags']
+        if not tags:
+            return True
+        current = self.backend.get_many([f"tag:{tag}" for tag in tags])
+        return all(token == tags[tag] for tag, token in zip(tags, current))
+
+    def invalidate_tags(self, *tags):
+        """Invalide toutes les entrées portant l'un des tags"""
+        for tag in tags:
+            self.backend.set(f"tag:{tag}", secrets.token_hex(8), timeout=0)
+            self._count('invalidations')
+
+    # ---- Accès aux entrées ----
+
+    def _lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry['value']
+        return _MISSING
+
+    def _store(self, key, value, timeout, tokens):
+        timeout = self.default_timeout if timeout is None else timeout
+        self.backend.set(key, {'value': value, 'tags': tokens}, timeout=timeout)
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        self._count('misses' if value is _MISSING else 'hits')
+        return default if value is _MISSING else value
+
+    def set(self, key, value, timeout=None, tags=None):
+        self._store(key, value, timeout, self._tag_tokens(tags))
+
+    def add(self, key, value, timeout=None, tags=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        return self.backend.add(key, {'value': value, 'tags': self._tag_tokens(tags)},
+                                timeout=timeout)
+
+    def delete(self, key):
+        return self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_or_set(self, key, func, timeout=None, tags=None, unless=None):
+        """Retourne la valeur en cache ou la calcule une seule fois
+
+        Les appels concurrents sur une même clé attendent le calcul en cours
+        au lieu de le relancer. `unless(valeur)` vrai empêche la mise en cache.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+
+        # Lire les jetons avant le calcul: une invalidation pendant le calcul
+        # rend immédiatement l'entrée caduque
+        tokens = self._tag_tokens(tags)
+        with self._single_flight(key) as computed_elsewhere:
+            if computed_elsewhere:
+                value = self._lookup(key)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    return value
+            value = func()
+            self._count('computations')
+            if unless is None or not unless(value):
+                self._store(key, value, timeout, tokens)
+            return value
+
+    @contextmanager
+    def _single_flight(self, key):
+        """Verrou par clé (processus) doublé d'un verrou Redis si partagé
+
+        Produit True si un autre appelant a pu calculer la valeur entre-temps.
+        """
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        lock = entry[0]
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            lock.acquire()
+        try:
+            if self.backend.distributed:
+                with self._distributed_lock(key) as waited_remote:
+                    yield waited or waited_remote
+            else:
+                yield waited
+        finally:
+            lock.release()
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    @contextmanager
+    def _distributed_lock(self, key):
+        lock_key = f"lock:{key}"
+        token = secrets.token_hex(8)
+        acquired = self.backend.add(lock_key, token, timeout=LOCK_TIMEOUT)
+        waited = False
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not acquired and time.monotonic() < deadline:
+            # Un autre processus calcule: attendre son résultat
+            waited = True
+            if self._lookup(key) is not _MISSING:
+                break
+            time.sleep(LOCK_POLL_INTERVAL)
+            acquired = self.backend.add(lock_key, token, timeout=LOCK_TIMEOUT)
+        try:
+            yield waited
+        finally:
+            if acquired and self.backend.get(lock_key) == token:
+                self.backend.delete(lock_key)
+
+    def stats(self):
+        """Statistiques du cache (succès, échecs, calculs, appels regroupés)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.backend.stats()
+        return stats
+
+def _create_backend(config):
+    """Crée le backend selon CACHE_TYPE (repli sur la mémoire si Redis est indisponible)"""
+    default_timeout = config.get('CACHE_DEFAULT_TIMEOUT', DEFAULT_TIMEOUT)
+    if config.get('CACHE_TYPE', 'memory') == 'redis':
+        try:
+            import redis
+            client = redis.Redis.from_url(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            client.ping()
+            return RedisBackend(client, prefix=config.get('CACHE_KEY_PREFIX', 'esa:'),
+                                default_timeout=default_timeout)
+        except Exception as e:
+            logger.warning("Cache Redis indisponible (%s), repli sur le cache mémoire", e)
+    return MemoryBackend(max_entries=config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                         default_timeout=default_timeout)
+
+def init_cache(app, backend=None):
     """Initialise le système de cache"""
-    cache.init_app(app, config={
-        'CACHE_TYPE': 'redis',  # En production
-        'CACHE_REDIS_URL': 'redis://localhost:6379/0',
-        'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes par défaut
-    })
+    cache = Cache(backend or _create_backend(app.config),
+                  default_timeout=app.config.get('CACHE_DEFAULT_TIMEOUT', DEFAULT_TIMEOUT))
+    app.extensions['cache'] = cache
     return cache
 
-# Cache en mémoire pour développement (si Redis non disponible)
-cache_memory = {}
+def get_cache():
+    """Retourne le cache de l'application courante (None si non initialisé)"""
+    return current_app.extensions.get('cache')
+
+def _serialize_response(response):
+    return {
+        'body': response.get_data(),
+        'status': response.status_code,
+        'mimetype': response.mimetype,
+    }
 
-def cached(timeout=300, key_prefix='view'):
-    """Décorateur pour mettre en cache une fonction"""
+def cached(timeout=DEFAULT_TIMEOUT, key_prefix='view', tags=None, per_user=False):
+    """Décorateur pour mettre en cache la réponse d'une vue GET
+
+    Les tags peuvent référencer les paramètres de la route, ex.
+    'etudiant:{etudiant_id}', passés par nom ou par position. Avec per_user=True, la clé inclut l'identité
+    JWT (à utiliser dès que la vue filtre selon l'utilisateur). Seules les
+    réponses 200 sont mises en cache.
+    """
     def decorator(f):
+        signature = inspect.signature(f)
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Générer une clé de cache unique
-            cache_key = f"{key_prefix}:{f.__name__}:{str(args)}:{str(kwargs)}"
-            
-            # Vérifier le cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Exécuter la fonction
-            result = f(*args, **kwargs)
-            
-            # Mettre en cache
-            cache.set(cache_key, result, timeout=timeout)
-            
-            return result
+            cache = get_cache()
+            if cache is None or request.method != 'GET':
+                return f(*args, **kwargs)
+
+            key = f"{key_prefix}:{f.__module__}.{f.__name__}:{request.full_path}"
+            if per_user:
+                key = f"{key}:user={get_jwt_identity()}"
+            # Arguments liés aux noms des paramètres: la vue peut aussi être appelée directement
+            arguments = signature.bind(*args, **kwargs).arguments
+            entry_tags = [tag.format(**arguments) for tag in tags or ()]
+
+            entry = cache.get_or_set(
+                key,
+                lambda: _serialize_response(current_app.make_response(f(*args, **kwargs))),
+                timeout=timeout,
+                tags=entry_tags,
+                unless=lambda value: value['status'] != 200,
+            )
+            return Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
         return decorated_function
     return decorator
 
-def invalidate_cache(pattern):
-    """Invalide le cache selon un pattern"""
-    try:
-        # Si Redis est utilisé
-        cache.cache.delete_many(pattern)
-    except:
-        # Fallback en mémoire
-        keys_to_delete = [k for k in cache_memory.keys() if pattern in k]
-        for key in keys_to_delete:
-            del cache_memory[key]
+def invalidate_cache(*tags):
+    """Invalide les entrées du cache portant l'un des tags"""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate_tags(*tags)
 
 def cache_user_data(user_id, data, timeout=600):
     """Cache les données d'un utilisateur"""
-    cache_key = f"user:{user_id}:data"
-    cache.set(cache_key, data, timeout=timeout)
+    cache = get_cache()
+    if cache is not None:
+        cache.set(f"user:{user_id}:data", data, timeout=timeout, tags=[f"user:{user_id}"])
 
 def get_cached_user_data(user_id):
     """Récupère les données cachées d'un utilisateur"""
-    cache_key = f"user:{user_id}:data"
-    return cache.get(cache_key)
+    cache = get_cache()
+    return cache.get(f"user:{user_id}:data") if cache is not None else None
 
 def clear_user_cache(user_id):
     """Efface le cache d'un utilisateur"""
-    cache.delete(f"user:{user_id}:data")
-    cache.delete(f"user:{user_id}:permissions")
-    cache.delete(f"user:{user_id}:notifications")
-
-
+    invalidate_cache(f"user:{user_id}")
@@ -0,0 +1,139 @@
+"""
+Cache disque des documents générés, adressé par le contenu
+
+La clé d'un document est l'empreinte SHA-256 de ses données d'entrée
+(type, version des gabarits, données transmises au rendu): tant que ces
+données ne changent pas, le fichier déjà produit est resservi. L'index
+documents_cache (schema_documents.sql) est purgé par triggers quand les
+moyennes ou paiements changent, et borne la taille totale du cache: au-delà
+de la limite, les documents les moins récemment servis sont supprimés. Les
+fichiers des entrées purgées sont retirés par un balayage périodique du
+répertoire (sweep), hors de toute transaction d'écriture.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent.parent / "database" / "schema_documents.sql"
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Intervalle minimal entre deux mises à jour de date_acces d'un document (secondes)
+DEFAULT_TOUCH_INTERVAL = 300
+# Âge minimal d'un fichier orphelin avant suppression (écriture concurrente en cours)
+ORPHAN_GRACE = 60
+# Intervalle entre deux balayages des fichiers orphelins (secondes)
+DEFAULT_SWEEP_INTERVAL = 3600
+
+def install_document_cache(db):
+    """Crée l'index du cache et ses triggers d'invalidation (migration idempotente)"""
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        db.executescript(f.read())
+
+def document_key(job_type, document, version):
+    """Empreinte des données d'entrée d'un document"""
+    payload = json.dumps([job_type, version, document['args']], sort_keys=True,
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class DocumentCache:
+    """Fichiers de documents rangés par empreinte (<répertoire>/<2 car.>/<clé>.pdf)"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, touch_interval=DEFAULT_TOUCH_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        os.makedirs(os.path.join(directory, 'tmp'), exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+
+    def staging_path(self, key):
+        """Fichier temporaire de rendu (unique: deux rendus du même document peuvent coexister)"""
+        return os.path.join(self.directory, 'tmp', f'{key}.{uuid.uuid4().hex}.pdf')
+
+    def get(self, db, key):
+        """Entrée du cache (dict avec path, date_creation, a_rafraichir) ou None"""
+        row = db.execute("""
+            SELECT cle, date_creation, date_acces < datetime('now', ?) as a_rafraichir
+            FROM documents_cache WHERE cle = ?
+        """, (f'-{int(self.touch_interval)} seconds', key)).fetchone()
+        if row is None:
+            return None
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        return {'path': path, 'date_creation': row['date_creation'],
+                'a_rafraichir': bool(row['a_rafraichir'])}
+
+    def touch(self, db, key):
+        """Marque un document comme servi (ordre LRU de l'éviction)"""
+        db.execute("UPDATE documents_cache SET date_acces = CURRENT_TIMESTAMP WHERE cle = ?", (key,))
+
+    def put(self, db, key, source_path, job_type, etudiant_id=None, paiement_id=None):
+        """Range un fichier rendu sous sa clé et l'inscrit à l'index; retourne son chemin
+
+        Pas de commit: l'appelant valide la transaction.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+        db.execute("""
+            INSERT INTO documents_cache (cle, type, etudiant_id, paiement_id, taille)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(cle) DO UPDATE SET
+                taille = excluded.taille,
+                date_acces = CURRENT_TIMESTAMP
+        """, (key, job_type, etudiant_id, paiement_id, os.path.getsize(path)))
+        self.evict(db)
+        return path
+
+    def evict(self, db):
+        """Au-delà de max_bytes, supprime les documents les moins récemment servis
+
+        Appelé dans la transaction de put(): ne lit que l'index (SUM(taille)),
+        jamais le répertoire.
+        """
+        total = db.execute("SELECT COALESCE(SUM(taille), 0) FROM documents_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        supprimes = 0
+        for row in db.execute("SELECT cle, taille FROM documents_cache ORDER BY date_acces, date_creation").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM documents_cache WHERE cle = ?", (row['cle'],))
+            self._remove(self.path(row['cle']))
+            total -= row['taille']
+            supprimes += 1
+        return supprimes
+
+    def sweep(self, db):
+        """Supprime les fichiers absents de l'index (documents invalidés); retourne leur nombre
+
+        Parcourt tout le répertoire: à appeler périodiquement, sur une
+        connexion de lecture.
+        """
+        valides = {row['cle'] for row in db.execute("SELECT cle FROM documents_cache")}
+        limite = time.time() - ORPHAN_GRACE
+        supprimes = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name == 'tmp':
+                continue
+            for fichier in os.scandir(entry.path):
+                if fichier.name[:-4] not in valides and fichier.stat().st_mtime < limite:
+                    self._remove(fichier.path)
+                    supprimes += 1
+        return supprimes
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Suppression impossible de %s: %s", path, e)
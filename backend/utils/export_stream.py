@@ -0,0 +1,124 @@
+"""
+Export en flux (CSV, JSON, NDJSON, XLSX) à mémoire constante
+
+Les lignes sont lues par paquets sur une connexion en lecture seule dédiée
+et envoyées au fil de l'eau (transfert chunked): la taille de l'export
+n'est plus limitée par la mémoire du serveur.
+"""
+import csv
+import io
+import json
+import logging
+from flask import Response, stream_with_context
+from database.db import get_db_connection, close_db
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+def iter_rows(query, params=(), chunk_size=CHUNK_SIZE):
+    """Itère sur les lignes d'une requête par paquets de `chunk_size`"""
+    with get_db_connection(read_only=True) as db:
+        cursor = db.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+def _cell(row, column):
+    """Valeur d'une colonne: clé de la ligne ou fonction de la ligne"""
+    _, source = column
+    return source(row) if callable(source) else row[source]
+
+def csv_chunks(rows, columns, chunk_size=CHUNK_SIZE, stats=None):
+    """Produit le CSV (en-tête puis lignes) par blocs d'octets"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM pour qu'Excel détecte l'UTF-8
+    buffer.write('\ufeff')
+    writer.writerow([header for header, _ in columns])
+    count = 0
+    for row in rows:
+        writer.writerow([_cell(row, column) for column in columns])
+        count += 1
+        if count % chunk_size == 0:
+            yield _drain(buffer, stats)
+    yield _drain(buffer, stats)
+    if stats is not None:
+        stats['lignes'] = count
+
+def json_chunks(rows, chunk_size=CHUNK_SIZE, stats=None, ndjson=False):
+    """Produit un tableau JSON (ou du NDJSON: un objet par ligne) par blocs d'octets"""
+    buffer = io.StringIO()
+    if not ndjson:
+        buffer.write('[')
+    count = 0
+    for row in rows:
+        if ndjson:
+            buffer.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+            buffer.write('\n')
+        else:
+            buffer.write(',\n' if count else '\n')
+            buffer.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+        count += 1
+        if count % chunk_size == 0:
+            yield _drain(buffer, stats)
+    if not ndjson:
+        buffer.write('\n]' if count else ']')
+    yield _drain(buffer, stats)
+    if stats is not None:
+        stats['lignes'] = count
+
+def _drain(buffer, stats):
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate(0)
+    if stats is not None:
+        stats['octets'] = stats.get('octets', 0) + len(data)
+    return data
+
+def write_xlsx(path, title, rows, columns, stats=None):
+    """Écrit un classeur XLSX en mode write-only d'openpyxl (mémoire constante)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title)
+    header_row = []
+    for header, _ in columns:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_row.append(cell)
+    ws.append(header_row)
+
+    count = 0
+    for row in rows:
+        ws.append([_cell(row, column) for column in columns])
+        count += 1
+    wb.save(path)
+    if stats is not None:
+        stats['lignes'] = count
+    return count
+
+def streaming_response(chunks, mimetype, download_name, on_complete=None):
+    """Réponse HTTP en flux; `on_complete()` est appelé une fois le flux terminé
+
+    Les connexions de la requête sont rendues au pool avant le flux: un
+    téléchargement long ne monopolise pas la connexion d'écriture.
+    """
+    close_db()
+
+    def generate():
+        yield from chunks
+        if on_complete is not None:
+            try:
+                on_complete()
+            except Exception as e:
+                logger.warning("Erreur en fin d'export: %s", e)
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,707 @@
+"""
+Génération des documents PDF en arrière-plan
+
+Les requêtes déposent un travail dans la file SQLite (database/job_queue.py).
+Un thread répartiteur le réclame, lit les données en base puis confie le
+rendu reportlab à un pool de processus: un rendu long n'occupe plus le
+worker HTTP ni le GIL du serveur.
+"""
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from flask import current_app, request, jsonify, send_file, url_for
+from database.db import get_db_connection, get_write_db, close_db
+from database.job_queue import (install_job_queue, submit_job, claim_job, finish_job,
+                                update_progress, cancel_job, get_job, job_to_dict,
+                                STATUTS_FINAUX, DEFAULT_BAIL)
+from utils.document_cache import DocumentCache, install_document_cache, document_key, DEFAULT_SWEEP_INTERVAL
+from utils.metrics import observe_pdf_render
+from utils.pdf_generator import (generate_bulletin, generate_receipt, generate_liste_etudiants,
+                                 TEMPLATE_VERSION)
+
+logger = logging.getLogger(__name__)
+
+class JobError(Exception):
+    """Travail impossible à réaliser (données introuvables)"""
+
+# ---------------------------------------------------------------------------
+# Préparation des documents: lecture en base, rendu différé
+# ---------------------------------------------------------------------------
+
+def prepare_bulletin(db, parametres):
+    """Données du bulletin d'un étudiant pour une période"""
+    etudiant_id = parametres.get('etudiant_id')
+    periode = parametres.get('periode', 'annuel')
+    etudiant = db.execute("""
+        SELECT e.*, u.nom, u.prenom, c.libelle as classe_libelle
+        FROM etudiants e
+        JOIN users u ON e.user_id = u.id
+        LEFT JOIN classes c ON e.classe_id = c.id
+        WHERE e.id = ?
+    """, (etudiant_id,)).fetchone()
+    if not etudiant:
+        raise JobError('Étudiant non trouvé')
+
+    moyennes = db.execute("""
+        SELECT m.*, mat.libelle as matiere, mat.coefficient
+        FROM moyennes m
+        JOIN matieres mat ON m.matiere_id = mat.id
+        WHERE m.etudiant_id = ? AND m.periode = ?
+        ORDER BY m.id
+    """, (etudiant_id, periode)).fetchall()
+
+    return _bulletin_document(etudiant, moyennes, periode)
+
+def _bulletin_document(etudiant, moyennes, periode):
+    """Document d'un bulletin (mêmes données, donc même clé de cache, seul ou en lot)"""
+    etudiant_data = {
+        'nom': etudiant['nom'],
+        'prenom': etudiant['prenom'],
+        'classe': etudiant['classe_libelle'],
+        'periode': periode,
+        'moyenne_generale': sum(m['moyenne'] for m in moyennes) / len(moyennes) if moyennes else 0
+    }
+    notes_data = [{
+        'matiere': m['matiere'],
+        'note': m['moyenne'],
+        'coefficient': m['coefficient'],
+        'moyenne': m['moyenne']
+    } for m in moyennes]
+
+    return {
+        'type': 'bulletin',
+        'render': generate_bulletin,
+        'args': (etudiant_data, notes_data),
+        'download_name': f'bulletin_{etudiant["numero_etudiant"]}.pdf',
+        'nombre_lignes': len(moyennes),
+        'etudiant_id': etudiant['id'],
+    }
+
+def prepare_bulletins_classe(db, parametres):
+    """Bulletins de tous les étudiants actifs d'une classe, moyennes lues en une requête"""
+    classe_id = parametres.get('classe_id')
+    periode = parametres.get('periode', 'annuel')
+    classe = db.execute("SELECT id, code, libelle FROM classes WHERE id = ?", (classe_id,)).fetchone()
+    if not classe:
+        raise JobError('Classe non trouvée')
+
+    rows = db.execute("""
+        SELECT e.id, e.numero_etudiant, u.nom, u.prenom, ? as classe_libelle,
+               mm.matiere, mm.coefficient, mm.moyenne
+        FROM etudiants e
+        JOIN users u ON e.user_id = u.id
+        LEFT JOIN (
+            SELECT m.id, m.etudiant_id, m.moyenne, mat.libelle as matiere, mat.coefficient
+            FROM moyennes m
+            JOIN matieres mat ON m.matiere_id = mat.id
+            WHERE m.periode = ?
+        ) mm ON mm.etudiant_id = e.id
+        WHERE e.classe_id = ? AND e.is_active = 1
+        ORDER BY e.numero_etudiant, mm.id
+    """, (classe['libelle'], periode, classe_id)).fetchall()
+
+    parts = []
+    etudiant, moyennes = None, []
+    for row in rows:
+        if etudiant is not None and row['id'] != etudiant['id']:
+            parts.append(_bulletin_document(etudiant, moyennes, periode))
+            moyennes = []
+        etudiant = row
+        if row['matiere'] is not None:
+            moyennes.append(row)
+    if etudiant is not None:
+        parts.append(_bulletin_document(etudiant, moyennes, periode))
+    if not parts:
+        raise JobError('Aucun étudiant actif dans cette classe')
+
+    return {
+        'parts': parts,
+        'download_name': f'bulletins_{classe["code"]}_{periode}.zip',
+        'nombre_lignes': len(parts),
+    }
+
+def prepare_recu(db, parametres):
+    """Données du reçu d'un paiement"""
+    paiement_id = parametres.get('paiement_id')
+    paiement = db.execute("""
+        SELECT p.*, e.numero_etudiant, u.nom as etudiant_nom, u.prenom as etudiant_prenom,
+               tf.libelle as type_frais
+        FROM paiements p
+        JOIN etudiants e ON p.etudiant_id = e.id
+        JOIN users u ON e.user_id = u.id
+        JOIN types_frais tf ON p.type_frais_id = tf.id
+        WHERE p.id = ?
+    """, (paiement_id,)).fetchone()
+    if not paiement:
+        raise JobError('Paiement non trouvé')
+
+    paiement_data = {
+        'reference': paiement['reference_paiement'] or f"PAY{paiement_id:06d}",
+        'date_paiement': paiement['date_paiement'],
+        'etudiant_nom': paiement['etudiant_nom'],
+        'etudiant_prenom': paiement['etudiant_prenom'],
+        'type_frais': paiement['type_frais'],
+        'montant': paiement['montant'],
+        'mode_paiement': paiement['mode_paiement'],
+        # Date d'édition dans les données: un reçu en cache est rendu à nouveau le lendemain
+        'date_emission': datetime.now().strftime('%d/%m/%Y'),
+    }
+
+    return {
+        'render': generate_receipt,
+        'args': (paiement_data,),
+        'type': 'recu',
+        'download_name': f'receipt_{paiement_id}.pdf',
+        'nombre_lignes': 1,
+        'etudiant_id': paiement['etudiant_id'],
+        'paiement_id': paiement['id'],
+    }
+
+def prepare_liste_etudiants(db, parametres):
+    """Liste des étudiants actifs (filtrable par classe)"""
+    query = """
+        SELECT e.numero_etudiant, u.nom, u.prenom, u.email, c.libelle as classe_libelle
+        FROM etudiants e
+        JOIN users u ON e.user_id = u.id
+        LEFT JOIN classes c ON e.classe_id = c.id
+        WHERE e.is_active = 1
+    """
+    params = []
+    if parametres.get('classe_id'):
+        query += " AND e.classe_id = ?"
+        params.append(parametres['classe_id'])
+    query += " ORDER BY e.numero_etudiant"
+    etudiants = [tuple(row) for row in db.execute(query, params)]
+
+    return {
+        'type': 'liste_etudiants',
+        'render': generate_liste_etudiants,
+        # Date d'édition dans les données: une liste en cache est rendue à nouveau le lendemain
+        'args': (etudiants, datetime.now().strftime('%d/%m/%Y')),
+        'download_name': 'liste_etudiants.pdf',
+        'nombre_lignes': len(etudiants),
+    }
+
+JOB_HANDLERS = {
+    'bulletin': prepare_bulletin,
+    'recu': prepare_recu,
+    'liste_etudiants': prepare_liste_etudiants,
+    'bulletins_classe': prepare_bulletins_classe,
+}
+
+# Type d'export inscrit à l'historique (pdf par défaut)
+JOB_EXPORT_TYPES = {
+    'bulletins_classe': 'zip',
+}
+
+def _render(render, args, output_path):
+    """Exécuté dans un processus du pool: produit le fichier du travail; retourne (taille, durée du rendu)"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    debut = time.perf_counter()
+    render(*args, output_path)
+    return os.path.getsize(output_path), time.perf_counter() - debut
+
+def _write_zip(output_path, fichiers):
+    """Archive les documents d'un lot ((chemin, nom dans l'archive), ...)"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # PDF déjà compressés: stockage sans recompression
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for path, name in fichiers:
+            archive.write(path, name)
+    return os.path.getsize(output_path)
+
+# ---------------------------------------------------------------------------
+# Répartiteur
+# ---------------------------------------------------------------------------
+
+class JobWorker:
+    """Réclame les travaux de la file et confie leur rendu à un pool de processus
+
+    Au plus `max_workers` travaux sont en cours à la fois. Plusieurs
+    instances (un par processus serveur) peuvent partager la même file.
+    Avec un cache de documents, un document dont les données n'ont pas
+    changé est resservi sans nouveau rendu, et les fichiers des documents
+    invalidés sont balayés toutes les `sweep_interval` secondes.
+    """
+
+    def __init__(self, app, max_workers=2, poll_interval=1.0, bail=DEFAULT_BAIL, executor=None,
+                 cache=None, sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self.app = app
+        self.cache = cache
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.bail = bail
+        self.output_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+        self._executor = executor
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._done = threading.Condition()
+        self._futures = {}
+        self._thread = None
+
+    def start(self):
+        """Démarre le thread répartiteur (et le pool de processus)"""
+        if self._executor is None:
+            # spawn: les processus de rendu n'héritent ni des threads ni des connexions SQLite
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        self._thread = threading.Thread(target=self._run, name='job-worker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """Arrête le répartiteur; les travaux non terminés seront repris à l'expiration du bail"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def notify(self):
+        """Signale un nouveau travail (évite d'attendre le prochain sondage)"""
+        self._wake.set()
+
+    def cancel(self, job_id):
+        """Retire du pool les rendus pas encore démarrés d'un travail"""
+        for future in self._futures.get(job_id, ()):
+            future.cancel()
+
+    def wait(self, timeout):
+        """Attend la fin d'un travail de ce répartiteur, au plus `timeout` secondes"""
+        with self._done:
+            self._done.wait(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.cache is not None and time.monotonic() >= self._next_sweep:
+                self._sweep()
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                dispatched = self._dispatch()
+            except Exception:
+                logger.exception("Erreur du répartiteur de travaux")
+                dispatched = False
+            if not dispatched:
+                self._slots.release()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _sweep(self):
+        """Balaye les fichiers orphelins du cache (connexion de lecture: n'attend pas l'écrivain)"""
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        try:
+            with self.app.app_context():
+                with get_db_connection(read_only=True) as db:
+                    supprimes = self.cache.sweep(db)
+            if supprimes:
+                logger.info("Cache des documents: %d fichiers orphelins supprimés", supprimes)
+        except Exception:
+            logger.exception("Erreur du balayage du cache des documents")
+
+    def _dispatch(self):
+        """Réclame un travail et soumet son rendu; retourne False si la file est vide"""
+        with self.app.app_context():
+            with get_db_connection() as db:
+                job = claim_job(db, self.bail)
+            if job is None:
+                return False
+
+            debut = time.monotonic()
+            key = None
+            try:
+                handler = JOB_HANDLERS.get(job['type'])
+                if handler is None:
+                    raise JobError(f"Type de travail inconnu: {job['type']}")
+                with get_db_connection(read_only=True) as db:
+                    document = handler(db, json.loads(job['parametres'] or '{}'))
+                    if 'parts' in document:
+                        return self._dispatch_batch(db, job, document, debut)
+                    if self.cache is not None:
+                        key = document_key(job['type'], document, TEMPLATE_VERSION)
+                        entree = self.cache.get(db, key)
+            except (JobError, sqlite3.Error) as e:
+                self._finish(job['id'], 'echoue', debut, erreur=str(e))
+                self._slots.release()
+                return True
+
+            if key is not None and entree is not None:
+                # Données inchangées depuis le dernier rendu: pas de nouveau rendu
+                self._finish(job['id'], 'termine', debut, fichier_path=entree['path'],
+                             download_name=document['download_name'],
+                             nombre_lignes=document['nombre_lignes'],
+                             taille=os.path.getsize(entree['path']))
+                self._slots.release()
+                return True
+
+        tache = {
+            'job': job,
+            'document': document,
+            'key': key,
+            'debut': debut,
+            'output_path': (self.cache.staging_path(key) if key is not None
+                            else os.path.join(self.output_dir, f"job_{job['id']}.pdf")),
+        }
+        future = self._executor.submit(_render, document['render'], document['args'], tache['output_path'])
+        self._futures[job['id']] = [future]
+        future.add_done_callback(lambda f: self._on_done(tache, f))
+        return True
+
+    def _dispatch_batch(self, db, job, document, debut):
+        """Répartit les documents d'un lot sur le pool de processus
+
+        Les documents déjà en cache ne sont pas rendus à nouveau; l'archive
+        est assemblée quand le dernier document est produit.
+        """
+        parts = document['parts']
+        cles = [None] * len(parts)
+        archive_key = None
+        chemins = [None] * len(parts)
+        if self.cache is not None:
+            cles = [document_key(part['type'], part, TEMPLATE_VERSION) for part in parts]
+            archive_key = document_key(job['type'], {'args': cles}, TEMPLATE_VERSION)
+            entree = self.cache.get(db, archive_key)
+            if entree is not None:
+                self._finish(job['id'], 'termine', debut, fichier_path=entree['path'],
+                             download_name=document['download_name'],
+                             nombre_lignes=document['nombre_lignes'],
+                             taille=os.path.getsize(entree['path']))
+                self._slots.release()
+                return True
+            for i, cle in enumerate(cles):
+                entree = self.cache.get(db, cle)
+                if entree is not None:
+                    chemins[i] = entree['path']
+
+        lot = {
+            'job': job,
+            'document': document,
+            'debut': debut,
+            'cles': cles,
+            'archive_key': archive_key,
+            'chemins': chemins,
+            'restants': chemins.count(None),
+            'erreur': None,
+            'lock': threading.Lock(),
+            'dossier': os.path.join(self.output_dir, f"job_{job['id']}"),
+        }
+        self._progress(job['id'], len(parts) - lot['restants'], len(parts))
+        if lot['restants'] == 0:
+            self._close_batch(lot)
+            return True
+
+        futures = []
+        for i, part in enumerate(parts):
+            if chemins[i] is not None:
+                continue
+            staging = (self.cache.staging_path(cles[i]) if cles[i] is not None
+                       else os.path.join(lot['dossier'], part['download_name']))
+            future = self._executor.submit(_render, part['render'], part['args'], staging)
+            futures.append((future, i, staging))
+        self._futures[job['id']] = [future for future, _, _ in futures]
+        for future, i, staging in futures:
+            future.add_done_callback(lambda f, i=i, staging=staging: self._on_part_done(lot, i, staging, f))
+        return True
+
+    def _on_part_done(self, lot, i, staging, future):
+        part = lot['document']['parts'][i]
+        erreur = None
+        try:
+            if future.cancelled():
+                erreur = 'Travail annulé'
+            elif future.exception() is not None:
+                erreur = str(future.exception())
+            elif lot['cles'][i] is not None:
+                observe_pdf_render(self.app, part['type'], future.result()[1])
+                with self.app.app_context():
+                    with get_db_connection() as db:
+                        lot['chemins'][i] = self.cache.put(db, lot['cles'][i], staging, part['type'],
+                                                           part.get('etudiant_id'))
+                        db.commit()
+            else:
+                observe_pdf_render(self.app, part['type'], future.result()[1])
+                lot['chemins'][i] = staging
+        except Exception as e:
+            logger.exception("Erreur sur un document du travail %s", lot['job']['id'])
+            erreur = str(e)
+        if erreur and os.path.exists(staging):
+            os.remove(staging)
+
+        with lot['lock']:
+            if erreur and lot['erreur'] is None:
+                lot['erreur'] = erreur
+            lot['restants'] -= 1
+            produits = len(lot['chemins']) - lot['restants']
+            dernier = lot['restants'] == 0
+        if not dernier:
+            self._progress(lot['job']['id'], produits)
+            return
+        self._close_batch(lot)
+
+    def _close_batch(self, lot):
+        """Assemble l'archive d'un lot et clôt le travail"""
+        job, document = lot['job'], lot['document']
+        archive_path = (self.cache.staging_path(lot['archive_key']) if lot['archive_key'] is not None
+                        else os.path.join(self.output_dir, f"job_{job['id']}.zip"))
+        conserve = False
+        try:
+            if lot['erreur'] is not None:
+                logger.warning("Échec du travail %s: %s", job['id'], lot['erreur'])
+                self._finish(job['id'], 'echoue', lot['debut'], erreur=lot['erreur'])
+            else:
+                noms = [part['download_name'] for part in document['parts']]
+                taille = _write_zip(archive_path, zip(lot['chemins'], noms))
+                with self.app.app_context():
+                    with get_db_connection() as db:
+                        fichier_path = archive_path
+                        if lot['archive_key'] is not None:
+                            fichier_path = self.cache.put(db, lot['archive_key'], archive_path, job['type'])
+                        update_progress(db, job['id'], len(noms))
+                        done = finish_job(db, job['id'], 'termine', fichier_path=fichier_path,
+                                          download_name=document['download_name'],
+                                          nombre_lignes=document['nombre_lignes'], taille=taille,
+                                          duree_ms=int((time.monotonic() - lot['debut']) * 1000))
+                        db.commit()
+                conserve = done or lot['archive_key'] is not None
+        except Exception:
+            logger.exception("Erreur à la clôture du travail %s", job['id'])
+        finally:
+            if not conserve and os.path.exists(archive_path):
+                os.remove(archive_path)
+            # Documents hors cache: seule l'archive est conservée
+            shutil.rmtree(lot['dossier'], ignore_errors=True)
+            self._futures.pop(job['id'], None)
+            self._slots.release()
+            self._wake.set()
+            with self._done:
+                self._done.notify_all()
+
+    def _progress(self, job_id, progression, total=None):
+        with self.app.app_context():
+            with get_db_connection() as db:
+                update_progress(db, job_id, progression, total)
+                db.commit()
+
+    def _on_done(self, tache, future):
+        job_id = tache['job']['id']
+        self._futures.pop(job_id, None)
+        conserve = False
+        try:
+            if future.cancelled():
+                pass
+            elif future.exception() is not None:
+                logger.warning("Échec du travail %s: %s", job_id, future.exception())
+                self._finish(job_id, 'echoue', tache['debut'], erreur=str(future.exception()))
+            else:
+                taille, duree = future.result()
+                observe_pdf_render(self.app, tache['job']['type'], duree)
+                conserve = self._complete(tache, taille)
+        except Exception:
+            logger.exception("Erreur à la clôture du travail %s", job_id)
+        finally:
+            # Rendu en échec, ou annulé hors cache: le fichier produit n'a pas lieu d'être conservé
+            if not conserve and os.path.exists(tache['output_path']):
+                os.remove(tache['output_path'])
+            self._slots.release()
+            self._wake.set()
+            with self._done:
+                self._done.notify_all()
+
+    def _complete(self, tache, taille):
+        """Range le document rendu et clôt le travail; retourne True si le fichier est conservé"""
+        job, document = tache['job'], tache['document']
+        with self.app.app_context():
+            with get_db_connection() as db:
+                fichier_path = tache['output_path']
+                if tache['key'] is not None:
+                    # Même si le travail a été annulé entre-temps, le document reste valable
+                    fichier_path = self.cache.put(db, tache['key'], fichier_path, job['type'],
+                                                  document.get('etudiant_id'), document.get('paiement_id'))
+                done = finish_job(db, job['id'], 'termine', fichier_path=fichier_path,
+                                  download_name=document['download_name'],
+                                  nombre_lignes=document['nombre_lignes'], taille=taille,
+                                  duree_ms=int((time.monotonic() - tache['debut']) * 1000))
+                db.commit()
+        return done or tache['key'] is not None
+
+    def _finish(self, job_id, statut, debut, **kwargs):
+        duree_ms = int((time.monotonic() - debut) * 1000)
+        with self.app.app_context():
+            with get_db_connection() as db:
+                done = finish_job(db, job_id, statut, duree_ms=duree_ms, **kwargs)
+                db.commit()
+        return done
+
+def init_jobs(app):
+    """Installe la file de travaux et le cache de documents, puis démarre le répartiteur (JOB_WORKERS > 0)"""
+    cache = None
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_job_queue(db)
+            except sqlite3.OperationalError as e:
+                logger.warning("File de travaux non installée: %s", e)
+                return None
+            if app.config.get('DOCUMENT_CACHE_MAX_BYTES', 0) > 0:
+                try:
+                    install_document_cache(db)
+                    cache = DocumentCache(
+                        app.config.get('DOCUMENT_CACHE_DIR') or os.path.join(app.config['UPLOAD_FOLDER'], 'documents'),
+                        max_bytes=app.config['DOCUMENT_CACHE_MAX_BYTES'],
+                    )
+                    app.extensions['document_cache'] = cache
+                except sqlite3.OperationalError as e:
+                    logger.warning("Cache des documents non installé: %s", e)
+
+    if app.config.get('JOB_WORKERS', 0) <= 0:
+        return None
+    worker = JobWorker(app, max_workers=app.config['JOB_WORKERS'],
+                       poll_interval=app.config.get('JOB_POLL_INTERVAL', 1.0),
+                       bail=app.config.get('JOB_BAIL', DEFAULT_BAIL), cache=cache,
+                       sweep_interval=app.config.get('DOCUMENT_CACHE_SWEEP_INTERVAL', DEFAULT_SWEEP_INTERVAL))
+    app.extensions['job_worker'] = worker.start()
+    atexit.register(worker.stop, wait=False)
+    return worker
+
+def get_job_worker():
+    """Retourne le répartiteur de l'application (None s'il n'est pas démarré)"""
+    return current_app.extensions.get('job_worker')
+
+def get_document_cache():
+    """Retourne le cache de documents de l'application (None s'il est désactivé)"""
+    return current_app.extensions.get('document_cache')
+
+# ---------------------------------------------------------------------------
+# Utilitaires pour les vues
+# ---------------------------------------------------------------------------
+
+def enqueue_job(job_type, user_id, parametres=None):
+    """Dépose un travail (connexion d'écriture, commit immédiat) et réveille le répartiteur"""
+    db = get_write_db()
+    job_id = submit_job(db, job_type, user_id, parametres, JOB_EXPORT_TYPES.get(job_type, 'pdf'))
+    db.commit()
+    worker = get_job_worker()
+    if worker is not None:
+        worker.notify()
+    return job_id
+
+def abort_job(job_id):
+    """Annule un travail; retourne False s'il était déjà clos"""
+    db = get_write_db()
+    annule = cancel_job(db, job_id)
+    db.commit()
+    worker = get_job_worker()
+    if annule and worker is not None:
+        worker.cancel(job_id)
+    return annule
+
+def wait_for_job(job_id, timeout):
+    """Attend qu'un travail soit clos, au plus `timeout` secondes; retourne son état"""
+    worker = get_job_worker()
+    limite = time.monotonic() + timeout
+    while True:
+        with get_db_connection(read_only=True) as db:
+            job = get_job(db, job_id)
+        restant = limite - time.monotonic()
+        if job is None or job['statut'] in STATUTS_FINAUX or restant <= 0:
+            return job
+        if worker is not None:
+            worker.wait(min(restant, 0.5))
+        else:
+            # Travail traité par un autre processus: sondage
+            time.sleep(min(restant, 0.1))
+
+def send_document(path, download_name, etag=True, last_modified=None):
+    """Envoie un document (réponses conditionnelles: ETag, Last-Modified, 304)
+
+    Le type MIME est déduit de download_name (PDF ou archive ZIP d'un lot).
+    """
+    response = send_file(path, as_attachment=True,
+                         download_name=download_name, etag=etag, last_modified=last_modified)
+    # Le client garde le document mais le revalide à chaque demande
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def send_job_file(job):
+    """Envoie le fichier d'un travail terminé"""
+    path = job['fichier_path']
+    cache = get_document_cache()
+    if cache is not None and os.path.dirname(os.path.dirname(path)) == cache.directory:
+        # Document du cache: même ETag (empreinte des données) que document_response
+        return send_document(path, job['download_name'], etag=os.path.basename(path)[:-len('.pdf')])
+    return send_document(path, job['download_name'])
+
+def job_status_response(job, code=202):
+    """État d'un travail et liens de suivi"""
+    data = job_to_dict(job)
+    data['status_url'] = url_for('jobs.get_job_status', job_id=job['id'])
+    data['download_url'] = url_for('jobs.download_job', job_id=job['id'])
+    response = jsonify(data)
+    if code == 202:
+        response.headers['Location'] = data['status_url']
+    return response, code
+
+def document_response(job_type, user_id, parametres, attendre=None):
+    """Réponse d'une vue de document
+
+    L'ETag est l'empreinte des données du document: un client à jour reçoit
+    304, un document déjà rendu est servi depuis le cache; sinon le rendu
+    est confié à la file de travaux (voir job_response).
+    """
+    cache = get_document_cache()
+    if cache is not None:
+        with get_db_connection(read_only=True) as db:
+            try:
+                document = JOB_HANDLERS[job_type](db, parametres)
+            except JobError as e:
+                return jsonify({'error': str(e)}), 404
+            key = document_key(job_type, document, TEMPLATE_VERSION)
+            if request.method in ('GET', 'HEAD') and key in request.if_none_match:
+                response = current_app.response_class(status=304)
+                response.set_etag(key)
+                return response
+            entree = cache.get(db, key)
+
+        if entree is not None:
+            if entree['a_rafraichir']:
+                # Sur l'écrivain de la requête: en emprunter un second l'attendrait (DB_WRITER_POOL_SIZE=1)
+                db = get_write_db()
+                cache.touch(db, key)
+                db.commit()
+            last_modified = datetime.strptime(entree['date_creation'], '%Y-%m-%d %H:%M:%S') \
+                .replace(tzinfo=timezone.utc)
+            return send_document(entree['path'], document['download_name'], etag=key,
+                                 last_modified=last_modified)
+
+    job_id = enqueue_job(job_type, user_id, parametres)
+    return job_response(job_id, attendre)
+
+def job_response(job_id, attendre=None):
+    """Réponse d'une vue qui a déposé un travail
+
+    Le fichier est renvoyé s'il est prêt dans le délai `attendre`
+    (JOB_SYNC_WAIT par défaut), sinon 202 avec l'état du travail.
+    """
+    if attendre is None:
+        attendre = current_app.config.get('JOB_SYNC_WAIT', 0)
+    # L'attente ne doit pas immobiliser de connexion du pool
+    close_db()
+    job = wait_for_job(job_id, attendre)
+    if job['statut'] == 'termine':
+        return send_job_file(job)
+    if job['statut'] == 'echoue':
+        return jsonify({'error': job['erreur'] or 'Génération impossible', 'job_id': job['id']}), 500
+    return job_status_response(job)
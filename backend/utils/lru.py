@@ -0,0 +1,88 @@
+"""
+Cache LRU en mémoire avec expiration des entrées (TTL)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Cache LRU borné et thread-safe
+
+    Chaque entrée expire après `ttl` secondes (None = jamais). Au-delà de
+    `max_size` entrées, la moins récemment utilisée est évincée.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à la clé, ou `default` si absente/expirée"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Enregistre une valeur (ttl en secondes, par défaut celui du cache)"""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        """Enregistre une valeur seulement si la clé est absente; retourne True si ajoutée"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def delete(self, key):
+        """Supprime une entrée; retourne True si elle existait"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Statistiques du cache (hits, misses, évictions, expirations)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+            stats['max_size'] = self.max_size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
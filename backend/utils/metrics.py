@@ -0,0 +1,306 @@
+"""
+Métriques de l'application au format texte Prometheus (GET /api/metrics)
+
+Mesurées à chaque requête (sans verrou: chaque thread incrémente ses
+propres compteurs, additionnés à la lecture):
+- esa_http_request_duration_seconds{blueprint, endpoint, status}: histogramme des latences;
+- esa_http_requests_in_flight: requêtes en cours;
+- esa_db_duration_seconds / esa_db_statements_total{blueprint, endpoint}: temps
+  passé en base et instructions, d'après le profil SQL (utils/query_profiler.py);
+- esa_pdf_render_duration_seconds{type}: durée des rendus PDF (utils/jobs.py).
+
+Lues à chaque collecte: succès et échecs du cache, connexions des pools,
+profondeur des files (travaux, boîte d'envoi des notifications, journal
+d'audit).
+
+METRICS_TOKEN exige l'en-tête Authorization: Bearer <token>. Sans jeton,
+la route n'est ouverte qu'en mode debug ou test (403 sinon).
+"""
+import bisect
+import hmac
+import logging
+import sqlite3
+import threading
+import time
+from flask import Response, current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'esa_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes des histogrammes (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Shard:
+    """Compteurs et histogrammes écrits par un seul thread"""
+
+    __slots__ = ('thread', 'counters', 'histograms')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}
+        # (nom, labels) -> [compte par intervalle..., compte au-delà, somme]
+        self.histograms = {}
+
+class MetricsRegistry:
+    """Registre de métriques à écriture sans verrou
+
+    Chaque thread écrit dans son propre fragment (_Shard); la collecte
+    additionne les fragments. Les fragments des threads terminés sont
+    fusionnés dans un fragment de base pour ne pas s'accumuler.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._base = _Shard(None)
+        self._meta = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """Déclare une métrique (counter, gauge ou histogram)"""
+        self._meta[name] = (kind, help_text, tuple(buckets) if buckets else None)
+
+    def add_collector(self, collector):
+        """Ajoute une fonction appelée à chaque collecte: [(nom, type, aide, [(labels, valeur)])]"""
+        self._collectors.append(collector)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Incrémente un compteur (ou une jauge, value négative)"""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Ajoute une observation à un histogramme déclaré"""
+        buckets = self._meta[name][2]
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(buckets) + 2)
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+    def _merge(self, target, shard):
+        for key, value in shard.counters.copy().items():
+            target.counters[key] = target.counters.get(key, 0) + value
+        for key, histogram in shard.histograms.copy().items():
+            current = target.histograms.get(key)
+            if current is None:
+                target.histograms[key] = list(histogram)
+            else:
+                target.histograms[key] = [a + b for a, b in zip(current, histogram)]
+
+    def snapshot(self):
+        """Somme des fragments: (compteurs, histogrammes)"""
+        total = _Shard(None)
+        with self._lock:
+            termines = [shard for shard in self._shards if not shard.thread.is_alive()]
+            for shard in termines:
+                self._merge(self._base, shard)
+            if termines:
+                self._shards = [shard for shard in self._shards if shard.thread.is_alive()]
+            self._merge(total, self._base)
+            shards = list(self._shards)
+        for shard in shards:
+            self._merge(total, shard)
+        return total.counters, total.histograms
+
+    def render(self):
+        """Exposition au format texte Prometheus 0.0.4"""
+        counters, histograms = self.snapshot()
+        familles = {}
+        for (name, labels), value in counters.items():
+            familles.setdefault(name, []).append((labels, value))
+        lignes = []
+        for name in sorted(set(familles) | {name for name, _ in histograms}):
+            kind, help_text, buckets = self._meta.get(name, ('untyped', '', None))
+            lignes.append(f'# HELP {PREFIX}{name} {help_text}')
+            lignes.append(f'# TYPE {PREFIX}{name} {kind}')
+            if kind == 'histogram':
+                for (_, labels), histogram in sorted((k, h) for k, h in histograms.items() if k[0] == name):
+                    lignes.extend(_histogram_lines(PREFIX + name, labels, buckets, histogram))
+            else:
+                for labels, value in sorted(familles[name]):
+                    lignes.append(f'{PREFIX}{name}{_labels(labels)} {_number(value)}')
+        for collector in self._collectors:
+            try:
+                metriques = collector()
+            except Exception:
+                logger.exception("Collecte de métriques en échec: %s", getattr(collector, '__name__', collector))
+                continue
+            for name, kind, help_text, samples in metriques:
+                lignes.append(f'# HELP {PREFIX}{name} {help_text}')
+                lignes.append(f'# TYPE {PREFIX}{name} {kind}')
+                for labels, value in samples:
+                    lignes.append(f'{PREFIX}{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lignes) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels, extra=()):
+    paires = tuple(labels) + tuple(extra)
+    if not paires:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in paires) + '}'
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+def _histogram_lines(name, labels, buckets, histogram):
+    cumul = 0
+    for borne, nombre in zip(buckets, histogram):
+        cumul += nombre
+        yield f'{name}_bucket{_labels(labels, (("le", repr(float(borne))),))} {cumul}'
+    # Le total se déduit des intervalles: cohérent même si la collecte croise une écriture
+    cumul += histogram[len(buckets)]
+    yield f'{name}_bucket{_labels(labels, (("le", "+Inf"),))} {cumul}'
+    yield f'{name}_sum{_labels(labels)} {_number(float(histogram[-1]))}'
+    yield f'{name}_count{_labels(labels)} {cumul}'
+
+# ---------------------------------------------------------------------------
+# Collecteurs (lus à chaque collecte)
+# ---------------------------------------------------------------------------
+
+def _collect_cache(app):
+    cache = app.extensions.get('cache')
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ('cache_requests_total', 'counter', 'Consultations du cache applicatif par résultat',
+         [((('result', 'hit'),), stats['hits']), ((('result', 'miss'),), stats['misses'])]),
+        ('cache_hit_ratio', 'gauge', 'Part des consultations du cache servies sans calcul',
+         [((), stats['hit_ratio'])]),
+    ]
+
+def _collect_db_pools(app):
+    samples = []
+    for role, nom in (('writer', 'db_pool'), ('reader', 'db_read_pool')):
+        pool = app.extensions.get(nom)
+        if pool is not None:
+            stats = pool.stats()
+            samples.append(((('pool', role), ('state', 'in_use')), stats['in_use']))
+            samples.append(((('pool', role), ('state', 'idle')), stats['idle']))
+    return [('db_pool_connections', 'gauge', 'Connexions SQLite des pools par état', samples)]
+
+def _collect_queues(app):
+    from database.db import get_db_connection
+    from database.notification_outbox import outbox_counts
+
+    metriques = []
+    with app.app_context():
+        with get_db_connection(read_only=True) as db:
+            try:
+                jobs = db.execute("""
+                    SELECT statut, COUNT(*) as nombre FROM jobs
+                    WHERE statut IN ('en_attente', 'en_cours') GROUP BY statut
+                """).fetchall()
+                nombres = {row['statut']: row['nombre'] for row in jobs}
+                metriques.append(('job_queue_depth', 'gauge', 'Travaux en attente ou en cours de rendu',
+                                  [((('state', statut),), nombres.get(statut, 0))
+                                   for statut in ('en_attente', 'en_cours')]))
+            except sqlite3.OperationalError:
+                pass
+            try:
+                metriques.append(('notification_outbox_depth', 'gauge',
+                                  "Messages de la boîte d'envoi par canal et statut",
+                                  [((('channel', canal), ('state', statut)), nombre)
+                                   for canal, statuts in sorted(outbox_counts(db).items())
+                                   for statut, nombre in sorted(statuts.items())]))
+            except sqlite3.OperationalError:
+                pass
+    writer = app.extensions.get('audit_writer')
+    if writer is not None:
+        stats = writer.stats()
+        metriques.append(('audit_queue_depth', 'gauge', "Événements d'audit en attente d'écriture",
+                          [((), stats['en_file'])]))
+        metriques.append(('audit_events_total', 'counter', "Événements d'audit par issue",
+                          [((('outcome', issue),), stats[issue])
+                           for issue in ('ecrits', 'abandonnes', 'deverses', 'erreurs')]))
+    return metriques
+
+# ---------------------------------------------------------------------------
+# Intégration Flask
+# ---------------------------------------------------------------------------
+
+def get_metrics(app=None):
+    """Registre de l'application (None si les métriques sont désactivées)"""
+    return (app or current_app).extensions.get('metrics')
+
+def observe_pdf_render(app, type_document, duree):
+    """Enregistre la durée d'un rendu PDF (secondes)"""
+    registry = get_metrics(app)
+    if registry is not None:
+        registry.observe('pdf_render_duration_seconds', duree, (('type', type_document),))
+
+def init_metrics(app):
+    """Mesure les requêtes et expose GET /api/metrics (après init_query_profiler: lit le profil SQL)"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return None
+    registry = MetricsRegistry()
+    registry.describe('http_request_duration_seconds', 'histogram', 'Latence des requêtes HTTP', LATENCY_BUCKETS)
+    registry.describe('http_requests_in_flight', 'gauge', 'Requêtes HTTP en cours de traitement')
+    registry.describe('db_duration_seconds', 'histogram', 'Temps passé en base par requête HTTP', DB_BUCKETS)
+    registry.describe('db_statements_total', 'counter', 'Instructions SQL exécutées par les requêtes HTTP')
+    registry.describe('pdf_render_duration_seconds', 'histogram', 'Durée des rendus PDF', PDF_BUCKETS)
+    registry.inc('http_requests_in_flight', value=0)
+    for collector in (_collect_cache, _collect_db_pools, _collect_queues):
+        registry.add_collector(lambda collector=collector: collector(app))
+    app.extensions['metrics'] = registry
+    if not app.config.get('METRICS_TOKEN'):
+        logger.warning("METRICS_TOKEN non défini: /api/metrics n'est servi qu'en mode debug ou test")
+
+    @app.before_request
+    def _start_request():
+        g.metrics_debut = time.perf_counter()
+        registry.inc('http_requests_in_flight')
+
+    @app.after_request
+    def _record_request(response):
+        debut = g.get('metrics_debut')
+        if debut is None:
+            return response
+        labels = (('blueprint', request.blueprint or ''), ('endpoint', request.endpoint or 'aucun'))
+        registry.observe('http_request_duration_seconds', time.perf_counter() - debut,
+                         labels + (('status', str(response.status_code)),))
+        profile = g.get('sql_profile')
+        if profile is not None:
+            registry.observe('db_duration_seconds', profile.duree_sql, labels)
+            registry.inc('db_statements_total', labels, profile.nombre)
+        return response
+
+    @app.teardown_request
+    def _end_request(exc=None):
+        if g.pop('metrics_debut', None) is not None:
+            registry.inc('http_requests_in_flight', value=-1)
+
+    @app.route('/api/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if not token:
+            # Route exemptée de la limitation de débit: jamais publique en production
+            if not (app.debug or app.testing):
+                return {'error': 'METRICS_TOKEN non configuré'}, 403
+        elif not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     f'Bearer {token}'.encode()):
+            return {'error': 'Non autorisé'}, 401
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return registry
@@ -1,41 +1,212 @@
 """
 Service de notifications amélioré
+
+Les notifications internes d'un événement sont insérées en un lot
+(executemany) et validées par un seul commit. Les envois externes (email,
+SMS, push) sont déposés dans la boîte d'envoi (database/notification_outbox.py)
+dans la même transaction, puis envoyés en arrière-plan par un worker par
+canal, avec nouvelles tentatives: la requête n'attend ni le serveur SMTP
+ni la passerelle SMS.
+
+Les envois externes des notes et absences, saisies par séries, peuvent être
+regroupés par destinataire sur une fenêtre (NOTIFICATION_DIGEST_WINDOW) en
+un seul message de résumé: un parent de trois enfants reçoit un SMS, pas
+un par note. Les notifications internes sont toujours insérées tout de suite.
 """
-from database.db import get_db
-from datetime import datetime
+import atexit
+import importlib.util
 import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, has_app_context
+from database.db import get_db, get_db_connection
+from database.notification_outbox import (
+    install_notification_outbox, enqueue_messages, claim_messages, mark_sent, mark_failed,
+    outbox_counts, DEFAULT_BAIL, DEFAULT_MAX_TENTATIVES, DEFAULT_BACKOFF,
+)
 
-def send_notification(user_id, type_notification, titre, message, lien=None, data=None):
-    """Envoie une notification à un utilisateur"""
-    db = get_db()
-    
-    db.execute("""
+logger = logging.getLogger(__name__)
+
+# Canaux externes activés par défaut, si leur expéditeur est configuré (email: à
+# demander dans NOTIFICATION_CHANNELS une fois Flask-Mail initialisé; push: en
+# attente de l'intégration FCM)
+DEFAULT_CHANNELS = ('sms',)
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_POLL_INTERVAL = 5      # secondes entre deux relèves de la boîte d'envoi
+DIGEST_TICK = 5                # secondes max entre deux vérifications des fenêtres de regroupement
+
+# Types de notification regroupables et leur libellé (singulier, pluriel)
+DIGEST_TYPES = {
+    'note_ajoutee': ('nouvelle note', 'nouvelles notes'),
+    'note_enfant': ('nouvelle note', 'nouvelles notes'),
+    'absence': ('absence', 'absences'),
+    'absence_enfant': ('absence', 'absences'),
+}
+
+# ========== NOTIFICATIONS INTERNES ==========
+
+def _canaux_actifs(canaux):
+    """Canaux demandés qui sont activés (NOTIFICATION_CHANNELS)"""
+    actifs = (current_app.config.get('NOTIFICATION_CHANNELS', DEFAULT_CHANNELS) or ()) if has_app_context() else DEFAULT_CHANNELS
+    return [canal for canal in canaux if canal in actifs]
+
+def _outbox_messages(notification, canaux):
+    """Messages externes d'une notification, selon les coordonnées du destinataire"""
+    messages = []
+    for canal in canaux:
+        if canal == 'email' and notification.get('email'):
+            messages.append({'canal': 'email', 'user_id': notification['user_id'],
+                             'destinataire': notification['email'],
+                             'sujet': notification.get('sujet') or notification['titre'],
+                             'contenu': notification['message']})
+        elif canal == 'sms' and notification.get('telephone'):
+            messages.append({'canal': 'sms', 'user_id': notification['user_id'],
+                             'destinataire': notification['telephone'],
+                             'contenu': notification.get('sms') or f"ESA: {notification['message']}"})
+        elif canal == 'push':
+            messages.append({'canal': 'push', 'user_id': notification['user_id'],
+                             'sujet': notification['titre'], 'contenu': notification['message'],
+                             'data': notification.get('data')})
+    return messages
+
+def notify_users(db, notifications, canaux=()):
+    """Insère des notifications en un lot et dépose leurs envois externes
+
+    `notifications`: dicts {user_id, type_notification, titre, message,
+    lien, data} complétés de email/telephone pour les canaux externes
+    (sujet et sms remplacent le titre et le texte du SMS). Un seul commit;
+    retourne le nombre de notifications insérées. Les envois externes des
+    types DIGEST_TYPES sont mis en attente de regroupement s'il est activé.
+    """
+    if not notifications:
+        return 0
+    db.executemany("""
         INSERT INTO notifications (user_id, type_notification, titre, message, lien)
         VALUES (?, ?, ?, ?, ?)
-    """, (user_id, type_notification, titre, message, lien))
+    """, [(n['user_id'], n['type_notification'], n['titre'], n['message'], n.get('lien'))
+          for n in notifications])
+
+    canaux = _canaux_actifs(canaux)
+    externes = notifications
+    digest = current_app.extensions.get('notification_digest') if canaux and has_app_context() else None
+    if digest is not None:
+        externes = digest.add(notifications, canaux)
+    deposes = enqueue_messages(db, [m for n in externes for m in _outbox_messages(n, canaux)]) if canaux else 0
     db.commit()
-    
-    # En production, envoyer aussi une notification push via FCM
-    # send_push_notification(user_id, titre, message, data)
+    if deposes:
+        _wake_workers(canaux)
+    return len(notifications)
+
+def _with_contacts(db, notifications):
+    """Complète les notifications avec l'email et le téléphone de leurs destinataires"""
+    user_ids = list({n['user_id'] for n in notifications})
+    placeholders = ','.join('?' * len(user_ids))
+    contacts = {row['id']: row for row in db.execute(
+        f"SELECT id, email, telephone FROM users WHERE id IN ({placeholders})", user_ids)}
+    for n in notifications:
+        contact = contacts.get(n['user_id'])
+        if contact is not None:
+            n.setdefault('email', contact['email'])
+            n.setdefault('telephone', contact['telephone'])
+    return notifications
+
+def send_notification(user_id, type_notification, titre, message, lien=None, data=None, canaux=()):
+    """Envoie une notification à un utilisateur (et sur les canaux externes demandés)"""
+    send_bulk_notification([user_id], type_notification, titre, message, lien, data, canaux)
 
-def send_bulk_notification(user_ids, type_notification, titre, message, lien=None):
-    """Envoie une notification à plusieurs utilisateurs"""
+def send_bulk_notification(user_ids, type_notification, titre, message, lien=None, data=None, canaux=()):
+    """Envoie une notification à plusieurs utilisateurs (un seul INSERT par lot)"""
     db = get_db()
-    
-    for user_id in user_ids:
-        db.execute("""
-            INSERT INTO notifications (user_id, type_notification, titre, message, lien)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_id, type_notification, titre, message, lien))
-    
-    db.commit()
+    notifications = [{'user_id': user_id, 'type_notification': type_notification, 'titre': titre,
+                      'message': message, 'lien': lien, 'data': data} for user_id in user_ids]
+    if notifications and _canaux_actifs(canaux):
+        _with_contacts(db, notifications)
+    return notify_users(db, notifications, canaux)
+
+def _student_recipients(db, etudiant_id):
+    """L'étudiant et ses parents, avec leurs coordonnées, en une requête"""
+    return db.execute("""
+        SELECT e.user_id, 'etudiant' as relation, u.email, u.telephone
+        FROM etudiants e
+        JOIN users u ON u.id = e.user_id
+        WHERE e.id = ?
+        UNION ALL
+        SELECT p.user_id, 'parent' as relation, u.email, u.telephone
+        FROM parent_etudiants pe
+        JOIN parents p ON p.id = pe.parent_id
+        JOIN users u ON u.id = p.user_id
+        WHERE pe.etudiant_id = ?
+    """, (etudiant_id, etudiant_id)).fetchall()
+
+def notify_student_event(etudiant_id, contenus, canaux=()):
+    """Notifie un événement concernant un étudiant à lui-même et à ses parents
+
+    `contenus` associe à chaque relation ('etudiant', 'parent') le dict
+    {type_notification, titre, message, lien, ...} de sa notification; une
+    relation absente n'est pas notifiée. Retourne le nombre de notifications.
+    """
+    db = get_db()
+    destinataires = _student_recipients(db, etudiant_id)
+    if not any(d['relation'] == 'etudiant' for d in destinataires):
+        return 0
+    notifications = [dict(contenus[d['relation']], user_id=d['user_id'], email=d['email'], telephone=d['telephone'])
+                     for d in destinataires if d['relation'] in contenus]
+    return notify_users(db, notifications, canaux)
+
+def notify_payment_received(etudiant_id, montant, type_frais, canaux=()):
+    """Notifie la réception d'un paiement"""
+    return notify_student_event(etudiant_id, {
+        'etudiant': {'type_notification': 'paiement_reçu', 'titre': 'Paiement reçu',
+                     'message': f'Votre paiement de {montant} FCFA pour {type_frais} a été reçu et validé.',
+                     'lien': '/etudiant/paiements'},
+        'parent': {'type_notification': 'paiement_enfant', 'titre': 'Paiement reçu',
+                   'message': f'Le paiement de {montant} FCFA a été effectué pour votre enfant.',
+                   'lien': f'/parent/enfants/{etudiant_id}/finances'},
+    }, canaux)
+
+def notify_grade_added(etudiant_id, matiere, note, canaux=()):
+    """Notifie l'ajout d'une note"""
+    return notify_student_event(etudiant_id, {
+        'etudiant': {'type_notification': 'note_ajoutee', 'titre': 'Nouvelle note',
+                     'message': f'Une nouvelle note a été ajoutée en {matiere}: {note}/20',
+                     'lien': '/etudiant/notes'},
+        'parent': {'type_notification': 'note_enfant', 'titre': 'Nouvelle note',
+                   'message': f'Une nouvelle note a été ajoutée pour votre enfant en {matiere}: {note}/20',
+                   'lien': f'/parent/enfants/{etudiant_id}/notes'},
+    }, canaux)
+
+def notify_absence_recorded(etudiant_id, date_absence, canaux=()):
+    """Notifie l'enregistrement d'une absence"""
+    return notify_student_event(etudiant_id, {
+        'etudiant': {'type_notification': 'absence', 'titre': 'Absence enregistrée',
+                     'message': f'Une absence a été enregistrée pour le {date_absence}',
+                     'lien': '/etudiant/absences'},
+        'parent': {'type_notification': 'absence_enfant', 'titre': 'Absence de votre enfant',
+                   'message': f'Une absence a été enregistrée pour votre enfant le {date_absence}',
+                   'lien': f'/parent/enfants/{etudiant_id}/absences'},
+    }, canaux)
+
+def notify_unpaid_fees(etudiant_id, montant_du, canaux=('email', 'sms')):
+    """Notifie les frais impayés (avec rappel par email et SMS)"""
+    return notify_student_event(etudiant_id, {
+        'etudiant': {'type_notification': 'frais_impayes', 'titre': 'Frais impayés',
+                     'message': f'Vous avez un solde impayé de {montant_du} FCFA. Veuillez régulariser votre situation.',
+                     'lien': '/etudiant/finances',
+                     'sujet': 'Rappel: Frais impayés',
+                     'sms': f'ESA: Solde impayé de {montant_du} FCFA. Veuillez régulariser.'},
+    }, canaux)
+
+# ========== ENVOIS EXTERNES ==========
 
 def send_email_notification(user_email, subject, body, html_body=None):
     """Envoie une notification par email"""
     from flask_mail import Message
-    from app import mail
-    
+
     try:
+        mail = current_app.extensions['mail']
         msg = Message(
             subject=subject,
             recipients=[user_email],
@@ -51,18 +222,17 @@ def send_email_notification(user_email, subject, body, html_body=None):
 def send_sms_notification(phone_number, message):
     """Envoie une notification par SMS"""
     try:
-        import os
         from twilio.rest import Client
-        
+
         account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         from_number = os.getenv('TWILIO_PHONE_NUMBER')
-        
+
         if not all([account_sid, auth_token, from_number]):
             return False
-        
+
         client = Client(account_sid, auth_token)
-        
+
         client.messages.create(
             body=message,
             from_=from_number,
@@ -76,127 +246,312 @@ def send_sms_notification(phone_number, message):
 def send_push_notification(user_id, title, body, data=None):
     """Envoie une notification push via FCM"""
     # À implémenter avec firebase-admin
-    pass
+    return False
 
-def notify_payment_received(etudiant_id, montant, type_frais):
-    """Notifie la réception d'un paiement"""
-    db = get_db()
-    
-    # Notifier l'étudiant
-    etudiant = db.execute("SELECT user_id FROM etudiants WHERE id = ?", (etudiant_id,)).fetchone()
-    if etudiant:
-        send_notification(
-            etudiant['user_id'],
-            'paiement_reçu',
-            'Paiement reçu',
-            f'Votre paiement de {montant} FCFA pour {type_frais} a été reçu et validé.',
-            f'/etudiant/paiements'
-        )
-        
-        # Notifier les parents
-        parents = db.execute("""
-            SELECT p.user_id FROM parents p
-            JOIN parent_etudiants pe ON p.id = pe.parent_id
-            WHERE pe.etudiant_id = ?
-        """, (etudiant_id,)).fetchall()
-        
-        for parent in parents:
-            send_notification(
-                parent['user_id'],
-                'paiement_enfant',
-                'Paiement reçu',
-                f'Le paiement de {montant} FCFA a été effectué pour votre enfant.',
-                f'/parent/enfants/{etudiant_id}/finances'
-            )
-
-def notify_grade_added(etudiant_id, matiere, note):
-    """Notifie l'ajout d'une note"""
-    db = get_db()
-    
-    etudiant = db.execute("SELECT user_id FROM etudiants WHERE id = ?", (etudiant_id,)).fetchone()
-    if etudiant:
-        send_notification(
-            etudiant['user_id'],
-            'note_ajoutee',
-            'Nouvelle note',
-            f'Une nouvelle note a été ajoutée en {matiere}: {note}/20',
-            f'/etudiant/notes'
-        )
-        
-        # Notifier les parents
-        parents = db.execute("""
-            SELECT p.user_id FROM parents p
-            JOIN parent_etudiants pe ON p.id = pe.parent_id
-            WHERE pe.etudiant_id = ?
-        """, (etudiant_id,)).fetchall()
-        
-        for parent in parents:
-            send_notification(
-                parent['user_id'],
-                'note_enfant',
-                'Nouvelle note',
-                f'Une nouvelle note a été ajoutée pour votre enfant en {matiere}: {note}/20',
-                f'/parent/enfants/{etudiant_id}/notes'
-            )
-
-def notify_absence_recorded(etudiant_id, date_absence):
-    """Notifie l'enregistrement d'une absence"""
-    db = get_db()
-    
-    etudiant = db.execute("SELECT user_id FROM etudiants WHERE id = ?", (etudiant_id,)).fetchone()
-    if etudiant:
-        send_notification(
-            etudiant['user_id'],
-            'absence',
-            'Absence enregistrée',
-            f'Une absence a été enregistrée pour le {date_absence}',
-            f'/etudiant/absences'
-        )
-        
-        # Notifier les parents
-        parents = db.execute("""
-            SELECT p.user_id FROM parents p
-            JOIN parent_etudiants pe ON p.id = pe.parent_id
-            WHERE pe.etudiant_id = ?
-        """, (etudiant_id,)).fetchall()
-        
-        for parent in parents:
-            send_notification(
-                parent['user_id'],
-                'absence_enfant',
-                'Absence de votre enfant',
-                f'Une absence a été enregistrée pour votre enfant le {date_absence}',
-                f'/parent/enfants/{etudiant_id}/absences'
-            )
-
-def notify_unpaid_fees(etudiant_id, montant_du):
-    """Notifie les frais impayés"""
-    db = get_db()
-    
-    etudiant = db.execute("SELECT user_id FROM etudiants WHERE id = ?", (etudiant_id,)).fetchone()
-    if etudiant:
-        send_notification(
-            etudiant['user_id'],
-            'frais_impayes',
-            'Frais impayés',
-            f'Vous avez un solde impayé de {montant_du} FCFA. Veuillez régulariser votre situation.',
-            f'/etudiant/finances'
-        )
-        
-        # Envoyer aussi un email et SMS si configuré
-        user = db.execute("SELECT email, telephone FROM users WHERE id = ?", 
-                         (etudiant['user_id'],)).fetchone()
-        
-        if user and user['email']:
-            send_email_notification(
-                user['email'],
-                'Rappel: Frais impayés',
-                f'Vous avez un solde impayé de {montant_du} FCFA.'
-            )
-        
-        if user and user['telephone']:
-            send_sms_notification(
-                user['telephone'],
-                f'ESA: Solde impayé de {montant_du} FCFA. Veuillez régulariser.'
-            )
+def _email_configured(app):
+    """Flask-Mail initialisé sur l'application (Mail(app))"""
+    return 'mail' in app.extensions
+
+def _sms_configured(app):
+    """Client Twilio installé et identifiants renseignés"""
+    return importlib.util.find_spec('twilio') is not None and all(
+        os.getenv(name) for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'))
+
+# Un expéditeur intégré peut-il envoyer, par canal
+SENDER_CHECKS = {
+    'email': _email_configured,
+    'sms': _sms_configured,
+    'push': lambda app: False,
+}
+
+# Envoi d'un message de la boîte d'envoi, par canal: True si envoyé
+SENDERS = {
+    'email': lambda m: send_email_notification(m['destinataire'], m['sujet'], m['contenu']),
+    'sms': lambda m: send_sms_notification(m['destinataire'], m['contenu']),
+    'push': lambda m: send_push_notification(m['user_id'], m['sujet'], m['contenu'],
+                                             json.loads(m['data']) if m['data'] else None),
+}
+
+class ChannelWorker:
+    """Envoie par lots les messages d'un canal de la boîte d'envoi
+
+    Les messages sont réclamés puis la connexion est rendue au pool avant
+    l'envoi: un serveur SMTP lent ne bloque pas les écritures. Un échec est
+    retenté avec un délai croissant (database/notification_outbox.py).
+    """
+
+    def __init__(self, app, canal, sender, batch_size=DEFAULT_BATCH_SIZE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_tentatives=DEFAULT_MAX_TENTATIVES, backoff=DEFAULT_BACKOFF, bail=DEFAULT_BAIL):
+        self.app = app
+        self.canal = canal
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_tentatives = max_tentatives
+        self.backoff = backoff
+        self.bail = bail
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'envoyes': 0, 'reessais': 0, 'echecs': 0, 'lots': 0, 'duree_envoi_s': 0.0}
+
+    def start(self):
+        """Démarre le thread d'envoi du canal"""
+        self._thread = threading.Thread(target=self._run, name=f'notifications-{self.canal}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def notify(self):
+        """Signale de nouveaux messages (évite d'attendre la prochaine relève)"""
+        self._wake.set()
+
+    def run_once(self):
+        """Réclame et envoie un lot; retourne le nombre de messages traités"""
+        with self.app.app_context():
+            with get_db_connection() as db:
+                messages = claim_messages(db, self.canal, self.batch_size, self.bail)
+            if not messages:
+                return 0
+
+            envoyes, echecs = [], []
+            debut = time.perf_counter()
+            for message in messages:
+                try:
+                    if self.sender(message):
+                        envoyes.append(message['id'])
+                    else:
+                        echecs.append((message, 'Envoi refusé'))
+                except Exception as e:
+                    echecs.append((message, str(e)))
+            duree = time.perf_counter() - debut
+
+            reessais = 0
+            with get_db_connection() as db:
+                mark_sent(db, envoyes)
+                for message, erreur in echecs:
+                    reessais += mark_failed(db, message, erreur, self.max_tentatives, self.backoff)
+                db.commit()
+
+        with self._lock:
+            self._stats['envoyes'] += len(envoyes)
+            self._stats['reessais'] += reessais
+            self._stats['echecs'] += len(echecs) - reessais
+            self._stats['lots'] += 1
+            self._stats['duree_envoi_s'] += duree
+        return len(messages)
+
+    def stats(self):
+        """Compteurs du canal et débit d'envoi (messages par seconde d'envoi)"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['debit'] = round(stats['envoyes'] / stats['duree_envoi_s'], 2) if stats['duree_envoi_s'] else None
+        stats['duree_envoi_s'] = round(stats['duree_envoi_s'], 3)
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once() == self.batch_size:
+                    continue  # lot plein: la boîte n'est peut-être pas vide
+            except Exception as e:
+                logger.warning("Envoi des notifications %s échoué: %s", self.canal, e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+# ========== REGROUPEMENT ==========
+
+class NotificationDigest:
+    """Regroupe par destinataire les envois externes fréquents en un résumé
+
+    La première notification regroupable (DIGEST_TYPES) d'un destinataire
+    ouvre une fenêtre de `window` secondes; à son expiration les envois
+    externes des notifications reçues entre-temps sont remplacés par un seul
+    email/SMS de résumé, ou déposés tels quels s'il n'y en a qu'une. Seuls
+    ces envois attendent en mémoire (stop() les dépose à l'arrêt du
+    processus): les notifications internes sont déjà en base.
+    """
+
+    def __init__(self, app, window, types=None):
+        self.app = app
+        self.window = window
+        self.types = DIGEST_TYPES if types is None else types
+        self._pending = {}  # user_id -> {'debut': monotonic, 'evenements': [(notification, canaux)]}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'regroupees': 0, 'resumes': 0, 'deposes': 0}
+
+    def add(self, notifications, canaux=()):
+        """Met en attente les envois des notifications regroupables; retourne les autres"""
+        immediates = []
+        maintenant = time.monotonic()
+        with self._lock:
+            for notification in notifications:
+                if notification['type_notification'] not in self.types:
+                    immediates.append(notification)
+                    continue
+                attente = self._pending.setdefault(notification['user_id'],
+                                                   {'debut': maintenant, 'evenements': []})
+                attente['evenements'].append((notification, tuple(canaux)))
+                self._stats['regroupees'] += 1
+        return immediates
+
+    def flush(self, tout=False):
+        """Dépose les résumés des fenêtres expirées (toutes si `tout`); retourne le nombre de résumés"""
+        limite = time.monotonic() - self.window
+        with self._lock:
+            echues = [user_id for user_id, attente in self._pending.items() if tout or attente['debut'] <= limite]
+            lots = [self._pending.pop(user_id)['evenements'] for user_id in echues]
+        if not lots:
+            return 0
+
+        messages = [message for evenements in lots for message in _outbox_messages(*self._digest(evenements))]
+        if messages:
+            with self.app.app_context():
+                with get_db_connection() as db:
+                    enqueue_messages(db, messages)
+                    db.commit()
+                _wake_workers({message['canal'] for message in messages})
+
+        with self._lock:
+            self._stats['resumes'] += sum(len(evenements) > 1 for evenements in lots)
+            self._stats['deposes'] += len(messages)
+        return len(lots)
+
+    def _digest(self, evenements):
+        """Notification unique (et canaux) dont les envois remplacent ceux d'un destinataire"""
+        canaux = tuple(dict.fromkeys(canal for _, canaux in evenements for canal in canaux))
+        if len(evenements) == 1:
+            return evenements[0][0], canaux
+
+        premiere = evenements[0][0]
+        nombres = {}
+        for notification, _ in evenements:
+            libelle = self.types[notification['type_notification']]
+            nombres[libelle] = nombres.get(libelle, 0) + 1
+        titre = ', '.join(f'{nombre} {libelle[nombre > 1]}' for libelle, nombre in nombres.items())
+        return {
+            'user_id': premiere['user_id'],
+            'titre': titre,
+            'message': '\n'.join(f"- {notification['message']}" for notification, _ in evenements),
+            'data': {'evenements': len(evenements)},
+            'email': premiere.get('email'),
+            'telephone': premiere.get('telephone'),
+            'sujet': f'ESA - {titre}',
+            'sms': f'ESA: {titre}. Détails dans votre espace.',
+        }, canaux
+
+    def start(self):
+        """Démarre le thread qui vide les fenêtres expirées"""
+        self._thread = threading.Thread(target=self._run, name='notifications-digest', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le thread puis dépose tous les envois en attente"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush(tout=True)
+        except sqlite3.Error as e:
+            logger.warning("Envois regroupés non déposés: %s", e)
+
+    def stats(self):
+        """Compteurs du regroupement"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['en_attente'] = sum(len(a['evenements']) for a in self._pending.values())
+            stats['destinataires'] = len(self._pending)
+        stats['fenetre_s'] = self.window
+        return stats
+
+    def _run(self):
+        while not self._stop.wait(min(self.window, DIGEST_TICK)):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Regroupement des notifications échoué: %s", e)
+
+def _wake_workers(canaux):
+    workers = current_app.extensions.get('notification_workers', {})
+    for canal in canaux:
+        if canal in workers:
+            workers[canal].notify()
+
+def _sender_ready(app, canal, senders):
+    sender = senders.get(canal)
+    if sender is None:
+        return False
+    # Un expéditeur fourni à init_notifications est supposé configuré
+    return sender is not SENDERS.get(canal) or SENDER_CHECKS[canal](app)
+
+def _resolve_channels(app, senders):
+    """Canaux activés: NOTIFICATION_CHANNELS, ou à défaut ceux de DEFAULT_CHANNELS
+    dont l'expéditeur est configuré
+
+    Un canal demandé explicitement sans expéditeur fonctionnel fait échouer
+    le démarrage (ValueError): ses messages seraient retentés puis abandonnés.
+    """
+    canaux = app.config.get('NOTIFICATION_CHANNELS')
+    if canaux is None:
+        canaux = tuple(canal for canal in DEFAULT_CHANNELS if _sender_ready(app, canal, senders))
+        if not canaux:
+            logger.info("Aucun canal de notification externe configuré")
+    elif app.config.get('NOTIFICATION_WORKERS', True):
+        absents = [canal for canal in canaux if not _sender_ready(app, canal, senders)]
+        if absents:
+            raise ValueError(f"Canaux de notification sans expéditeur configuré: {', '.join(absents)}")
+    app.config['NOTIFICATION_CHANNELS'] = tuple(canaux)
+    return app.config['NOTIFICATION_CHANNELS']
+
+def init_notifications(app, senders=None):
+    """Installe la boîte d'envoi et démarre un worker par canal activé (NOTIFICATION_WORKERS)"""
+    senders = senders or SENDERS
+    canaux = _resolve_channels(app, senders)
+    with app.app_context():
+        with get_db_connection() as db:
+            try:
+                install_notification_outbox(db)
+            except sqlite3.OperationalError as e:
+                logger.warning("Boîte d'envoi des notifications non installée: %s", e)
+                return {}
+
+    workers = {}
+    if app.config.get('NOTIFICATION_WORKERS', True):
+        for canal in canaux:
+            workers[canal] = ChannelWorker(
+                app, canal, senders[canal],
+                batch_size=app.config.get('NOTIFICATION_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                poll_interval=app.config.get('NOTIFICATION_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+                max_tentatives=app.config.get('NOTIFICATION_MAX_TENTATIVES', DEFAULT_MAX_TENTATIVES),
+                backoff=app.config.get('NOTIFICATION_BACKOFF', DEFAULT_BACKOFF),
+            ).start()
+            atexit.register(workers[canal].stop)
+    app.extensions['notification_workers'] = workers
+
+    window = app.config.get('NOTIFICATION_DIGEST_WINDOW', 0)
+    if window > 0:
+        # Démarré même sans workers: il dépose les résumés dans la boîte d'envoi
+        digest = NotificationDigest(app, window).start()
+        atexit.register(digest.stop)
+        app.extensions['notification_digest'] = digest
+    return workers
 
+def notification_stats(db):
+    """État de la boîte d'envoi et compteurs des workers par canal, et du regroupement"""
+    workers = current_app.extensions.get('notification_workers', {})
+    stats = {
+        canal: {'boite': statuts, 'worker': workers[canal].stats() if canal in workers else None}
+        for canal, statuts in outbox_counts(db).items()
+    }
+    digest = current_app.extensions.get('notification_digest')
+    stats['regroupement'] = digest.stats() if digest is not None else None
+    return stats
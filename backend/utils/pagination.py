@@ -0,0 +1,154 @@
+"""
+Pagination par curseur (keyset) des routes de liste
+
+Une page est lue par `ORDER BY <clés> LIMIT n` à partir de la dernière
+ligne de la page précédente, transmise au client sous forme de curseur
+opaque: le coût d'une page ne dépend pas de sa position dans la liste
+(contrairement à OFFSET). Le corps de la réponse reste un tableau JSON;
+la page suivante est annoncée par les en-têtes X-Next-Cursor et Link, le
+nombre total de lignes (X-Total-Count) n'est calculé que sur demande.
+
+Paramètres de requête: limit, cursor, count=1.
+"""
+import base64
+import binascii
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from urllib.parse import urlencode
+from flask import current_app, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent.parent / "database" / "schema_pagination.sql"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+PAGINATION_HEADERS = ('Link', 'X-Next-Cursor', 'X-Total-Count')
+
+class PaginationError(ValueError):
+    """Paramètre de pagination invalide (limit ou cursor)"""
+
+def install_pagination_indexes(db):
+    """Crée les index des tris paginés et renseigne les clés de tri NULL (migration idempotente)
+
+    Un index dont la table n'existe pas dans cette base est ignoré.
+    """
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        statements = [s.strip() for s in f.read().split(';')]
+    for statement in statements:
+        lignes = [l for l in statement.splitlines() if not l.strip().startswith('--')]
+        if not ''.join(lignes).strip():
+            continue
+        try:
+            db.execute(statement)
+        except sqlite3.OperationalError as e:
+            logger.debug("Index de pagination ignoré: %s", e)
+    db.commit()
+
+def init_pagination(app):
+    """Installe les index de pagination au démarrage de l'application"""
+    from database.db import get_db_connection
+
+    with app.app_context():
+        with get_db_connection() as db:
+            install_pagination_indexes(db)
+
+def encode_cursor(values):
+    """Curseur opaque: valeurs des clés de tri de la dernière ligne"""
+    payload = json.dumps(list(values), separators=(',', ':'), ensure_ascii=False, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    """Valeurs d'un curseur (PaginationError s'il est illisible ou d'une autre liste)"""
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding).decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError('Curseur invalide')
+    if (not isinstance(values, list) or len(values) != size
+            or not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in values)):
+        raise PaginationError('Curseur invalide')
+    return values
+
+def page_size():
+    """Taille de page demandée, bornée à PAGE_SIZE_MAX"""
+    default = current_app.config.get('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', MAX_PAGE_SIZE)
+    limit = request.args.get('limit')
+    if limit is None:
+        return min(default, maximum)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError('limit doit être un entier')
+    if limit < 1:
+        raise PaginationError('limit doit être positif')
+    return min(limit, maximum)
+
+def keyset_condition(order_by, values):
+    """Condition SQL des lignes situées après `values` dans l'ordre `order_by`
+
+    Même sens pour toutes les clés: comparaison de valeurs de ligne
+    ((a, b) < (?, ?)), utilisable par un index. Sens mélangés: forme
+    développée précédée d'une borne sur la première clé.
+    """
+    colonnes = [f'"{colonne}"' for colonne, _ in order_by]
+    operateurs = ['<' if sens.upper() == 'DESC' else '>' for _, sens in order_by]
+    if len(set(operateurs)) == 1:
+        return (f"({', '.join(colonnes)}) {operateurs[0]} ({', '.join('?' * len(colonnes))})",
+                list(values))
+
+    termes, params = [], []
+    for i, (colonne, operateur) in enumerate(zip(colonnes, operateurs)):
+        egalites = [f'{c} = ?' for c in colonnes[:i]]
+        termes.append('(' + ' AND '.join(egalites + [f'{colonne} {operateur} ?']) + ')')
+        params.extend(values[:i + 1])
+    borne = f'{colonnes[0]} {operateurs[0]}= ?'
+    return f"{borne} AND ({' OR '.join(termes)})", [values[0]] + params
+
+def _next_link(token):
+    args = request.args.to_dict(flat=False)
+    args['cursor'] = [token]
+    return f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+
+def paginate(db, query, params=(), order_by=(('id', 'DESC'),), transform=dict):
+    """Réponse JSON d'une page de `query` (requête sans ORDER BY ni LIMIT)
+
+    `order_by`: colonnes du résultat et sens ('ASC'/'DESC'); la dernière doit
+    être unique (l'identifiant) et aucune ne doit être NULL: une ligne NULL
+    échappe à la comparaison des clés et son curseur est refusé. Les
+    écritures renseignent donc ces colonnes (COALESCE dans le tri empêcherait
+    l'usage des index).
+    """
+    try:
+        limit = page_size()
+        cursor = request.args.get('cursor')
+        values = decode_cursor(cursor, len(order_by)) if cursor else None
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    params = list(params)
+    sql = f"SELECT * FROM ({query}) AS page"
+    page_params = list(params)
+    if values is not None:
+        condition, condition_params = keyset_condition(order_by, values)
+        sql += f" WHERE {condition}"
+        page_params += condition_params
+    sql += " ORDER BY " + ', '.join(f'"{colonne}" {sens.upper()}' for colonne, sens in order_by)
+    sql += " LIMIT ?"
+    page_params.append(limit + 1)
+
+    rows = db.execute(sql, page_params).fetchall()
+    response = jsonify([transform(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        dernier = rows[limit - 1]
+        token = encode_cursor(dernier[colonne] for colonne, _ in order_by)
+        response.headers['X-Next-Cursor'] = token
+        response.headers['Link'] = _next_link(token)
+    if request.args.get('count') in ('1', 'true'):
+        total = db.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+        response.headers['X-Total-Count'] = str(total)
+    return response, 200
@@ -10,6 +10,12 @@ from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 from datetime import datetime
 import os
 
+# Version des gabarits: à incrémenter à chaque changement de mise en page
+# (invalide les documents en cache, voir utils/document_cache.py).
+# Un gabarit n'imprime que ses données: une date d'édition fait partie des
+# données (donc de la clé du cache), jamais l'heure du rendu.
+TEMPLATE_VERSION = 2
+
 def generate_receipt(paiement_data, output_path):
     """Génère un reçu de paiement en PDF"""
     doc = SimpleDocTemplate(output_path, pagesize=A4)
@@ -57,7 +63,7 @@ def generate_receipt(paiement_data, output_path):
     
     story.append(table)
     story.append(Spacer(1, 1*cm))
-    story.append(Paragraph(f"Date d'émission: {datetime.now().strftime('%d/%m/%Y %H:%M')}", 
+    story.append(Paragraph(f"Date d'émission: {paiement_data.get('date_emission') or datetime.now().strftime('%d/%m/%Y')}", 
                           ParagraphStyle('RightAlign', parent=styles['Normal'], alignment=TA_RIGHT)))
     
     doc.build(story)
@@ -122,6 +128,46 @@ def generate_bulletin(etudiant_data, notes_data, output_path):
     doc.build(story)
     return output_path
 
+# Lignes par tableau dans les listes PDF
+LISTE_TABLE_ROWS = 500
+
+def generate_liste_etudiants(etudiants, date_edition, output_path):
+    """Génère la liste des étudiants en PDF (numéro, nom, prénom, email, classe) datée du JJ/MM/AAAA donné"""
+    doc = SimpleDocTemplate(output_path, pagesize=A4)
+    story = []
+    styles = getSampleStyleSheet()
+    
+    story.append(Paragraph("Liste des Étudiants", styles['Heading1']))
+    story.append(Paragraph(f"Date: {date_edition}", styles['Normal']))
+    
+    entetes = ['Numéro', 'Nom', 'Prénom', 'Email', 'Classe']
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    
+    # Un tableau par paquet de lignes (en-tête répété à chaque page):
+    # reportlab découpe mal un tableau unique de plusieurs milliers de lignes
+    paquet = []
+    nombre = 0
+    for e in etudiants:
+        paquet.append([e[0], e[1], e[2], e[3], e[4] or 'N/A'])
+        nombre += 1
+        if len(paquet) == LISTE_TABLE_ROWS:
+            story.append(Table([entetes] + paquet, style=table_style, repeatRows=1))
+            paquet = []
+    if paquet or not nombre:
+        story.append(Table([entetes] + paquet, style=table_style, repeatRows=1))
+    
+    doc.build(story)
+    return output_path
+
 def generate_cv_pdf(etudiant_data, portfolio_data, output_path):
     """Génère un CV PDF à partir du portfolio"""
     doc = SimpleDocTemplate(output_path, pagesize=A4)
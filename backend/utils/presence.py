@@ -0,0 +1,212 @@
+"""
+Service de présence des utilisateurs (en ligne / hors ligne)
+
+La présence vit en mémoire: un battement de cœur (POST /api/chat/presence,
+envoi d'un message) met à jour le registre sans écrire en base, et un
+utilisateur sans battement depuis PRESENCE_TTL secondes passe hors ligne.
+Les changements sont écrits dans presence_users par lots, toutes les
+PRESENCE_FLUSH_INTERVAL secondes (0 = écriture immédiate), et diffusés sur
+le canal 'presence:<user_id>' du hub temps réel.
+
+Le registre est celui du processus: il est chargé depuis presence_users au
+démarrage, et chaque processus serveur ne voit en direct que les
+battements qu'il reçoit.
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, has_request_context
+from database.db import get_db, get_db_connection, get_write_db
+from utils.realtime import get_hub
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 90               # secondes sans battement avant de passer hors ligne
+DEFAULT_FLUSH_INTERVAL = 10    # secondes entre deux écritures en base
+
+def presence_channel(user_id):
+    return f'presence:{user_id}'
+
+@contextmanager
+def _connection(app, read_only=False):
+    """Connexion de la requête en cours s'il y en a une, sinon une connexion du pool
+
+    Dans une requête, emprunter une seconde connexion d'écriture attendrait
+    celle que la requête détient déjà.
+    """
+    if has_request_context():
+        yield get_db() if read_only else get_write_db()
+    else:
+        with app.app_context():
+            with get_db_connection(read_only=read_only) as db:
+                yield db
+
+class PresenceService:
+    """Registre de présence en mémoire avec expiration et écriture différée"""
+
+    def __init__(self, app, ttl=DEFAULT_TTL, flush_interval=DEFAULT_FLUSH_INTERVAL, hub=None):
+        self.app = app
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.hub = hub
+        self._etats = {}
+        self._modifies = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'battements': 0, 'expirations': 0, 'ecritures': 0, 'lots': 0}
+
+    def load(self, db):
+        """Charge les présences enregistrées (les utilisateurs en ligne reçoivent un délai de grâce)"""
+        expire = time.monotonic() + self.ttl
+        with self._lock:
+            for row in db.execute("SELECT user_id, is_online, derniere_activite, device_info FROM presence_users"):
+                self._etats[row['user_id']] = {
+                    'is_online': bool(row['is_online']),
+                    'derniere_activite': row['derniere_activite'],
+                    'device_info': row['device_info'],
+                    'expire': expire,
+                }
+
+    def heartbeat(self, user_id, is_online=True, device_info=None):
+        """Enregistre l'activité d'un utilisateur; device_info=None conserve l'appareil connu"""
+        with self._lock:
+            etat = self._etats.get(user_id)
+            changement = etat is None or etat['is_online'] != bool(is_online)
+            etat = self._etats[user_id] = {
+                'is_online': bool(is_online),
+                'derniere_activite': str(datetime.now()),
+                'device_info': device_info if device_info is not None else (etat or {}).get('device_info'),
+                'expire': time.monotonic() + self.ttl,
+            }
+            self._modifies.add(user_id)
+            self._stats['battements'] += 1
+        if changement:
+            self._publish(user_id, etat)
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def get_many(self, user_ids):
+        """Présence des utilisateurs connus parmi `user_ids` (sans accès à la base)"""
+        maintenant = time.monotonic()
+        with self._lock:
+            return [self._public(user_id, etat, maintenant)
+                    for user_id, etat in ((u, self._etats.get(u)) for u in user_ids)
+                    if etat is not None]
+
+    def expire(self):
+        """Passe hors ligne les utilisateurs sans battement récent; retourne leur nombre"""
+        maintenant = time.monotonic()
+        expires = []
+        with self._lock:
+            for user_id, etat in self._etats.items():
+                if etat['is_online'] and etat['expire'] <= maintenant:
+                    etat['is_online'] = False
+                    self._modifies.add(user_id)
+                    expires.append((user_id, dict(etat)))
+            self._stats['expirations'] += len(expires)
+        for user_id, etat in expires:
+            self._publish(user_id, etat)
+        return len(expires)
+
+    def flush(self):
+        """Écrit en une transaction les présences modifiées depuis la dernière écriture"""
+        with self._lock:
+            modifies, self._modifies = self._modifies, set()
+            lignes = [(user_id, self._etats[user_id]['is_online'], self._etats[user_id]['derniere_activite'],
+                       self._etats[user_id]['device_info']) for user_id in modifies]
+        if not lignes:
+            return 0
+        try:
+            with _connection(self.app) as db:
+                db.executemany("""
+                    INSERT INTO presence_users (user_id, is_online, derniere_activite, device_info)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        is_online = excluded.is_online,
+                        derniere_activite = excluded.derniere_activite,
+                        device_info = excluded.device_info
+                """, lignes)
+                db.commit()
+        except sqlite3.Error:
+            # Réessayer au prochain lot (sans écraser un battement plus récent)
+            with self._lock:
+                self._modifies |= modifies
+            raise
+        with self._lock:
+            self._stats['ecritures'] += len(lignes)
+            self._stats['lots'] += 1
+        return len(lignes)
+
+    def start(self):
+        """Démarre le thread d'expiration et d'écriture différée"""
+        self._thread = threading.Thread(target=self._run, name='presence-flush', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le thread puis écrit les dernières modifications"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning("Présences non enregistrées à l'arrêt: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, utilisateurs=len(self._etats),
+                        en_ligne=sum(1 for e in self._etats.values() if e['is_online']),
+                        en_attente=len(self._modifies))
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.expire()
+                self.flush()
+            except Exception as e:
+                logger.warning("Écriture des présences échouée: %s", e)
+
+    def _public(self, user_id, etat, maintenant):
+        return {
+            'user_id': user_id,
+            'is_online': etat['is_online'] and etat['expire'] > maintenant,
+            'derniere_activite': etat['derniere_activite'],
+        }
+
+    def _publish(self, user_id, etat):
+        if self.hub is not None:
+            self.hub.publish(presence_channel(user_id), {
+                'event': 'presence',
+                'data': {'user_id': user_id, 'is_online': etat['is_online'],
+                         'derniere_activite': etat['derniere_activite']},
+            })
+
+def init_presence(app):
+    """Crée le service de présence, charge presence_users et démarre l'écriture différée"""
+    service = PresenceService(app, ttl=app.config.get('PRESENCE_TTL', DEFAULT_TTL),
+                              flush_interval=app.config.get('PRESENCE_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                              hub=get_hub(app))
+    with _connection(app, read_only=True) as db:
+        try:
+            service.load(db)
+        except sqlite3.OperationalError as e:
+            logger.warning("Présences enregistrées non chargées: %s", e)
+    app.extensions['presence'] = service
+    if service.flush_interval > 0:
+        service.start()
+        atexit.register(service.stop)
+    return service
+
+def get_presence_service(app=None):
+    """Retourne le service de présence de l'application (créé à la demande)"""
+    app = app or current_app._get_current_object()
+    service = app.extensions.get('presence')
+    if service is None:
+        service = init_presence(app)
+    return service
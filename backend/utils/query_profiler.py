@@ -0,0 +1,181 @@
+"""
+Profilage SQL par requête HTTP
+
+Chaque requête reçoit un profil (g.sql_profile) attaché aux connexions
+qu'elle emprunte aux pools (database/db.py): chaque instruction exécutée
+(execute, executemany, commit) y est enregistrée avec sa durée. En fin de
+requête:
+- l'en-tête Server-Timing annonce le temps passé en base, le nombre
+  d'instructions et la durée totale (db;dur=12.4;desc="7 sql", app;dur=30.1);
+- une même forme d'instruction (littéraux remplacés par ?) exécutée
+  SQL_PROFILING_N_PLUS_ONE fois ou plus est signalée comme N+1: requête
+  émise dans une boucle Python au lieu d'une jointure ou d'un IN;
+- le profil est agrégé par endpoint (GET /api/admin/perf).
+
+SQL_PROFILING=false désactive l'ensemble: les connexions n'ont alors plus
+de profil et l'exécution n'est pas mesurée.
+"""
+import logging
+import re
+import threading
+import time
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE = 5          # répétitions d'une forme dans une requête
+MAX_FORMES_PAR_ROUTE = 100      # formes d'instructions suivies par endpoint
+MAX_INSTRUCTIONS = 1000         # instructions conservées par profil (les compteurs continuent)
+
+_ESPACES = re.compile(r'\s+')
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_LISTES = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+def statement_shape(sql):
+    """Forme d'une instruction: espaces réduits, littéraux et listes IN remplacés par ?"""
+    sql = _CHAINES.sub('?', sql)
+    sql = _NOMBRES.sub('?', sql)
+    sql = _LISTES.sub('(?)', sql)
+    return _ESPACES.sub(' ', sql).strip()
+
+class RequestProfile:
+    """Instructions SQL d'une requête HTTP et leurs durées"""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.instructions = []
+        self.nombre = 0
+        self.duree_sql = 0.0
+
+    def record(self, sql, duree):
+        self.nombre += 1
+        self.duree_sql += duree
+        if len(self.instructions) < MAX_INSTRUCTIONS:
+            self.instructions.append((sql, duree))
+
+    def shapes(self):
+        """{forme: (exécutions, durée totale)}"""
+        formes = {}
+        for sql, duree in self.instructions:
+            forme = statement_shape(sql)
+            nombre, total = formes.get(forme, (0, 0.0))
+            formes[forme] = (nombre + 1, total + duree)
+        return formes
+
+    def server_timing(self, duree_totale):
+        return (f'db;dur={self.duree_sql * 1000:.1f};desc="{self.nombre} sql", '
+                f'app;dur={duree_totale * 1000:.1f}')
+
+class QueryProfiler:
+    """Agrégats des profils SQL par endpoint"""
+
+    def __init__(self, seuil=DEFAULT_N_PLUS_ONE):
+        self.seuil = seuil
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._signales = set()
+
+    def add(self, endpoint, profile, duree_totale):
+        formes = profile.shapes()
+        repetees = {forme for forme, (nombre, _) in formes.items() if nombre >= self.seuil}
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {
+                    'requetes': 0, 'sql_total': 0, 'sql_max': 0, 'duree_sql': 0.0, 'duree_totale': 0.0,
+                    'duree_max': 0.0, 'n_plus_un': 0, 'formes': {},
+                }
+            route['requetes'] += 1
+            route['sql_total'] += profile.nombre
+            route['sql_max'] = max(route['sql_max'], profile.nombre)
+            route['duree_sql'] += profile.duree_sql
+            route['duree_totale'] += duree_totale
+            route['duree_max'] = max(route['duree_max'], duree_totale)
+            route['n_plus_un'] += bool(repetees)
+            for forme, (nombre, duree) in formes.items():
+                stats = route['formes'].get(forme)
+                if stats is None:
+                    if len(route['formes']) >= MAX_FORMES_PAR_ROUTE:
+                        continue
+                    stats = route['formes'][forme] = {'executions': 0, 'duree': 0.0, 'max_par_requete': 0,
+                                                      'requetes_n_plus_un': 0}
+                stats['executions'] += nombre
+                stats['duree'] += duree
+                stats['max_par_requete'] = max(stats['max_par_requete'], nombre)
+                stats['requetes_n_plus_un'] += forme in repetees
+            nouvelles = [(forme, formes[forme][0]) for forme in repetees if (endpoint, forme) not in self._signales]
+            self._signales.update((endpoint, forme) for forme, _ in nouvelles)
+        for forme, nombre in nouvelles:
+            logger.warning("N+1 dans %s: %d exécutions de %s", endpoint, nombre, forme[:200])
+
+    def stats(self, limite=5):
+        """Agrégats par endpoint, du plus long temps passé en base au plus court"""
+        with self._lock:
+            routes = [(endpoint, dict(route, formes={f: dict(s) for f, s in route['formes'].items()}))
+                      for endpoint, route in self._routes.items()]
+        resultat = []
+        for endpoint, route in routes:
+            n = route['requetes']
+            formes = sorted(route['formes'].items(), key=lambda item: -item[1]['duree'])
+            resultat.append({
+                'endpoint': endpoint,
+                'requetes': n,
+                'sql_moyenne': round(route['sql_total'] / n, 2),
+                'sql_max': route['sql_max'],
+                'duree_sql_ms': round(route['duree_sql'] * 1000, 3),
+                'duree_sql_moyenne_ms': round(route['duree_sql'] * 1000 / n, 3),
+                'duree_moyenne_ms': round(route['duree_totale'] * 1000 / n, 3),
+                'duree_max_ms': round(route['duree_max'] * 1000, 3),
+                'requetes_n_plus_un': route['n_plus_un'],
+                'n_plus_un': [dict(sql=forme, executions=s['executions'], max_par_requete=s['max_par_requete'],
+                                   requetes=s['requetes_n_plus_un'], duree_ms=round(s['duree'] * 1000, 3))
+                              for forme, s in formes if s['requetes_n_plus_un']],
+                'instructions_lentes': [dict(sql=forme, executions=s['executions'],
+                                             duree_ms=round(s['duree'] * 1000, 3),
+                                             duree_moyenne_ms=round(s['duree'] * 1000 / s['executions'], 3))
+                                        for forme, s in formes[:limite]],
+            })
+        resultat.sort(key=lambda route: -route['duree_sql_ms'])
+        return {
+            'seuil_n_plus_un': self.seuil,
+            'routes': resultat,
+            'routes_n_plus_un': [route['endpoint'] for route in resultat if route['requetes_n_plus_un']],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._signales.clear()
+
+def get_query_profiler():
+    """Profileur de l'application courante (None si SQL_PROFILING=false)"""
+    return current_app.extensions.get('query_profiler')
+
+def init_query_profiler(app):
+    """Profile les instructions SQL de chaque requête (à appeler avant les autres hooks)"""
+    if not app.config.get('SQL_PROFILING', True):
+        return None
+    profiler = QueryProfiler(app.config.get('SQL_PROFILING_N_PLUS_ONE', DEFAULT_N_PLUS_ONE))
+    app.extensions['query_profiler'] = profiler
+
+    @app.before_request
+    def _start_profile():
+        g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        # Les instructions d'une réponse en flux ne sont plus comptées
+        for conn in (g.get('db'), g.get('db_write')):
+            if getattr(conn, 'profiler', None) is profile:
+                conn.profiler = None
+        duree = time.perf_counter() - profile.debut
+        response.headers['Server-Timing'] = profile.server_timing(duree)
+        if request.endpoint:
+            profiler.add(request.endpoint, profile, duree)
+        return response
+
+    return profiler
@@ -0,0 +1,223 @@
+"""
+Limitation de débit par seau à jetons (token bucket)
+
+Chaque clé (ex. 'login_<ip>') possède un seau de `limit` jetons qui se
+remplit au rythme de `limit / window` jetons par seconde; une requête
+consomme un jeton. L'état d'une clé tient en deux nombres (jetons, date de
+mise à jour), mis à jour en O(1).
+
+Deux stockages: en mémoire du processus (LRU borné) ou dans un fichier
+SQLite partagé par tous les workers gunicorn d'un même serveur, où chaque
+vérification est une seule instruction UPSERT ... RETURNING.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, has_app_context
+from database.pool import open_connection
+from utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_KEYS = 10000
+DEFAULT_PURGE_EVERY = 1000     # vérifications entre deux purges des seaux pleins (SQLite)
+
+RateLimitResult = namedtuple('RateLimitResult', ['autorise', 'restant', 'reessayer_dans'])
+
+def _refill(jetons, maj, now, limit, debit):
+    """Jetons disponibles à `now` (seau plein pour une clé inconnue)"""
+    if jetons is None:
+        return float(limit)
+    return min(float(limit), jetons + max(0.0, now - maj) * debit)
+
+class MemoryStorage:
+    """Seaux en mémoire du processus, bornés à `max_keys` clés (LRU)
+
+    Un seau expire après `window` secondes d'inactivité: il serait de
+    nouveau plein, l'oublier ne change rien.
+    """
+    distributed = False
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self._seaux = LRUCache(max_size=max_keys, ttl=None)
+        self._lock = threading.Lock()
+
+    def consume(self, key, limit, window, cost=1, now=None):
+        """Consomme `cost` jetons si possible; retourne (autorisé, jetons restants)"""
+        now = time.time() if now is None else now
+        debit = limit / window
+        with self._lock:
+            etat = self._seaux.get(key)
+            jetons = _refill(*(etat or (None, None)), now, limit, debit)
+            autorise = jetons >= cost
+            if autorise:
+                jetons -= cost
+            self._seaux.set(key, (jetons, now), ttl=window)
+        return autorise, jetons
+
+    def reset(self, key=None):
+        if key is None:
+            self._seaux.clear()
+        else:
+            self._seaux.delete(key)
+
+    def stats(self):
+        stats = self._seaux.stats()
+        return {'backend': 'memory', 'cles': stats['size'], 'max_cles': stats['max_size'],
+                'evictions': stats['evictions']}
+
+class SQLiteStorage:
+    """Seaux dans un fichier SQLite partagé entre processus
+
+    La recharge et la consommation sont calculées par SQLite dans l'UPSERT:
+    deux workers ne peuvent pas consommer le même jeton. Les seaux inactifs
+    depuis plus de leur fenêtre sont purgés toutes les `purge_every`
+    vérifications. Une base indisponible laisse passer la requête.
+    """
+    distributed = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            cle TEXT PRIMARY KEY,
+            jetons REAL NOT NULL,
+            maj REAL NOT NULL,              -- secondes epoch de la dernière vérification
+            expire_at REAL NOT NULL,        -- seau de nouveau plein: peut être purgé
+            autorise INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_rate_limits_expire ON rate_limits(expire_at);
+    """
+
+    CONSUME = """
+        INSERT INTO rate_limits (cle, jetons, maj, expire_at, autorise)
+        VALUES (:cle, CASE WHEN :limite >= :cout THEN :limite - :cout ELSE :limite END,
+                :now, :now + :fenetre, :limite >= :cout)
+        ON CONFLICT(cle) DO UPDATE SET
+            jetons = min(:limite, jetons + max(0, :now - maj) * :debit)
+                     - CASE WHEN min(:limite, jetons + max(0, :now - maj) * :debit) >= :cout THEN :cout ELSE 0 END,
+            autorise = min(:limite, jetons + max(0, :now - maj) * :debit) >= :cout,
+            maj = :now,
+            expire_at = :now + :fenetre
+        RETURNING autorise, jetons
+    """
+
+    def __init__(self, path, purge_every=DEFAULT_PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._verifications = 0
+        self._stats = {'purges': 0, 'erreurs': 0}
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _connection(self):
+        """Connexion propre au thread (une écriture à la fois de toute façon)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = open_connection(self.path)
+        return conn
+
+    def consume(self, key, limit, window, cost=1, now=None):
+        """Consomme `cost` jetons si possible; retourne (autorisé, jetons restants)"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        try:
+            row = conn.execute(self.CONSUME, {'cle': key, 'limite': float(limit), 'cout': cost, 'now': now,
+                                              'fenetre': window, 'debit': limit / window}).fetchone()
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.warning("Limitation de débit indisponible (%s), requête autorisée", e)
+            with self._lock:
+                self._stats['erreurs'] += 1
+            return True, float(limit)
+
+        with self._lock:
+            self._verifications += 1
+            purger = self.purge_every and self._verifications % self.purge_every == 0
+        if purger:
+            self.purge(now)
+        return bool(row['autorise']), row['jetons']
+
+    def purge(self, now=None):
+        """Supprime les seaux redevenus pleins; retourne le nombre supprimé"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        try:
+            supprimes = conn.execute("DELETE FROM rate_limits WHERE expire_at <= ?", (now,)).rowcount
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.warning("Purge de la limitation de débit échouée: %s", e)
+            return 0
+        with self._lock:
+            self._stats['purges'] += 1
+        return supprimes
+
+    def reset(self, key=None):
+        conn = self._connection()
+        if key is None:
+            conn.execute("DELETE FROM rate_limits")
+        else:
+            conn.execute("DELETE FROM rate_limits WHERE cle = ?", (key,))
+        conn.commit()
+
+    def stats(self):
+        cles = self._connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+        with self._lock:
+            return dict(self._stats, backend='sqlite', cles=cles, verifications=self._verifications)
+
+class RateLimiter:
+    """Façade de la limitation de débit"""
+
+    def __init__(self, storage=None):
+        self.storage = storage or MemoryStorage()
+        self._lock = threading.Lock()
+        self._stats = {'autorisees': 0, 'refusees': 0}
+
+    def hit(self, key, limit, window, cost=1):
+        """Enregistre une requête pour la clé: `limit` requêtes par `window` secondes"""
+        autorise, jetons = self.storage.consume(key, limit, window, cost)
+        with self._lock:
+            self._stats['autorisees' if autorise else 'refusees'] += 1
+        reessayer_dans = 0.0 if autorise else (cost - jetons) * window / limit
+        return RateLimitResult(autorise, int(jetons), round(reessayer_dans, 3))
+
+    def reset(self, key=None):
+        self.storage.reset(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.storage.stats())
+        return stats
+
+def _create_storage(config):
+    """Crée le stockage selon RATELIMIT_STORAGE (repli sur la mémoire si SQLite est indisponible)"""
+    if config.get('RATELIMIT_STORAGE', 'memory') == 'sqlite':
+        path = config.get('RATELIMIT_DATABASE') or os.path.join(
+            os.path.dirname(os.path.abspath(config['DATABASE'])), 'ratelimit.db')
+        try:
+            return SQLiteStorage(path)
+        except sqlite3.Error as e:
+            logger.warning("Limitation de débit SQLite indisponible (%s), repli sur la mémoire", e)
+    return MemoryStorage(max_keys=config.get('RATELIMIT_MAX_KEYS', DEFAULT_MAX_KEYS))
+
+def init_rate_limiter(app, storage=None):
+    """Initialise la limitation de débit de l'application"""
+    limiter = RateLimiter(storage or _create_storage(app.config))
+    app.extensions['rate_limiter'] = limiter
+    return limiter
+
+# Limiteur hors application (scripts, tests)
+_default_limiter = RateLimiter()
+
+def get_rate_limiter():
+    """Retourne le limiteur de l'application courante (ou celui du processus)"""
+    if has_app_context():
+        return current_app.extensions.get('rate_limiter', _default_limiter)
+    return _default_limiter
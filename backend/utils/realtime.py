@@ -0,0 +1,169 @@
+"""
+Diffusion en temps réel (publication/abonnement en mémoire, Server-Sent Events)
+
+Un abonné (un client connecté au flux SSE) s'inscrit sur un ou plusieurs
+canaux, par exemple 'conversation:42' ou 'presence:7'; chaque publication
+sur un canal est déposée dans la file de chacun de ses abonnés. Le hub vit dans le processus: avec
+plusieurs processus serveur, un client ne reçoit que ce qui est publié dans
+le sien (la reprise par Last-Event-ID rattrape le reste depuis la base).
+"""
+import json
+import logging
+import queue
+import threading
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 256       # événements en attente par abonné
+DEFAULT_KEEPALIVE = 15         # secondes entre deux commentaires de maintien SSE
+RECONNECT_DELAY_MS = 1000      # délai de reconnexion indiqué au client EventSource
+
+class Subscription:
+    """Abonnement d'un client à un ou plusieurs canaux
+
+    Un abonné trop lent (file pleine) est décroché du hub: il vide sa file
+    puis son flux se termine, et le client se reconnecte en reprenant au
+    dernier identifiant reçu.
+    """
+
+    def __init__(self, canaux, user_id=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.canaux = canaux
+        self.user_id = user_id
+        self.decroche = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def put(self, event):
+        """Dépose un événement; retourne False si la file est pleine"""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout=None):
+        """Prochain événement, ou None après `timeout` secondes sans événement"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def pending(self):
+        """Nombre d'événements en attente"""
+        return self._queue.qsize()
+
+class Hub:
+    """Registre thread-safe des abonnés par canal"""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._canaux = {}
+        self._lock = threading.Lock()
+        self._stats = {'publications': 0, 'livraisons': 0, 'decrochages': 0}
+
+    def subscribe(self, canaux, user_id=None):
+        """Inscrit un nouvel abonné sur un canal (ou une liste de canaux)"""
+        canaux = (canaux,) if isinstance(canaux, str) else tuple(canaux)
+        subscription = Subscription(canaux, user_id, self.queue_size)
+        with self._lock:
+            for canal in canaux:
+                self._canaux.setdefault(canal, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Retire un abonné (sans effet s'il a déjà été retiré)"""
+        with self._lock:
+            for canal in subscription.canaux:
+                abonnes = self._canaux.get(canal)
+                if abonnes is not None:
+                    abonnes.discard(subscription)
+                    if not abonnes:
+                        del self._canaux[canal]
+
+    def publish(self, canal, event):
+        """Diffuse un événement aux abonnés du canal; retourne le nombre de livraisons"""
+        with self._lock:
+            abonnes = list(self._canaux.get(canal, ()))
+            self._stats['publications'] += 1
+        livres = 0
+        for subscription in abonnes:
+            if subscription.put(event):
+                livres += 1
+            else:
+                subscription.decroche = True
+                self.unsubscribe(subscription)
+                with self._lock:
+                    self._stats['decrochages'] += 1
+                logger.info("Abonné %s décroché du canal %s (file pleine)", subscription.user_id, canal)
+        with self._lock:
+            self._stats['livraisons'] += livres
+        return livres
+
+    def subscribers(self, canal):
+        """Identifiants des utilisateurs abonnés au canal"""
+        with self._lock:
+            return {s.user_id for s in self._canaux.get(canal, ())}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats,
+                        canaux=len(self._canaux),
+                        abonnes=len(set().union(*self._canaux.values())))
+
+def init_realtime(app):
+    """Initialise le hub de diffusion de l'application"""
+    hub = Hub(queue_size=app.config.get('REALTIME_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+    app.extensions['realtime_hub'] = hub
+    return hub
+
+def get_hub(app=None):
+    """Retourne le hub de l'application (créé à la demande si non initialisé)"""
+    app = app or current_app._get_current_object()
+    hub = app.extensions.get('realtime_hub')
+    if hub is None:
+        hub = init_realtime(app)
+    return hub
+
+def sse_event(data, event=None, event_id=None):
+    """Formate un événement Server-Sent Events (données sérialisées en JSON)"""
+    lignes = []
+    if event_id is not None:
+        lignes.append(f'id: {event_id}')
+    if event:
+        lignes.append(f'event: {event}')
+    lignes.append(f'data: {json.dumps(data, default=str, ensure_ascii=False)}')
+    return '\n'.join(lignes) + '\n\n'
+
+def sse_stream(subscription, hub, initial=(), keepalive=DEFAULT_KEEPALIVE, last_id=None):
+    """Flux SSE: les événements `initial` (rattrapage) puis ceux du canal
+
+    Chaque événement est un dict {'id', 'event', 'data'}; ceux dont l'id ne
+    dépasse pas le dernier envoyé sont ignorés (un message publié pendant le
+    rattrapage arrive par les deux voies). Un commentaire est émis toutes les
+    `keepalive` secondes pour garder la connexion ouverte à travers les
+    proxys. Sans abonnement, le flux se termine après le rattrapage. L'abonné
+    est retiré du hub à la fin du flux.
+    """
+    try:
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+        for event in initial:
+            last_id = event.get('id', last_id)
+            yield sse_event(event['data'], event.get('event'), event.get('id'))
+        while subscription is not None:
+            event = subscription.get(timeout=keepalive)
+            if event is None:
+                if subscription.decroche:
+                    return
+                yield ': keepalive\n\n'
+                continue
+            event_id = event.get('id')
+            if event_id is not None and last_id is not None and event_id <= last_id:
+                continue
+            if event_id is not None:
+                last_id = event_id
+            yield sse_event(event['data'], event.get('event'), event_id)
+            if subscription.decroche and not subscription.pending():
+                return
+    finally:
+        if subscription is not None:
+            hub.unsubscribe(subscription)
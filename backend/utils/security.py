@@ -10,21 +10,25 @@ from flask import jsonify, request, session, g
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from database.db import get_db
 from utils.auth import log_action, log_connection
-
-# Rate limiting storage (en production, utiliser Redis)
-_rate_limit_storage = {}
+from utils.rate_limit import get_rate_limiter, init_rate_limiter
+from utils.anomaly import get_anomaly_detector, init_anomaly_detector
+from utils.audit_log import record_audit
 
 def init_security(app):
     """Initialise les mesures de sécurité"""
     from flask_limiter import Limiter
     from flask_limiter.util import get_remote_address
     
+    # Limites par défaut: redis://... (RATELIMIT_STORAGE_URI) pour les partager entre workers
     limiter = Limiter(
         app=app,
         key_func=get_remote_address,
         default_limits=["200 per day", "50 per hour"],
-        storage_uri="memory://"  # En production, utiliser Redis
+        storage_uri=app.config.get('RATELIMIT_STORAGE_URI', 'memory://')
     )
+    # Limites manuelles (check_rate_limit): seaux à jetons en mémoire ou SQLite partagé
+    init_rate_limiter(app)
+    init_anomaly_detector(app)
     
     # Headers de sécurité
     @app.after_request
@@ -115,47 +119,11 @@ def validate_password_strength(password):
     return len(errors) == 0, errors
 
 def detect_suspicious_activity(user_id, action, ip_address):
-    """Détecte une activité suspecte"""
-    db = get_db()
-    
-    # Vérifier les tentatives de connexion échouées récentes
-    recent_failures = db.execute("""
-        SELECT COUNT(*) as count FROM logs_connexion
-        WHERE user_id = ? AND statut = 'echec'
-        AND created_at > datetime('now', '-15 minutes')
-    """, (user_id,)).fetchone()
-    
-    if recent_failures['count'] > 5:
-        return True, "Trop de tentatives de connexion échouées"
-    
-    # Vérifier les changements d'IP fréquents
-    recent_ips = db.execute("""
-        SELECT DISTINCT ip_address FROM logs_connexion
-        WHERE user_id = ? AND statut = 'succes'
-        AND created_at > datetime('now', '-1 hour')
-    """, (user_id,)).fetchall()
-    
-    if len(recent_ips) > 3:
-        return True, "Changements d'adresse IP suspects"
-    
-    # Vérifier les actions suspectes
-    suspicious_actions = ['suppression', 'modification_massive', 'export_donnees']
-    if action in suspicious_actions:
-        count = db.execute("""
-            SELECT COUNT(*) as count FROM logs_actions
-            WHERE user_id = ? AND action = ?
-            AND created_at > datetime('now', '-1 hour')
-        """, (user_id, action)).fetchone()
-        
-        if count['count'] > 10:
-            return True, "Trop d'actions suspectes détectées"
-    
-    return False, None
+    """Détecte une activité suspecte (fenêtres glissantes en mémoire, voir utils/anomaly.py)"""
+    return get_anomaly_detector().check(user_id, action, ip_address)
 
 def log_security_event(event_type, user_id, details, severity='info', ip_address=None):
-    """Enregistre un événement de sécurité"""
-    db = get_db()
-    
+    """Enregistre un événement de sécurité (écriture différée, voir utils/audit_log.py)"""
     # Si user_id est None, utiliser 0 (utilisateur système/anonyme)
     effective_user_id = user_id if user_id is not None else 0
     
@@ -167,53 +135,16 @@ def log_security_event(event_type, user_id, details, severity='info', ip_address
         except:
             ip = ip_address or 'unknown'
         
-        # Utiliser un timeout et gérer les erreurs de verrouillage
-        try:
-            db.execute("""
-                INSERT INTO logs_actions (user_id, action, table_affectee, 
-                                         nouvelles_valeurs, ip_address)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                effective_user_id,
-                f"security_{event_type}",
-                'security',
-                str(details),
-                ip
-            ))
-            db.commit()
-        except Exception as db_error:
-            # Si la base est verrouillée, rollback et ignorer
-            try:
-                db.rollback()
-            except:
-                pass
-            # Ne pas lever l'exception pour ne pas bloquer l'application
-            import logging
-            logging.warning(f"Erreur DB lors du logging de sécurité: {db_error}")
+        record_audit('action', (effective_user_id, f"security_{event_type}", 'security', None,
+                                None, str(details), ip))
     except Exception as e:
         # Ne pas faire échouer l'application si le logging échoue
         import logging
         logging.warning(f"Erreur lors du logging de sécurité: {e}")
 
 def check_rate_limit(identifier, limit=5, window=60):
-    """Vérifie le rate limiting manuel"""
-    key = f"rate_limit_{identifier}"
-    now = datetime.now()
-    
-    if key not in _rate_limit_storage:
-        _rate_limit_storage[key] = []
-    
-    # Nettoyer les anciennes entrées
-    _rate_limit_storage[key] = [
-        timestamp for timestamp in _rate_limit_storage[key]
-        if (now - timestamp).total_seconds() < window
-    ]
-    
-    if len(_rate_limit_storage[key]) >= limit:
-        return False
-    
-    _rate_limit_storage[key].append(now)
-    return True
+    """Vérifie le rate limiting manuel (`limit` requêtes par `window` secondes)"""
+    return get_rate_limiter().hit(f"rate_limit_{identifier}", limit, window).autorise
 
 def encrypt_sensitive_data(data):
     """Chiffre des données sensibles (basique, utiliser cryptography en production)"""